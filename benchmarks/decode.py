@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Vazão da etapa de decodificação do bybit (bybit/decode.py): mensagens por
+segundo no parse de cada adaptador de streams.py e klines por segundo na
+conversão de uma resposta /api/v3/klines para o array de candles.
+
+Cada backend JSON roda num processo próprio (JSON_BACKEND=json|orjson,
+lido na importação de decode.py). As mensagens são sintéticas, no formato
+de cada exchange, com um frame de controle (pong/ack) a cada `--control`
+mensagens. As klines comparam o caminho antigo (decodificar a lista e
+converter campo a campo com float) com klines_array() sobre o corpo cru.
+
+Uso:
+    python3 benchmarks/decode.py
+    python3 benchmarks/decode.py --messages 50000 --klines 1000 --runs 50
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BYBIT_DIR = os.path.join(ROOT, 'bybit')
+BACKENDS = ('json', 'orjson')
+
+
+def _price(rng, base=60000.0):
+    return f"{base * (1 + rng.gauss(0, 0.001)):.2f}"
+
+
+def _levels(rng, count):
+    return [[_price(rng), f"{rng.uniform(0.001, 5):.3f}"] for _ in range(count)]
+
+
+def messages(adapter, count, control, seed=42):
+    """Frames de texto como chegam do websocket de cada exchange."""
+    rng = random.Random(seed)
+    frames = []
+    for i in range(count):
+        ts = 1700000000000 + i * 100
+        if control and i % control == control - 1:
+            frames.append({
+                'binance': '{"result":null,"id":1}',
+                'bybit': '{"success":true,"ret_msg":"pong","conn_id":"abc","op":"ping"}',
+                'kucoin': '{"id":"1","type":"pong"}',
+            }[adapter.split('_')[0]])
+            continue
+        if adapter == 'binance':
+            msg = {'stream': 'btcusdt@miniTicker', 'data': {
+                'e': '24hrMiniTicker', 'E': ts, 's': 'BTCUSDT', 'c': _price(rng), 'o': _price(rng),
+                'h': _price(rng), 'l': _price(rng), 'v': '10402.1', 'q': '624126000.5'}}
+        elif adapter == 'bybit':
+            msg = {'topic': 'tickers.BTCUSDT', 'type': 'delta', 'cs': ts, 'ts': ts, 'data': {
+                'symbol': 'BTCUSDT', 'tickDirection': 'PlusTick', 'price24hPcnt': '0.0123',
+                'lastPrice': _price(rng), 'markPrice': _price(rng), 'indexPrice': _price(rng),
+                'openInterest': '52000.1', 'openInterestValue': '3120000000.00', 'turnover24h': '9812345678.9',
+                'volume24h': '163000.2', 'fundingRate': '0.0001', 'nextFundingTime': str(ts + 3600000),
+                'bid1Price': _price(rng), 'bid1Size': '3.1', 'ask1Price': _price(rng), 'ask1Size': '2.4'}}
+        elif adapter == 'kucoin':
+            msg = {'type': 'message', 'topic': '/contractMarket/ticker:XBTUSDTM', 'subject': 'ticker', 'data': {
+                'symbol': 'XBTUSDTM', 'sequence': i, 'side': 'buy', 'size': 3, 'price': _price(rng),
+                'bestBidSize': 120, 'bestBidPrice': _price(rng), 'bestAskPrice': _price(rng),
+                'tradeId': str(ts), 'ts': ts * 1000000, 'bestAskSize': 80}}
+        elif adapter == 'binance_book':
+            msg = {'stream': 'btcusdt@depth@100ms', 'data': {
+                'e': 'depthUpdate', 'E': ts, 's': 'BTCUSDT', 'U': i * 10, 'u': i * 10 + 9,
+                'b': _levels(rng, 10), 'a': _levels(rng, 10)}}
+        elif adapter == 'bybit_book':
+            msg = {'topic': 'orderbook.50.BTCUSDT', 'type': 'delta', 'ts': ts, 'cts': ts, 'data': {
+                's': 'BTCUSDT', 'b': _levels(rng, 5), 'a': _levels(rng, 5), 'u': i + 2, 'seq': i}}
+        else:
+            msg = {'type': 'message', 'topic': '/contractMarket/level2:XBTUSDTM', 'subject': 'level2', 'data': {
+                'sequence': i, 'change': f"{_price(rng)},{rng.choice(('buy', 'sell'))},{rng.randint(0, 500)}",
+                'timestamp': ts}}
+        frames.append(json.dumps(msg, separators=(',', ':')))
+    return frames
+
+
+def klines_body(count, seed=42):
+    """Corpo de /api/v3/klines com `count` candles de 12 campos."""
+    rng = random.Random(seed)
+    rows = []
+    price = 60000.0
+    for i in range(count):
+        open_time = 1700000000000 + i * 60000
+        close = price * (1 + rng.gauss(0, 0.001))
+        rows.append([open_time, f"{price:.2f}", f"{max(price, close) * 1.0005:.2f}", f"{min(price, close) * 0.9995:.2f}",
+                     f"{close:.2f}", f"{rng.uniform(5, 50):.5f}", open_time + 59999, "1234567.89", 812,
+                     "6.1", "365000.2", "0"])
+        price = close
+    return json.dumps(rows, separators=(',', ':')).encode()
+
+
+def _best(runs, fn):
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def child(args):
+    """Roda no processo do backend: mede e imprime os resultados em JSON."""
+    sys.path.insert(0, BYBIT_DIR)
+    os.environ.setdefault('LOG_FILE', '')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    import decode
+    from streams import ADAPTERS
+
+    results = {'backend': decode.JSON_BACKEND, 'parse': {}}
+    for name, adapter_class in ADAPTERS.items():
+        adapter = adapter_class()
+        frames = messages(name, args.messages, args.control)
+        elapsed = _best(args.runs, lambda: [adapter.parse(frame) for frame in frames])
+        results['parse'][name] = len(frames) / elapsed
+
+    body = klines_body(args.klines)
+
+    def per_field():
+        return [[float(value) for value in kline[:6]] for kline in decode.loads(body)]
+
+    results['klines'] = {
+        'loads + float': args.klines / _best(args.runs, per_field),
+        'klines_array': args.klines / _best(args.runs, lambda: decode.klines_array(body)),
+    }
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=20000, help='mensagens por adaptador')
+    parser.add_argument('--control', type=int, default=10, help='um frame de controle a cada N mensagens (0: nenhum)')
+    parser.add_argument('--klines', type=int, default=1000, help='klines na resposta convertida')
+    parser.add_argument('--runs', type=int, default=5, help='repetições (vale a melhor)')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    results = []
+    for backend in BACKENDS:
+        env = dict(os.environ, JSON_BACKEND=backend)
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--child'] + sys.argv[1:],
+                              env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"{backend}: falhou\n{proc.stderr.strip()}")
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        if result['backend'] != backend:
+            print(f"{backend}: pulado (não instalado)")
+            continue
+        results.append(result)
+    if not results:
+        return 1
+
+    print(f"Parse dos streams (mensagens/s, {args.messages} por adaptador, controle a cada {args.control})")
+    print(f"{'adaptador':<14}" + ''.join(f"{r['backend']:>12}" for r in results))
+    for name in results[0]['parse']:
+        print(f"{name:<14}" + ''.join(f"{r['parse'][name]:>12,.0f}" for r in results))
+    print(f"\nKlines -> array (klines/s, resposta com {args.klines})")
+    print(f"{'caminho':<14}" + ''.join(f"{r['backend']:>12}" for r in results))
+    for path in results[0]['klines']:
+        print(f"{path:<14}" + ''.join(f"{r['klines'][path]:>12,.0f}" for r in results))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Benchmarks dos caminhos quentes dos três bots (binance, bybit, kucoin).
+
+Cada pacote roda num subprocesso próprio (os módulos se chamam todos
+api.py/ui.py), com as respostas HTTP substituídas pelos fixtures gravados
+em benchmarks/fixtures. Nenhuma requisição sai para a rede.
+
+Uso:
+    python3 benchmarks/run.py                     # roda e compara com baseline.json
+    python3 benchmarks/run.py --save-baseline     # grava os resultados atuais como baseline
+    python3 benchmarks/run.py --package bybit --rows 50 --tolerance 0.3
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+import subprocess
+import contextlib
+import importlib.util
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(ROOT, 'benchmarks')
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baseline.json')
+
+PACKAGES = ('binance', 'binance-isolated', 'bybit', 'kucoin')
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'r') as f:
+        return f.read()
+
+
+# ---------------------------------------------------------------------------
+# Dublês de HTTP e da janela
+# ---------------------------------------------------------------------------
+
+class FakeResponse:
+    """Resposta no formato do requests: decodifica o JSON a cada .json(), como a real."""
+
+    def __init__(self, text, status_code=200, headers=None):
+        self.text = text
+        self.content = text.encode()
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class FakeRequests:
+    """Substitui o módulo `requests` dentro de api.py, roteando pela URL."""
+
+    def __init__(self, routes):
+        self.routes = routes
+
+    def _route(self, url):
+        for fragment, text in self.routes.items():
+            if fragment in url:
+                return FakeResponse(text)
+        return FakeResponse('{}', status_code=404)
+
+    def get(self, url, *args, **kwargs):
+        return self._route(url)
+
+    def post(self, url, *args, **kwargs):
+        return self._route(url)
+
+
+class _SilentSound:
+    def play_sound(self):
+        pass
+
+
+def _noop(*args, **kwargs):
+    return None
+
+
+class HeadlessWindow:
+    """
+    Stand-in de MainWindow para chamar um método da classe sem abrir a
+    janela, timers e websocket. Só carrega os atributos que o método lê;
+    os demais métodos de MainWindow viram no-op.
+    """
+
+    def __init__(self, window_cls, **attrs):
+        self.__dict__['_window_cls'] = window_cls
+        self.__dict__.update(attrs)
+
+    def __getattr__(self, name):
+        if name.startswith('sound_'):
+            return _SilentSound()
+        if callable(getattr(self._window_cls, name, None)):
+            return _noop
+        raise AttributeError(name)
+
+
+WINDOW_DEFAULTS = {
+    'default_stop_loss': -20.0,
+    'stop_loss_price': '',
+    'auto_calc_trailing_stop': False,
+    'trailing_stop_1_15': 6.5,
+    'trailing_stop_16_30': 12.0,
+    'trailing_stop_31_50': 20.0,
+    'trailing_stop_above_50': 25.0,
+    'trailing_stop_mode': 'ladder',
+    'atr_stop_multiplier': 3.0,
+    'auto_close_positions': False,
+    'auto_open_new_position': False,
+    'ignore_coins_sl_list': [],
+    'ignore_coins_tp_list': [],
+    'last_price': 103349.7,
+    'default_leverage': 20,
+    'default_usd_amount': 10,
+    'default_contract_qty': 1,
+    'selected_symbol': 'BTCUSDT',
+}
+
+
+# ---------------------------------------------------------------------------
+# Medição
+# ---------------------------------------------------------------------------
+
+def measure(fn, min_time=0.3, rounds=5):
+    """Retorna ops/s (melhor rodada) e o pico de memória alocada por operação."""
+    fn()  # aquecimento
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / rounds or iterations >= 1 << 20:
+            break
+        iterations *= 2
+
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'ops_per_sec': iterations / best if best > 0 else 0.0,
+        'peak_kib': (peak - before) / 1024,
+        'retained_kib': (after - before) / 1024,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks por pacote (rodam no subprocesso, com cwd = diretório do pacote)
+# ---------------------------------------------------------------------------
+
+def _import_package_module(package, module_name, file_name=None):
+    path = os.path.join(ROOT, package, file_name or f'{module_name}.py')
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _qt_app():
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+def _klines_routes():
+    return {'/api/v3/klines': load_fixture('binance_klines.json')}
+
+
+def _binance_routes(account_fixture, account_path):
+    symbol_info = json.loads(load_fixture('binance_symbol_info.json'))
+    routes = _klines_routes()
+    routes[account_path] = load_fixture(account_fixture)
+    routes['/api/v3/exchangeInfo'] = json.dumps({'symbols': [symbol_info]})
+    routes['/api/v3/ticker/price'] = json.dumps({'symbol': 'BTCUSDT', 'price': '103349.70'})
+    return routes
+
+
+def _binance_trackers(rows):
+    trackers = {}
+    for i in range(rows):
+        symbol = f"BT{i}USDT"
+        pnl_percentage = 5 + (i * 7) % 55
+        trackers[symbol] = {
+            'position': {
+                'symbol': symbol, 'side': 'LONG' if i % 2 == 0 else 'SHORT',
+                'position_size': 0.001, 'amount_usd': 100.0, 'entry_price': 100000.0,
+                'current_price': 103349.7, 'margin': 10.0, 'pnl': pnl_percentage / 10,
+                'pnl_percentage': pnl_percentage, 'borrowed_amount': 90.0, 'leverage': 10
+            },
+            'max_pnl_percent': pnl_percentage,
+            'trigger_stop_loss_percent': -20.0,
+        }
+    return trackers
+
+
+def _contract_positions(template, rows, symbol_suffix):
+    positions = []
+    for i in range(rows):
+        position = dict(template)
+        position['symbol'] = f"COIN{i}{symbol_suffix}"
+        pnl_percent = 5 + (i * 7) % 55
+        position['unrealisedPnl'] = position['posMargin'] * pnl_percent / 100
+        position['currentQty'] = position['currentQty'] if i % 2 == 0 else -position['currentQty']
+        positions.append(position)
+    return positions
+
+
+def _contract_trackers(positions):
+    return {
+        position['symbol']: {
+            'position': position,
+            'max_pnl_percent': 0,
+            'trigger_stop_loss_percent': -20.0,
+            'used_margin_calls': 0
+        }
+        for position in positions
+    }
+
+
+def bench_binance(rows, isolated=False):
+    if isolated:
+        api = _import_package_module('binance', 'api', 'api-isolated.py')
+        api.requests = FakeRequests(_binance_routes('binance_isolated_account.json', '/sapi/v1/margin/isolated/account'))
+    else:
+        api = _import_package_module('binance', 'api')
+        api.requests = FakeRequests(_binance_routes('binance_margin_account.json', '/sapi/v1/margin/account'))
+    symbol_info = json.loads(load_fixture('binance_symbol_info.json'))
+    trackers = {'BTCUSDT': {'position': {'entry_price': 100000.0, 'leverage': 10.0, 'amount_usd': 100.0}}}
+
+    benches = {
+        'decide_trade_direction': lambda: api.decide_trade_direction('BTCUSDT'),
+        'fetch_open_positions': lambda: api.fetch_open_positions(trackers),
+        'adjust_quantity': lambda: api.adjust_quantity(symbol_info, 0.0123456),
+    }
+    if isolated:
+        return benches
+
+    benches['sign_payload'] = lambda: api.sign_payload(
+        {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': '0.001'})
+
+    _qt_app()
+    from PyQt5.QtWidgets import QTableWidget
+    ui = _import_package_module('binance', 'ui')
+    window = HeadlessWindow(ui.MainWindow, position_trackers=_binance_trackers(rows), **WINDOW_DEFAULTS)
+    window.positions_table = QTableWidget()
+    window.positions_table.setColumnCount(9)
+    positions = [tracker['position'] for tracker in _binance_trackers(rows).values()]
+    benches[f'check_auto_close_positions[{rows}]'] = lambda: ui.MainWindow.check_auto_close_positions(window)
+    benches[f'update_positions_display[{rows}]'] = lambda: ui.MainWindow.update_positions_display(window, positions)
+    return benches
+
+
+def bench_bybit(rows):
+    api = _import_package_module('bybit', 'api')
+    api.requests = FakeRequests(_klines_routes())
+    positions_payload = load_fixture('bybit_positions.json')
+    api.session.get_positions = lambda **kwargs: json.loads(positions_payload)
+
+    benches = {
+        'decide_trade_direction': lambda: api.decide_trade_direction('BTCUSDT', use_high_low=True),
+        'fetch_open_positions': api.fetch_open_positions,
+    }
+
+    scanner = _import_package_module('bybit', 'scanner')
+    signal_scanner = scanner.SignalScanner()
+    klines = json.loads(load_fixture('binance_klines.json'))
+    symbols = [f"COIN{i}USDT" for i in range(300)]
+    signal_scanner._allocate(symbols)
+    for i, symbol in enumerate(symbols):
+        factor = 1 + (i % 50 - 25) / 1000
+        signal_scanner.backfill(symbol, [
+            [k[0], k[1], float(k[2]) * factor, float(k[3]) * factor, float(k[4]) * factor, k[5]] for k in klines
+        ])
+    benches['scanner_evaluate[300]'] = signal_scanner.evaluate
+
+    orderbook = _import_package_module('bybit', 'orderbook')
+    book = orderbook.OrderBook('BTCUSDT')
+    book.apply_snapshot([(103349.5 - i * 0.5, 0.05 + (i % 7) * 0.01) for i in range(50)],
+                        [(103350.0 + i * 0.5, 0.05 + (i % 5) * 0.01) for i in range(50)], 1)
+    benches['orderbook_estimate[0.5]'] = lambda: book.estimate('buy', 0.5)
+    benches['orderbook_delta'] = lambda: book.apply_delta([(103340.0, 0.07)], [(103360.0, 0.0)], 2)
+
+    _qt_app()
+    from PyQt5.QtWidgets import QTableWidget
+    ui = _import_package_module('bybit', 'ui')
+    template = api.fetch_open_positions()[0]
+    positions = ui.PositionTable.from_positions(_contract_positions(template, rows, 'USDT'))
+    risk = _import_package_module('bybit', 'risk')
+    portfolio = risk.PortfolioRisk()
+    portfolio.load_positions(positions)
+    benches[f'portfolio_recompute[{rows}]'] = portfolio.recompute
+
+    execution = _import_package_module('bybit', 'execution')
+    costs = _import_package_module('bybit', 'costs')
+    window = HeadlessWindow(
+        ui.MainWindow, position_trackers=_contract_trackers(positions), last_positions=positions,
+        # Dados sempre frescos e nenhuma ordem fatiada em andamento
+        positions_updated_ts=float('inf'), last_price_ts=float('inf'),
+        execution=execution.ExecutionEngine(None),
+        # Modelo de custos sem atualização: taxa padrão e sem funding
+        costs=costs.CostModel(None, None), **WINDOW_DEFAULTS
+    )
+    window.positions_table = QTableWidget()
+    window.positions_table.setColumnCount(9)
+    benches[f'check_auto_close_positions[{rows}]'] = lambda: ui.MainWindow.check_auto_close_positions(window)
+    benches[f'update_positions_display[{rows}]'] = lambda: ui.MainWindow.update_positions_display(window, positions)
+    return benches
+
+
+def bench_kucoin(rows):
+    api = _import_package_module('kucoin', 'api')
+    routes = _klines_routes()
+    routes['/api/v1/positions'] = load_fixture('kucoin_positions.json')
+    api.requests = FakeRequests(routes)
+
+    benches = {
+        'decide_trade_direction': lambda: api.decide_trade_direction('BTCUSDT', use_high_low=True),
+        'fetch_open_positions': api.fetch_open_positions,
+        'signed_headers': lambda: api.signed_headers(1737176616702, 'GET', '/api/v1/positions'),
+    }
+
+    _qt_app()
+    from PyQt5.QtWidgets import QTableWidget
+    ui = _import_package_module('kucoin', 'ui')
+    template = api.fetch_open_positions()[0]
+    positions = _contract_positions(template, rows, 'USDTM')
+    window = HeadlessWindow(ui.MainWindow, position_trackers=_contract_trackers(positions), **WINDOW_DEFAULTS)
+    window.positions_table = QTableWidget()
+    window.positions_table.setColumnCount(9)
+    benches[f'check_auto_close_positions[{rows}]'] = lambda: ui.MainWindow.check_auto_close_positions(window)
+    benches[f'update_positions_display[{rows}]'] = lambda: ui.MainWindow.update_positions_display(window, positions)
+    return benches
+
+
+def run_worker(package, rows, min_time):
+    package_dir = os.path.join(ROOT, 'binance' if package == 'binance-isolated' else package)
+    os.chdir(package_dir)
+    sys.path.insert(0, package_dir)
+
+    # Sem credenciais reais, sem log em arquivo e sem janela
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    os.environ.setdefault('LOG_FILE', '')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    for var in ('BINANCE_API_KEY', 'BINANCE_API_SECRET', 'BYBIT_API_KEY', 'BYBIT_API_SECRET',
+                'KUCOIN_API_KEY', 'KUCOIN_API_SECRET', 'KUCOIN_API_PASSWORD'):
+        os.environ.setdefault(var, 'benchmark')
+
+    results = {}
+    # Os bots imprimem bastante; o stdout do worker fica reservado para o JSON final
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            if package == 'binance':
+                benches = bench_binance(rows)
+            elif package == 'binance-isolated':
+                benches = bench_binance(rows, isolated=True)
+            elif package == 'bybit':
+                benches = bench_bybit(rows)
+            else:
+                benches = bench_kucoin(rows)
+        except ImportError as e:
+            benches = {}
+            results['_skipped'] = f"dependência ausente: {e}"
+        for name, fn in benches.items():
+            results[name] = measure(fn, min_time=min_time)
+    print(json.dumps(results))
+
+
+# ---------------------------------------------------------------------------
+# Orquestração
+# ---------------------------------------------------------------------------
+
+def run_package(package, rows, min_time):
+    cmd = [sys.executable, os.path.abspath(__file__), '--worker', package,
+           '--rows', str(rows), '--min-time', str(min_time)]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {'_skipped': f"worker falhou: {proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else proc.returncode}"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    print(f"{'pacote':<18}{'benchmark':<34}{'ops/s':>12}{'pico KiB':>11}{'baseline':>12}{'delta':>9}")
+    for package, benches in results.items():
+        if '_skipped' in benches:
+            print(f"{package:<18}{'(pulado) ' + benches['_skipped']}")
+            continue
+        for name, stats in benches.items():
+            base = baseline.get(package, {}).get(name)
+            line = f"{package:<18}{name:<34}{stats['ops_per_sec']:>12.1f}{stats['peak_kib']:>11.1f}"
+            if base:
+                delta = stats['ops_per_sec'] / base['ops_per_sec'] - 1
+                line += f"{base['ops_per_sec']:>12.1f}{delta * 100:>8.1f}%"
+                if delta < -tolerance:
+                    line += "  REGRESSÃO"
+                    regressions.append((package, name, delta))
+            print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--package', choices=PACKAGES, action='append',
+                        help="pacote a medir (pode repetir; padrão: todos)")
+    parser.add_argument('--rows', type=int, default=20, help="posições em check_auto_close/update_positions_display")
+    parser.add_argument('--min-time', type=float, default=0.3, help="tempo mínimo de medição por benchmark (s)")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="queda de ops/s tolerada antes de falhar (0.2 = 20%%)")
+    parser.add_argument('--save-baseline', action='store_true', help="grava os resultados em benchmarks/baseline.json")
+    parser.add_argument('--worker', choices=PACKAGES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.rows, args.min_time)
+        return 0
+
+    results = {package: run_package(package, args.rows, args.min_time) for package in (args.package or PACKAGES)}
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, 'r') as f:
+            baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        for package, benches in results.items():
+            if '_skipped' not in benches:
+                baseline[package] = benches
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump(baseline, f, indent=4, sort_keys=True)
+        print(f"Baseline gravada em {BASELINE_FILE}")
+        return 0
+
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) abaixo da baseline além da tolerância de {args.tolerance:.0%}.")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Simulação do motor de execução do bybit (bybit/execution.py) contra uma
+exchange fictícia: as ordens filhas agridem um OrderBook L2 que se
+recompõe com o tempo. Compara o slippage realizado de uma única ordem a
+mercado com o fatiamento TWAP, iceberg e pelo livro.
+
+O relógio é simulado (clock/sleep injetados no ExecutionEngine), então a
+simulação roda em milissegundos e é determinística.
+
+Uso:
+    python3 benchmarks/slicing.py
+    python3 benchmarks/slicing.py --notional 250000 --depth 20000 --recovery 5
+"""
+
+import os
+import sys
+import math
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'bybit'))
+os.environ.setdefault('LOG_FILE', '')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import execution  # noqa: E402
+from execution import ExecutionEngine, ParentOrder  # noqa: E402
+from orderbook import OrderBook  # noqa: E402
+
+SYMBOL = 'BTCUSDT'
+
+
+class SimClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class MockExchange:
+    """
+    Livro com `levels` níveis de `depth_usd` cada, espaçados de `tick_bps`
+    em torno de `mid`. A liquidez consumida volta ao tamanho original com
+    constante de tempo `recovery` (segundos).
+    """
+
+    def __init__(self, clock, mid=60000.0, levels=50, depth_usd=20000.0, tick_bps=1.0, recovery=5.0,
+                 lot_step=0.001, min_qty=0.001):
+        self.clock = clock
+        self.recovery = recovery
+        self.lot = (lot_step, min_qty)
+        self.book = OrderBook(SYMBOL)
+        tick = mid * tick_bps / 10000
+        self.base_bids = {round(mid - tick * (i + 0.5), 2): depth_usd / mid for i in range(levels)}
+        self.base_asks = {round(mid + tick * (i + 0.5), 2): depth_usd / mid for i in range(levels)}
+        self.book.apply_snapshot(list(self.base_bids.items()), list(self.base_asks.items()), 1)
+        self.last_update = clock()
+        self.orders = 0
+
+    def _replenish(self):
+        elapsed = self.clock() - self.last_update
+        self.last_update = self.clock()
+        if elapsed <= 0:
+            return
+        factor = 1 - math.exp(-elapsed / self.recovery)
+        bids = [(p, s + (self.base_bids[p] - s) * factor) for p, s in self.book.bids.items()]
+        asks = [(p, s + (self.base_asks[p] - s) * factor) for p, s in self.book.asks.items()]
+        bids += [(p, self.base_bids[p] * factor) for p in self.base_bids if p not in self.book.bids]
+        asks += [(p, self.base_asks[p] * factor) for p in self.base_asks if p not in self.book.asks]
+        self.book.apply_delta(bids, asks, self.book.update_id + 1)
+
+    def lot_size(self, symbol):
+        return self.lot
+
+    def place(self, symbol, side, quantity, reduce_only):
+        self._replenish()
+        self.orders += 1
+        if side == 'buy':
+            levels, prices = self.book.asks, sorted(self.book.asks)
+        else:
+            levels, prices = self.book.bids, sorted(self.book.bids, reverse=True)
+        filled = cost = 0.0
+        consumed = []
+        for price in prices:
+            if filled >= quantity:
+                break
+            take = min(levels[price], quantity - filled)
+            filled += take
+            cost += take * price
+            consumed.append((price, levels[price] - take))
+        if side == 'buy':
+            self.book.apply_delta([], consumed, self.book.update_id + 1)
+        else:
+            self.book.apply_delta(consumed, [], self.book.update_id + 1)
+        if filled == 0:
+            return None
+        return filled, cost / filled
+
+
+def simulate(strategy, args):
+    clock = SimClock()
+    exchange = MockExchange(clock, depth_usd=args.depth, recovery=args.recovery)
+    mid = exchange.book.mid()
+    quantity = round(args.notional / mid, 3)
+    engine = ExecutionEngine(exchange, book_for=lambda symbol: exchange.book, clock=clock, sleep=clock.sleep)
+    if strategy == 'market':
+        parent = ParentOrder(SYMBOL, args.side, quantity, strategy='market', reference_price=mid)
+        parent.started_at = clock()
+        parent.record_fill(*exchange.place(SYMBOL, args.side, quantity, False))
+    else:
+        parent = ParentOrder(SYMBOL, args.side, quantity, strategy=strategy, reference_price=mid)
+        engine.run(parent)
+    return {
+        'strategy': strategy,
+        'filled': parent.filled,
+        'children': exchange.orders,
+        'seconds': clock(),
+        'slippage_bps': parent.slippage_bps(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--notional', type=float, default=200000, help='tamanho da ordem-mãe em USD')
+    parser.add_argument('--side', choices=('buy', 'sell'), default='buy')
+    parser.add_argument('--depth', type=float, default=20000, help='liquidez por nível do livro em USD')
+    parser.add_argument('--recovery', type=float, default=5.0, help='constante de recomposição do livro (s)')
+    args = parser.parse_args()
+
+    print(f"Ordem-mãe {args.side.upper()} ${args.notional:,.0f} | livro ${args.depth:,.0f}/nível, "
+          f"recomposição {args.recovery:g}s | book: até {execution.BOOK_SLICE_MAX_BPS:g} bps por filha")
+    print(f"{'estratégia':<12}{'filhas':>8}{'duração (s)':>14}{'slippage (bps)':>17}")
+    for strategy in ('market', 'twap', 'iceberg', 'book'):
+        result = simulate(strategy, args)
+        print(f"{result['strategy']:<12}{result['children']:>8}{result['seconds']:>14.1f}{result['slippage_bps']:>17.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Tempo até a primeira tela interativa do bot bybit: do lançamento do
+processo até a janela desenhada (show + processEvents) com as posições do
+snapshot da última sessão (startup_snapshot.json).
+
+Cada medição roda num processo novo, num diretório temporário com um
+snapshot de N posições sintéticas. A abertura não pode fazer chamadas
+REST; os dados ao vivo chegam depois, numa thread.
+
+Uso:
+    python3 benchmarks/startup.py                 # 5 execuções, falha se a mediana passar de 300 ms
+    python3 benchmarks/startup.py --runs 10 --rows 50 --budget 250
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BYBIT_DIR = os.path.join(ROOT, 'bybit')
+
+
+def _snapshot(rows):
+    positions = []
+    for i in range(rows):
+        qty = 0.01 if i % 2 == 0 else -0.01
+        positions.append({
+            'symbol': f"COIN{i}USDT", 'avgEntryPrice': 103682.9, 'realLeverage': 20.0,
+            'maintMargin': 5.23831932, 'realisedPnl': -0.1140512, 'posMargin': 5.23831932,
+            'unrealisedPnl': 5.23831932 * (5 + (i * 7) % 55) / 100, 'currentQty': qty,
+            'markPrice': '103349.7', 'liquidationPrice': 98987.3, 'curRealisedPnl': -0.0570256,
+        })
+    return {
+        'symbol': 'XBTUSDTM',
+        'positions': positions,
+        'balance': 1659.03,
+        'high_low': [104120.5, 102877.0],
+        'indicators': {'decision': 'wait', 'sma': '103401 | 103388 (buy)', 'rsi': '54 (wait)',
+                       'volume': '12 agora | 10 média (buy)', 'high_low': '(sell)'},
+    }
+
+
+def child(launched_at):
+    """Roda no processo medido: abre a janela e informa os tempos em JSON."""
+    sys.path.insert(0, BYBIT_DIR)
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv[:1])
+    imports_start = time.time()
+    from ui import MainWindow
+    construct_start = time.time()
+    window = MainWindow()
+    window.show()
+    app.processEvents()
+    first_frame = time.time()
+    print(json.dumps({
+        'interpreter_ms': (imports_start - launched_at) * 1000,
+        'imports_ms': (construct_start - imports_start) * 1000,
+        'window_ms': (first_frame - construct_start) * 1000,
+        'first_frame_ms': (first_frame - launched_at) * 1000,
+    }), flush=True)
+    # Sem esperar websocket, servidor de métricas e a carga ao vivo encerrarem
+    os._exit(0)
+
+
+def measure(workdir):
+    env = dict(os.environ)
+    env.update({
+        'QT_QPA_PLATFORM': 'offscreen', 'LOG_FILE': '', 'LOG_LEVEL': 'WARNING', 'METRICS_PORT': '0',
+        'SCANNER_ENABLED': 'false', 'ACCOUNTS_FILE': os.path.join(workdir, 'no-accounts.json'),
+        'BYBIT_API_KEY': 'benchmark', 'BYBIT_API_SECRET': 'benchmark',
+    })
+    launched_at = time.time()
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', repr(launched_at)],
+        cwd=workdir, env=env, capture_output=True, text=True, timeout=60
+    )
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    raise RuntimeError(f"processo medido falhou:\n{result.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--rows', type=int, default=20, help='posições no snapshot')
+    parser.add_argument('--budget', type=float, default=300, help='limite da mediana em ms')
+    parser.add_argument('--child', type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        child(args.child)
+        return
+
+    workdir = tempfile.mkdtemp(prefix='bybit-startup-')
+    try:
+        if os.path.exists(os.path.join(BYBIT_DIR, 'configurations.json')):
+            shutil.copy(os.path.join(BYBIT_DIR, 'configurations.json'), workdir)
+        with open(os.path.join(workdir, 'startup_snapshot.json'), 'w') as f:
+            json.dump(_snapshot(args.rows), f)
+
+        try:
+            runs = [measure(workdir) for _ in range(args.runs)]
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            print(f"Não foi possível medir a abertura: {e}")
+            sys.exit(2)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'etapa':<16}{'mediana (ms)':>14}{'máx (ms)':>10}")
+    for key in ('interpreter_ms', 'imports_ms', 'window_ms', 'first_frame_ms'):
+        values = [run[key] for run in runs]
+        print(f"{key[:-3]:<16}{statistics.median(values):>14.1f}{max(values):>10.1f}")
+    median = statistics.median(run['first_frame_ms'] for run in runs)
+    if median > args.budget:
+        print(f"Primeira tela em {median:.0f} ms, acima do limite de {args.budget:.0f} ms")
+        sys.exit(1)
+    print(f"Primeira tela em {median:.0f} ms (limite {args.budget:.0f} ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Backtest dos modos de trailing stop do bybit (bybit/trailing.py): as
+faixas fixas (trailing_stop_*), o auto calc (metade do PnL) e o modo ATR,
+sobre os mesmos caminhos de preço de 1m com regimes calmos e voláteis.
+
+Cada trade entra a cada `--every` minutos, alternando compra e venda, e
+é avaliado a cada tick (abertura, máxima/mínima, fechamento de cada
+candle) com as mesmas funções e a mesma regra de subida do trigger de
+check_auto_close_positions. Os caminhos são sintéticos e determinísticos
+(`--seed`); `--klines` usa um arquivo de klines da Binance no lugar deles.
+
+Uso:
+    python3 benchmarks/trailing.py
+    python3 benchmarks/trailing.py --multiplier 2 --leverage 10 --minutes 20000
+    python3 benchmarks/trailing.py --klines benchmarks/fixtures/binance_klines.json
+"""
+
+import os
+import sys
+import json
+import math
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'bybit'))
+os.environ.setdefault('LOG_FILE', '')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from trailing import AtrState, ATR_STOP_PERIOD, ladder_stop, atr_stop, next_trigger  # noqa: E402
+
+# Padrões de configurations.json (config.py)
+DEFAULT_STOP_LOSS = -3.5
+TIERS = (1.5, 5.0, 8.0, 10.0)
+# Minutos de histórico antes de cada entrada, para o ATR já estar semeado
+WARMUP = 100
+
+
+def synthetic_candles(minutes, seed, price=60000.0):
+    """Candles de 1m com volatilidade alternando entre regimes calmos e agitados, com tendências."""
+    rng = random.Random(seed)
+    candles = []
+    sigma, drift = 0.0005, 0.0
+    for minute in range(minutes):
+        if minute % 240 == 0:
+            sigma = rng.choice((0.0003, 0.0008, 0.0025))
+            drift = rng.gauss(0, sigma / 4)
+        open_price = price
+        path = [open_price]
+        for _ in range(4):
+            price *= math.exp(rng.gauss(drift / 4, sigma / 2))
+            path.append(price)
+        candles.append((minute * 60, open_price, max(path), min(path), price))
+    return candles
+
+
+def file_candles(path):
+    with open(path) as f:
+        klines = json.load(f)
+    return [(int(k[0]) // 1000, float(k[1]), float(k[2]), float(k[3]), float(k[4])) for k in klines]
+
+
+def ticks(candle):
+    """Ticks de um candle: abertura, extremos na ordem mais provável e fechamento."""
+    ts, open_price, high, low, close = candle
+    extremes = (low, high) if close >= open_price else (high, low)
+    return [(ts, open_price), (ts + 20, extremes[0]), (ts + 40, extremes[1]), (ts + 59, close)]
+
+
+def run_trade(candles, start, side, mode, args):
+    atr = AtrState(ATR_STOP_PERIOD)
+    for _, _, high, low, close in candles[:start][-WARMUP:]:
+        atr.add_candle(high, low, close)
+    entry = candles[start][1]
+    trigger = DEFAULT_STOP_LOSS
+    max_pnl = pnl = 0.0
+    for candle in candles[start:start + args.max_minutes]:
+        for ts, price in ticks(candle):
+            atr.on_tick(price, ts)
+            pnl = side * (price / entry - 1) * 100 * args.leverage
+            max_pnl = max(max_pnl, pnl)
+            atr_value = atr.value() if mode == 'atr' else None
+            if atr_value is not None:
+                calculated = atr_stop(pnl, args.leverage, DEFAULT_STOP_LOSS, atr_value / price * 100, args.multiplier)
+            else:
+                calculated = ladder_stop(pnl, args.leverage, DEFAULT_STOP_LOSS, TIERS, mode == 'auto_calc')
+            trigger = next_trigger(trigger, calculated, pnl)
+            if pnl <= trigger:
+                return pnl, max_pnl, True
+    return pnl, max_pnl, False
+
+
+def simulate(candles, mode, args):
+    results = []
+    side = 1
+    # Arquivos curtos: metade dos candles aquece o ATR
+    for start in range(min(WARMUP, len(candles) // 2), len(candles) - 1, args.every):
+        results.append(run_trade(candles, start, side, mode, args))
+        side = -side
+    pnls = [pnl for pnl, _, _ in results]
+    winners = [(pnl, max_pnl) for pnl, max_pnl, _ in results if max_pnl >= 5]
+    return {
+        'mode': mode,
+        'trades': len(results),
+        'mean_pnl': sum(pnls) / len(pnls) if pnls else 0.0,
+        'win_rate': sum(pnl > 0 for pnl in pnls) / len(pnls) * 100 if pnls else 0.0,
+        # Quanto do pico devolvido nos trades que chegaram a +5%
+        'giveback': sum(max_pnl - pnl for pnl, max_pnl in winners) / len(winners) if winners else 0.0,
+        'stopped': sum(stopped for _, _, stopped in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--minutes', type=int, default=10000, help='minutos de preço sintético')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--klines', help='arquivo JSON de klines de 1m da Binance no lugar do caminho sintético')
+    parser.add_argument('--every', type=int, default=30, help='minutos entre entradas')
+    parser.add_argument('--max-minutes', type=int, default=720, help='tempo máximo de um trade')
+    parser.add_argument('--leverage', type=float, default=20)
+    parser.add_argument('--multiplier', type=float, default=3.0, help='ATRs de distância no modo atr')
+    args = parser.parse_args()
+
+    candles = file_candles(args.klines) if args.klines else synthetic_candles(args.minutes, args.seed)
+    print(f"{len(candles)} candles de 1m | alavancagem {args.leverage:g}x | ATR({ATR_STOP_PERIOD}) x {args.multiplier:g}")
+    print(f"{'modo':<11}{'trades':>8}{'PnL médio (%)':>15}{'acertos (%)':>13}{'devolvido (%)':>15}{'stops':>7}")
+    for mode in ('ladder', 'auto_calc', 'atr'):
+        r = simulate(candles, mode, args)
+        print(f"{r['mode']:<11}{r['trades']:>8}{r['mean_pnl']:>15.2f}{r['win_rate']:>13.1f}{r['giveback']:>15.2f}{r['stopped']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -17,12 +17,26 @@ API_SECRET = os.getenv("BINANCE_API_SECRET")
 
 BASE_URL = 'https://api.binance.com'
 
-def send_signed_request(http_method, url_path, payload={}):
+# Stop loss espelhado na Binance (STOP_LOSS_LIMIT na margem com AUTO_REPAY)
+EXCHANGE_STOPS_ENABLED = os.getenv("EXCHANGE_STOPS_ENABLED", "true").lower() == "true"
+# Só troca a ordem stop quando o trigger andar mais que isto (pontos de PnL%)
+STOP_AMEND_THRESHOLD = float(os.getenv("STOP_AMEND_THRESHOLD", 0.5))
+# Distância do preço limite para o preço de disparo, para a ordem executar mesmo com o livro andando
+STOP_LIMIT_OFFSET = 0.005
+# Releitura da taxa taker da conta (s); até a primeira leitura vale a taxa padrão da margem
+COST_FEE_REFRESH_SECONDS = float(os.getenv("COST_FEE_REFRESH_SECONDS", 3600))
+DEFAULT_TAKER_FEE = 0.001
+
+def sign_payload(payload):
+    """Retorna a query string com timestamp e assinatura HMAC-SHA256."""
     query_string = urlencode(payload, True)
     timestamp = int(time.time() * 1000)
     query_string += '&timestamp=' + str(timestamp)
     signature = hmac.new(API_SECRET.encode('utf-8'), query_string.encode('utf-8'), hashlib.sha256).hexdigest()
-    url = BASE_URL + url_path + '?' + query_string + '&signature=' + signature
+    return query_string + '&signature=' + signature
+
+def send_signed_request(http_method, url_path, payload={}):
+    url = BASE_URL + url_path + '?' + sign_payload(payload)
 
     headers = {
         'X-MBX-APIKEY': API_KEY
@@ -31,6 +45,8 @@ def send_signed_request(http_method, url_path, payload={}):
         response = requests.get(url, headers=headers)
     elif http_method == 'POST':
         response = requests.post(url, headers=headers)
+    elif http_method == 'DELETE':
+        response = requests.delete(url, headers=headers)
     else:
         raise ValueError('Invalid HTTP method')
 
@@ -160,13 +176,16 @@ def fetch_open_positions(position_trackers):
                             pnl = (entry_price - current_price) * abs(position_size)
                     else:
                         pnl = 0.0
-                    # remover 4% do pnl para taxas
-                    tax = pnl * 0.04
-                    # tax = 0.08 # test
-
-                    # ajustar o preço de acordo com a alavancagem
-                    # pnl /= leverage
-                    pnl -= tax
+                    # Custos reais: taxa taker da conta na entrada e na saída + juros já cobrados do empréstimo
+                    if side == 'LONG':
+                        total_interest = float(usdt_info.get('interest', 0))
+                    else:
+                        total_interest = interest * current_price if current_price else 0.0
+                    if entry_price and current_price:
+                        costs = fetch_taker_fee(symbol) * abs(position_size) * (entry_price + current_price) + total_interest
+                    else:
+                        costs = 0.0
+                    pnl -= costs
 
                     # print(f"entry price: {entry_price} - current price: {current_price} - pnl: {pnl} - leverage: {leverage}")
 
@@ -176,15 +195,13 @@ def fetch_open_positions(position_trackers):
                     else:
                         initial_margin = abs(position_size) * entry_price if entry_price else 0.0
 
-                    # Ajusta a margem inicial para juros e taxas
-                    total_interest = interest * current_price
-                    initial_margin += total_interest
-
-                    # Calcula PNL em porcentagem
+                    # Calcula PNL em porcentagem (os juros já saíram do PnL como custo)
                     if initial_margin != 0:
                         pnl_percentage = (pnl / initial_margin) * 100
+                        cost_percent = (costs / initial_margin) * 100
                     else:
                         pnl_percentage = 0.0
+                        cost_percent = 0.0
 
                     # Quantidade em USD
                     amount_usd = initial_margin * leverage
@@ -208,6 +225,7 @@ def fetch_open_positions(position_trackers):
                         'margin': margin,
                         'pnl': pnl,
                         'pnl_percentage': pnl_percentage,
+                        'cost_percent': cost_percent,
                         'borrowed_amount': abs(borrowed_amount),
                         'leverage': leverage
                     })
@@ -230,6 +248,9 @@ def close_position_market(position):
         side = 'SELL' if position['side'] == 'LONG' else 'BUY'
         amount = abs(position['position_size'])
 
+        # A ordem stop espelhada trava o saldo: cancela antes de fechar
+        cancel_margin_open_orders(symbol)
+
         # Obtém informações do símbolo para ajustar a quantidade de acordo com LOT_SIZE
         symbol_info = get_symbol_info(symbol)
         if symbol_info is None:
@@ -575,6 +596,26 @@ def open_new_position_market(symbol, side, usd_amount, leverage):
         print(f"Erro em open_new_position_market: {e}")
         return None
 
+_taker_fees = {}
+
+def fetch_taker_fee(symbol):
+    """Taxa taker da conta no par (tradeFee), em cache por COST_FEE_REFRESH_SECONDS."""
+    cached = _taker_fees.get(symbol)
+    if cached and time.time() - cached[1] < COST_FEE_REFRESH_SECONDS:
+        return cached[0]
+    taker = cached[0] if cached else DEFAULT_TAKER_FEE
+    try:
+        response = send_signed_request('GET', '/sapi/v1/asset/tradeFee', {'symbol': symbol})
+        if response.status_code == 200 and response.json():
+            taker = float(response.json()[0]['takerCommission'])
+        else:
+            print(f"Erro ao obter taxa da conta: {response.status_code}, {response.text}")
+    except Exception as e:
+        print(f"Erro em fetch_taker_fee: {e}")
+    # Falha: mantém o último valor conhecido e tenta de novo no próximo intervalo
+    _taker_fees[symbol] = (taker, time.time())
+    return taker
+
 def get_symbol_info(symbol):
     """Obtém as informações de exchange para o símbolo fornecido."""
     try:
@@ -616,6 +657,78 @@ def adjust_quantity(symbol_info, quantity):
         print(f"Erro em adjust_quantity: {e}")
         return None
 
+def adjust_price(symbol_info, price):
+    """Ajusta o preço para o tickSize do filtro PRICE_FILTER."""
+    try:
+        price_filter = next(f for f in symbol_info['filters'] if f['filterType'] == 'PRICE_FILTER')
+        tick_size = float(price_filter['tickSize'])
+        precision = int(round(-math.log(tick_size, 10), 0))
+        price = round(math.floor(price / tick_size) * tick_size, precision)
+        return ('{0:.' + str(max(precision, 0)) + 'f}').format(price)
+    except Exception as e:
+        print(f"Erro em adjust_price: {e}")
+        return None
+
+def stop_price_for_trigger(entry_price, leverage, side, trigger_percent, cost_percent=0.0):
+    """
+    Preço em que o pnl_percentage de fetch_open_positions chega ao trigger:
+    pnl_percentage = variação do preço * alavancagem - custos (% da margem).
+    """
+    move = (trigger_percent + cost_percent) / 100 / leverage
+    return entry_price * (1 + move) if side == 'LONG' else entry_price * (1 - move)
+
+def place_stop_loss_order(symbol, side, quantity, stop_price):
+    """
+    Envia uma STOP_LOSS_LIMIT na margem que fecha a posição quando o preço
+    cruzar stop_price. AUTO_REPAY quita o empréstimo com o resultado.
+    Retorna o orderId ou None.
+    """
+    try:
+        symbol_info = get_symbol_info(symbol)
+        if symbol_info is None:
+            return None
+        order_side = 'SELL' if side == 'LONG' else 'BUY'
+        limit_price = stop_price * (1 - STOP_LIMIT_OFFSET) if order_side == 'SELL' else stop_price * (1 + STOP_LIMIT_OFFSET)
+        params = {
+            'symbol': symbol,
+            'side': order_side,
+            'type': 'STOP_LOSS_LIMIT',
+            'quantity': adjust_quantity(symbol_info, quantity),
+            'stopPrice': adjust_price(symbol_info, stop_price),
+            'price': adjust_price(symbol_info, limit_price),
+            'timeInForce': 'GTC',
+            'sideEffectType': 'AUTO_REPAY'
+        }
+        response = send_signed_request('POST', '/sapi/v1/margin/order', params)
+        if response.status_code == 200:
+            return response.json()['orderId']
+        print(f"Erro ao enviar ordem stop: {response.status_code}, {response.text}")
+        return None
+    except Exception as e:
+        print(f"Erro em place_stop_loss_order: {e}")
+        return None
+
+def cancel_margin_order(symbol, order_id):
+    try:
+        response = send_signed_request('DELETE', '/sapi/v1/margin/order', {'symbol': symbol, 'orderId': order_id})
+        if response.status_code == 200:
+            return True
+        print(f"Erro ao cancelar ordem {order_id}: {response.status_code}, {response.text}")
+        return False
+    except Exception as e:
+        print(f"Erro em cancel_margin_order: {e}")
+        return False
+
+def cancel_margin_open_orders(symbol):
+    """Cancela todas as ordens abertas do par na margem (ex.: o stop espelhado)."""
+    try:
+        response = send_signed_request('DELETE', '/sapi/v1/margin/openOrders', {'symbol': symbol})
+        # -2011: não havia ordens abertas
+        if response.status_code != 200 and '-2011' not in response.text:
+            print(f"Erro ao cancelar ordens abertas: {response.status_code}, {response.text}")
+    except Exception as e:
+        print(f"Erro em cancel_margin_open_orders: {e}")
+
 def decide_trade_direction(symbol, rsi_period=14, use_sma=True, use_rsi=True, use_volume=False, granularity=5):
     """Decide a direção do trade com base em dados históricos e uma estratégia combinada."""
     try:
@@ -633,8 +746,8 @@ def decide_trade_direction(symbol, rsi_period=14, use_sma=True, use_rsi=True, us
             if len(data) < 25:
                 print(f"Dados insuficientes para análise ({len(data)} períodos)")
                 return {'decision': 'wait', 'sma': 'N/A', 'rsi': 'N/A', 'volume': 'N/A'}
-            close_prices = np.array([float(kline[4]) for kline in data])
-            volumes = np.array([float(kline[5]) for kline in data])
+            # close e volume de todas as klines convertidos numa única chamada
+            close_prices, volumes = np.array([kline[4:6] for kline in data], dtype=float).T
 
             # Calcula SMAs
             sma_short = np.mean(close_prices[-7:])
@@ -741,10 +854,9 @@ def fetch_high_low_prices(symbol):
         response = requests.get(url, params=params)
         if response.status_code == 200:
             data = response.json()
-            highs = [float(kline[2]) for kline in data]
-            lows = [float(kline[3]) for kline in data]
-            high_price = max(highs)
-            low_price = min(lows)
+            highs, lows = np.array([kline[2:4] for kline in data], dtype=float).T
+            high_price = float(highs.max())
+            low_price = float(lows.min())
             return high_price, low_price
         else:
             print(f"Erro ao obter preços high/low: {response.status_code}, {response.text}")
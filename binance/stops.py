@@ -0,0 +1,102 @@
+# stops.py
+
+import time
+import threading
+
+# Espera depois de uma recusa da exchange antes de tentar de novo o mesmo símbolo
+STOP_RETRY_SECONDS = 30
+
+
+class ExchangeStopSync:
+    """
+    Tira da thread da GUI as chamadas que mantêm a ordem stop de cada posição
+    na exchange. `request()` roda na thread da GUI a cada avaliação e só
+    enfileira quando o trigger andou mais que `threshold`, a posição mudou ou
+    o stop deve sair; uma thread própria faz as chamadas, ficando só com o
+    pedido mais recente de cada símbolo.
+
+    `replace(symbol, request, active)` roda nessa thread: troca a ordem
+    `active` (o dict de tracker['exchange_stop'], ou None) pelo pedido e
+    retorna (sucesso, ordem que ficou na exchange ou None).
+    `on_result(symbol, tracker, active)` é chamado em seguida, ainda na thread
+    do worker; gravar no tracker fica com a GUI.
+    """
+
+    def __init__(self, replace, on_result, threshold):
+        self.replace = replace
+        self.on_result = on_result
+        self.threshold = threshold
+        self.trackers = {}   # symbol -> tracker dono do estado abaixo
+        self.active = {}     # symbol -> ordem na exchange ou None
+        self.requested = {}  # symbol -> último pedido (ou a ordem ativa, depois de uma recusa)
+        self.pending = {}    # symbol -> (tracker, pedido)
+        self.failed = {}     # symbol -> instante da última recusa
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="ExchangeStopSync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wakeup.set()
+
+    def _current(self, symbol, tracker):
+        with self._lock:
+            if self.trackers.get(symbol) is tracker:
+                return self.requested.get(symbol)
+        return tracker.get('exchange_stop')
+
+    def request(self, symbol, tracker, request):
+        """
+        Pede o stop descrito em `request` = {'trigger', 'price', 'key', ...}
+        (price None = sem stop) para a posição de `tracker`. Pedidos que não
+        mudam nada em relação ao último são ignorados.
+        """
+        if time.monotonic() - self.failed.get(symbol, -STOP_RETRY_SECONDS) < STOP_RETRY_SECONDS:
+            return
+        current = self._current(symbol, tracker)
+        has_stop = current is not None and current['price'] is not None
+        if request['price'] is None:
+            if not has_stop:
+                return
+        elif has_stop and current['key'] == request['key'] \
+                and abs(request['trigger'] - current['trigger']) < self.threshold:
+            return
+        with self._lock:
+            if self.trackers.get(symbol) is not tracker:
+                # Posição nova para o worker: a ordem que vale é a gravada no tracker
+                self.trackers[symbol] = tracker
+                self.active[symbol] = tracker.get('exchange_stop')
+            self.requested[symbol] = request
+            self.pending[symbol] = (tracker, request)
+        self._wakeup.set()
+
+    def _run(self):
+        while self._running:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while self._running:
+                with self._lock:
+                    if not self.pending:
+                        break
+                    symbol, (tracker, request) = self.pending.popitem()
+                    active = self.active.get(symbol)
+                ok, active = self.replace(symbol, request, active)
+                with self._lock:
+                    if self.trackers.get(symbol) is tracker:
+                        self.active[symbol] = active
+                        # Depois de uma recusa a GUI volta a comparar com o que ficou na exchange
+                        if not ok and symbol not in self.pending:
+                            self.requested[symbol] = active
+                if ok:
+                    self.failed.pop(symbol, None)
+                else:
+                    self.failed[symbol] = time.monotonic()
+                self.on_result(symbol, tracker, active)
@@ -7,7 +7,7 @@ from PyQt5.QtWidgets import (
     QTableWidget, QTableWidgetItem, QHeaderView, QPushButton, QCheckBox
 )
 from PyQt5.QtGui import QFont, QColor, QBrush
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 
 from sound import SoundPlayer
 from websocket_client import PriceWebsocketClient
@@ -17,10 +17,19 @@ from api import (
     close_position_market,
     open_new_position_market,
     decide_trade_direction,
-    get_margin_account_balance
+    get_margin_account_balance,
+    stop_price_for_trigger,
+    place_stop_loss_order,
+    cancel_margin_order,
+    EXCHANGE_STOPS_ENABLED,
+    STOP_AMEND_THRESHOLD
 )
+from stops import ExchangeStopSync
 
 class MainWindow(QWidget):
+    # Ordem stop que ficou na exchange (símbolo, tracker, ordem ou None), vinda da thread do ExchangeStopSync
+    exchange_stop_done = pyqtSignal(str, object, object)
+
     def __init__(self):
         super().__init__()
 
@@ -41,6 +50,11 @@ class MainWindow(QWidget):
         self.auto_open_new_position = False
         self.granularity = '5'
         self.fetch_open_positions_empty_count = 0
+        self.exchange_stops = ExchangeStopSync(
+            self.replace_exchange_stop, self.exchange_stop_done.emit, STOP_AMEND_THRESHOLD
+        )
+        self.exchange_stop_done.connect(self.on_exchange_stop_done)
+        self.exchange_stops.start()
 
         self.position_trackers = {}
         self.load_position_trackers()
@@ -618,6 +632,9 @@ class MainWindow(QWidget):
                 elif pnl_percentage < 0 and pnl_percentage < tracker.get('max_pnl_percent', 0):
                     tracker['max_pnl_percent'] = pnl_percentage
 
+                # Espelha o trigger como ordem stop na Binance
+                self.sync_exchange_stop(tracker)
+
                 # Verifica se a porcentagem de lucro caiu abaixo do stop loss configurado
                 if pnl_percentage <= tracker['trigger_stop_loss_percent']:
                     if pnl_percentage >= 0:
@@ -654,6 +671,80 @@ class MainWindow(QWidget):
                 print(f"Posição {pid} fechada automaticamente.")
                 self.save_position_trackers()
 
+    def sync_exchange_stop(self, tracker):
+        """
+        Mantém uma STOP_LOSS_LIMIT na margem no preço do trigger do tracker,
+        para a posição ficar protegida mesmo se o bot parar. Só pede a troca
+        quando o trigger anda mais que STOP_AMEND_THRESHOLD ou a posição muda;
+        as chamadas à API ficam com o ExchangeStopSync, fora da thread da GUI.
+        """
+        if not EXCHANGE_STOPS_ENABLED:
+            return
+        position = tracker['position']
+        symbol = position['symbol']
+        entry_price = position.get('entry_price')
+        leverage = position.get('leverage') or 0
+        current_price = position.get('current_price') or 0
+        quantity = abs(position.get('position_size', 0))
+        if not entry_price or leverage <= 0 or quantity == 0:
+            return
+
+        trigger = tracker['trigger_stop_loss_percent']
+        # Quantidade com 3 algarismos: os juros mexem no net_asset a toda hora
+        position_key = [position['side'], entry_price, leverage, float(f"{quantity:.3g}")]
+        stop_price = stop_price_for_trigger(
+            entry_price, leverage, position['side'], trigger, position.get('cost_percent', 0.0)
+        )
+        # Stop do lado errado do preço dispararia na hora; o fechamento local cuida desse caso
+        if current_price and (stop_price >= current_price if position['side'] == 'LONG' else stop_price <= current_price):
+            return
+        self.exchange_stops.request(symbol, tracker, {
+            'trigger': trigger,
+            'price': stop_price,
+            'key': position_key,
+            'side': position['side'],
+            'quantity': quantity
+        })
+
+    def replace_exchange_stop(self, symbol, request, active):
+        """
+        Roda na thread do ExchangeStopSync. A ordem antiga trava o saldo, então
+        sai antes da nova entrar; se a nova for recusada, a antiga volta no
+        preço anterior na mesma hora.
+        """
+        if active:
+            if not cancel_margin_order(symbol, active['order_id']):
+                return False, active
+        order_id = place_stop_loss_order(symbol, request['side'], request['quantity'], request['price'])
+        if order_id is None:
+            if not active:
+                return False, None
+            print(f"ERRO: stop da Binance recusado em {request['price']:.4f}; {symbol} está sem stop, "
+                  f"recolocando em {active['price']:.4f}")
+            order_id = place_stop_loss_order(symbol, request['side'], request['quantity'], active['price'])
+            if order_id is None:
+                print(f"ERRO: {symbol} continua sem stop na Binance; a posição está desprotegida")
+                return False, None
+            print(f"Stop na Binance de volta em {active['price']:.4f} para {symbol}")
+            return False, dict(active, order_id=order_id)
+        print(f"Stop na Binance em {request['price']:.4f} (trigger {request['trigger']:.2f}%) para {symbol}")
+        return True, {
+            'order_id': order_id,
+            'trigger': request['trigger'],
+            'price': request['price'],
+            'key': request['key']
+        }
+
+    def on_exchange_stop_done(self, symbol, tracker, active):
+        """Grava no tracker a ordem stop que ficou na exchange (thread da GUI)."""
+        if self.position_trackers.get(symbol) is not tracker or tracker.get('exchange_stop') == active:
+            return
+        if active is None:
+            tracker.pop('exchange_stop', None)
+        else:
+            tracker['exchange_stop'] = active
+        self.save_position_trackers()
+
     def open_new_position_after_close(self, closed_position):
         """Inicia o monitoramento de sinais para abrir uma nova posição."""
         symbol = self.selected_symbol
@@ -1,10 +1,24 @@
 # websocket_client.py
 
 import asyncio
+import random
+import time
 from PyQt5.QtCore import QThread, pyqtSignal
+import requests
 import websockets
 import json
 
+try:
+    import orjson  # decodificação mais rápida das mensagens, quando instalado
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+RECONNECT_MAX_DELAY = 60     # teto do backoff exponencial (s)
+STALE_SECONDS = 10           # sem tick por este tempo, o feed é considerado congelado
+REST_FALLBACK_INTERVAL = 2   # intervalo das consultas REST enquanto o feed estiver congelado (s)
+
+
 class PriceWebsocketClient(QThread):
     price_updated = pyqtSignal(float)
 
@@ -12,25 +26,104 @@ class PriceWebsocketClient(QThread):
         super().__init__()
         self.symbol = symbol.lower()
         self.ws = None
+        self.loop = None
+        self._stop_event = None
         self._is_running = True
+        self.last_tick = 0.0
+        self.last_event_time = 0
+
+    async def receive(self, ws):
+        async for message in ws:
+            data = _loads(message)
+            # 'E' é o horário do evento; descarta mensagens repetidas ou fora de ordem
+            event_time = data.get('E', 0)
+            if event_time and event_time <= self.last_event_time:
+                continue
+            self.last_event_time = event_time
+            self.last_tick = time.monotonic()
+            price = float(data['c'])  # 'c' is close price
+            self.price_updated.emit(price)
 
     async def connect(self):
         url = f"wss://stream.binance.com:9443/ws/{self.symbol}@miniTicker"
-        self.ws = await websockets.connect(url)
+        failures = 0
         while self._is_running:
             try:
-                message = await self.ws.recv()
-                data = json.loads(message)
-                price = float(data['c'])  # 'c' is close price
-                self.price_updated.emit(price)
+                # ping_interval/ping_timeout: a biblioteca derruba a conexão se o pong não voltar
+                async with websockets.connect(url, ping_interval=20, ping_timeout=20, close_timeout=5) as ws:
+                    self.ws = ws
+                    self.last_tick = time.monotonic()
+                    print(f"Websocket conectado: {self.symbol}@miniTicker")
+                    failures = 0
+                    await self.receive(ws)
             except Exception as e:
                 print(f"Error in websocket: {e}")
-                await asyncio.sleep(5)
+            finally:
+                self.ws = None
+            if self._is_running:
+                delay = min(RECONNECT_MAX_DELAY, 2 ** failures) * random.uniform(0.5, 1.0)
+                failures += 1
+                print(f"Reconectando websocket em {delay:.1f}s...")
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def fetch_rest_price(self):
+        response = await self.loop.run_in_executor(
+            None,
+            lambda: requests.get(
+                "https://api.binance.com/api/v3/ticker/price", params={'symbol': self.symbol.upper()}, timeout=5
+            )
+        )
+        return float(response.json()['price'])
+
+    async def watchdog(self):
+        """Feed congelado: força a reconexão e emite o preço via REST até os ticks voltarem."""
+        last_rest = 0.0
+        stale = False
+        while self._is_running:
+            await asyncio.sleep(1)
+            age = time.monotonic() - self.last_tick
+            if age <= STALE_SECONDS:
+                if stale:
+                    print("Websocket normalizado.")
+                    stale = False
+                continue
+            if not stale:
+                print(f"Websocket sem ticks há {age:.0f}s. Usando preço via REST.")
+                stale = True
+                if self.ws is not None:
+                    await self.ws.close()
+            if time.monotonic() - last_rest >= REST_FALLBACK_INTERVAL:
+                last_rest = time.monotonic()
+                try:
+                    self.price_updated.emit(await self.fetch_rest_price())
+                except Exception as e:
+                    print(f"Erro ao obter preço via REST: {e}")
+
+    async def main(self):
+        self._stop_event = asyncio.Event()
+        self.last_tick = time.monotonic()
+        watchdog_task = asyncio.ensure_future(self.watchdog())
+        try:
+            await self.connect()
+        finally:
+            watchdog_task.cancel()
 
     def run(self):
-        asyncio.run(self.connect())
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.main())
+        finally:
+            self.loop.close()
 
     def stop(self):
+        # Chamado pela thread da GUI: o fechamento precisa rodar no loop desta thread
         self._is_running = False
-        if self.ws:
-            asyncio.get_event_loop().run_until_complete(self.ws.close())
+        if self.loop is not None and self.loop.is_running():
+            if self._stop_event is not None:
+                self.loop.call_soon_threadsafe(self._stop_event.set)
+            if self.ws is not None:
+                asyncio.run_coroutine_threadsafe(self.ws.close(), self.loop)
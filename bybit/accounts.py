@@ -0,0 +1,425 @@
+# accounts.py
+
+import os
+import time
+import json
+import hmac
+import base64
+import hashlib
+import threading
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from dotenv import load_dotenv
+
+from api import fetch_open_positions, get_account_overview
+from metrics import registry, Counter, Gauge, track_request, json_routes
+from decode import response_json
+from logger import get_logger
+
+load_dotenv()
+
+logger = get_logger('accounts')
+
+# Lista de contas extras (subcontas, outras exchanges) acompanhadas no mesmo processo
+ACCOUNTS_FILE = os.getenv("ACCOUNTS_FILE", "accounts.json")
+ACCOUNT_POLL_SECONDS = float(os.getenv("ACCOUNT_POLL_SECONDS", 5))
+# Requisições REST por segundo que cada conta pode gastar, por exchange (sobrescrito por conta no arquivo)
+DEFAULT_REQUESTS_PER_SECOND = {'bybit': 5, 'kucoin': 2, 'binance': 2}
+
+ACCOUNT_EQUITY = registry.register(Gauge(
+    'bot_account_equity_usd', 'Patrimônio de cada conta acompanhada (USD)', ('account',)))
+ACCOUNT_NOTIONAL = registry.register(Gauge(
+    'bot_account_notional_usd', 'Notional bruto das posições de cada conta (USD)', ('account',)))
+ACCOUNT_UNREALISED_PNL = registry.register(Gauge(
+    'bot_account_unrealised_pnl_usd', 'PnL não realizado das posições de cada conta (USD)', ('account',)))
+ACCOUNT_POLLS = registry.register(Counter(
+    'bot_account_polls_total', 'Consultas de posições e saldo por conta', ('account', 'result')))
+
+
+class RateBudget:
+    """Balde de fichas por conta: `rate` requisições por segundo, com rajada de até `burst`."""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1) * 2)
+        self.tokens = self.burst
+        self.clock = clock
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, cost=1):
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < cost:
+                return False
+            self.tokens -= cost
+            return True
+
+
+# ----------------------------------------------------------------------
+# Clientes por exchange: posições normalizadas e patrimônio de uma conta
+# Linha de posição: symbol, qty (base, com sinal), entry, mark, margin, unrealised_pnl, liq
+# ----------------------------------------------------------------------
+
+class BybitClient:
+    exchange = 'bybit'
+    cost = 2  # get_positions + get_wallet_balance
+
+    def __init__(self, api_key, api_secret, testnet=False):
+        from pybit.unified_trading import HTTP
+        self.session = HTTP(testnet=testnet, api_key=api_key, api_secret=api_secret)
+
+    def positions(self):
+        positions = fetch_open_positions(client=self.session)
+        if positions is None:
+            return None
+        return [{
+            'symbol': p['symbol'],
+            'qty': float(p['currentQty']),
+            'entry': float(p['avgEntryPrice']),
+            'mark': float(p.get('markPrice') or 0) or None,
+            'margin': float(p.get('posMargin') or 0),
+            'unrealised_pnl': float(p.get('unrealisedPnl') or 0),
+            'liq': p['liquidationPrice'] if isinstance(p.get('liquidationPrice'), (int, float)) else None,
+        } for p in positions if p.get('currentQty')]
+
+    def equity(self, price):
+        overview = get_account_overview(client=self.session)
+        return float(overview['availableBalance']) if overview else None
+
+
+class KucoinClient:
+    exchange = 'kucoin'
+    cost = 2
+    base_url = 'https://api-futures.kucoin.com'
+
+    def __init__(self, api_key, api_secret, passphrase):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.passphrase = base64.b64encode(
+            hmac.new(api_secret.encode('utf-8'), passphrase.encode('utf-8'), hashlib.sha256).digest()
+        ).decode()
+
+    def _get(self, endpoint, request_path):
+        now = str(int(time.time() * 1000))
+        signature = base64.b64encode(
+            hmac.new(self.api_secret.encode('utf-8'), (now + 'GET' + request_path).encode('utf-8'), hashlib.sha256).digest()
+        ).decode()
+        headers = {
+            "KC-API-KEY": self.api_key,
+            "KC-API-SIGN": signature,
+            "KC-API-TIMESTAMP": now,
+            "KC-API-PASSPHRASE": self.passphrase,
+            "KC-API-KEY-VERSION": "2",
+        }
+        with track_request(endpoint) as call:
+            response = requests.get(self.base_url + request_path, headers=headers, timeout=10)
+            if response.status_code != 200:
+                call.ok = False
+                logger.error(f"Erro em {endpoint} (KuCoin): {response.status_code}, {response.text}")
+                return None
+            return response_json(response).get("data")
+
+    def positions(self):
+        try:
+            positions = self._get("kucoin_positions", '/api/v1/positions')
+        except Exception as e:
+            logger.error(f"Erro ao obter posições KuCoin: {e}")
+            return None
+        if positions is None:
+            return None
+        rows = []
+        for p in positions:
+            mark = float(p.get('markPrice') or 0)
+            if not p.get('currentQty') or not mark:
+                continue
+            rows.append({
+                'symbol': p['symbol'],
+                # currentQty vem em lotes; markValue já traz o multiplicador
+                'qty': float(p.get('markValue') or 0) / mark,
+                'entry': float(p.get('avgEntryPrice') or 0),
+                'mark': mark,
+                'margin': float(p.get('posMargin') or 0),
+                'unrealised_pnl': float(p.get('unrealisedPnl') or 0),
+                'liq': float(p['liquidationPrice']) if p.get('liquidationPrice') else None,
+            })
+        return rows
+
+    def equity(self, price):
+        try:
+            overview = self._get("kucoin_account_overview", '/api/v1/account-overview?currency=USDT')
+        except Exception as e:
+            logger.error(f"Erro ao obter saldo KuCoin: {e}")
+            return None
+        return float(overview['accountEquity']) if overview else None
+
+
+class BinanceClient:
+    """Conta de margem cruzada: cada ativo com saldo líquido diferente de zero é uma posição contra USDT."""
+    exchange = 'binance'
+    cost = 1  # /sapi/v1/margin/account traz posições e patrimônio
+    base_url = 'https://api.binance.com'
+
+    def __init__(self, api_key, api_secret):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.account = None
+
+    def _get(self, endpoint, url_path):
+        query = urlencode({'timestamp': int(time.time() * 1000)})
+        signature = hmac.new(self.api_secret.encode('utf-8'), query.encode('utf-8'), hashlib.sha256).hexdigest()
+        with track_request(endpoint) as call:
+            response = requests.get(
+                f"{self.base_url}{url_path}?{query}&signature={signature}",
+                headers={'X-MBX-APIKEY': self.api_key}, timeout=10
+            )
+            if response.status_code != 200:
+                call.ok = False
+                logger.error(f"Erro em {endpoint} (Binance): {response.status_code}, {response.text}")
+                return None
+            return response_json(response)
+
+    def positions(self):
+        try:
+            self.account = self._get("binance_margin_account", '/sapi/v1/margin/account')
+        except Exception as e:
+            logger.error(f"Erro ao obter conta de margem Binance: {e}")
+            self.account = None
+        if self.account is None:
+            return None
+        return [{
+            'symbol': asset['asset'] + 'USDT',
+            'qty': float(asset['netAsset']),
+            # O preço de entrada fica nos trackers do bot da Binance; aqui só a exposição
+            'entry': None,
+            'mark': None,
+            'margin': 0.0,
+            'unrealised_pnl': 0.0,
+            'liq': None,
+        } for asset in self.account['userAssets'] if asset['asset'] != 'USDT' and float(asset['netAsset']) != 0]
+
+    def equity(self, price):
+        # Aproveita a resposta de positions(); o patrimônio vem em BTC
+        btc_price = price('BTCUSDT')
+        if self.account is None or not btc_price:
+            return None
+        return float(self.account['totalNetAssetOfBtc']) * btc_price
+
+
+def _build_client(config):
+    exchange = config['exchange']
+    key = os.getenv(config['key_env'], '')
+    secret = os.getenv(config['secret_env'], '')
+    if exchange == 'bybit':
+        return BybitClient(key, secret, testnet=config.get('testnet', False))
+    if exchange == 'kucoin':
+        return KucoinClient(key, secret, os.getenv(config['passphrase_env'], ''))
+    if exchange == 'binance':
+        return BinanceClient(key, secret)
+    raise ValueError(f"Exchange desconhecida para a conta {config.get('name')}: {exchange}")
+
+
+class Account:
+    """
+    Uma conta acompanhada: cliente REST próprio, orçamento de requisições
+    próprio e trackers próprios (position_trackers.<nome>.json). Os preços
+    vêm do cache compartilhado do orquestrador.
+    """
+
+    def __init__(self, name, client, budget):
+        self.name = name
+        self.client = client
+        self.budget = budget
+        self.rows = []
+        self.equity = None
+        self.updated = None
+        self.trackers_file = f"position_trackers.{name}.json"
+        self.trackers = self._load_trackers()
+
+    @property
+    def exchange(self):
+        return self.client.exchange
+
+    def poll(self, price):
+        """Lê posições e patrimônio se o orçamento da conta permitir. Retorna os símbolos abertos."""
+        if not self.budget.try_acquire(self.client.cost):
+            ACCOUNT_POLLS.inc(account=self.name, result='throttled')
+            return None
+        rows = self.client.positions()
+        if rows is None:
+            ACCOUNT_POLLS.inc(account=self.name, result='error')
+            return None
+        equity = self.client.equity(lambda symbol: price(self.exchange, symbol))
+        self.rows = rows
+        if equity is not None:
+            self.equity = equity
+        self.updated = time.time()
+        ACCOUNT_POLLS.inc(account=self.name, result='ok')
+        self._update_trackers(rows)
+        return [row['symbol'] for row in rows]
+
+    def _update_trackers(self, rows):
+        changed = False
+        open_symbols = set()
+        for row in rows:
+            symbol = row['symbol']
+            open_symbols.add(symbol)
+            pnl_percent = row['unrealised_pnl'] / row['margin'] * 100 if row['margin'] else 0.0
+            tracker = self.trackers.get(symbol)
+            if tracker is None or tracker.get('entry') != row['entry']:
+                self.trackers[symbol] = {'entry': row['entry'], 'opened': time.time(), 'max_pnl_percent': pnl_percent}
+                changed = True
+            elif pnl_percent > tracker['max_pnl_percent']:
+                tracker['max_pnl_percent'] = pnl_percent
+                changed = True
+        for symbol in list(self.trackers):
+            if symbol not in open_symbols:
+                del self.trackers[symbol]
+                changed = True
+        if changed:
+            self._save_trackers()
+
+    def _load_trackers(self):
+        try:
+            with open(self.trackers_file, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Erro ao carregar {self.trackers_file}: {e}")
+            return {}
+
+    def _save_trackers(self):
+        try:
+            with open(self.trackers_file, 'w') as f:
+                json.dump(self.trackers, f)
+        except Exception as e:
+            logger.warning(f"Erro ao salvar {self.trackers_file}: {e}")
+
+
+class AccountOrchestrator:
+    """
+    Acompanha N contas em M exchanges no mesmo processo. Os preços chegam
+    pelo StreamManager compartilhado (um símbolo assinado uma vez, não
+    importa quantas contas o tenham) e ficam num único cache; cada conta
+    só guarda suas linhas de posição. As contas são consultadas em paralelo
+    a cada ACCOUNT_POLL_SECONDS, cada uma dentro do próprio orçamento.
+
+    `summary()` agrega tudo para o painel (GET /accounts no servidor de métricas).
+    """
+
+    def __init__(self, accounts, manager=None):
+        self.accounts = accounts
+        self.manager = manager
+        self.prices = {}          # (exchange, symbol) -> último preço
+        self.subscribed = set()   # (exchange, symbol)
+        self._running = False
+        self._thread = None
+        self._pool = ThreadPoolExecutor(max_workers=min(8, max(len(accounts), 1)), thread_name_prefix="account")
+        if manager is not None:
+            manager.add_listener(self._on_stream)
+
+    @classmethod
+    def from_file(cls, path=ACCOUNTS_FILE, manager=None):
+        """
+        Lê a lista de contas (JSON). Sem o arquivo, retorna None. As
+        credenciais ficam no .env; o arquivo só diz o nome das variáveis:
+        [{"name": "sub1", "exchange": "bybit", "key_env": "SUB1_KEY", "secret_env": "SUB1_SECRET"}, ...]
+        """
+        try:
+            with open(path, 'r') as f:
+                configs = json.load(f)
+        except FileNotFoundError:
+            return None
+        accounts = []
+        for config in configs:
+            try:
+                client = _build_client(config)
+            except Exception as e:
+                logger.error(f"Conta {config.get('name')} ignorada: {e}")
+                continue
+            rate = config.get('requests_per_second', DEFAULT_REQUESTS_PER_SECOND[client.exchange])
+            accounts.append(Account(config['name'], client, RateBudget(rate)))
+        logger.info(f"{len(accounts)} contas carregadas de {path}")
+        return cls(accounts, manager)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        if self.manager is not None and any(a.exchange == 'binance' for a in self.accounts):
+            # Patrimônio da margem da Binance vem em BTC
+            self._subscribe('binance', ['BTCUSDT'])
+        json_routes['/accounts'] = self.summary
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="AccountOrchestrator", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        json_routes.pop('/accounts', None)
+
+    def _run(self):
+        while self._running:
+            started = time.monotonic()
+            self.poll_all()
+            time.sleep(max(0.0, ACCOUNT_POLL_SECONDS - (time.monotonic() - started)))
+
+    def poll_all(self):
+        results = self._pool.map(lambda account: (account, account.poll(self.price)), self.accounts)
+        for account, symbols in results:
+            if symbols:
+                self._subscribe(account.exchange, symbols)
+        self.summary()
+
+    def _subscribe(self, exchange, symbols):
+        new = [symbol for symbol in symbols if (exchange, symbol) not in self.subscribed]
+        if new and self.manager is not None:
+            self.subscribed.update((exchange, symbol) for symbol in new)
+            self.manager.subscribe(exchange, new)
+
+    def _on_stream(self, exchange, symbol, price, data):
+        mark = data.get('markPrice') if exchange == 'bybit' else None
+        if mark or price:
+            self.prices[(exchange, symbol)] = float(mark) if mark else price
+
+    def price(self, exchange, symbol):
+        return self.prices.get((exchange, symbol))
+
+    def summary(self):
+        """Posições de cada conta reavaliadas pelo preço compartilhado, mais os totais."""
+        accounts = []
+        totals = {'equity': 0.0, 'notional': 0.0, 'unrealised_pnl': 0.0, 'positions': 0}
+        for account in self.accounts:
+            positions = []
+            notional = upl = 0.0
+            for row in account.rows:
+                mark = self.price(account.exchange, row['symbol']) or row['mark']
+                position_upl = row['unrealised_pnl']
+                if mark and row['entry']:
+                    position_upl = row['qty'] * (mark - row['entry'])
+                position_notional = abs(row['qty']) * mark if mark else 0.0
+                notional += position_notional
+                upl += position_upl
+                tracker = account.trackers.get(row['symbol'], {})
+                positions.append({
+                    'symbol': row['symbol'], 'qty': row['qty'], 'entry': row['entry'], 'mark': mark,
+                    'notional': position_notional, 'unrealised_pnl': position_upl,
+                    'liquidation_price': row['liq'], 'max_pnl_percent': tracker.get('max_pnl_percent'),
+                })
+            accounts.append({
+                'name': account.name, 'exchange': account.exchange, 'equity': account.equity,
+                'notional': notional, 'unrealised_pnl': upl, 'updated': account.updated, 'positions': positions,
+            })
+            totals['equity'] += account.equity or 0.0
+            totals['notional'] += notional
+            totals['unrealised_pnl'] += upl
+            totals['positions'] += len(positions)
+
+        ACCOUNT_EQUITY.replace({(a['name'],): a['equity'] for a in accounts if a['equity'] is not None})
+        ACCOUNT_NOTIONAL.replace({(a['name'],): a['notional'] for a in accounts})
+        ACCOUNT_UNREALISED_PNL.replace({(a['name'],): a['unrealised_pnl'] for a in accounts})
+        return {'accounts': accounts, 'totals': totals}
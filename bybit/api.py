@@ -1,39 +1,88 @@
 # api.py
 
 import os
-import re
 import time
 import json
+import threading
 import requests
-import numpy as np
 from dotenv import load_dotenv
-from pybit.unified_trading import HTTP
+
+from latency import tracer
+from metrics import track_request, RATE_LIMIT_WEIGHT, INDICATOR_SECONDS
+from logger import get_logger
+from symbols import symbol_registry
+from indicators import STRATEGIES, LiveSignals, enabled_indicators, indicator_for, live_lookback, signal_name, split_name
+from candles import CandleStore
+from positions import PositionTable
+from decode import klines_array
+from events import bus, OrderAck
 
 load_dotenv()
 
+logger = get_logger('api')
+
 BYBIT_API_KEY = os.getenv("BYBIT_API_KEY")
 BYBIT_API_SECRET = os.getenv("BYBIT_API_SECRET")
 USE_TESTNET = os.getenv("BYBIT_TESTNET", "False").lower() == "true"
 
 BINANCE_BASE_URL = 'https://api.binance.com'
 
+
+class _LazySession:
+    """
+    Sessão HTTP da Bybit (pybit) criada na primeira chamada: importar o pybit
+    e montar a sessão fica fora do caminho até a primeira tela.
+    """
+
+    def __init__(self):
+        self._session = None
+
+    def __getattr__(self, name):
+        if self._session is None:
+            from pybit.unified_trading import HTTP
+            # Se quiser usar mainnet, certifique-se de que BYBIT_TESTNET não esteja setado como "true".
+            self._session = HTTP(
+                testnet=USE_TESTNET,
+                api_key=BYBIT_API_KEY,
+                api_secret=BYBIT_API_SECRET
+            )
+        return getattr(self._session, name)
+
+
 # Inicializa sessão HTTP da Bybit (usando pybit)
-# Se quiser usar mainnet, certifique-se de que BYBIT_TESTNET não esteja setado como "true".
-session = HTTP(
-    testnet=USE_TESTNET,
-    api_key=BYBIT_API_KEY,
-    api_secret=BYBIT_API_SECRET
-)
+session = _LazySession()
 
 
-def fetch_open_positions():
+def to_bybit_symbol(symbol):
+    """Converte o símbolo de qualquer exchange (ex.: XBTUSDTM da KuCoin) para o da Bybit (BTCUSDT)."""
+    return symbol_registry.convert(symbol, 'bybit')
+
+
+def _call(endpoint, method, **kwargs):
+    """Executa um método da sessão pybit registrando contagem, erros e latência."""
+    with track_request(endpoint):
+        return method(**kwargs)
+
+
+def _publish_ack(symbol, side, qty, result, reduce_only):
+    """OrderAck no barramento com a resposta de place_order (aceita quando veio um orderId)."""
+    order_id = None
+    if isinstance(result, dict):
+        order_id = result.get("result", {}).get("orderId") or result.get("orderId")
+    bus.publish(OrderAck(symbol, side.lower(), float(qty), order_id, order_id is not None, reduce_only))
+
+
+def fetch_open_positions(client=None):
     """
     Busca as posições abertas usando a biblioteca pybit (unified_trading).
-    Mantém a estrutura de retorno compatível com o código do ui.py.
+    Retorna uma PositionTable (positions.py): arrays por coluna para as
+    contas em lote e, ao iterar, posições que aceitam as mesmas chaves dos
+    dicts antigos (symbol, avgEntryPrice, currentQty, markPrice...).
+    `client` é a sessão de outra conta (accounts.py); por padrão, a do .env.
     """
     try:
         # A chamada abaixo retorna um dict que inclui "result" e, dentro dele, "list".
-        response = session.get_positions(category="linear", settleCoin="USDT")
+        response = _call("get_positions", (client or session).get_positions, category="linear", settleCoin="USDT")
         if "result" not in response or "list" not in response["result"]:
             return None
 
@@ -41,50 +90,11 @@ def fetch_open_positions():
         if not isinstance(position_list, list):
             return None
 
-        adapted_positions = []
-        for pos in position_list:
-
 #Posição: {'symbol': 'BTCUSDT', 'leverage': '20', 'autoAddMargin': 0, 'avgPrice': '103682.9', 'liqPrice': '4771.28168679', 'riskLimitValue': '2000000', 'takeProfit': '', 'positionValue': '103.6829', 'isReduceOnly': False, 'tpslMode': 'Full', 'riskId': 1, 'trailingStop': '0', 'unrealisedPnl': '-0.3332', 'markPrice': '103349.7', 'adlRankIndicator': 2, 'cumRealisedPnl': '5.94638841', 'positionMM': '0.57258882', 'createdTime': '1736570501798', 'positionIdx': 0, 'positionIM': '5.23831932', 'seq': 311874322993, 'updatedTime': '1737176616702', 'side': 'Buy', 'bustPrice': '', 'positionBalance': '0', 'leverageSysUpdatedTime': '', 'curRealisedPnl': '-0.0570256', 'size': '0.001', 'positionStatus': 'Normal', 'mmrSysUpdatedTime': '', 'stopLoss': '', 'tradeMode': 0, 'sessionAvgPrice': ''}
-            # print(f"Posição: {pos}")
-            symbol = pos.get('symbol', '')
-            side = pos.get('side', '')
-            size_str = pos.get('size', '0')
-            size = float(size_str)
-            # print(f"Size: {size}")
-            entry_price = float(pos.get('avgPrice', 0))
-            leverage = float(pos.get('leverage', 0))
-            unrealised_pnl = float(pos.get('unrealisedPnl', 0))
-            liq_price = float(pos.get('liqPrice', 0)) if pos.get('liqPrice') else 'N/A'
-
-            # 'positionBalance' costuma ser a margem alocada para a posição
-            pos_balance = float(pos.get('positionIM', 0))
-
-            # Calcula currentQty como positivo (long) ou negativo (short)
-            current_qty = size if side.lower() == 'buy' else -size
-
-            # Bybit não retorna markPrice diretamente no get_positions (v5).
-            # Podemos aproximar com positionValue/size se size > 0
-            mark_price = pos.get('markPrice', 0)
-
-            # PnL realizado não vem diretamente aqui, então definimos como 0.
-            realized_pnl = float(pos.get('curRealisedPnl', 0)) * 2  # multiplicado por 2 já contando a taxa de fechaemento da posição
-
-            adapted_positions.append({
-                "symbol": symbol,
-                "avgEntryPrice": entry_price,
-                "realLeverage": leverage,
-                "maintMargin": pos_balance,
-                "realisedPnl": realized_pnl,
-                "posMargin": pos_balance,
-                "unrealisedPnl": unrealised_pnl,
-                "currentQty": current_qty,
-                "markPrice": mark_price,
-                "liquidationPrice": liq_price
-            })
-        return adapted_positions
+        return PositionTable.from_bybit(position_list)
 
     except Exception as e:
-        print(f"Erro ao obter posições Bybit: {e}")
+        logger.error(f"Erro ao obter posições Bybit: {e}")
         return None
 
 
@@ -96,15 +106,13 @@ def fetch_high_low_prices(symbol):
         end_time = int(time.time() * 1000)
         start_time = end_time - (60 * 60 * 1000)  # 1 hora atrás
 
-        # Caso use "XBTUSDTM", faça um replace para "BTCUSDT", etc., se for necessário.
-        # bybit_symbol = symbol.replace("XBT", "BTC").replace("M", "")
-        # corrija a linha acima, o M precisa ser no final da string:
-        bybit_symbol = re.sub(r"M$", "", symbol.replace("XBT", "BTC"))
-        # bybit_symbol = symbol.replace("XBT", "BTC").replace("TRUP", "TRUMP")
+        # Caso use "XBTUSDTM", o registro de símbolos traduz para "BTCUSDT"
+        bybit_symbol = to_bybit_symbol(symbol)
 
         # A biblioteca pybit oferece método get_kline():
         # doc: get_kline(category, symbol, interval, start, end, limit=..., ...)
-        response = session.get_kline(
+        response = _call(
+            "get_kline", session.get_kline,
             category="linear",
             symbol=bybit_symbol,
             interval="1",     # 1m
@@ -120,22 +128,11 @@ def fetch_high_low_prices(symbol):
             return None, None
 
         # Cada item é do tipo [startTime, open, high, low, close, volume, turnover]
-        highs = []
-        lows = []
-        for kline in klines:
-            # kline[2] = high, kline[3] = low
-            if len(kline) >= 4:
-                high_val = float(kline[2])
-                low_val = float(kline[3])
-                highs.append(high_val)
-                lows.append(low_val)
-
-        if highs and lows:
-            return max(highs), min(lows)
-        return None, None
+        data = klines_array(klines)
+        return float(data[:, 2].max()), float(data[:, 3].min())
 
     except Exception as e:
-        print(f"Erro ao obter preços High/Low Bybit: {e}")
+        logger.error(f"Erro ao obter preços High/Low Bybit: {e}")
         return None, None
 
 
@@ -149,40 +146,44 @@ def close_position_market(position):
         symbol = position['symbol']
         current_qty = position['currentQty']
         if current_qty == 0:
-            print("Posição já fechada.")
+            logger.info("Posição já fechada.")
             return
 
         # Determina o símbolo adaptado para Bybit
-        bybit_symbol = re.sub(r"M$", "", symbol.replace("XBT", "BTC"))
+        bybit_symbol = to_bybit_symbol(symbol)
 
         # Cancelar todas as ordens abertas para o mesmo símbolo
-        cancel_result = session.cancel_all_orders(category="linear", symbol=bybit_symbol)
+        cancel_result = _call("cancel_all_orders", session.cancel_all_orders, category="linear", symbol=bybit_symbol)
         if cancel_result is not None:
-            print(f"Todas as ordens abertas para {bybit_symbol} foram canceladas.")
+            logger.info(f"Todas as ordens abertas para {bybit_symbol} foram canceladas.")
         else:
-            print(f"Falha ao cancelar ordens para {bybit_symbol}.")
+            logger.warning(f"Falha ao cancelar ordens para {bybit_symbol}.")
 
         # Se a posição for short (qty < 0), precisamos de side="Buy" para fechar.
         side_for_close = "Buy" if current_qty < 0 else "Sell"
         size = abs(current_qty)
 
-        result = session.place_order(
-            category="linear",
-            symbol=bybit_symbol,
-            side=side_for_close,
-            orderType="Market",
-            qty=size,
-            timeInForce="GTC",
-            reduceOnly=True,
-            positionIdx=0  # one-way mode
-        )
+        with tracer.span('http_send_to_ack'):
+            result = _call(
+                "place_order", session.place_order,
+                category="linear",
+                symbol=bybit_symbol,
+                side=side_for_close,
+                orderType="Market",
+                qty=size,
+                timeInForce="GTC",
+                reduceOnly=True,
+                positionIdx=0  # one-way mode
+            )
+        tracer.since_tick('tick_to_ack')
+        _publish_ack(symbol, side_for_close, size, result, True)
         if result is not None and "orderId" in result:
-            print(f"Ordem de mercado enviada para fechar posição: {result}")
+            logger.info(f"Ordem de mercado enviada para fechar posição: {result}")
         else:
-            print("Falha ao enviar ordem de fechamento na Bybit.")
+            logger.warning("Falha ao enviar ordem de fechamento na Bybit.")
 
     except Exception as e:
-        print(f"Erro em close_position_market (Bybit): {e}")
+        logger.error(f"Erro em close_position_market (Bybit): {e}")
 
 
 
@@ -193,13 +194,13 @@ def open_new_position_market(symbol, side, size, leverage):
       2) Cria a ordem de mercado
     """
     try:
-        # bybit_symbol = symbol.replace("XBT", "BTC").replace("M", "")
-        bybit_symbol = re.sub(r"M$", "", symbol.replace("XBT", "BTC"))
+        bybit_symbol = to_bybit_symbol(symbol)
         side_for_bybit = "Buy" if side.lower() == "buy" else "Sell"
 
         # 1) Ajustar alavancagem:
         # set_leverage(category="linear", symbol="BTCUSDT", buyLeverage=..., sellLeverage=..., tradeMode=0)
-        session.set_leverage(
+        _call(
+            "set_leverage", session.set_leverage,
             category="linear",
             symbol=bybit_symbol,
             buyLeverage=str(leverage),
@@ -208,7 +209,8 @@ def open_new_position_market(symbol, side, size, leverage):
         )
 
         # 2) Criar ordem de mercado
-        result = session.place_order(
+        result = _call(
+            "place_order", session.place_order,
             category="linear",
             symbol=bybit_symbol,
             side=side_for_bybit,
@@ -218,8 +220,9 @@ def open_new_position_market(symbol, side, size, leverage):
             reduceOnly=False,
             positionIdx=0
         )
+        _publish_ack(symbol, side_for_bybit, size, result, False)
         if result is not None and "orderId" in result:
-            print(f"Ordem de mercado enviada para abrir nova posição: {result}")
+            logger.info(f"Ordem de mercado enviada para abrir nova posição: {result}")
             # Montamos um dict para que o ui.py continue funcionando
             position_details = {
                 'symbol': symbol,
@@ -229,152 +232,126 @@ def open_new_position_market(symbol, side, size, leverage):
             }
             return position_details
         else:
-            print("Erro ao enviar ordem de abertura na Bybit.")
+            logger.error("Erro ao enviar ordem de abertura na Bybit.")
             return None
 
     except Exception as e:
-        print(f"Erro em open_new_position_market (Bybit): {e}")
+        logger.error(f"Erro em open_new_position_market (Bybit): {e}")
         return None
 
 
+def _signals_error(text, extra=()):
+    result = {key: text for key in ('sma', 'rsi', 'volume', 'high_low')}
+    result.update({name: text for name in extra})
+    result['decision'] = 'wait'
+    return result
+
+
+def _fetch_binance_klines(symbol, interval, limit):
+    url = BINANCE_BASE_URL + '/api/v3/klines'
+    params = {
+        'symbol': symbol,
+        'interval': interval,
+        'limit': limit
+    }
+    with track_request("binance_klines") as call:
+        response = requests.get(url, params=params)
+        call.ok = response.status_code == 200
+    used_weight = response.headers.get('X-MBX-USED-WEIGHT-1M')
+    if used_weight is not None:
+        RATE_LIMIT_WEIGHT.set(float(used_weight), exchange='binance')
+    if response.status_code != 200:
+        logger.error(f"Erro ao obter dados da Binance: {response.status_code}, {response.text}")
+        return None
+    # [tempo, open, high, low, close, volume] em float, convertidos do corpo cru numa passada
+    return klines_array(response.content).tolist()
+
+
+# Candles locais da Binance: um fluxo de 1m alimenta todos os timeframes dos indicadores
+candle_store = CandleStore(_fetch_binance_klines)
+
+# Indicadores ao vivo por (símbolo, timeframe, parâmetros): cada barra fechada é somada uma vez
+_live_signals = {}
+_live_lock = threading.Lock()
+# Barras entregues por consulta quando o histórico já está carregado
+LIVE_KLINES = 3
+
+
 def decide_trade_direction(symbol, rsi_period=14, use_sma=True, use_rsi=True,
-                           use_volume=False, granularity=5, use_high_low=False):
+                           use_volume=False, granularity=5, use_high_low=False,
+                           extra=(), strategy='unanimous'):
     """
-    Esta função permanece igual, pois faz uso da API da Binance para cálculos de RSI, SMA etc.
+    Sinais dos indicadores registrados em indicators.py sobre os candles
+    locais da Binance (candles.py). SMA, RSI e volume são sempre calculados;
+    High/Low e os plugins de `extra` só quando ativos. Os indicadores rodam
+    no timeframe da granularidade, ou no indicado em 'nome@timeframe'
+    (ex.: 'ema@1h' como filtro de tendência). A decisão usa a estratégia
+    `strategy` com os indicadores ativos.
     """
     try:
-        interval = '1m' if granularity == 1 else '5m'
-        limit = 100 if granularity == 1 else 30
-        url = BINANCE_BASE_URL + '/api/v3/klines'
-        params = {
-            'symbol': symbol,
-            'interval': interval,
-            'limit': limit
-        }
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            data = response.json()
-            if len(data) < 25:
-                print(f"Dados insuficientes para análise ({len(data)} períodos)")
-                return {'decision': 'wait', 'sma': 'N/A', 'rsi': 'N/A', 'volume': 'N/A', 'high_low': 'N/A'}
-
-            close_prices = np.array([float(kline[4]) for kline in data])
-            volumes = np.array([float(kline[5]) for kline in data])
-            current_price = close_prices[-1]
-
-            # SMA curto (7) e longo (25)
-            sma_short = np.mean(close_prices[-7:])
-            sma_long = np.mean(close_prices[-25:])
-
-            # RSI
-            delta = np.diff(close_prices)
-            up = delta.copy()
-            down = delta.copy()
-            up[up < 0] = 0
-            down[down > 0] = 0
-            gain = np.mean(up[-rsi_period:])
-            loss = -np.mean(down[-rsi_period:])
-            if loss == 0:
-                rsi = 100
-            else:
-                rs = gain / loss
-                rsi = 100 - (100 / (1 + rs))
-
-            # Volume
-            avg_volume = np.mean(volumes[-7:])
-            current_volume = volumes[-1]
-
-            # Sinal da SMA
-            if sma_short > sma_long:
-                sma_signal = 'buy'
-            elif sma_short < sma_long:
-                sma_signal = 'sell'
-            else:
-                sma_signal = 'wait'
-
-            # Sinal do RSI
-            if rsi < 30:
-                rsi_signal = 'buy'
-            elif rsi > 70:
-                rsi_signal = 'sell'
-            else:
-                rsi_signal = 'wait'
-
-            # Confirmação de volume
-            volume_signal = 'go' if current_volume > avg_volume else 'wait'
-            volume_confirmation = (volume_signal == 'go') if use_volume else True
-
-            # High/Low
-            if use_high_low:
-                highs = np.array([float(kline[2]) for kline in data])
-                lows = np.array([float(kline[3]) for kline in data])
-                high_price = np.max(highs)
-                low_price = np.min(lows)
-                dist_to_high = abs(high_price - current_price)
-                dist_to_low = abs(current_price - low_price)
-                if dist_to_low < dist_to_high:
-                    high_low_signal = 'buy'
-                else:
-                    high_low_signal = 'sell'
-                high_low_value = f"({high_low_signal})"
-            else:
-                high_low_signal = 'wait'
-                high_low_value = 'N/A'
-
-            # Decidir com base nos sinais que foram escolhidos (SMA, RSI, High/Low)
-            signals = []
-            if use_sma:
-                signals.append(sma_signal)
-            if use_rsi:
-                signals.append(rsi_signal)
-            if use_high_low:
-                signals.append(high_low_signal)
-
-            if len(signals) > 0 and all(s == 'buy' for s in signals) and volume_confirmation:
-                decision = 'buy'
-            elif len(signals) > 0 and all(s == 'sell' for s in signals) and volume_confirmation:
-                decision = 'sell'
-            else:
-                decision = 'wait'
-
-            return {
-                "decision": decision,
-                "sma": f"{int(sma_short)} | {int(sma_long)} ({sma_signal})",
-                "rsi": f"{int(rsi)} ({rsi_signal})",
-                "volume": f"{int(current_volume)} agora | {int(avg_volume)} média ({volume_signal})",
-                "high_low": high_low_value
-            }
-
-        else:
-            print(f"Erro ao obter dados da Binance: {response.status_code}, {response.text}")
-            return {
-                "decision": "wait",
-                "sma": "Erro",
-                "rsi": "Erro",
-                "volume": "Erro",
-                "high_low": "Erro"
-            }
+        base = '1m' if granularity == 1 else '5m'
+        window = 100 if granularity == 1 else 30
+        enabled = enabled_indicators(use_sma, use_rsi, use_volume, use_high_low, extra)
+        names = ('sma', 'rsi', 'volume') + tuple(name for name in enabled if name not in ('sma', 'rsi', 'volume'))
+        params = {'rsi': {'period': rsi_period}, 'high_low': {'window': window}}
+        by_timeframe = {}
+        for name in names:
+            by_timeframe.setdefault(split_name(name)[1] or base, []).append(name)
+
+        # Uma única consulta de 1m, seja qual for o número de timeframes
+        if not candle_store.refresh(symbol):
+            return _signals_error('Erro', extra)
+
+        indicator_start = time.perf_counter()
+        outputs = {}
+        for timeframe, group in by_timeframe.items():
+            key = (symbol, timeframe, rsi_period, tuple(group))
+            with _live_lock:
+                live = _live_signals.get(key)
+            full = max(window, live_lookback(group, params)) if timeframe == base else live_lookback(group, params)
+            bars = candle_store.bars(symbol, timeframe, LIVE_KLINES if live is not None else full)
+            if live is not None and not live.caught_up(bars):
+                live = None
+                bars = candle_store.bars(symbol, timeframe, full)
+            if not bars:
+                return _signals_error('Erro', extra)
+            if live is None:
+                if timeframe == base and len(bars) < 25:
+                    logger.warning(f"Dados insuficientes para análise ({len(bars)} períodos)")
+                    return _signals_error('N/A', extra)
+                live = LiveSignals(group, params)
+            with _live_lock:
+                _live_signals[key] = live
+                outputs.update(live.feed(bars))
+
+        if any(outputs[name] is None for name in names):
+            logger.warning(f"Dados insuficientes para análise de {symbol}")
+            return _signals_error('N/A', extra)
+        decision = STRATEGIES[strategy].decide({name: outputs[name] for name in enabled})[0]
+        INDICATOR_SECONDS.observe(time.perf_counter() - indicator_start)
+
+        result = {'decision': signal_name(decision)}
+        for name in names:
+            result[name] = indicator_for(name).describe(outputs[name])
+        result.setdefault('high_low', 'N/A')
+        return result
     except Exception as e:
-        print(f"Erro em decide_trade_direction: {e}")
-        return {
-            "decision": "wait",
-            "sma": "Erro",
-            "rsi": "Erro",
-            "volume": "Erro",
-            "high_low": "Erro"
-        }
+        logger.error(f"Erro em decide_trade_direction: {e}")
+        return _signals_error('Erro', extra)
 
 
-def get_account_overview(currency="USDT"):
+def get_account_overview(currency="USDT", client=None):
     """
     Busca saldo disponível na conta. 
     Para uma conta de derivativos (linear), podemos usar get_wallet_balance.
+    `client` é a sessão de outra conta (accounts.py); por padrão, a do .env.
     """
     try:
         # Se for conta "CONTRACT" (derivativos), ou "UNIFIED", etc.
         # A doc oficial mostra: session.get_wallet_balance(accountType="UNIFIED")
         # Aqui, para manter compatível com o antigo 'CONTRACT', ajustamos:
-        response = session.get_wallet_balance(
+        response = _call(
+            "get_wallet_balance", (client or session).get_wallet_balance,
             accountType="UNIFIED"
         )
         # Normalmente, a resposta vem em algo como:
@@ -390,7 +367,7 @@ def get_account_overview(currency="USDT"):
         # }
 
 # Resposta da Bybit wallet: {'retCode': 0, 'retMsg': 'OK', 'result': {'list': [{'totalEquity': '1659.03831971', 'accountIMRate': '', 'totalMarginBalance': '', 'totalInitialMargin': '', 'accountType': 'UNIFIED', 'totalAvailableBalance': '', 'accountMMRate': '', 'totalPerpUPL': '-102.27221471', 'totalWalletBalance': '1761.31053443', 'accountLTV': '', 'totalMaintenanceMargin': '', 'coin': [{'availableToBorrow': '', 'bonus': '0', 'accruedInterest': '0', 'availableToWithdraw': '', 'totalOrderIM': '7.21375219', 'equity': '1659.12161219', 'totalPositionMM': '21.93050317', 'usdValue': '1659.0303605', 'unrealisedPnl': '-102.27784', 'collateralSwitch': True, 'spotHedgingQty': '0', 'borrowAmount': '0', 'totalPositionIM': '696.44725257', 'walletBalance': '1761.39945219', 'cumRealisedPnl': '16.74085219', 'locked': '0', 'marginCollateral': True, 'coin': 'USDT'}, {'availableToBorrow': '', 'bonus': '0', 'accruedInterest': '', 'availableToWithdraw': '', 'totalOrderIM': '0', 'equity': '0.048', 'totalPositionMM': '0', 'usdValue': '0.00795921', 'unrealisedPnl': '0', 'collateralSwitch': False, 'spotHedgingQty': '0', 'borrowAmount': '0', 'totalPositionIM': '0', 'walletBalance': '0.048', 'cumRealisedPnl': '0', 'locked': '0', 'marginCollateral': False, 'coin': 'BRL'}]}]}, 'retExtInfo': {}, 'time': 1737540404650}
-        print(f"Resposta da Bybit wallet: {response}")
+        logger.debug("Resposta da Bybit wallet: %s", response)
         if "result" not in response or "list" not in response["result"]:
             return None
 
@@ -402,6 +379,244 @@ def get_account_overview(currency="USDT"):
         return {"availableBalance": response["result"]["list"][0]["totalEquity"] or 0}
 
     except Exception as e:
-        print(f"Erro ao obter saldo Bybit: {e}")
+        logger.error(f"Erro ao obter saldo Bybit: {e}")
         return None
 
+
+
+def list_usdt_contracts(limit=300):
+    """
+    Lista os contratos perpétuos lineares em USDT ordenados pelo volume
+    financeiro de 24h, usando uma única chamada get_tickers.
+    Retorna os tickers no formato da Bybit (symbol, lastPrice, volume24h, turnover24h, ...).
+    """
+    try:
+        response = _call("get_tickers", session.get_tickers, category="linear")
+        if "result" not in response or "list" not in response["result"]:
+            return []
+
+        tickers = [t for t in response["result"]["list"] if t.get('symbol', '').endswith('USDT')]
+        tickers.sort(key=lambda t: float(t.get('turnover24h') or 0), reverse=True)
+        return tickers[:limit]
+
+    except Exception as e:
+        logger.error(f"Erro ao listar contratos USDT Bybit: {e}")
+        return []
+
+
+def fetch_fee_rates():
+    """Faixa de taxas da conta nos contratos lineares: {symbol: (maker, taker)}."""
+    try:
+        response = _call("get_fee_rates", session.get_fee_rates, category="linear")
+        return {
+            item['symbol']: (float(item['makerFeeRate']), float(item['takerFeeRate']))
+            for item in response["result"]["list"]
+        }
+    except Exception as e:
+        logger.error(f"Erro ao obter taxas da conta Bybit: {e}")
+        return None
+
+
+def fetch_funding_rates():
+    """Funding previsto de cada contrato linear: {symbol: (taxa, próximo acerto em ms)}."""
+    try:
+        response = _call("get_tickers", session.get_tickers, category="linear")
+        return {
+            t['symbol']: (float(t['fundingRate']), int(t['nextFundingTime']))
+            for t in response["result"]["list"] if t.get('fundingRate') and t.get('nextFundingTime')
+        }
+    except Exception as e:
+        logger.error(f"Erro ao obter funding Bybit: {e}")
+        return None
+
+
+def fetch_klines(symbol, interval="1", limit=100):
+    """
+    Busca candles do contrato linear na Bybit, do mais antigo para o mais novo.
+    Cada item é [startTime, open, high, low, close, volume, turnover] (strings).
+    """
+    try:
+        response = _call(
+            "get_kline", session.get_kline,
+            category="linear",
+            symbol=symbol,
+            interval=interval,
+            limit=limit
+        )
+        if "result" not in response or "list" not in response["result"]:
+            return []
+        # A Bybit devolve do mais novo para o mais antigo
+        return list(reversed(response["result"]["list"]))
+
+    except Exception as e:
+        logger.error(f"Erro ao obter candles de {symbol} na Bybit: {e}")
+        return []
+
+
+_instruments = {}
+
+
+def fetch_instrument(symbol):
+    """Filtros de lote e de preço do contrato (get_instruments_info), com cache."""
+    bybit_symbol = to_bybit_symbol(symbol)
+    if bybit_symbol in _instruments:
+        return _instruments[bybit_symbol]
+    try:
+        response = _call("get_instruments_info", session.get_instruments_info, category="linear", symbol=bybit_symbol)
+        instrument = response["result"]["list"][0]
+        _instruments[bybit_symbol] = instrument
+        return instrument
+    except Exception as e:
+        logger.error(f"Erro ao obter dados do contrato {bybit_symbol} na Bybit: {e}")
+        return None
+
+
+def fetch_lot_size(symbol):
+    """Passo e quantidade mínima de ordem do contrato."""
+    listed = symbol_registry.instrument('bybit', to_bybit_symbol(symbol))
+    if listed is not None and listed.lot_size:
+        return listed.lot_size, listed.min_qty
+    instrument = fetch_instrument(symbol)
+    if instrument is None:
+        return None
+    lot_filter = instrument["lotSizeFilter"]
+    return float(lot_filter["qtyStep"]), float(lot_filter["minOrderQty"])
+
+
+def fetch_tick_size(symbol):
+    listed = symbol_registry.instrument('bybit', to_bybit_symbol(symbol))
+    if listed is not None and listed.tick_size:
+        return listed.tick_size
+    instrument = fetch_instrument(symbol)
+    if instrument is None:
+        return None
+    return float(instrument["priceFilter"]["tickSize"])
+
+
+def set_position_leverage(symbol, leverage):
+    """Ajusta a alavancagem (isolada) do contrato antes de abrir posição."""
+    try:
+        _call(
+            "set_leverage", session.set_leverage,
+            category="linear",
+            symbol=to_bybit_symbol(symbol),
+            buyLeverage=str(leverage),
+            sellLeverage=str(leverage),
+            tradeMode=0
+        )
+        return True
+    except Exception as e:
+        # A Bybit responde erro quando a alavancagem já é a pedida
+        logger.debug(f"set_leverage {symbol}: {e}")
+        return False
+
+
+def place_market_order(symbol, side, qty, reduce_only=False):
+    """Envia uma ordem a mercado e retorna o orderId (ou None)."""
+    try:
+        result = _call(
+            "place_order", session.place_order,
+            category="linear",
+            symbol=to_bybit_symbol(symbol),
+            side="Buy" if side.lower() == "buy" else "Sell",
+            orderType="Market",
+            qty=str(qty),
+            timeInForce="IOC",
+            reduceOnly=reduce_only,
+            positionIdx=0
+        )
+        _publish_ack(symbol, side, qty, result, reduce_only)
+        return result.get("result", {}).get("orderId")
+    except Exception as e:
+        logger.error(f"Erro em place_market_order (Bybit): {e}")
+        return None
+
+
+def fetch_order_fill(symbol, order_id):
+    """Quantidade executada, preço médio e status de uma ordem (get_order_history)."""
+    try:
+        response = _call(
+            "get_order_history", session.get_order_history,
+            category="linear",
+            symbol=to_bybit_symbol(symbol),
+            orderId=order_id
+        )
+        orders = response.get("result", {}).get("list", [])
+        if not orders:
+            return None
+        order = orders[0]
+        return {
+            'filled': float(order.get('cumExecQty') or 0),
+            'avg_price': float(order.get('avgPrice') or 0),
+            'status': order.get('orderStatus', '')
+        }
+    except Exception as e:
+        logger.error(f"Erro em fetch_order_fill (Bybit): {e}")
+        return None
+
+
+def cancel_order(symbol, order_id):
+    """Cancela uma ordem pelo orderId; falso se a Bybit recusar (ex.: a ordem já terminou)."""
+    try:
+        _call("cancel_order", session.cancel_order, category="linear", symbol=to_bybit_symbol(symbol), orderId=order_id)
+        return True
+    except Exception as e:
+        logger.warning(f"Falha ao cancelar a ordem {order_id} de {symbol}: {e}")
+        return False
+
+
+def cancel_open_orders(symbol):
+    """Cancela todas as ordens abertas do contrato (ex.: antes de um fechamento fatiado)."""
+    bybit_symbol = to_bybit_symbol(symbol)
+    try:
+        _call("cancel_all_orders", session.cancel_all_orders, category="linear", symbol=bybit_symbol)
+        logger.info(f"Todas as ordens abertas para {bybit_symbol} foram canceladas.")
+        return True
+    except Exception as e:
+        logger.warning(f"Falha ao cancelar ordens para {bybit_symbol}: {e}")
+        return False
+
+
+def set_stop_loss(symbol, stop_price):
+    """
+    Grava (ou move) o stop loss da posição na própria Bybit via set_trading_stop:
+    ordem a mercado reduce-only disparada pelo mark price. `stop_price=None` remove o stop.
+    """
+    try:
+        _call(
+            "set_trading_stop", session.set_trading_stop,
+            category="linear",
+            symbol=to_bybit_symbol(symbol),
+            stopLoss="0" if stop_price is None else str(stop_price),
+            slTriggerBy="MarkPrice",
+            slOrderType="Market",
+            tpslMode="Full",
+            positionIdx=0
+        )
+        return True
+    except Exception as e:
+        # 34040 = "not modified": o stop já está nesse preço
+        if "34040" in str(e):
+            return True
+        logger.error(f"Erro em set_stop_loss (Bybit) {symbol}: {e}")
+        return False
+
+
+def add_position_margin(symbol, amount, call_id=None):
+    """
+    Adiciona margem isolada à posição (add_or_reduce_margin). A Bybit não
+    aceita id de cliente nesse endpoint; `call_id` só identifica a chamada no log.
+    """
+    try:
+        _call(
+            "add_or_reduce_margin", session.add_or_reduce_margin,
+            category="linear",
+            symbol=to_bybit_symbol(symbol),
+            margin=str(amount),
+            positionIdx=0
+        )
+        logger.info(f"Margem adicionada ({call_id}): +{amount} USDT em {symbol}")
+        return True
+    except Exception as e:
+        logger.error(f"Erro em add_position_margin (Bybit) {call_id}: {e}")
+        return False
@@ -0,0 +1,188 @@
+# candles.py
+
+import os
+import threading
+from collections import deque
+from dotenv import load_dotenv
+
+from events import bus, Candle
+from logger import get_logger
+
+load_dotenv()
+
+logger = get_logger('candles')
+
+# Barras guardadas por símbolo e timeframe
+CANDLE_STORE_SIZE = int(os.getenv("CANDLE_STORE_SIZE", 300))
+# Klines de 1m pedidas por atualização depois da carga inicial
+CANDLE_STORE_POLL = 3
+
+BASE_TIMEFRAME = '1m'
+# Duração de cada timeframe em ms; os maiores são montados a partir do 1m
+TIMEFRAMES = {
+    '1m': 60_000,
+    '5m': 300_000,
+    '15m': 900_000,
+    '1h': 3_600_000,
+    '4h': 14_400_000,
+}
+
+
+def _merge(bar, kline, open_time):
+    """Soma a kline [tempo, open, high, low, close, volume, ...] à barra `bar` (ou abre uma nova em `open_time`)."""
+    if bar is None:
+        return [open_time, float(kline[1]), float(kline[2]), float(kline[3]), float(kline[4]), float(kline[5])]
+    return [bar[0], bar[1], max(bar[2], float(kline[2])), min(bar[3], float(kline[3])),
+            float(kline[4]), bar[5] + float(kline[5])]
+
+
+class Resampler:
+    """
+    Barras de um timeframe montadas incrementalmente a partir de klines de 1m.
+
+    `add_closed()` recebe cada kline de 1m fechada uma única vez e a soma à
+    barra em andamento (`pending`); a barra vai para `closed` quando chega o
+    primeiro minuto do período seguinte. `bars()` junta a kline de 1m em
+    formação sem guardá-la, então consultar o preço não conta volume duas
+    vezes. As barras seguem o formato das klines da Binance.
+    """
+
+    def __init__(self, timeframe, size=CANDLE_STORE_SIZE):
+        self.timeframe = timeframe
+        self.period = TIMEFRAMES[timeframe]
+        self.closed = deque(maxlen=size)
+        self.pending = None
+
+    def _roll(self, open_time):
+        if self.pending is not None and self.pending[0] < open_time:
+            self.closed.append(self.pending)
+            self.pending = None
+
+    def seed(self, klines):
+        """Barras fechadas deste timeframe vindas da exchange (carga inicial)."""
+        for kline in klines:
+            self.closed.append([int(kline[0])] + [float(value) for value in kline[1:6]])
+
+    def add_closed(self, kline):
+        open_time = int(kline[0]) - int(kline[0]) % self.period
+        if self.closed and open_time <= self.closed[-1][0]:
+            # Período já coberto pelas barras da carga inicial
+            return
+        self._roll(open_time)
+        self.pending = _merge(self.pending, kline, open_time)
+
+    def bars(self, partial=None, count=None):
+        """Barras fechadas mais a em andamento (com a kline de 1m `partial`), da mais antiga para a mais nova."""
+        current = self.pending
+        if partial is not None:
+            open_time = int(partial[0]) - int(partial[0]) % self.period
+            self._roll(open_time)
+            current = _merge(self.pending, partial, open_time)
+        bars = list(self.closed)
+        if current is not None:
+            bars.append(current)
+        return bars[-count:] if count else bars
+
+
+class SymbolCandles:
+    def __init__(self, size):
+        self.size = size
+        self.base = Resampler(BASE_TIMEFRAME, size)
+        self.resamplers = {BASE_TIMEFRAME: self.base}
+        self.last_closed = None
+        self.partial = None
+
+    def add_timeframe(self, timeframe, klines):
+        """Novo timeframe: barras fechadas da exchange e o período em andamento refeito a partir do 1m guardado."""
+        resampler = Resampler(timeframe, self.size)
+        resampler.seed(klines)
+        for kline in list(self.base.closed) + ([self.base.pending] if self.base.pending else []):
+            resampler.add_closed(kline)
+        self.resamplers[timeframe] = resampler
+
+    def feed(self, klines):
+        """klines de 1m da mais antiga para a mais nova, a última em formação; retorna as que fecharam agora."""
+        closed = []
+        for kline in klines[:-1]:
+            if self.last_closed is None or kline[0] > self.last_closed:
+                for resampler in self.resamplers.values():
+                    resampler.add_closed(kline)
+                self.last_closed = kline[0]
+                closed.append(kline)
+        self.partial = klines[-1]
+        return closed
+
+
+class CandleStore:
+    """
+    Candles locais por símbolo: um único fluxo de klines de 1m alimenta
+    todos os timeframes (5m, 15m, 1h, 4h), cada um atualizado de forma
+    incremental. Depois da carga inicial, cada `refresh()` pede só as
+    últimas CANDLE_STORE_POLL klines de 1m, seja qual for o número de
+    timeframes em uso; um timeframe novo busca o próprio histórico uma vez.
+
+    Cada barra de 1m que fecha numa atualização vira um evento Candle no
+    barramento (a carga inicial não publica o histórico).
+
+    `fetch(symbol, interval, limit)` retorna as klines da exchange (ou None).
+    """
+
+    def __init__(self, fetch, size=CANDLE_STORE_SIZE):
+        self.fetch = fetch
+        self.size = size
+        self.symbols = {}
+        self._lock = threading.Lock()
+
+    def refresh(self, symbol):
+        """Atualiza o 1m de `symbol`; falso se a exchange não respondeu."""
+        with self._lock:
+            candles = self.symbols.get(symbol)
+        if candles is not None:
+            data = self.fetch(symbol, BASE_TIMEFRAME, CANDLE_STORE_POLL)
+            if not data:
+                return False
+            if candles.last_closed is None or data[0][0] > candles.last_closed + TIMEFRAMES[BASE_TIMEFRAME]:
+                # Buraco desde a última atualização: refaz o símbolo
+                logger.debug(f"Candles de {symbol} com buraco; recarregando.")
+                candles = None
+            else:
+                with self._lock:
+                    closed = candles.feed(data)
+                for kline in closed:
+                    bus.publish(Candle(symbol, BASE_TIMEFRAME, kline))
+                return True
+
+        # O 1m guardado precisa cobrir o período em andamento do maior timeframe
+        limit = max(self.size, max(TIMEFRAMES.values()) // TIMEFRAMES[BASE_TIMEFRAME] + 1)
+        data = self.fetch(symbol, BASE_TIMEFRAME, min(limit, 1000))
+        if not data:
+            return False
+        candles = SymbolCandles(self.size)
+        candles.feed(data)
+        with self._lock:
+            previous = self.symbols.get(symbol)
+            self.symbols[symbol] = candles
+        for timeframe in (previous.resamplers if previous else ()):
+            if timeframe != BASE_TIMEFRAME:
+                self._add_timeframe(symbol, candles, timeframe)
+        return True
+
+    def _add_timeframe(self, symbol, candles, timeframe):
+        data = self.fetch(symbol, timeframe, self.size + 1)
+        if data is None:
+            return False
+        with self._lock:
+            # A última barra da exchange ainda está em formação: sai do 1m local
+            candles.add_timeframe(timeframe, data[:-1])
+        return True
+
+    def bars(self, symbol, timeframe=BASE_TIMEFRAME, count=None):
+        """Barras de `timeframe`, a última em formação; [] se o símbolo ainda não foi carregado."""
+        with self._lock:
+            candles = self.symbols.get(symbol)
+        if candles is None:
+            return []
+        if timeframe not in candles.resamplers and not self._add_timeframe(symbol, candles, timeframe):
+            return []
+        with self._lock:
+            return candles.resamplers[timeframe].bars(candles.partial, count)
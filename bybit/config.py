@@ -0,0 +1,251 @@
+# config.py
+
+import os
+import json
+import time
+import tempfile
+import threading
+from dotenv import load_dotenv
+
+from metrics import registry, Counter
+from logger import get_logger
+from indicators import INDICATORS, STRATEGIES, LEGACY_INDICATORS, split_name
+from candles import TIMEFRAMES
+from trailing import TRAILING_STOP_MODES
+
+load_dotenv()
+
+logger = get_logger('config')
+
+CONFIG_FILE = os.getenv("CONFIG_FILE", "configurations.json")
+# Espera depois da última tecla antes de validar e aplicar os campos da janela
+CONFIG_DEBOUNCE_MS = int(os.getenv("CONFIG_DEBOUNCE_MS", 400))
+# Intervalo de verificação do arquivo para recarregar edições feitas fora do bot
+CONFIG_WATCH_SECONDS = float(os.getenv("CONFIG_WATCH_SECONDS", 1))
+
+CONFIG_RELOADS = registry.register(Counter(
+    'bot_config_reloads_total', 'Recargas de configurations.json editado fora do bot', ('result',)))
+
+
+class ConfigError(ValueError):
+    """Configuração recusada; `errors` = {campo: motivo}."""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(f"{name}: {reason}" for name, reason in errors.items()))
+        self.errors = errors
+
+
+class Field:
+    def __init__(self, name, kind, default, minimum=None, maximum=None, choices=None, check=None):
+        self.name = name
+        self.kind = kind
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.choices = choices
+        self.check = check
+
+    def parse(self, value):
+        """Converte e valida um valor do arquivo ou da janela; ValueError com o motivo."""
+        if self.kind is bool:
+            if not isinstance(value, bool):
+                raise ValueError(f"esperado true/false, recebido {value!r}")
+            return value
+        if self.kind is str:
+            value = str(value).strip()
+        elif isinstance(value, bool):
+            raise ValueError(f"esperado número, recebido {value!r}")
+        elif self.kind is int and isinstance(value, float):
+            if not value.is_integer():
+                raise ValueError(f"esperado inteiro, recebido {value!r}")
+            value = int(value)
+        else:
+            value = self.kind(value)
+        if self.choices is not None and value not in self.choices:
+            raise ValueError(f"deve ser um de {', '.join(self.choices)}")
+        if self.minimum is not None and value < self.minimum:
+            raise ValueError(f"mínimo {self.minimum}")
+        if self.maximum is not None and value > self.maximum:
+            raise ValueError(f"máximo {self.maximum}")
+        if self.check is not None:
+            self.check(value)
+        return value
+
+
+def _positive_or_empty(value):
+    if value and float(value) <= 0:
+        raise ValueError("deve ser positivo ou vazio")
+
+
+def _indicator_list(value):
+    unknown = []
+    for name in _split(value):
+        indicator, timeframe = split_name(name)
+        if timeframe is None:
+            if indicator not in INDICATORS or indicator in LEGACY_INDICATORS:
+                unknown.append(name)
+        elif indicator not in INDICATORS or timeframe not in TIMEFRAMES:
+            unknown.append(name)
+    if unknown:
+        raise ValueError(f"indicadores desconhecidos: {', '.join(unknown)}")
+
+
+def _split(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+SCHEMA = (
+    Field('selected_symbol', str, 'XBTUSDTM'),
+    Field('default_leverage', int, 20, 1, 125),
+    Field('default_stop_loss', float, -3.5, -100, 0),
+    Field('stop_loss_price', str, '', check=_positive_or_empty),
+    Field('auto_calc_trailing_stop', bool, True),
+    Field('trailing_stop_1_15', float, 1.5, 0, 100),
+    Field('trailing_stop_16_30', float, 5.0, 0, 100),
+    Field('trailing_stop_31_50', float, 8.0, 0, 100),
+    Field('trailing_stop_above_50', float, 10.0, 0, 100),
+    Field('trailing_stop_mode', str, 'ladder', choices=TRAILING_STOP_MODES),
+    # Distância do trailing em ATRs de 1m no modo 'atr'
+    Field('atr_stop_multiplier', float, 3.0, 0.1, 50),
+    Field('alert_price_above', float, 0.0, 0),
+    Field('alert_price_below', float, 0.0, 0),
+    Field('default_contract_qty', int, 1, 1),
+    Field('rsi_period', int, 14, 2, 500),
+    Field('use_sma', bool, True),
+    Field('use_rsi', bool, True),
+    Field('use_volume', bool, False),
+    Field('use_high_low', bool, True),
+    # Plugins de indicators.py além dos quatro originais, separados por vírgula (ex.: "ema,macd");
+    # 'nome@timeframe' roda o indicador em outro timeframe (ex.: "ema@1h")
+    Field('extra_indicators', str, '', check=_indicator_list),
+    Field('strategy', str, 'unanimous', choices=tuple(STRATEGIES)),
+    Field('granularity', str, '5', choices=('1', '5')),
+    Field('auto_open_new_position', bool, False),
+    Field('auto_close_positions', bool, True),
+    Field('margin_calls', int, 0, 0, 100),
+    Field('trade_direction_option', str, 'both', choices=('both', 'buy', 'sell')),
+    Field('ignore_coins_sl', str, ''),
+    Field('ignore_coins_tp', str, ''),
+)
+FIELDS = {field.name: field for field in SCHEMA}
+
+
+class Settings:
+    """
+    Configuração validada, tratada como imutável: uma mudança gera outro
+    Settings, e quem lê guarda a referência uma vez por avaliação. Assim
+    trailing stops e indicadores trocam juntos, nunca pela metade.
+    """
+
+    def __init__(self, values=None):
+        values = values or {}
+        for field in SCHEMA:
+            setattr(self, field.name, values.get(field.name, field.default))
+        self.ignore_coins_sl_list = _split(self.ignore_coins_sl)
+        self.ignore_coins_tp_list = _split(self.ignore_coins_tp)
+        self.extra_indicators_list = tuple(_split(self.extra_indicators))
+
+    @classmethod
+    def from_dict(cls, raw, base=None):
+        """
+        Valida `raw` campo a campo; os ausentes vêm de `base` (ou dos padrões).
+        Levanta ConfigError com todos os campos inválidos; nada é aplicado pela metade.
+        """
+        values = base.as_dict() if base is not None else {}
+        errors = {}
+        for name, value in raw.items():
+            field = FIELDS.get(name)
+            if field is None:
+                logger.warning(f"Configuração desconhecida ignorada: {name}")
+                continue
+            try:
+                values[name] = field.parse(value)
+            except (TypeError, ValueError) as e:
+                errors[name] = str(e)
+        if errors:
+            raise ConfigError(errors)
+        return cls(values)
+
+    def as_dict(self):
+        return {field.name: getattr(self, field.name) for field in SCHEMA}
+
+    def changed(self, other):
+        """Campos com valor diferente em `other`."""
+        return [field.name for field in SCHEMA if getattr(self, field.name) != getattr(other, field.name)]
+
+
+class ConfigStore:
+    """
+    configurations.json: leitura validada, gravação atômica (arquivo
+    temporário + os.replace, o arquivo nunca fica pela metade) e recarga
+    quando outro processo ou editor altera o arquivo. A verificação compara
+    mtime e tamanho a cada CONFIG_WATCH_SECONDS numa thread; as gravações do
+    próprio bot não disparam recarga.
+
+    `on_reload(settings)` é chamado da thread de verificação.
+    """
+
+    def __init__(self, path=CONFIG_FILE, on_reload=None):
+        self.path = path
+        self.on_reload = on_reload
+        self._signature = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    def load(self, base=None):
+        """Settings do arquivo (padrões se ele não existe); ConfigError se algum campo é inválido."""
+        with self._lock:
+            self._signature = self._stat()
+            try:
+                with open(self.path, 'r') as f:
+                    raw = json.load(f)
+            except FileNotFoundError:
+                return Settings() if base is None else base
+        return Settings.from_dict(raw, base)
+
+    def save(self, settings):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with self._lock:
+            fd, tmp_path = tempfile.mkstemp(prefix='.configurations.', suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(settings.as_dict(), f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._signature = self._stat()
+
+    def start(self):
+        if self._thread is None:
+            if self._signature is None:
+                self._signature = self._stat()
+            self._thread = threading.Thread(target=self._watch, name="ConfigWatcher", daemon=True)
+            self._thread.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(CONFIG_WATCH_SECONDS)
+            with self._lock:
+                signature = self._stat()
+                if signature is None or signature == self._signature:
+                    continue
+            try:
+                settings = self.load()
+            except Exception as e:
+                # Edição inválida: mantém a configuração em uso até o arquivo ser corrigido
+                logger.error(f"{self.path} alterado com valores inválidos, mantendo a configuração atual: {e}")
+                CONFIG_RELOADS.inc(result='invalid')
+                continue
+            CONFIG_RELOADS.inc(result='ok')
+            if self.on_reload is not None:
+                self.on_reload(settings)
@@ -0,0 +1,161 @@
+# costs.py
+
+import os
+import time
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+from metrics import registry, Gauge
+from logger import get_logger
+
+load_dotenv()
+
+logger = get_logger('costs')
+
+# Intervalos de atualização das taxas da conta e das taxas de funding
+COST_FEE_REFRESH_SECONDS = float(os.getenv("COST_FEE_REFRESH_SECONDS", 3600))
+COST_FUNDING_REFRESH_SECONDS = float(os.getenv("COST_FUNDING_REFRESH_SECONDS", 60))
+# Funding previsto que vence dentro deste prazo já entra no PnL líquido
+FUNDING_HORIZON_SECONDS = float(os.getenv("FUNDING_HORIZON_SECONDS", 300))
+# Taxa taker usada enquanto a faixa da conta não foi lida (a aproximação antiga de 0,06% por lado)
+DEFAULT_TAKER_FEE = 0.0006
+
+FUNDING_RATE = registry.register(Gauge(
+    'bot_funding_rate', 'Taxa de funding prevista dos contratos com posição aberta', ('symbol',)))
+
+
+class CostModel:
+    """
+    Custos reais de cada posição: taxa taker da faixa da conta, funding já
+    pago e o funding previsto para o próximo acerto. As taxas ficam em cache
+    e uma thread as atualiza de tempos em tempos; `net_pnl()` é só aritmética
+    sobre o cache, barata o bastante para cada avaliação.
+
+    `fetch_fee_rates()` -> {symbol: (maker, taker)};
+    `fetch_funding_rates()` -> {symbol: (taxa prevista, próximo acerto em ms)}.
+    """
+
+    def __init__(self, fetch_fee_rates, fetch_funding_rates, clock=time.time):
+        self.fetch_fee_rates = fetch_fee_rates
+        self.fetch_funding_rates = fetch_funding_rates
+        self.clock = clock
+        self.fee_rates = {}
+        self.funding_rates = {}
+        self.fees_updated = 0.0
+        self.funding_updated = 0.0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="CostModel", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+
+    def _run(self):
+        while self._running:
+            now = self.clock()
+            if now - self.fees_updated >= COST_FEE_REFRESH_SECONDS:
+                self.refresh_fees()
+            if now - self.funding_updated >= COST_FUNDING_REFRESH_SECONDS:
+                self.refresh_funding()
+            time.sleep(1)
+
+    def refresh_fees(self):
+        rates = self.fetch_fee_rates()
+        # Falha: mantém o cache e tenta de novo no próximo intervalo
+        self.fees_updated = self.clock()
+        if rates:
+            self.fee_rates = rates
+            logger.debug(f"Taxas da conta atualizadas: {len(rates)} contratos")
+
+    def refresh_funding(self):
+        rates = self.fetch_funding_rates()
+        self.funding_updated = self.clock()
+        if rates:
+            self.funding_rates = rates
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def taker_fee(self, symbol):
+        rates = self.fee_rates.get(symbol)
+        return rates[1] if rates else DEFAULT_TAKER_FEE
+
+    def funding_due(self, symbol, current_qty, mark_price):
+        """
+        Funding a pagar (positivo) ou receber no próximo acerto, se ele vence
+        dentro de FUNDING_HORIZON_SECONDS. Taxa positiva: long paga, short recebe.
+        """
+        funding = self.funding_rates.get(symbol)
+        if not funding:
+            return 0.0
+        rate, next_time_ms = funding
+        if next_time_ms / 1000 - self.clock() > FUNDING_HORIZON_SECONDS:
+            return 0.0
+        return rate * current_qty * mark_price
+
+    def net_pnl(self, position, mark_price=None):
+        """
+        (PnL líquido em USDT, PnL% líquido sobre a margem, custos em % da margem)
+        de uma posição de fetch_open_positions (api.py). Custos = taxas e funding
+        já realizados na posição + taxa taker de saída + funding prestes a vencer.
+        Sem `mark_price`, usa o PnL não realizado informado pela Bybit.
+        """
+        symbol = position['symbol']
+        current_qty = float(position.get('currentQty', 0) or 0)
+        entry = float(position.get('avgEntryPrice', 0) or 0)
+        margin = float(position.get('posMargin', 0) or 0)
+        if mark_price is None:
+            mark_price = float(position.get('markPrice', 0) or 0) or entry
+            unrealised = float(position.get('unrealisedPnl', 0) or 0)
+        else:
+            unrealised = current_qty * (mark_price - entry)
+
+        taker = self.taker_fee(symbol)
+        realised = position.get('curRealisedPnl')
+        if realised is None:
+            # Sem o realizado da posição: estima a taxa de entrada
+            paid = taker * abs(current_qty) * entry
+        else:
+            paid = -float(realised)
+        costs = paid + taker * abs(current_qty) * mark_price + self.funding_due(symbol, current_qty, mark_price)
+
+        net = unrealised - costs
+        if margin == 0:
+            return net, 0.0, 0.0
+        return net, net / margin * 100, costs / margin * 100
+
+    def net_pnl_table(self, table, mark=None):
+        """
+        net_pnl de todas as posições de uma PositionTable (positions.py) de
+        uma vez: arrays (PnL líquido em USDT, PnL% líquido, custos %). Só a
+        taxa e o funding de cada símbolo são lidos por linha, do cache.
+        """
+        qty = table.qty
+        if mark is None:
+            mark = table.mark_or_entry()
+            unrealised = table.unrealised
+        else:
+            unrealised = table.unrealised_at(mark)
+        taker = np.array([self.taker_fee(symbol) for symbol in table.symbols], dtype=float)
+        funding = np.array([
+            self.funding_due(symbol, q, m) for symbol, q, m in zip(table.symbols, qty.tolist(), mark.tolist())
+        ], dtype=float)
+        # Sem o realizado da posição: estima a taxa de entrada
+        paid = np.where(np.isnan(table.cur_realised), taker * np.abs(qty) * table.entry, -table.cur_realised)
+        costs = paid + taker * np.abs(qty) * mark + funding
+        net = unrealised - costs
+        return net, table.percent_of_margin(net), table.percent_of_margin(costs)
+
+    def publish(self, symbols):
+        """Exporta a taxa de funding prevista dos contratos com posição aberta."""
+        FUNDING_RATE.replace({
+            (symbol,): self.funding_rates[symbol][0] for symbol in symbols if symbol in self.funding_rates
+        })
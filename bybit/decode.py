@@ -0,0 +1,70 @@
+# decode.py
+
+import os
+import json
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Decodificador das mensagens dos streams e das respostas REST: orjson quando instalado,
+# senão o json da biblioteca padrão; JSON_BACKEND=json força a padrão
+JSON_BACKEND = os.getenv("JSON_BACKEND", "orjson" if orjson is not None else "json").lower()
+if JSON_BACKEND == 'orjson' and orjson is None:
+    JSON_BACKEND = 'json'
+
+# Colunas de uma kline mantidas nos arrays: tempo de abertura, open, high, low, close, volume
+KLINE_COLUMNS = 6
+# Aspas, colchetes e espaços somem: o corpo de uma lista de klines vira só números separados por vírgula
+_KLINE_STRIP = b'"[] \t\r\n'
+
+
+def loads(data):
+    """JSON (str ou bytes) para objetos Python pelo backend configurado."""
+    if JSON_BACKEND == 'orjson':
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def response_json(response):
+    """Corpo de uma resposta do requests, decodificado sem a detecção de charset de response.json()."""
+    return loads(response.content)
+
+
+def _raw_klines(body, columns):
+    if isinstance(body, str):
+        body = body.encode()
+    end = body.find(b']')
+    if end < 0:
+        raise ValueError("corpo sem lista de klines")
+    fields = body.translate(None, _KLINE_STRIP).split(b',')
+    if fields == [b'']:
+        return np.empty((0, columns))
+    # Todas as linhas têm o tamanho da primeira (a Binance manda 12 campos por kline)
+    width = body[:end].count(b',') + 1
+    if len(fields) % width:
+        raise ValueError("klines com tamanhos diferentes")
+    return np.array(fields, dtype=float).reshape(-1, width)[:, :columns]
+
+
+def klines_array(payload, columns=KLINE_COLUMNS):
+    """
+    Klines [tempo, open, high, low, close, volume, ...] como array float64
+    (n, columns). Com o corpo cru da resposta (bytes/str), o NumPy converte
+    os campos direto do texto, sem montar as listas e strings do JSON; com a
+    lista já decodificada, a conversão também é uma única chamada.
+    """
+    if isinstance(payload, (bytes, bytearray, str)):
+        try:
+            return _raw_klines(bytes(payload) if isinstance(payload, bytearray) else payload, columns)
+        except ValueError:
+            # Formato inesperado (erro da API, campo não numérico): decodifica normalmente
+            payload = loads(payload)
+    if not payload:
+        return np.empty((0, columns))
+    return np.array([row[:columns] for row in payload], dtype=float)
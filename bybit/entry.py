@@ -0,0 +1,261 @@
+# entry.py
+
+import os
+import time
+from dotenv import load_dotenv
+
+from metrics import registry, Counter
+from logger import get_logger
+
+load_dotenv()
+
+logger = get_logger('entry')
+
+# Regras de confirmação do sinal antes da ordem, separadas por vírgula:
+#   price_move: no fim da janela o preço andou a favor do sinal (o comportamento original)
+#   breakout: confirma no primeiro tick que andar ENTRY_CONFIRM_MIN_MOVE_BPS a favor, sem esperar a janela
+#   signal_hold: o sinal dos indicadores não pode mudar durante a janela
+#   none: abre assim que o sinal aparece
+ENTRY_CONFIRM_RULES = os.getenv("ENTRY_CONFIRM_RULES", "price_move")
+ENTRY_CONFIRM_SECONDS = float(os.getenv("ENTRY_CONFIRM_SECONDS", 30))
+ENTRY_CONFIRM_MIN_MOVE_BPS = float(os.getenv("ENTRY_CONFIRM_MIN_MOVE_BPS", 0))
+# Depois da ordem, prazo para a posição aparecer na consulta de posições
+ENTRY_OPEN_TIMEOUT = float(os.getenv("ENTRY_OPEN_TIMEOUT", 60))
+
+IDLE = 'idle'              # nada em andamento
+SIGNAL = 'signal'          # aguardando um sinal buy/sell dos indicadores
+CONFIRMING = 'confirming'  # sinal recebido, aplicando as regras de confirmação
+ORDERING = 'ordering'      # ordem sendo enviada
+OPEN = 'open'              # ordem enviada; volta a IDLE quando a posição fecha
+
+CONFIRM, REJECT, WAIT = 'confirm', 'reject', 'wait'
+
+ENTRIES = registry.register(Counter(
+    'bot_entries_total', 'Entradas automáticas por resultado da confirmação', ('result',)))
+
+
+class PriceMoveRule:
+    """
+    Movimento do preço a favor do sinal desde a referência, em bps. Sem
+    `early`, decide só no fim da janela; com `early`, confirma no tick que
+    alcançar `min_move_bps` e recusa no fim da janela.
+    """
+
+    def __init__(self, seconds, min_move_bps=0.0, early=False):
+        self.seconds = seconds
+        self.min_move_bps = min_move_bps
+        self.early = early
+
+    def check(self, side, reference, price, signal, elapsed):
+        if price is None or not reference:
+            return REJECT if elapsed >= self.seconds else WAIT
+        move = (price - reference) / reference * 10000
+        if side == 'sell':
+            move = -move
+        reached = move > self.min_move_bps if self.min_move_bps == 0 else move >= self.min_move_bps
+        if self.early and reached:
+            return CONFIRM
+        if elapsed < self.seconds:
+            return WAIT
+        return CONFIRM if reached else REJECT
+
+
+class SignalHoldRule:
+    """O sinal precisa continuar o mesmo durante a janela; uma virada recusa na hora."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def check(self, side, reference, price, signal, elapsed):
+        if signal is not None and signal != side:
+            return REJECT
+        return CONFIRM if elapsed >= self.seconds else WAIT
+
+
+def rules_from_env(names=ENTRY_CONFIRM_RULES, seconds=ENTRY_CONFIRM_SECONDS, min_move_bps=ENTRY_CONFIRM_MIN_MOVE_BPS):
+    rules = []
+    for name in (n.strip() for n in names.split(',') if n.strip()):
+        if name == 'price_move':
+            rules.append(PriceMoveRule(seconds, min_move_bps))
+        elif name == 'breakout':
+            rules.append(PriceMoveRule(seconds, min_move_bps, early=True))
+        elif name == 'signal_hold':
+            rules.append(SignalHoldRule(seconds))
+        elif name != 'none':
+            raise ValueError(f"Regra de confirmação desconhecida: {name}")
+    return rules
+
+
+class EntryStateMachine:
+    """
+    Entrada automática como máquina de estados explícita:
+
+        IDLE -> SIGNAL -> CONFIRMING -> ORDERING -> OPEN -> IDLE
+
+    Reage aos eventos na hora: `on_signal()` quando os indicadores mudam,
+    `on_tick()` a cada preço do websocket, `on_positions()` a cada consulta
+    de posições. Nada depende de um timer periódico: `deadline()` diz quando
+    a máquina precisa de `poll()` sem evento nenhum (fim da janela de
+    confirmação sem ticks, prazo da posição aparecer) e `on_change()` avisa
+    a cada troca de estado para o dono reagendar.
+
+    Só a posição do próprio símbolo move a máquina para OPEN ou de volta a
+    IDLE: posições de outros contratos chegando durante a confirmação não
+    interrompem a entrada. Sem Qt; todas as chamadas vêm da mesma thread.
+
+    `open_position(symbol, side, size, leverage, price)` -> bool envia a ordem;
+    `decision_for(symbol)` e `price_for(symbol)` dão o sinal e o preço atuais;
+    `normalize(symbol)` compara o símbolo da entrada com o das posições
+    quando as exchanges escrevem o mesmo contrato de formas diferentes.
+    """
+
+    def __init__(self, open_position, decision_for, price_for, rules=None, clock=time.monotonic, normalize=None,
+                 on_change=None):
+        self.open_position = open_position
+        self.decision_for = decision_for
+        self.price_for = price_for
+        self.normalize = normalize or (lambda symbol: symbol)
+        self.rules = rules_from_env() if rules is None else rules
+        self.clock = clock
+        self.on_change = lambda: None
+        self._reset()
+        self.on_change = on_change or self.on_change
+
+    def _reset(self):
+        self.state = IDLE
+        self.symbol = None
+        self.side = None
+        self.size = None
+        self.leverage = None
+        self.direction = 'both'
+        self.reference_price = None
+        self.signal = None
+        self.since = self.clock()
+        self.seen_position = False
+        self.on_change()
+
+    def _enter(self, state):
+        logger.debug(f"Entrada {self.symbol}: {self.state} -> {state}")
+        self.state = state
+        self.since = self.clock()
+        self.on_change()
+
+    def deadline(self):
+        """Instante (no relógio `clock`) em que `poll()` precisa rodar mesmo sem eventos; None se nenhum."""
+        if self.state == CONFIRMING and self.rules:
+            return self.since + max(getattr(rule, 'seconds', 0) for rule in self.rules)
+        if self.state == OPEN and not self.seen_position:
+            return self.since + ENTRY_OPEN_TIMEOUT
+        return None
+
+    def _finish(self, result, message):
+        logger.info(message, extra={'symbol': self.symbol} if self.symbol else None)
+        ENTRIES.inc(result=result)
+        self._reset()
+
+    # ------------------------------------------------------------------
+    # Comandos
+    # ------------------------------------------------------------------
+
+    def arm(self, symbol, size, leverage, direction='both'):
+        """IDLE -> SIGNAL: passa a esperar um sinal para `symbol`. Falso se já há uma entrada em andamento."""
+        if self.state != IDLE:
+            return False
+        self.symbol = symbol
+        self.size = size
+        self.leverage = leverage
+        self.direction = direction
+        self._enter(SIGNAL)
+        logger.info(f"Iniciando monitoramento de sinais para nova posição em {symbol}...")
+        self.on_signal(symbol, self.decision_for(symbol))
+        return True
+
+    def cancel(self, reason):
+        if self.state in (SIGNAL, CONFIRMING):
+            self._finish('cancelled', f"Entrada em {self.symbol} cancelada: {reason}.")
+        elif self.state == OPEN:
+            self._reset()
+
+    # ------------------------------------------------------------------
+    # Eventos
+    # ------------------------------------------------------------------
+
+    def on_signal(self, symbol, decision):
+        if symbol != self.symbol:
+            return
+        if self.state == SIGNAL:
+            if decision not in ('buy', 'sell'):
+                return
+            if self.direction != 'both' and decision != self.direction:
+                self._finish('rejected', f"Sinal {decision.upper()} não corresponde à direção selecionada ({self.direction.upper()}).")
+                return
+            self.side = decision
+            self.signal = decision
+            self.reference_price = self.price_for(symbol)
+            self._enter(CONFIRMING)
+            logger.info(f"Sinal identificado: {decision.upper()} em {symbol}. Preço de referência {self.reference_price}.")
+            self._evaluate(self.reference_price)
+        elif self.state == CONFIRMING:
+            self.signal = decision
+            self._evaluate(self.price_for(symbol))
+
+    def on_tick(self, symbol, price):
+        if self.state == CONFIRMING and symbol == self.symbol:
+            self._evaluate(price)
+
+    def poll(self):
+        if self.state == SIGNAL:
+            self.on_signal(self.symbol, self.decision_for(self.symbol))
+        elif self.state == CONFIRMING:
+            self.signal = self.decision_for(self.symbol)
+            self._evaluate(self.price_for(self.symbol))
+        elif self.state == OPEN and not self.seen_position and self.clock() - self.since >= ENTRY_OPEN_TIMEOUT:
+            logger.warning(f"Posição em {self.symbol} não apareceu em {ENTRY_OPEN_TIMEOUT:.0f} s após a ordem.")
+            self._reset()
+
+    def on_positions(self, positions):
+        """Posições da consulta REST: só as do símbolo da entrada contam."""
+        if self.state == IDLE or self.symbol is None:
+            return
+        symbol = self.normalize(self.symbol)
+        held = any(
+            position.get('currentQty') and self.normalize(position.get('symbol', '')) == symbol
+            for position in positions
+        )
+        if held and self.state in (SIGNAL, CONFIRMING):
+            # Aberta por fora (ordem manual, outra instância): não entra de novo
+            self._finish('cancelled', f"Já existe posição em {self.symbol}; entrada automática cancelada.")
+        elif self.state == OPEN:
+            if held:
+                self.seen_position = True
+            elif self.seen_position:
+                logger.debug(f"Posição em {self.symbol} fechada; entrada automática livre.")
+                self._reset()
+
+    # ------------------------------------------------------------------
+
+    def _evaluate(self, price):
+        elapsed = self.clock() - self.since
+        results = [rule.check(self.side, self.reference_price, price, self.signal, elapsed) for rule in self.rules]
+        if REJECT in results:
+            self._finish(
+                'rejected',
+                f"Sinal {self.side.upper()} em {self.symbol} não confirmado (referência {self.reference_price}, "
+                f"preço {price}, {elapsed:.0f} s). Não abrindo posição."
+            )
+            return
+        if WAIT in results:
+            return
+
+        self._enter(ORDERING)
+        logger.info(f"Sinal {self.side.upper()} em {self.symbol} confirmado a {price}. Abrindo posição.")
+        try:
+            opened = self.open_position(self.symbol, self.side, self.size, self.leverage, price)
+        except Exception as e:
+            logger.error(f"Erro ao abrir posição em {self.symbol}: {e}")
+            opened = False
+        if opened:
+            ENTRIES.inc(result='opened')
+            self._enter(OPEN)
+        else:
+            self._finish('failed', f"Entrada em {self.symbol} não enviada.")
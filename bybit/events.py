@@ -0,0 +1,308 @@
+# events.py
+
+import os
+import time
+import threading
+from collections import deque
+from dotenv import load_dotenv
+
+from metrics import registry, Counter, Gauge
+from logger import get_logger
+
+load_dotenv()
+
+logger = get_logger('events')
+
+# Tamanho padrão da fila de cada assinante
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", 1000))
+# Espera máxima de quem publica numa fila cheia com a política 'block'
+EVENT_BLOCK_TIMEOUT = float(os.getenv("EVENT_BLOCK_TIMEOUT", 1))
+
+# Políticas de fila cheia
+DROP_OLDEST = 'drop_oldest'  # descarta o evento mais antigo (o assinante quer o estado mais novo)
+DROP_NEWEST = 'drop_newest'  # descarta o evento que chegou
+BLOCK = 'block'              # quem publica espera (backpressure), até EVENT_BLOCK_TIMEOUT
+POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+EVENTS_PUBLISHED = registry.register(Counter(
+    'bot_events_published_total', 'Eventos publicados no barramento', ('event',)))
+EVENTS_DROPPED = registry.register(Counter(
+    'bot_events_dropped_total', 'Eventos descartados por fila cheia', ('subscriber', 'event')))
+EVENT_QUEUE_DEPTH = registry.register(Gauge(
+    'bot_event_queue_depth', 'Eventos esperando na fila de cada assinante', ('subscriber',)))
+
+
+# ----------------------------------------------------------------------
+# Eventos
+# ----------------------------------------------------------------------
+
+class Event:
+    __slots__ = ('ts',)
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class Tick(Event):
+    """Preço de um símbolo numa exchange (websocket ou fallback REST)."""
+    __slots__ = ('exchange', 'symbol', 'price', 'source')
+
+    def __init__(self, exchange, symbol, price, source='ws', ts=None):
+        self.exchange = exchange
+        self.symbol = symbol
+        self.price = price
+        self.source = source
+        self.ts = time.time() if ts is None else ts
+
+
+class Candle(Event):
+    """Barra fechada [tempo, open, high, low, close, volume] de um timeframe."""
+    __slots__ = ('symbol', 'timeframe', 'bar')
+
+    def __init__(self, symbol, timeframe, bar, ts=None):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.bar = bar
+        self.ts = time.time() if ts is None else ts
+
+
+class Signal(Event):
+    """Decisão dos indicadores ('buy', 'sell' ou 'wait') que mudou para um símbolo."""
+    __slots__ = ('symbol', 'decision', 'source', 'details')
+
+    def __init__(self, symbol, decision, source='panel', details=None, ts=None):
+        self.symbol = symbol
+        self.decision = decision
+        self.source = source
+        self.details = details
+        self.ts = time.time() if ts is None else ts
+
+
+class PositionUpdate(Event):
+    """Posições abertas de cada leitura REST; `changed` diz se algo mudou em relação à anterior."""
+    __slots__ = ('positions', 'changed')
+
+    def __init__(self, positions, changed=True, ts=None):
+        self.positions = positions
+        self.changed = changed
+        self.ts = time.time() if ts is None else ts
+
+
+class OrderAck(Event):
+    """Resposta da exchange a uma ordem: aceita (com order_id) ou recusada."""
+    __slots__ = ('symbol', 'side', 'quantity', 'order_id', 'accepted', 'reduce_only')
+
+    def __init__(self, symbol, side, quantity, order_id, accepted, reduce_only=False, ts=None):
+        self.symbol = symbol
+        self.side = side
+        self.quantity = quantity
+        self.order_id = order_id
+        self.accepted = accepted
+        self.reduce_only = reduce_only
+        self.ts = time.time() if ts is None else ts
+
+
+class Fill(Event):
+    """Execução (parcial ou total) de uma ordem."""
+    __slots__ = ('symbol', 'side', 'quantity', 'price', 'reduce_only', 'parent_id')
+
+    def __init__(self, symbol, side, quantity, price, reduce_only=False, parent_id=None, ts=None):
+        self.symbol = symbol
+        self.side = side
+        self.quantity = quantity
+        self.price = price
+        self.reduce_only = reduce_only
+        self.parent_id = parent_id
+        self.ts = time.time() if ts is None else ts
+
+
+# ----------------------------------------------------------------------
+# Barramento
+# ----------------------------------------------------------------------
+
+class Subscription:
+    """
+    Fila limitada de um assinante. Onde o `handler` roda depende do modo:
+
+    - thread: uma thread própria esvazia a fila;
+    - loop: o event loop asyncio `loop` esvazia a fila (call_soon_threadsafe);
+    - wake: `wake()` é chamado quando a fila deixa de estar vazia e o dono
+      chama `drain()` na própria thread (ex.: um sinal do Qt para a GUI).
+
+    `drain()` entrega os eventos em ordem; com `batch`, o handler recebe a
+    lista inteira de uma vez. `size=None` não limita a fila (para eventos
+    raros que não podem ser perdidos). `accept(event)` filtra na thread de
+    quem publica; com `key(event)`, um evento substitui o da mesma chave que
+    ainda está na fila (ex.: só o último tick de cada símbolo).
+    """
+
+    def __init__(self, bus, name, types, handler, size, policy, mode, loop=None, wake=None, batch=False,
+                 accept=None, key=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Política desconhecida: {policy}")
+        self.bus = bus
+        self.name = name
+        self.types = types
+        self.handler = handler
+        self.policy = policy
+        self.mode = mode
+        self.loop = loop
+        self.wake = wake
+        self.batch = batch
+        self.accept = accept
+        self.key = key
+        # Com `key`, a fila é um dict ordenado chave -> evento mais novo
+        self.queue = {} if key is not None else deque(maxlen=size if policy == DROP_OLDEST else None)
+        self.size = size
+        self.dropped = 0
+        self._scheduled = False
+        self._closed = False
+        self._consumer = None
+        self._cond = threading.Condition()
+        if mode == 'thread':
+            threading.Thread(target=self._run, name=f"events-{name}", daemon=True).start()
+
+    def offer(self, event):
+        if self.accept is not None and not self.accept(event):
+            return
+        with self._cond:
+            if self._closed:
+                return
+            key = self.key(event) if self.key is not None else None
+            replacing = key is not None and key in self.queue
+            if self.size is not None and not replacing and len(self.queue) >= self.size:
+                if self.policy == DROP_NEWEST:
+                    return self._drop(event)
+                if self.policy == BLOCK:
+                    if threading.get_ident() == self._consumer:
+                        # O próprio consumidor publicando: esperar travaria a fila
+                        return self._drop(event)
+                    deadline = time.monotonic() + EVENT_BLOCK_TIMEOUT
+                    while len(self.queue) >= self.size and not self._closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return self._drop(event)
+                        self._cond.wait(remaining)
+                elif self.key is not None:
+                    self._drop(self.queue.pop(next(iter(self.queue))))
+                else:
+                    # DROP_OLDEST: o deque com maxlen descarta o mais antigo no append
+                    self._drop(self.queue[0])
+            if self.key is not None:
+                self.queue[key] = event
+            else:
+                self.queue.append(event)
+            EVENT_QUEUE_DEPTH.set(len(self.queue), subscriber=self.name)
+            notify = not self._scheduled
+            self._scheduled = True
+            self._cond.notify_all()
+        if notify:
+            if self.mode == 'loop':
+                self.loop.call_soon_threadsafe(self.drain)
+            elif self.mode == 'wake':
+                self.wake()
+
+    def _drop(self, event):
+        self.dropped += 1
+        EVENTS_DROPPED.inc(subscriber=self.name, event=type(event).__name__)
+
+    def drain(self):
+        """Entrega tudo o que está na fila; chamado na thread/loop do assinante."""
+        self._consumer = threading.get_ident()
+        with self._cond:
+            events = list(self.queue.values()) if self.key is not None else list(self.queue)
+            self.queue.clear()
+            self._scheduled = False
+            EVENT_QUEUE_DEPTH.set(0, subscriber=self.name)
+            self._cond.notify_all()
+        if not events:
+            return
+        try:
+            if self.batch:
+                self.handler(events)
+            else:
+                for event in events:
+                    self.handler(event)
+        except Exception as e:
+            logger.error(f"Erro no assinante {self.name}: {e}")
+
+    def _run(self):
+        self._consumer = threading.get_ident()
+        while True:
+            with self._cond:
+                while not self.queue and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            self.drain()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self.queue.clear()
+            self._cond.notify_all()
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """
+    Publish/subscribe em processo entre dados de mercado, estratégia, risco,
+    execução e a janela. `publish()` só coloca o evento nas filas dos
+    assinantes do tipo (ou de uma classe base dele) e volta; cada assinante
+    consome na própria thread ou no event loop, então quem publica nunca
+    roda código de outro componente. Sem assinantes, publicar custa uma
+    consulta a dicionário.
+    """
+
+    def __init__(self):
+        self._routes = {}
+        self._subscriptions = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, types, handler, name=None, size=EVENT_QUEUE_SIZE, policy=DROP_OLDEST,
+                  mode='thread', loop=None, wake=None, batch=False, accept=None, key=None):
+        """
+        Assina `types` (uma classe de evento ou uma tupla delas). `mode`:
+        'thread', 'loop' (com `loop`) ou 'wake' (com `wake`, ver Subscription);
+        `accept` e `key` filtram e agrupam a fila (ver Subscription).
+        """
+        if not isinstance(types, tuple):
+            types = (types,)
+        if mode == 'loop' and loop is None:
+            raise ValueError("mode='loop' precisa do event loop")
+        if mode == 'wake' and wake is None:
+            raise ValueError("mode='wake' precisa de wake()")
+        subscription = Subscription(self, name or getattr(handler, '__qualname__', 'subscriber'), types, handler,
+                                    size, policy, mode, loop, wake, batch, accept, key)
+        with self._lock:
+            self._subscriptions.append(subscription)
+            self._rebuild()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+                self._rebuild()
+
+    def _rebuild(self):
+        # Rotas por classe concreta, resolvidas na publicação e guardadas
+        self._routes = {}
+
+    def _route(self, event_type):
+        routes = self._routes.get(event_type)
+        if routes is None:
+            with self._lock:
+                routes = tuple(s for s in self._subscriptions if issubclass(event_type, s.types))
+                self._routes[event_type] = routes
+        return routes
+
+    def publish(self, event):
+        EVENTS_PUBLISHED.inc(event=type(event).__name__)
+        for subscription in self._route(type(event)):
+            subscription.offer(event)
+
+
+# Barramento do processo
+bus = EventBus()
@@ -0,0 +1,332 @@
+# execution.py
+
+import os
+import math
+import time
+import itertools
+import threading
+from dotenv import load_dotenv
+
+from metrics import registry, Counter, Histogram
+from events import bus, Fill
+from logger import get_logger
+
+load_dotenv()
+
+logger = get_logger('execution')
+
+# Ordens a partir deste notional (USD) são fatiadas; abaixo disso segue uma única ordem a mercado
+SLICE_MIN_NOTIONAL = float(os.getenv("SLICE_MIN_NOTIONAL", 5000))
+# Estratégia das entradas: book, twap ou iceberg (saídas sempre usam book com prazo)
+EXECUTION_STRATEGY = os.getenv("EXECUTION_STRATEGY", "book").lower()
+CHILD_INTERVAL = float(os.getenv("CHILD_INTERVAL", 2))
+TWAP_DURATION = float(os.getenv("TWAP_DURATION", 60))
+TWAP_SLICES = int(os.getenv("TWAP_SLICES", 6))
+ICEBERG_CLIP_NOTIONAL = float(os.getenv("ICEBERG_CLIP_NOTIONAL", 1000))
+BOOK_SLICE_MAX_BPS = float(os.getenv("BOOK_SLICE_MAX_BPS", 2))
+# Prazo das saídas fatiadas: vencido, o restante vai numa única ordem
+EXIT_SLICE_DEADLINE = float(os.getenv("EXIT_SLICE_DEADLINE", 10))
+MAX_CHILD_FAILURES = 3
+
+CHILD_ORDERS = registry.register(Counter(
+    'bot_child_orders_total', 'Ordens filhas enviadas pelo motor de execução', ('strategy', 'status')))
+REALIZED_SLIPPAGE_BPS = registry.register(Histogram(
+    'bot_realized_slippage_bps', 'Slippage realizado das ordens-mãe contra o preço de referência (bps)', ('strategy',),
+    buckets=(0.5, 1, 2, 5, 10, 20, 50, 100)))
+
+
+# Status finais de uma ordem na Bybit: depois deles a quantidade executada não muda mais
+TERMINAL_STATUSES = ('Filled', 'Cancelled', 'PartiallyFilledCanceled', 'Rejected', 'Deactivated')
+
+
+class UnconfirmedFill(Exception):
+    """Ordem aceita cuja execução não chegou a um status final: a próxima filha não pode ser dimensionada."""
+
+    def __init__(self, order_id, filled=0.0, avg_price=0.0):
+        super().__init__(f"ordem {order_id} sem status final ({filled} executado até agora)")
+        self.order_id = order_id
+        self.filled = filled
+        self.avg_price = avg_price
+
+
+def round_down(quantity, step):
+    if step <= 0:
+        return quantity
+    # round() limpa o ruído de ponto flutuante (0.30000000000000004) antes de virar string na ordem
+    return round(math.floor(quantity / step + 1e-9) * step, 10)
+
+
+class ParentOrder:
+    """Ordem-mãe: quantidade total, estratégia e o acumulado das filhas executadas."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, symbol, side, quantity, strategy=EXECUTION_STRATEGY, reduce_only=False,
+                 deadline=None, reference_price=None):
+        self.id = next(self._ids)
+        self.symbol = symbol
+        self.side = side.lower()
+        self.quantity = float(quantity)
+        self.strategy = strategy
+        self.reduce_only = reduce_only
+        self.deadline = deadline              # segundos a partir do início
+        self.reference_price = reference_price  # preço no momento da decisão (para o slippage)
+        self.filled = 0.0
+        self.cost = 0.0
+        self.children = []
+        self.status = 'working'
+        self.error = None
+        self.started_at = None
+        self._cancel = threading.Event()
+
+    @property
+    def remaining(self):
+        return max(0.0, self.quantity - self.filled)
+
+    @property
+    def avg_price(self):
+        return self.cost / self.filled if self.filled else 0.0
+
+    @property
+    def is_exit(self):
+        return self.reduce_only
+
+    def slippage_bps(self):
+        if not self.filled or not self.reference_price:
+            return None
+        diff = self.avg_price - self.reference_price
+        if self.side == 'sell':
+            diff = -diff
+        return diff / self.reference_price * 10000
+
+    def record_fill(self, quantity, price):
+        self.filled += quantity
+        self.cost += quantity * price
+        self.children.append((quantity, price))
+
+    def cancel(self):
+        self._cancel.set()
+
+
+class BybitExecution:
+    """Envia as filhas como ordens a mercado IOC na Bybit e lê a execução no histórico de ordens."""
+
+    def __init__(self, fill_poll_attempts=5, fill_poll_interval=0.2):
+        self.fill_poll_attempts = fill_poll_attempts
+        self.fill_poll_interval = fill_poll_interval
+
+    def lot_size(self, symbol):
+        from api import fetch_lot_size
+        return fetch_lot_size(symbol) or (0.0, 0.0)
+
+    def _poll(self, symbol, order_id):
+        from api import fetch_order_fill
+        fill = None
+        for _ in range(self.fill_poll_attempts):
+            time.sleep(self.fill_poll_interval)
+            fill = fetch_order_fill(symbol, order_id) or fill
+            if fill and fill['status'] in TERMINAL_STATUSES:
+                break
+        return fill
+
+    def place(self, symbol, side, quantity, reduce_only):
+        """
+        Retorna (quantidade executada, preço médio) com a ordem já em status
+        final, ou None se ela não foi aceita. Uma IOC ainda aberta depois das
+        consultas é cancelada e reconsultada; sem status final, levanta
+        UnconfirmedFill em vez de deixar o motor mandar outra filha.
+        """
+        from api import place_market_order, cancel_order
+        order_id = place_market_order(symbol, side, quantity, reduce_only)
+        if order_id is None:
+            return None
+        fill = self._poll(symbol, order_id)
+        if not fill or fill['status'] not in TERMINAL_STATUSES:
+            cancel_order(symbol, order_id)
+            fill = self._poll(symbol, order_id) or fill
+        if not fill or fill['status'] not in TERMINAL_STATUSES:
+            raise UnconfirmedFill(order_id, *((fill['filled'], fill['avg_price']) if fill else ()))
+        return fill['filled'], fill['avg_price']
+
+
+class ExecutionEngine:
+    """
+    Divide ordens-mãe em filhas a mercado:
+
+    - twap: TWAP_SLICES filhas iguais espaçadas ao longo de TWAP_DURATION;
+    - iceberg: filhas de ICEBERG_CLIP_NOTIONAL a cada CHILD_INTERVAL;
+    - book: a cada CHILD_INTERVAL, a maior filha cujo slippage estimado no
+      livro espelhado fique abaixo de BOOK_SLICE_MAX_BPS (sem livro, vira iceberg).
+
+    `book_for(symbol)` devolve o OrderBook espelhado do símbolo (ou None).
+    Cada ordem-mãe roda numa thread própria; `on_update(parent)` é chamado a
+    cada filha executada e ao final (da thread de execução, então a GUI deve
+    reencaminhar por sinal). `clock` e `sleep` podem ser trocados para
+    simulação.
+    """
+
+    def __init__(self, exchange, book_for=None, on_update=None, clock=time.monotonic, sleep=None):
+        self.exchange = exchange
+        self.book_for = book_for
+        self.on_update = on_update
+        self.clock = clock
+        self.sleep = sleep
+        self.working = {}
+        self._lock = threading.Lock()
+
+    def is_working(self, symbol):
+        return symbol in self.working
+
+    def cancel(self, symbol):
+        parent = self.working.get(symbol)
+        if parent is not None:
+            parent.cancel()
+        return parent
+
+    def submit(self, parent):
+        """Começa a executar a ordem-mãe em segundo plano. Retorna False se o símbolo já tem uma em andamento."""
+        with self._lock:
+            if parent.symbol in self.working:
+                return False
+            self.working[parent.symbol] = parent
+        thread = threading.Thread(target=self.run, args=(parent,), name=f"execution-{parent.id}", daemon=True)
+        thread.start()
+        return True
+
+    def _book(self, symbol):
+        if self.book_for is None:
+            return None
+        return self.book_for(symbol)
+
+    def _reference_price(self, parent):
+        book = self._book(parent.symbol)
+        mid = book.mid() if book is not None else None
+        return mid or parent.reference_price
+
+    def child_size(self, parent, lot_step, min_qty):
+        remaining = parent.remaining
+        elapsed = self.clock() - parent.started_at
+        if parent.deadline is not None and elapsed >= parent.deadline:
+            return round_down(remaining, lot_step)
+
+        if parent.strategy == 'twap':
+            size = remaining / max(1, TWAP_SLICES - len(parent.children))
+        else:
+            price = self._reference_price(parent)
+            size = ICEBERG_CLIP_NOTIONAL / price if price else remaining
+            book = self._book(parent.symbol) if parent.strategy == 'book' else None
+            if book is not None:
+                size = self._book_size(book, parent.side, remaining, min_qty)
+
+        size = min(round_down(size, lot_step), remaining)
+        size = max(size, min_qty)
+        # Não deixa um resto menor que o mínimo negociável
+        if remaining - size < max(min_qty, lot_step):
+            size = round_down(remaining, lot_step)
+        return size
+
+    @staticmethod
+    def _book_size(book, side, remaining, min_qty):
+        """Busca binária pela maior quantidade com slippage estimado até BOOK_SLICE_MAX_BPS."""
+        estimate = book.estimate(side, remaining)
+        if estimate is not None and estimate['complete'] and estimate['slippage_bps'] <= BOOK_SLICE_MAX_BPS:
+            return remaining
+        low, high = min_qty, remaining
+        for _ in range(20):
+            middle = (low + high) / 2
+            estimate = book.estimate(side, middle)
+            if estimate is not None and estimate['complete'] and estimate['slippage_bps'] <= BOOK_SLICE_MAX_BPS:
+                low = middle
+            else:
+                high = middle
+        return low
+
+    def _interval(self, parent):
+        if parent.strategy == 'twap':
+            return TWAP_DURATION / max(1, TWAP_SLICES)
+        return CHILD_INTERVAL
+
+    def _wait(self, parent, seconds):
+        if self.sleep is not None:
+            self.sleep(seconds)
+            return parent._cancel.is_set()
+        return parent._cancel.wait(seconds)
+
+    def _notify(self, parent):
+        if self.on_update is not None:
+            try:
+                self.on_update(parent)
+            except Exception as e:
+                logger.error(f"Erro ao notificar execução #{parent.id}: {e}")
+
+    def _record(self, parent, quantity, price):
+        parent.record_fill(quantity, price)
+        bus.publish(Fill(parent.symbol, parent.side, quantity, price, parent.reduce_only, parent.id))
+        self._notify(parent)
+
+    def run(self, parent):
+        """Executa a ordem-mãe até completar, ser cancelada ou falhar (bloqueante)."""
+        parent.started_at = self.clock()
+        if parent.reference_price is None:
+            parent.reference_price = self._reference_price(parent)
+        lot_step, min_qty = self.exchange.lot_size(parent.symbol)
+        # Resto abaixo do mínimo negociável não pode ser enviado
+        dust = max(min_qty, lot_step, 1e-12) * (1 - 1e-6)
+        failures = 0
+        logger.info(
+            f"Execução #{parent.id}: {parent.side.upper()} {parent.quantity} {parent.symbol} "
+            f"({parent.strategy}{', reduce-only' if parent.reduce_only else ''})"
+        )
+        try:
+            while parent.remaining >= dust:
+                if parent._cancel.is_set():
+                    parent.status = 'cancelled'
+                    break
+                size = self.child_size(parent, lot_step, min_qty)
+                try:
+                    fill = self.exchange.place(parent.symbol, parent.side, size, parent.reduce_only)
+                except UnconfirmedFill as e:
+                    # Sem saber quanto a filha executou, outra filha poderia passar da quantidade da mãe
+                    if e.filled > 0:
+                        self._record(parent, e.filled, e.avg_price)
+                    CHILD_ORDERS.inc(strategy=parent.strategy, status='unconfirmed')
+                    parent.status = 'failed'
+                    parent.error = str(e)
+                    break
+                if fill is None or fill[0] <= 0:
+                    failures += 1
+                    CHILD_ORDERS.inc(strategy=parent.strategy, status='error')
+                    if failures >= MAX_CHILD_FAILURES:
+                        parent.status = 'failed'
+                        parent.error = f"{failures} filhas sem execução"
+                        break
+                else:
+                    failures = 0
+                    CHILD_ORDERS.inc(strategy=parent.strategy, status='filled')
+                    self._record(parent, *fill)
+                if parent.remaining >= dust:
+                    if self._wait(parent, self._interval(parent)):
+                        parent.status = 'cancelled'
+                        break
+            else:
+                parent.status = 'done'
+        except Exception as e:
+            parent.status = 'failed'
+            parent.error = str(e)
+        finally:
+            with self._lock:
+                if self.working.get(parent.symbol) is parent:
+                    del self.working[parent.symbol]
+
+        slippage = parent.slippage_bps()
+        if slippage is not None:
+            REALIZED_SLIPPAGE_BPS.observe(slippage, strategy=parent.strategy)
+        log = logger.info if parent.status == 'done' else logger.warning
+        log(
+            f"Execução #{parent.id} {parent.status}: {parent.filled}/{parent.quantity} em {len(parent.children)} filhas, "
+            f"preço médio {parent.avg_price:.4f}"
+            + (f", slippage {slippage:.1f} bps" if slippage is not None else "")
+            + (f" ({parent.error})" if parent.error else "")
+        )
+        self._notify(parent)
+        return parent
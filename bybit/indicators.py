@@ -0,0 +1,530 @@
+# indicators.py
+
+from collections import deque
+import numpy as np
+
+# Indicadores e estratégias registrados; a janela e a configuração descobrem os plugins por aqui
+INDICATORS = {}
+STRATEGIES = {}
+
+# Os quatro indicadores originais têm caixas e chaves próprias em configurations.json (use_sma, ...)
+LEGACY_INDICATORS = ('sma', 'rsi', 'volume', 'high_low')
+
+BUY, SELL, WAIT = 1, -1, 0
+
+# EMAs são semeadas com o primeiro valor: o lookback cobre EMA_WARMUP períodos da EMA mais lenta
+# para que o valor ao vivo (poucas barras) e o do scanner (janela inteira) concordem
+EMA_WARMUP = 3
+
+
+def register_indicator(cls):
+    """Decorador: registra uma subclasse de Indicator pelo seu `name`."""
+    INDICATORS[cls.name] = cls()
+    return cls
+
+
+def register_strategy(cls):
+    STRATEGIES[cls.name] = cls()
+    return cls
+
+
+def split_name(name):
+    """'ema@1h' -> ('ema', '1h'); sem timeframe, o segundo valor é None (o da janela)."""
+    indicator, _, timeframe = name.partition('@')
+    return indicator, timeframe or None
+
+
+def indicator_for(name):
+    return INDICATORS[split_name(name)[0]]
+
+
+def signal_name(value):
+    return 'buy' if value > 0 else 'sell' if value < 0 else 'wait'
+
+
+class Candles:
+    """Matrizes (símbolos x candles), do mais antigo para o mais novo."""
+
+    def __init__(self, highs, lows, closes, volumes):
+        self.highs = highs
+        self.lows = lows
+        self.closes = closes
+        self.volumes = volumes
+
+    def __len__(self):
+        return self.closes.shape[1]
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Uma linha a partir de candles (high, low, close, volume)."""
+        data = np.asarray(rows, dtype=float).reshape(-1, 4)
+        return cls(data[None, :, 0], data[None, :, 1], data[None, :, 2], data[None, :, 3])
+
+
+def kline_candle(kline):
+    """Candle (high, low, close, volume) de uma kline da Binance/Bybit [tempo, open, high, low, close, volume, ...]."""
+    return float(kline[2]), float(kline[3]), float(kline[4]), float(kline[5])
+
+
+class WindowStream:
+    """
+    Atualização incremental genérica: guarda só os últimos `lookback`
+    candles fechados e roda a versão vetorizada numa linha. `update()`
+    recebe um candle fechado; `peek()` avalia com o candle em formação,
+    sem guardá-lo.
+    """
+
+    def __init__(self, indicator, params):
+        self.indicator = indicator
+        self.params = params
+        self.lookback = indicator.lookback(**params)
+        self.window = deque(maxlen=self.lookback)
+
+    def update(self, candle):
+        self.window.append(candle)
+
+    def peek(self, candle=None):
+        rows = list(self.window)
+        if candle is not None:
+            rows = rows[1:] if len(rows) == self.lookback else rows
+            rows.append(candle)
+        if len(rows) < self.lookback:
+            return None
+        return self.indicator.batch(Candles.from_rows(rows), **self.params)
+
+
+class Indicator:
+    """
+    Plugin de indicador. Cada um declara:
+
+    - `name`, `label` (texto da caixa na janela) e `kind`: 'direction' vota
+      buy/sell; 'filter' só libera (1) ou segura (0) a entrada;
+    - `params`: parâmetros e valores padrão;
+    - `lookback(**params)`: candles necessários;
+    - `batch(candles, **params)`: versão vetorizada sobre Candles, para o
+      scanner e backtests; retorna um dict de arrays com pelo menos `signal`;
+    - `stream(**params)`: objeto com update(candle)/peek(candle) para uso ao
+      vivo (por padrão, WindowStream);
+    - `describe(output)`: texto mostrado ao lado da caixa.
+    """
+
+    name = ''
+    label = ''
+    kind = 'direction'
+    params = {}
+
+    def options(self, **params):
+        return {**self.params, **{k: v for k, v in params.items() if k in self.params}}
+
+    def lookback(self, **params):
+        raise NotImplementedError
+
+    def batch(self, candles, **params):
+        raise NotImplementedError
+
+    def stream(self, **params):
+        return WindowStream(self, self.options(**params))
+
+    def describe(self, output):
+        return f"({signal_name(output['signal'][0])})"
+
+
+def _ema_series(values, period):
+    """EMA (símbolos x candles) semeada com o primeiro valor, laço só no eixo do tempo."""
+    alpha = 2 / (period + 1)
+    out = np.empty_like(values, dtype=float)
+    out[:, 0] = values[:, 0]
+    for t in range(1, values.shape[1]):
+        out[:, t] = out[:, t - 1] + alpha * (values[:, t] - out[:, t - 1])
+    return out
+
+
+class EmaState:
+    """Uma EMA incremental; `peek` calcula o próximo valor sem guardá-lo."""
+
+    def __init__(self, period):
+        self.alpha = 2 / (period + 1)
+        self.value = None
+
+    def peek(self, x):
+        return x if self.value is None else self.value + self.alpha * (x - self.value)
+
+    def update(self, x):
+        self.value = self.peek(x)
+
+
+# ----------------------------------------------------------------------
+# Indicadores originais
+# ----------------------------------------------------------------------
+
+@register_indicator
+class SmaCross(Indicator):
+    name = 'sma'
+    label = 'SMA'
+    params = {'short': 7, 'long': 25}
+
+    def lookback(self, **params):
+        return self.options(**params)['long']
+
+    def batch(self, candles, **params):
+        p = self.options(**params)
+        short = candles.closes[:, -p['short']:].mean(axis=1)
+        long = candles.closes[:, -p['long']:].mean(axis=1)
+        return {'signal': np.sign(short - long).astype(np.int8), 'short': short, 'long': long}
+
+    def describe(self, output):
+        return f"{int(output['short'][0])} | {int(output['long'][0])} ({signal_name(output['signal'][0])})"
+
+
+@register_indicator
+class Rsi(Indicator):
+    name = 'rsi'
+    label = 'RSI'
+    # Média simples dos últimos `period` deltas, como na versão escalar original
+    params = {'period': 14, 'oversold': 30, 'overbought': 70}
+
+    def lookback(self, **params):
+        return self.options(**params)['period'] + 1
+
+    def batch(self, candles, **params):
+        p = self.options(**params)
+        delta = np.diff(candles.closes[:, -(p['period'] + 1):], axis=1)
+        gain = np.clip(delta, 0, None).mean(axis=1)
+        loss = -np.clip(delta, None, 0).mean(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = np.where(loss == 0, 100.0, 100 - 100 / (1 + gain / loss))
+        signal = np.where(rsi < p['oversold'], BUY, np.where(rsi > p['overbought'], SELL, WAIT)).astype(np.int8)
+        return {'signal': signal, 'value': rsi}
+
+    def describe(self, output):
+        return f"{int(output['value'][0])} ({signal_name(output['signal'][0])})"
+
+
+@register_indicator
+class VolumeFilter(Indicator):
+    name = 'volume'
+    label = 'Volume'
+    kind = 'filter'
+    params = {'window': 7}
+
+    def lookback(self, **params):
+        return self.options(**params)['window']
+
+    def batch(self, candles, **params):
+        p = self.options(**params)
+        average = candles.volumes[:, -p['window']:].mean(axis=1)
+        current = candles.volumes[:, -1]
+        return {'signal': (current > average).astype(np.int8), 'current': current, 'average': average}
+
+    def describe(self, output):
+        state = 'go' if output['signal'][0] else 'wait'
+        return f"{int(output['current'][0])} agora | {int(output['average'][0])} média ({state})"
+
+
+@register_indicator
+class HighLow(Indicator):
+    name = 'high_low'
+    label = 'High/Low'
+    # Mais perto da mínima da janela -> buy; window = candles da janela (30 em 5m, 100 em 1m)
+    params = {'window': 30}
+
+    def lookback(self, **params):
+        return self.options(**params)['window']
+
+    def batch(self, candles, **params):
+        p = self.options(**params)
+        price = candles.closes[:, -1]
+        dist_to_high = np.abs(candles.highs[:, -p['window']:].max(axis=1) - price)
+        dist_to_low = np.abs(price - candles.lows[:, -p['window']:].min(axis=1))
+        return {'signal': np.where(dist_to_low < dist_to_high, BUY, SELL).astype(np.int8)}
+
+
+# ----------------------------------------------------------------------
+# Novos indicadores
+# ----------------------------------------------------------------------
+
+@register_indicator
+class EmaCross(Indicator):
+    name = 'ema'
+    label = 'EMA'
+    params = {'fast': 9, 'slow': 21}
+
+    def lookback(self, **params):
+        return EMA_WARMUP * self.options(**params)['slow']
+
+    def batch(self, candles, **params):
+        p = self.options(**params)
+        fast = _ema_series(candles.closes, p['fast'])[:, -1]
+        slow = _ema_series(candles.closes, p['slow'])[:, -1]
+        return {'signal': np.sign(fast - slow).astype(np.int8), 'fast': fast, 'slow': slow}
+
+    def stream(self, **params):
+        return EmaCrossStream(self, self.options(**params))
+
+    def describe(self, output):
+        return f"{output['fast'][0]:.6g} | {output['slow'][0]:.6g} ({signal_name(output['signal'][0])})"
+
+
+class EmaCrossStream:
+    def __init__(self, indicator, params):
+        self.lookback = indicator.lookback(**params)
+        self.fast = EmaState(params['fast'])
+        self.slow = EmaState(params['slow'])
+        self.count = 0
+
+    def update(self, candle):
+        self.fast.update(candle[2])
+        self.slow.update(candle[2])
+        self.count += 1
+
+    def peek(self, candle=None):
+        if self.count + (candle is not None) < self.lookback:
+            return None
+        if candle is None:
+            fast, slow = self.fast.value, self.slow.value
+        else:
+            fast, slow = self.fast.peek(candle[2]), self.slow.peek(candle[2])
+        return {'signal': np.sign(np.array([fast - slow])).astype(np.int8),
+                'fast': np.array([fast]), 'slow': np.array([slow])}
+
+
+@register_indicator
+class Macd(Indicator):
+    name = 'macd'
+    label = 'MACD'
+    params = {'fast': 12, 'slow': 26, 'signal': 9}
+
+    def lookback(self, **params):
+        p = self.options(**params)
+        return EMA_WARMUP * p['slow'] + p['signal']
+
+    def batch(self, candles, **params):
+        p = self.options(**params)
+        macd = _ema_series(candles.closes, p['fast']) - _ema_series(candles.closes, p['slow'])
+        signal_line = _ema_series(macd, p['signal'])
+        histogram = macd[:, -1] - signal_line[:, -1]
+        return {'signal': np.sign(histogram).astype(np.int8), 'macd': macd[:, -1], 'histogram': histogram}
+
+    def stream(self, **params):
+        return MacdStream(self, self.options(**params))
+
+    def describe(self, output):
+        return f"{output['macd'][0]:.4g} | hist {output['histogram'][0]:.4g} ({signal_name(output['signal'][0])})"
+
+
+class MacdStream:
+    def __init__(self, indicator, params):
+        self.lookback = indicator.lookback(**params)
+        self.fast = EmaState(params['fast'])
+        self.slow = EmaState(params['slow'])
+        self.signal = EmaState(params['signal'])
+        self.count = 0
+
+    def update(self, candle):
+        self.fast.update(candle[2])
+        self.slow.update(candle[2])
+        self.signal.update(self.fast.value - self.slow.value)
+        self.count += 1
+
+    def peek(self, candle=None):
+        if self.count + (candle is not None) < self.lookback:
+            return None
+        if candle is None:
+            macd, signal_line = self.fast.value - self.slow.value, self.signal.value
+        else:
+            macd = self.fast.peek(candle[2]) - self.slow.peek(candle[2])
+            signal_line = self.signal.peek(macd)
+        histogram = macd - signal_line
+        return {'signal': np.sign(np.array([histogram])).astype(np.int8),
+                'macd': np.array([macd]), 'histogram': np.array([histogram])}
+
+
+@register_indicator
+class Bollinger(Indicator):
+    name = 'bollinger'
+    label = 'Bollinger'
+    # Fechamento abaixo da banda inferior -> buy; acima da superior -> sell
+    params = {'period': 20, 'width': 2.0}
+
+    def lookback(self, **params):
+        return self.options(**params)['period']
+
+    def batch(self, candles, **params):
+        p = self.options(**params)
+        window = candles.closes[:, -p['period']:]
+        middle = window.mean(axis=1)
+        deviation = window.std(axis=1)
+        lower = middle - p['width'] * deviation
+        upper = middle + p['width'] * deviation
+        price = candles.closes[:, -1]
+        signal = np.where(price < lower, BUY, np.where(price > upper, SELL, WAIT)).astype(np.int8)
+        return {'signal': signal, 'lower': lower, 'upper': upper}
+
+    def describe(self, output):
+        return f"{output['lower'][0]:.6g} | {output['upper'][0]:.6g} ({signal_name(output['signal'][0])})"
+
+
+@register_indicator
+class Atr(Indicator):
+    name = 'atr'
+    label = 'ATR'
+    kind = 'filter'
+    # Libera a entrada só com volatilidade mínima: ATR em % do preço
+    params = {'period': 14, 'min_percent': 0.1}
+
+    def lookback(self, **params):
+        return self.options(**params)['period'] + 1
+
+    def batch(self, candles, **params):
+        p = self.options(**params)
+        n = p['period']
+        highs, lows = candles.highs[:, -n:], candles.lows[:, -n:]
+        previous_close = candles.closes[:, -(n + 1):-1]
+        true_range = np.maximum(highs - lows, np.maximum(np.abs(highs - previous_close), np.abs(lows - previous_close)))
+        atr = true_range.mean(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percent = np.nan_to_num(atr / candles.closes[:, -1] * 100)
+        return {'signal': (percent >= p['min_percent']).astype(np.int8), 'value': atr, 'percent': percent}
+
+    def describe(self, output):
+        state = 'go' if output['signal'][0] else 'wait'
+        return f"{output['value'][0]:.6g} ({output['percent'][0]:.2f}%) ({state})"
+
+
+@register_indicator
+class Vwap(Indicator):
+    name = 'vwap'
+    label = 'VWAP'
+    # VWAP da janela; fechamento acima -> buy
+    params = {'window': 30}
+
+    def lookback(self, **params):
+        return self.options(**params)['window']
+
+    def batch(self, candles, **params):
+        p = self.options(**params)
+        w = p['window']
+        typical = (candles.highs[:, -w:] + candles.lows[:, -w:] + candles.closes[:, -w:]) / 3
+        volumes = candles.volumes[:, -w:]
+        total = volumes.sum(axis=1)
+        price = candles.closes[:, -1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vwap = np.where(total > 0, (typical * volumes).sum(axis=1) / total, price)
+        return {'signal': np.sign(price - vwap).astype(np.int8), 'value': vwap}
+
+    def describe(self, output):
+        return f"{output['value'][0]:.6g} ({signal_name(output['signal'][0])})"
+
+
+# ----------------------------------------------------------------------
+# Estratégias
+# ----------------------------------------------------------------------
+
+class Strategy:
+    """
+    Combina os sinais dos indicadores ativos numa decisão por linha:
+    `decide(outputs)` recebe {nome: saída de batch} e retorna um array
+    int8 com 1 (buy), -1 (sell) ou 0 (wait).
+    """
+
+    name = ''
+
+    def decide(self, outputs):
+        raise NotImplementedError
+
+    @staticmethod
+    def split(outputs):
+        votes = [out['signal'] for name, out in outputs.items() if indicator_for(name).kind == 'direction']
+        filters = [out['signal'] for name, out in outputs.items() if indicator_for(name).kind == 'filter']
+        rows = len(next(iter(outputs.values()))['signal']) if outputs else 0
+        allowed = np.all(np.vstack(filters) == 1, axis=0) if filters else np.ones(rows, dtype=bool)
+        return votes, allowed, rows
+
+
+@register_strategy
+class Unanimous(Strategy):
+    """Todos os indicadores de direção concordam e todos os filtros liberam (a regra original)."""
+
+    name = 'unanimous'
+
+    def decide(self, outputs):
+        votes, allowed, rows = self.split(outputs)
+        decision = np.zeros(rows, dtype=np.int8)
+        if votes:
+            stacked = np.vstack(votes)
+            decision[np.all(stacked == BUY, axis=0) & allowed] = BUY
+            decision[np.all(stacked == SELL, axis=0) & allowed] = SELL
+        return decision
+
+
+@register_strategy
+class Majority(Strategy):
+    """Mais da metade dos indicadores de direção num mesmo lado, com os filtros liberando."""
+
+    name = 'majority'
+
+    def decide(self, outputs):
+        votes, allowed, rows = self.split(outputs)
+        decision = np.zeros(rows, dtype=np.int8)
+        if votes:
+            stacked = np.vstack(votes)
+            half = len(votes) / 2
+            decision[((stacked == BUY).sum(axis=0) > half) & allowed] = BUY
+            decision[((stacked == SELL).sum(axis=0) > half) & allowed] = SELL
+        return decision
+
+
+def enabled_indicators(use_sma=True, use_rsi=True, use_volume=False, use_high_low=False, extra=()):
+    """
+    Nomes dos indicadores ativos a partir das caixas originais e dos plugins
+    em `extra`; 'nome@timeframe' roda o indicador em outro timeframe.
+    """
+    flags = {'sma': use_sma, 'rsi': use_rsi, 'volume': use_volume, 'high_low': use_high_low}
+    names = [name for name in LEGACY_INDICATORS if flags[name]]
+    return tuple(names + [name for name in extra if split_name(name)[0] in INDICATORS and name not in names])
+
+
+def live_lookback(names, params=None):
+    """Maior lookback entre os indicadores `names`: candles necessários antes do primeiro sinal."""
+    params = params or {}
+    return max((indicator_for(name).lookback(**params.get(split_name(name)[0], {})) for name in names), default=1)
+
+
+def evaluate(candles, names, enabled, params=None, strategy='unanimous'):
+    """
+    Roda os indicadores `names` sobre `candles` e decide só com os `enabled`.
+    Retorna (decisão por linha, {nome: saída}).
+    """
+    params = params or {}
+    outputs = {name: indicator_for(name).batch(candles, **params.get(split_name(name)[0], {})) for name in names}
+    decision = STRATEGIES[strategy].decide({name: outputs[name] for name in enabled})
+    return decision, outputs
+
+
+class LiveSignals:
+    """
+    Indicadores de um símbolo ao vivo: cada candle fechado alimenta os
+    streams incrementais uma única vez, e o candle em formação é avaliado
+    com peek(), sem recalcular a janela inteira a cada consulta.
+    """
+
+    def __init__(self, names, params=None):
+        params = params or {}
+        self.streams = {name: indicator_for(name).stream(**params.get(split_name(name)[0], {})) for name in names}
+        self.lookback = live_lookback(names, params)
+        self.last_open_time = None
+
+    def caught_up(self, klines):
+        """A primeira kline recebida já foi vista: não houve buraco desde a última consulta."""
+        return self.last_open_time is not None and klines and klines[0][0] <= self.last_open_time
+
+    def feed(self, klines):
+        """klines do mais antigo para o mais novo, a última em formação; retorna {nome: saída ou None}."""
+        for kline in klines[:-1]:
+            if self.last_open_time is None or kline[0] > self.last_open_time:
+                candle = kline_candle(kline)
+                for stream in self.streams.values():
+                    stream.update(candle)
+                self.last_open_time = kline[0]
+        current = kline_candle(klines[-1])
+        return {name: stream.peek(current) for name, stream in self.streams.items()}
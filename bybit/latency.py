@@ -0,0 +1,106 @@
+# latency.py
+
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Estágios medidos entre o tick do websocket e o ack da exchange (todos em ms)
+STAGES = (
+    'qt_delivery',          # recebimento no websocket -> slot da GUI
+    'tick_to_evaluation',   # último tick -> início de check_auto_close_positions
+    'evaluation',           # duração de check_auto_close_positions
+    'tick_to_close_call',   # último tick -> chamada de close_position_market
+    'http_send_to_ack',     # envio da ordem -> resposta da exchange
+    'tick_to_ack',          # último tick -> resposta da exchange (ponta a ponta)
+)
+
+
+class LatencyHistogram:
+    """
+    Guarda as últimas amostras de um estágio (em ms) numa janela circular.
+    Os percentis só são calculados quando alguém pede o snapshot.
+    """
+
+    def __init__(self, max_samples=2048):
+        self.samples = deque(maxlen=max_samples)
+        self.count = 0
+        self.max_value = 0.0
+
+    def observe(self, value_ms):
+        self.samples.append(value_ms)
+        self.count += 1
+        if value_ms > self.max_value:
+            self.max_value = value_ms
+
+    def snapshot(self):
+        if not self.samples:
+            return {'count': 0, 'p50': 0.0, 'p99': 0.0, 'max': 0.0}
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+        return {
+            'count': self.count,
+            'p50': ordered[int(last * 0.50)],
+            'p99': ordered[int(last * 0.99)],
+            'max': self.max_value
+        }
+
+
+class LatencyTracer:
+    """
+    Marca o tempo de cada estágio do caminho tick -> ordem -> ack.
+    O websocket registra o instante do último tick e os demais estágios
+    medem a distância até ele com time.perf_counter().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        self.last_tick_ts = 0.0
+
+    def tick_received(self):
+        ts = time.perf_counter()
+        self.last_tick_ts = ts
+        return ts
+
+    def observe(self, stage, value_ms):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = LatencyHistogram()
+            histogram.observe(value_ms)
+
+    def since_tick(self, stage, tick_ts=None):
+        """Registra quanto tempo passou desde o tick informado (ou o último recebido)."""
+        if tick_ts is None:
+            tick_ts = self.last_tick_ts
+        if not tick_ts:
+            return
+        self.observe(stage, (time.perf_counter() - tick_ts) * 1000)
+
+    @contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, (time.perf_counter() - start) * 1000)
+
+    def snapshot(self):
+        with self._lock:
+            return {stage: histogram.snapshot() for stage, histogram in self.histograms.items()}
+
+    def summary_lines(self):
+        lines = []
+        for stage, stats in self.snapshot().items():
+            if stats['count'] == 0:
+                continue
+            lines.append(
+                f"{stage}: n={stats['count']} p50={stats['p50']:.2f}ms "
+                f"p99={stats['p99']:.2f}ms max={stats['max']:.2f}ms"
+            )
+        return lines
+
+
+tracer = LatencyTracer()
+
@@ -0,0 +1,190 @@
+# logger.py
+
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "bot.log")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # "text" ou "json"
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 5 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+
+# Níveis por módulo, ex.: LOG_LEVELS="api=DEBUG,ui=WARNING"
+LOG_LEVELS = {
+    name.strip(): level.strip().upper()
+    for name, level in (item.split('=', 1) for item in os.getenv("LOG_LEVELS", "").split(',') if '=' in item)
+}
+
+# Limites por módulo para mensagens repetitivas, aplicados por ponto de chamada:
+#   max_per_window: quantas mensagens passam a cada `window` segundos
+#   sample_every:   dentro do limite, deixa passar 1 a cada N mensagens
+# Avisos e erros nunca são amostrados e têm um limite próprio, bem maior (WARNINGS_PER_WINDOW):
+# uma falha repetida de ordem ou de stop continua aparecendo no log.
+WARNINGS_PER_WINDOW = int(os.getenv("LOG_WARNINGS_PER_WINDOW", 600))
+MODULE_LIMITS = {
+    'api': {'max_per_window': 20, 'window': 60.0, 'sample_every': 1},
+    'ui': {'max_per_window': 30, 'window': 60.0, 'sample_every': 1},
+    'websocket_client': {'max_per_window': 10, 'window': 60.0, 'sample_every': 1},
+}
+
+ROOT_LOGGER_NAME = 'bot'
+
+# Atributos padrão do LogRecord; o que não estiver aqui veio de `extra=`
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Formata o registro como texto `chave=valor` ou como uma linha JSON.
+    Campos passados via `extra={...}` entram como campos estruturados.
+    """
+
+    def __init__(self, json_output=False):
+        super().__init__()
+        self.json_output = json_output
+
+    def format(self, record):
+        fields = {k: v for k, v in record.__dict__.items() if k not in _STANDARD_ATTRS}
+        message = record.getMessage()
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record.created))
+        timestamp += f".{int(record.msecs):03d}"
+
+        if self.json_output:
+            payload = {
+                'ts': timestamp,
+                'level': record.levelname,
+                'logger': record.name,
+                'thread': record.threadName,
+                'msg': message,
+            }
+            payload.update(fields)
+            if record.exc_info:
+                payload['exc'] = self.formatException(record.exc_info)
+            return json.dumps(payload, default=str, ensure_ascii=False)
+
+        line = f"{timestamp} {record.levelname:<7} {record.name}: {message}"
+        if fields:
+            line += ' ' + ' '.join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limita mensagens por ponto de chamada (arquivo + linha), para que um
+    print num laço de 1 s não inunde o log. Roda na thread que loga, então
+    precisa ser barato: um dict e uma soma.
+    """
+
+    def __init__(self, max_per_window=20, window=60.0, sample_every=1, max_warnings_per_window=WARNINGS_PER_WINDOW):
+        super().__init__()
+        self.max_per_window = max_per_window
+        self.max_warnings_per_window = max_warnings_per_window
+        self.window = window
+        self.sample_every = max(1, sample_every)
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.pathname, record.lineno)
+        now = record.created
+        with self._lock:
+            state = self._sites.get(key)
+            if state is None or now - state[0] >= self.window:
+                suppressed = state[2] if state else 0
+                state = self._sites[key] = [now, 0, 0, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+            state[3] += 1
+            if record.levelno < logging.WARNING and (state[3] - 1) % self.sample_every:
+                state[2] += 1
+                return False
+            limit = self.max_warnings_per_window if record.levelno >= logging.WARNING else self.max_per_window
+            if state[1] >= limit:
+                state[2] += 1
+                return False
+            state[1] += 1
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que descarta (e conta) registros quando a fila enche, em vez de bloquear."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging():
+    """
+    Configura o logger raiz do bot uma única vez: os registros vão para uma
+    fila e uma thread em segundo plano grava no console e no arquivo rotativo.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        formatter = StructuredFormatter(json_output=(LOG_FORMAT == 'json'))
+
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(formatter)
+        handlers = [console_handler]
+        if LOG_FILE:
+            try:
+                file_handler = logging.handlers.RotatingFileHandler(
+                    LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+                )
+                file_handler.setFormatter(formatter)
+                handlers.append(file_handler)
+            except OSError as e:
+                sys.stderr.write(f"Não foi possível abrir o arquivo de log {LOG_FILE}: {e}\n")
+
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        root = logging.getLogger(ROOT_LOGGER_NAME)
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(DroppingQueueHandler(log_queue))
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def get_logger(name):
+    """Retorna o logger `bot.<name>` com o nível e o limite configurados para o módulo."""
+    setup_logging()
+    logger = logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
+    if name in LOG_LEVELS:
+        logger.setLevel(LOG_LEVELS[name])
+    limits = MODULE_LIMITS.get(name)
+    if limits and not any(isinstance(f, RateLimitFilter) for f in logger.filters):
+        logger.addFilter(RateLimitFilter(**limits))
+    return logger
+
+
+def set_level(level, name=None):
+    """Muda o nível em tempo de execução (ex.: DEBUG durante um incidente)."""
+    target = f"{ROOT_LOGGER_NAME}.{name}" if name else ROOT_LOGGER_NAME
+    logging.getLogger(target).setLevel(level.upper() if isinstance(level, str) else level)
@@ -0,0 +1,138 @@
+# margin.py
+
+import os
+import time
+import queue
+import threading
+from dotenv import load_dotenv
+
+from metrics import registry, Counter
+from logger import get_logger
+
+load_dotenv()
+
+logger = get_logger('margin')
+
+# Distância do mark ao preço de liquidação (%) que dispara uma chamada de margem
+MARGIN_CALL_LIQ_PERCENT = float(os.getenv("MARGIN_CALL_LIQ_PERCENT", 3))
+# Margem adicionada em cada chamada, como fração da margem atual da posição
+MARGIN_CALL_RATIO = float(os.getenv("MARGIN_CALL_RATIO", 0.5))
+# Espera depois de uma recusa da exchange antes de tentar de novo a mesma chamada
+MARGIN_CALL_RETRY_SECONDS = 10
+
+MARGIN_CALLS = registry.register(Counter(
+    'bot_margin_calls_total', 'Chamadas de margem enviadas à exchange', ('result',)))
+
+
+class MarginCallEngine:
+    """
+    Adiciona margem isolada quando o mark de uma posição chega a menos de
+    MARGIN_CALL_LIQ_PERCENT do preço de liquidação, até `max_calls` vezes por
+    posição (a configuração "Chamadas de Margem").
+
+    `sync()` recebe as posições e os trackers a cada consulta REST;
+    `on_mark()` roda a cada tick do stream, então a reação acontece no tick
+    que cruzou o limite. As chamadas à API saem de uma thread própria.
+
+    Cada chamada tem um id `<símbolo>-<entrada>-<n>`: enquanto ela está em
+    andamento ou até a consulta seguinte trazer o novo preço de liquidação,
+    o mesmo número de chamada não é enviado de novo.
+    """
+
+    def __init__(self, add_margin, on_call=None, max_calls=0):
+        self.add_margin = add_margin      # (symbol, amount, call_id) -> bool
+        self.on_call = on_call            # (symbol, used_calls, amount), chamado da thread da engine
+        self.max_calls = max_calls
+        self.positions = {}               # symbol -> estado da posição
+        self._lock = threading.Lock()
+        self._jobs = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="MarginCallEngine", daemon=True)
+            self._thread.start()
+
+    def attach_stream(self, manager):
+        manager.add_listener(self._on_stream)
+
+    def _on_stream(self, exchange, symbol, price, data):
+        if exchange == 'bybit':
+            mark = data.get('markPrice')
+            if mark or price:
+                self.on_mark(symbol, float(mark) if mark else price)
+
+    def sync(self, positions, trackers):
+        """Atualiza liquidação, margem e chamadas usadas a partir de fetch_open_positions."""
+        with self._lock:
+            current = {}
+            for position in positions:
+                symbol = position['symbol']
+                liq = position.get('liquidationPrice')
+                if not isinstance(liq, (int, float)) or not position.get('currentQty'):
+                    continue
+                previous = self.positions.get(symbol, {})
+                tracker = trackers.get(symbol, {})
+                current[symbol] = {
+                    'entry': position.get('avgEntryPrice'),
+                    'liq': float(liq),
+                    'margin': float(position.get('posMargin') or 0),
+                    'used': max(tracker.get('used_margin_calls', 0), previous.get('used', 0)
+                                if previous.get('entry') == position.get('avgEntryPrice') else 0),
+                    'inflight': previous.get('inflight', False),
+                    'call_liq': previous.get('call_liq'),
+                    'retry_at': previous.get('retry_at', 0.0),
+                }
+            self.positions = current
+        for position in positions:
+            mark = float(position.get('markPrice') or 0)
+            if mark and position['symbol'] in current:
+                self.on_mark(position['symbol'], mark)
+
+    def on_mark(self, symbol, mark):
+        state = self.positions.get(symbol)
+        if state is None or self.max_calls <= 0:
+            return
+        distance = abs(mark - state['liq']) / mark * 100
+        if distance >= MARGIN_CALL_LIQ_PERCENT:
+            return
+        with self._lock:
+            if state['inflight'] or state['used'] >= self.max_calls:
+                return
+            # A liquidação ainda é a de antes da última chamada: a posição não foi reconsultada
+            if state['call_liq'] == state['liq'] or time.monotonic() < state['retry_at']:
+                return
+            state['inflight'] = True
+            call_number = state['used'] + 1
+        amount = round(state['margin'] * MARGIN_CALL_RATIO, 2)
+        call_id = f"{symbol}-{state['entry']}-{call_number}"
+        logger.warning(
+            f"{symbol} a {distance:.2f}% da liquidação ({state['liq']}). "
+            f"Chamada de margem {call_number}/{self.max_calls}: +{amount} USDT",
+            extra={'symbol': symbol}
+        )
+        self._jobs.put((symbol, state['entry'], state['liq'], call_number, amount, call_id))
+
+    def _run(self):
+        while True:
+            symbol, entry, liq, call_number, amount, call_id = self._jobs.get()
+            ok = False
+            try:
+                ok = amount > 0 and self.add_margin(symbol, amount, call_id)
+            except Exception as e:
+                logger.error(f"Erro na chamada de margem {call_id}: {e}")
+            with self._lock:
+                # sync() pode ter trocado o estado durante a chamada: o resultado vai para o estado atual do símbolo
+                state = self.positions.get(symbol)
+                if state is not None:
+                    state['inflight'] = False
+                # Com outra entrada é outra posição no mesmo símbolo: a chamada não conta para ela
+                if state is not None and state['entry'] == entry:
+                    if ok:
+                        state['used'] = max(state['used'], call_number)
+                        state['call_liq'] = liq
+                    else:
+                        state['retry_at'] = time.monotonic() + MARGIN_CALL_RETRY_SECONDS
+            MARGIN_CALLS.inc(result='ok' if ok else 'error')
+            if ok and self.on_call is not None:
+                self.on_call(symbol, call_number, amount)
@@ -0,0 +1,258 @@
+# metrics.py
+
+import os
+import time
+import json
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+from latency import tracer
+from logger import get_logger
+from profiler import profiler, PROFILE_SECONDS
+
+load_dotenv()
+
+logger = get_logger('metrics')
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9108))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.extend(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def replace(self, values):
+        """Troca todas as séries de uma vez: {(label1, ...): valor}."""
+        with self._lock:
+            self._values = dict(values)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            bucket_counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    bucket_counts[i] += 1
+                    break
+            state[1] += 1
+            state[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = [(key, (list(state[0]), state[1], state[2])) for key, state in self._values.items()]
+        for key, (bucket_counts, count, total) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [('le', bound)])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, [('le', '+Inf')])
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        # Percentis de latência do tracer (latency.py)
+        lines.append("# HELP bot_latency_ms Latência por estágio do caminho tick -> ack (ms)")
+        lines.append("# TYPE bot_latency_ms gauge")
+        for stage, stats in tracer.snapshot().items():
+            for quantile, field in (('0.5', 'p50'), ('0.99', 'p99'), ('1', 'max')):
+                lines.append(f'bot_latency_ms{{stage="{stage}",quantile="{quantile}"}} {stats[field]}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+API_REQUESTS = registry.register(Counter(
+    'bot_api_requests_total', 'Requisições REST por endpoint e status', ('endpoint', 'status')))
+API_REQUEST_SECONDS = registry.register(Histogram(
+    'bot_api_request_seconds', 'Duração das requisições REST por endpoint', ('endpoint',)))
+RATE_LIMIT_WEIGHT = registry.register(Gauge(
+    'bot_rate_limit_weight', 'Peso de rate limit usado informado pela exchange', ('exchange',)))
+WS_RECONNECTS = registry.register(Counter(
+    'bot_ws_reconnects_total', 'Reconexões do websocket de preços'))
+WS_MESSAGES = registry.register(Counter(
+    'bot_ws_messages_total', 'Mensagens recebidas pelo websocket de preços'))
+OPEN_POSITIONS = registry.register(Gauge(
+    'bot_open_positions', 'Posições abertas acompanhadas pelos trackers'))
+POSITION_PNL_PERCENT = registry.register(Gauge(
+    'bot_position_pnl_percent', 'PnL% líquido de taxas por posição', ('symbol',)))
+POSITION_TRIGGER_PERCENT = registry.register(Gauge(
+    'bot_position_trigger_percent', 'Trigger do trailing stop por posição', ('symbol',)))
+INDICATOR_SECONDS = registry.register(Histogram(
+    'bot_indicator_seconds', 'Tempo de cálculo dos indicadores em decide_trade_direction',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)))
+PERSISTENCE_WRITE_SECONDS = registry.register(Histogram(
+    'bot_persistence_write_seconds', 'Tempo de escrita dos arquivos JSON', ('file',),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)))
+
+
+class _TrackedRequest:
+    def __init__(self):
+        self.ok = True
+
+
+@contextmanager
+def track_request(endpoint):
+    """
+    Mede uma chamada REST. Exceções contam como erro; para respostas HTTP
+    de erro sem exceção, o chamador marca `call.ok = False`.
+    """
+    call = _TrackedRequest()
+    start = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        call.ok = False
+        raise
+    finally:
+        API_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+        API_REQUESTS.inc(endpoint=endpoint, status='ok' if call.ok else 'error')
+
+
+# Rotas GET extras que devolvem JSON: caminho -> função sem argumentos (ex.: /accounts)
+json_routes = {}
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def _send(self, status, body, content_type='application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.rstrip('/')
+        if path == '/metrics':
+            self._send(200, registry.render().encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8')
+        elif path == '/latency':
+            self._send(200, json.dumps(tracer.snapshot()).encode('utf-8'))
+        elif path == '/profile':
+            self._send(200, json.dumps(profiler.status()).encode('utf-8'))
+        elif path in json_routes:
+            self._send(200, json.dumps(json_routes[path]()).encode('utf-8'))
+        else:
+            self._send(404, b'', 'text/plain')
+
+    def do_POST(self):
+        # Controle do profiler: POST /profile/start?seconds=30 e POST /profile/stop
+        url = urlsplit(self.path)
+        path = url.path.rstrip('/')
+        if path == '/profile/start':
+            try:
+                seconds = float(parse_qs(url.query).get('seconds', [PROFILE_SECONDS])[0])
+            except ValueError:
+                self._send(400, b'{"error": "seconds invalido"}')
+                return
+            started = profiler.start(seconds)
+            self._send(200 if started else 409, json.dumps(profiler.status()).encode('utf-8'))
+        elif path == '/profile/stop':
+            profiler.stop()
+            self._send(200, json.dumps(profiler.status()).encode('utf-8'))
+        else:
+            self._send(404, b'', 'text/plain')
+
+    def log_message(self, format, *args):
+        # Silencia o log padrão do http.server (uma linha por scrape)
+        pass
+
+
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """
+    Sobe o endpoint HTTP local (GET /metrics, /latency, /profile e as rotas de json_routes) numa thread daemon.
+    Retorna o servidor, ou None se a porta estiver ocupada.
+    """
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.warning(f"Não foi possível iniciar o servidor de métricas em {host}:{port}: {e}")
+        return None
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    logger.info(f"Servidor de métricas ouvindo em http://{host}:{port}/metrics")
+    return server
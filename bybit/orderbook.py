@@ -0,0 +1,243 @@
+# orderbook.py
+
+import os
+import bisect
+import asyncio
+import threading
+from dotenv import load_dotenv
+
+from metrics import registry, Counter
+from logger import get_logger
+
+load_dotenv()
+
+logger = get_logger('orderbook')
+
+# Slippage máximo (em bps sobre o preço médio do livro) aceito para abrir posição automaticamente
+MAX_ENTRY_SLIPPAGE_BPS = float(os.getenv("MAX_ENTRY_SLIPPAGE_BPS", 20))
+# Deltas guardados enquanto o snapshot REST não chega
+MAX_BUFFERED_DELTAS = 5000
+
+BOOK_RESYNCS = registry.register(Counter(
+    'bot_orderbook_resyncs_total', 'Ressincronizações do livro por lacuna de sequência ou reconexão', ('exchange',)))
+
+
+class OrderBook:
+    """
+    Livro L2 de um símbolo mantido por snapshot + deltas. Os preços ficam em
+    listas ordenadas (bisect) e os tamanhos num dict, então consultar o
+    preço médio de execução só percorre os níveis necessários.
+
+    As quantidades estão na unidade da exchange (moeda base na Bybit e na
+    Binance, contratos na KuCoin).
+    """
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.bids = {}
+        self.asks = {}
+        self._bid_prices = []   # crescente; o melhor bid é o último
+        self._ask_prices = []   # crescente; o melhor ask é o primeiro
+        self.update_id = 0
+        self.ready = False
+        self.buffer = []
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Manutenção
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _set_level(levels, prices, price, size):
+        if size == 0:
+            if levels.pop(price, None) is not None:
+                i = bisect.bisect_left(prices, price)
+                if i < len(prices) and prices[i] == price:
+                    del prices[i]
+        else:
+            if price not in levels:
+                bisect.insort(prices, price)
+            levels[price] = size
+
+    def apply_snapshot(self, bids, asks, update_id):
+        with self._lock:
+            self.bids = {price: size for price, size in bids if size > 0}
+            self.asks = {price: size for price, size in asks if size > 0}
+            self._bid_prices = sorted(self.bids)
+            self._ask_prices = sorted(self.asks)
+            self.update_id = update_id
+            self.ready = True
+
+    def apply_delta(self, bids, asks, last_id):
+        with self._lock:
+            for price, size in bids:
+                self._set_level(self.bids, self._bid_prices, price, size)
+            for price, size in asks:
+                self._set_level(self.asks, self._ask_prices, price, size)
+            self.update_id = last_id
+
+    def reset(self):
+        with self._lock:
+            self.ready = False
+            self.buffer = []
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def best_bid(self):
+        prices = self._bid_prices
+        return prices[-1] if prices else None
+
+    def best_ask(self):
+        prices = self._ask_prices
+        return prices[0] if prices else None
+
+    def mid(self):
+        bid, ask = self.best_bid(), self.best_ask()
+        if bid is None or ask is None:
+            return None
+        return (bid + ask) / 2
+
+    def _walk(self, side, quantity=None, notional=None):
+        """Percorre os níveis do lado agredido até completar `quantity` (ou `notional`)."""
+        with self._lock:
+            if not self._bid_prices or not self._ask_prices:
+                return None
+            reference = (self._bid_prices[-1] + self._ask_prices[0]) / 2
+            if side == 'buy':
+                levels, prices = self.asks, iter(self._ask_prices)
+            else:
+                levels, prices = self.bids, reversed(self._bid_prices)
+            filled = cost = 0.0
+            worst = None
+            used = 0
+            for price in prices:
+                size = levels[price]
+                remaining = (quantity - filled) if quantity is not None else (notional - cost) / price
+                if remaining <= 0:
+                    break
+                take = size if size < remaining else remaining
+                filled += take
+                cost += take * price
+                worst = price
+                used += 1
+        if filled == 0:
+            return None
+        avg_price = cost / filled
+        slippage = (avg_price - reference) if side == 'buy' else (reference - avg_price)
+        target, done = (quantity, filled) if quantity is not None else (notional, cost)
+        return {
+            'avg_price': avg_price,
+            'worst_price': worst,
+            'filled': filled,
+            'notional': cost,
+            'levels': used,
+            'slippage_bps': slippage / reference * 10000,
+            'complete': done >= target * (1 - 1e-9),
+        }
+
+    def estimate(self, side, quantity):
+        """
+        Preço médio, pior preço e slippage (bps contra o preço médio do livro)
+        de uma ordem a mercado de `quantity`. `complete` é False se o livro
+        espelhado não tiver profundidade suficiente.
+        """
+        if quantity <= 0:
+            return None
+        return self._walk(side, quantity=quantity)
+
+    def estimate_notional(self, side, notional):
+        """Mesmo que estimate(), para uma ordem definida em USD (ex.: usd_amount * leverage)."""
+        if notional <= 0:
+            return None
+        return self._walk(side, notional=notional)
+
+
+class OrderBookMirror:
+    """
+    Espelha livros L2 a partir do StreamManager (bybit_book, binance_book,
+    kucoin_book). Deltas com lacuna de sequência disparam ressincronização:
+    snapshot REST (Binance/KuCoin) ou reassinatura (a Bybit reenvia o snapshot).
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.books = {}
+        manager.add_listener(self._on_message)
+
+    def track(self, exchange, symbol):
+        """Começa a espelhar o livro de `symbol` na exchange ('bybit', 'binance' ou 'kucoin')."""
+        channel = f"{exchange}_book"
+        if (channel, symbol) in self.books:
+            return self.books[(channel, symbol)]
+        book = self.books[(channel, symbol)] = OrderBook(symbol)
+        self.manager.subscribe(channel, [symbol])
+        if channel != 'bybit_book':
+            asyncio.run_coroutine_threadsafe(self._load_snapshot(channel, book), self.manager.loop)
+        return book
+
+    def untrack(self, exchange, symbol):
+        channel = f"{exchange}_book"
+        if self.books.pop((channel, symbol), None) is not None:
+            self.manager.unsubscribe(channel, [symbol])
+
+    def get(self, exchange, symbol):
+        book = self.books.get((f"{exchange}_book", symbol))
+        return book if book is not None and book.ready else None
+
+    async def _load_snapshot(self, channel, book):
+        adapter = self.manager.adapters.get(channel)
+        if adapter is None:
+            # O adaptador é criado pelo subscribe, que roda antes no mesmo loop
+            await asyncio.sleep(0)
+            adapter = self.manager.adapters[channel]
+        loop = asyncio.get_running_loop()
+        try:
+            bids, asks, update_id = await loop.run_in_executor(None, adapter.rest_snapshot, book.symbol)
+        except Exception as e:
+            logger.warning(f"Erro ao obter snapshot do livro {channel}:{book.symbol}: {e}")
+            await asyncio.sleep(5)
+            if (channel, book.symbol) in self.books:
+                self.manager.loop.create_task(self._load_snapshot(channel, book))
+            return
+        book.apply_snapshot(bids, asks, update_id)
+        # Aplica os deltas que chegaram durante o download e são posteriores ao snapshot
+        buffered, book.buffer = book.buffer, []
+        for delta in buffered:
+            if not self._apply(channel, book, delta):
+                return
+        logger.info(f"Livro {channel}:{book.symbol} sincronizado ({len(book.bids)} bids, {len(book.asks)} asks)")
+
+    def _resync(self, channel, book, reason):
+        BOOK_RESYNCS.inc(exchange=channel)
+        logger.warning(f"Livro {channel}:{book.symbol}: {reason}. Ressincronizando...")
+        book.reset()
+        if channel == 'bybit_book':
+            self.manager.loop.create_task(self.manager._resubscribe(channel, [book.symbol]))
+        else:
+            self.manager.loop.create_task(self._load_snapshot(channel, book))
+
+    def _apply(self, channel, book, delta):
+        if delta['last'] <= book.update_id:
+            return True  # já contido no snapshot
+        if delta['first'] > book.update_id + 1:
+            self._resync(channel, book, f"lacuna de sequência ({book.update_id} -> {delta['first']})")
+            return False
+        book.apply_delta(delta['bids'], delta['asks'], delta['last'])
+        return True
+
+    def _on_message(self, exchange, symbol, price, data):
+        if not exchange.endswith('_book'):
+            return
+        book = self.books.get((exchange, symbol))
+        if book is None:
+            return
+        if data['type'] == 'snapshot':
+            book.buffer = []
+            book.apply_snapshot(data['bids'], data['asks'], data['last'])
+        elif not book.ready:
+            if len(book.buffer) < MAX_BUFFERED_DELTAS:
+                book.buffer.append(data)
+        else:
+            self._apply(exchange, book, data)
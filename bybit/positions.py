@@ -0,0 +1,210 @@
+# positions.py
+
+import numpy as np
+
+# Colunas numéricas da tabela e a chave equivalente nos dicts de posição (snapshot, trackers, código antigo)
+COLUMNS = (
+    ('qty', 'currentQty'),           # com sinal: positivo long, negativo short
+    ('entry', 'avgEntryPrice'),
+    ('mark', 'markPrice'),
+    ('leverage', 'realLeverage'),
+    ('margin', 'posMargin'),
+    ('unrealised', 'unrealisedPnl'),
+    ('realised', 'realisedPnl'),     # curRealisedPnl * 2, já contando a taxa de fechamento
+    ('cur_realised', 'curRealisedPnl'),
+    ('liq', 'liquidationPrice'),
+)
+KEYS = {key: column for column, key in COLUMNS}
+# A Bybit só informa a margem inicial da posição (positionIM): as duas chaves antigas apontam para ela
+KEYS['maintMargin'] = 'margin'
+# NaN na tabela = valor desconhecido; a visão de dict devolve o que o código antigo espera
+MISSING = {'liq': 'N/A', 'cur_realised': None}
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _column(name):
+    return property(lambda self: float(getattr(self.table, name)[self.i]), doc=f"Coluna `{name}` desta linha.")
+
+
+class Position:
+    """
+    Uma posição como objeto: visão de uma linha da PositionTable, sem cópia.
+    Os atributos (`qty`, `entry`, `mark`...) leem direto dos arrays da
+    tabela, e `position['avgEntryPrice']` / `position.get(...)` aceitam as
+    chaves dos dicts de fetch_open_positions, então o código que trata
+    posições como dicts continua funcionando. `to_dict()` só é usado para
+    gravar em JSON.
+    """
+    __slots__ = ('table', 'i')
+
+    qty = _column('qty')
+    entry = _column('entry')
+    mark = _column('mark')
+    leverage = _column('leverage')
+    margin = _column('margin')
+    unrealised = _column('unrealised')
+    realised = _column('realised')
+    cur_realised = _column('cur_realised')
+    liq = _column('liq')
+
+    def __init__(self, table, i):
+        self.table = table
+        self.i = i
+
+    @property
+    def symbol(self):
+        return self.table.symbols[self.i]
+
+    def __getitem__(self, key):
+        if key == 'symbol':
+            return self.symbol
+        column = KEYS[key]
+        value = float(getattr(self.table, column)[self.i])
+        if value != value and column in MISSING:
+            return MISSING[column]
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return key == 'symbol' or key in KEYS
+
+    def keys(self):
+        return ('symbol',) + tuple(KEYS)
+
+    def to_dict(self):
+        return {key: self[key] for key in self.keys()}
+
+    def __repr__(self):
+        return f"Position({self.symbol!r}, qty={self.qty}, entry={self.entry}, mark={self.mark})"
+
+
+class PositionTable:
+    """
+    Posições abertas como struct of arrays: um array float64 por coluna
+    (COLUMNS) e a lista `symbols`, uma linha por posição. Stops, risco e
+    custos avaliam todas as posições com operações de array; as linhas como
+    objetos (Position) são visões dos mesmos arrays, criadas uma vez por
+    tabela. `from_positions()` devolve a própria tabela quando recebe uma,
+    então passar a tabela adiante não copia nada.
+    """
+
+    def __init__(self, symbols=(), **columns):
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        n = len(self.symbols)
+        for column, _ in COLUMNS:
+            values = columns.get(column)
+            setattr(self, column, np.zeros(n) if values is None else np.asarray(values, dtype=float))
+        self._rows = None
+
+    @classmethod
+    def from_bybit(cls, rows):
+        """Tabela a partir da lista crua de get_positions (pybit), numa única passada e sem dicts intermediários."""
+        symbols, qty, entry, mark, leverage, margin, unrealised, cur_realised, liq = ([] for _ in range(9))
+        for pos in rows:
+            symbols.append(pos.get('symbol', ''))
+            size = float(pos.get('size', '0'))
+            qty.append(size if pos.get('side', '').lower() == 'buy' else -size)
+            entry.append(pos.get('avgPrice', 0))
+            mark.append(pos.get('markPrice', 0) or 0)
+            leverage.append(pos.get('leverage', 0))
+            # 'positionIM' costuma ser a margem alocada para a posição
+            margin.append(pos.get('positionIM', 0))
+            unrealised.append(pos.get('unrealisedPnl', 0))
+            cur_realised.append(pos.get('curRealisedPnl', 0))
+            liq.append(pos.get('liqPrice') or 'nan')
+        # As strings numéricas da Bybit são convertidas coluna a coluna pelo NumPy
+        cur_realised = np.array(cur_realised, dtype=float)
+        return cls(
+            symbols, qty=qty, entry=np.array(entry, dtype=float), mark=np.array(mark, dtype=float),
+            leverage=np.array(leverage, dtype=float), margin=np.array(margin, dtype=float),
+            unrealised=np.array(unrealised, dtype=float),
+            # Realizado multiplicado por 2 já contando a taxa de fechamento da posição
+            realised=cur_realised * 2, cur_realised=cur_realised, liq=np.array(liq, dtype=float)
+        )
+
+    @classmethod
+    def from_positions(cls, positions):
+        """Tabela a partir de dicts de posição (snapshot, trackers) ou de outra tabela (sem cópia)."""
+        if isinstance(positions, PositionTable):
+            return positions
+        positions = list(positions or ())
+        columns = {column: [] for column, _ in COLUMNS}
+        for position in positions:
+            for column, key in COLUMNS:
+                value = position.get(key)
+                # Vazio conta como zero, exceto onde a falta do valor tem significado ('N/A', sem realizado)
+                columns[column].append(_float(value) if column in MISSING else _float(value or 0))
+        return cls([position.get('symbol', '') for position in positions], **columns)
+
+    # ------------------------------------------------------------------
+    # Visão de lista
+    # ------------------------------------------------------------------
+
+    def rows(self):
+        if self._rows is None:
+            self._rows = [Position(self, i) for i in range(len(self.symbols))]
+        return self._rows
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __iter__(self):
+        return iter(self.rows())
+
+    def __getitem__(self, i):
+        return self.rows()[i]
+
+    def get(self, symbol):
+        i = self.index.get(symbol)
+        return None if i is None else self.rows()[i]
+
+    def __eq__(self, other):
+        if not isinstance(other, PositionTable):
+            return NotImplemented
+        return self.symbols == other.symbols and all(
+            np.array_equal(getattr(self, column), getattr(other, column), equal_nan=True) for column, _ in COLUMNS
+        )
+
+    __hash__ = None
+
+    def to_list(self):
+        """Lista de dicts para gravar em JSON (snapshot da abertura)."""
+        return [position.to_dict() for position in self.rows()]
+
+    # ------------------------------------------------------------------
+    # Cálculos em array
+    # ------------------------------------------------------------------
+
+    def mark_or_entry(self):
+        """Mark de cada posição; o preço de entrada quando a Bybit não informou o mark."""
+        return np.where(self.mark > 0, self.mark, self.entry)
+
+    def unrealised_at(self, mark):
+        """PnL não realizado (USDT) de todas as posições com os preços `mark`."""
+        return self.qty * (mark - self.entry)
+
+    def percent_of_margin(self, values):
+        """`values` em % da margem de cada posição; 0 onde a margem é zero."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.margin != 0, values / self.margin * 100, 0.0)
+
+
+def to_json(obj):
+    """`default` do json.dump para posições e tabelas dentro de trackers e snapshots."""
+    if isinstance(obj, Position):
+        return obj.to_dict()
+    if isinstance(obj, PositionTable):
+        return obj.to_list()
+    raise TypeError(f"{type(obj).__name__} não é serializável em JSON")
@@ -0,0 +1,156 @@
+# profiler.py
+
+import os
+import sys
+import time
+import signal
+import threading
+from collections import Counter
+from dotenv import load_dotenv
+
+from logger import get_logger
+
+load_dotenv()
+
+logger = get_logger('profiler')
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 10))
+PROFILE_SECONDS = float(os.getenv("PROFILE_SECONDS", 30))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 300))
+PROFILE_MAX_DEPTH = 128
+
+
+class SamplingProfiler:
+    """
+    Profiler por amostragem: uma thread daemon lê as pilhas de todas as
+    threads (sys._current_frames) a cada PROFILE_INTERVAL_MS e conta as
+    pilhas repetidas. Não instrumenta chamadas, então o custo fica no
+    intervalo de amostragem e não no código medido.
+
+    A saída é o formato "folded" (uma pilha por linha, frames separados por
+    ';' e a contagem no fim), aceito por flamegraph.pl, speedscope e inferno.
+    """
+
+    def __init__(self, interval_ms=PROFILE_INTERVAL_MS, output_dir=PROFILE_DIR):
+        self.interval = interval_ms / 1000
+        self.output_dir = output_dir
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._samples = Counter()
+        self._labels = {}
+        self._started_at = 0.0
+        self._duration = 0.0
+        self.sample_count = 0
+        self.last_output = None
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration=PROFILE_SECONDS):
+        """Inicia uma janela de amostragem. Retorna False se já houver uma em andamento."""
+        with self._lock:
+            if self.is_running:
+                return False
+            self._duration = max(0.1, min(float(duration), PROFILE_MAX_SECONDS))
+            self._samples = Counter()
+            self.sample_count = 0
+            self._stop_event.clear()
+            self._started_at = time.monotonic()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+        logger.info(f"Profiler iniciado por {self._duration:g}s (intervalo de {self.interval * 1000:.0f}ms)")
+        return True
+
+    def stop(self):
+        """
+        Pede o fim da janela atual antes do prazo e volta na hora (roda na
+        thread da GUI): a thread do profiler grava o arquivo e `status()`
+        mostra 'stopping' até `last_output` apontar para ele.
+        """
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return False
+        self._stop_event.set()
+        return True
+
+    def toggle(self, duration=PROFILE_SECONDS):
+        if self.is_running:
+            self.stop()
+        else:
+            self.start(duration)
+
+    def status(self):
+        return {
+            'running': self.is_running,
+            'stopping': self.is_running and self._stop_event.is_set(),
+            'elapsed': round(time.monotonic() - self._started_at, 1) if self.is_running else 0.0,
+            'duration': self._duration,
+            'samples': self.sample_count,
+            'last_output': self.last_output,
+        }
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _sample(self, own_ident):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = []
+            while frame is not None and len(stack) < PROFILE_MAX_DEPTH:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            stack.reverse()
+            self._samples[';'.join(stack)] += 1
+        self.sample_count += 1
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        deadline = self._started_at + self._duration
+        while not self._stop_event.wait(self.interval):
+            self._sample(own_ident)
+            if time.monotonic() >= deadline:
+                break
+        self._write()
+
+    def _write(self):
+        if not self._samples:
+            logger.warning("Profiler encerrado sem amostras")
+            return
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir, time.strftime("profile-%Y%m%d-%H%M%S.folded"))
+            with open(path, 'w') as f:
+                for stack, count in self._samples.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            logger.error(f"Erro ao gravar o profile: {e}")
+            return
+        self.last_output = path
+        logger.info(f"Profile gravado em {path} ({self.sample_count} amostras). "
+                    f"Gere o flamegraph com: flamegraph.pl {path} > profile.svg")
+
+
+profiler = SamplingProfiler()
+
+
+def install_signal_handler(signum=getattr(signal, 'SIGUSR2', None)):
+    """
+    Liga/desliga o profiler com `kill -USR2 <pid>`. Precisa ser chamado na
+    thread principal; sem SIGUSR2 (Windows) não faz nada.
+    O handler Python só roda quando o laço do Qt devolve o controle ao
+    interpretador, o que os QTimers da janela garantem a cada segundo.
+    """
+    if signum is None:
+        return False
+    signal.signal(signum, lambda *args: profiler.toggle())
+    return True
@@ -0,0 +1,249 @@
+# risk.py
+
+import os
+import json
+import time
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+from metrics import registry, Gauge, Counter
+from positions import PositionTable
+from logger import get_logger
+
+load_dotenv()
+
+logger = get_logger('risk')
+
+# Limites da conta aplicados antes de qualquer abertura automática (0 desliga o limite)
+RISK_MAX_EXPOSURE = float(os.getenv("RISK_MAX_EXPOSURE", 0))            # notional total em USD
+RISK_MAX_MARGIN_USAGE = float(os.getenv("RISK_MAX_MARGIN_USAGE", 0.8))  # margem usada / patrimônio
+RISK_MAX_DAILY_LOSS = float(os.getenv("RISK_MAX_DAILY_LOSS", 0))        # perda no dia (UTC) em USD
+# Movimento adverso usado no pior caso: todas as posições andam juntos este percentual
+RISK_SHOCK_PERCENT = float(os.getenv("RISK_SHOCK_PERCENT", 5))
+# Aviso quando o mark de alguma posição chega a menos disto (%) do preço de liquidação
+RISK_LIQ_WARN_PERCENT = float(os.getenv("RISK_LIQ_WARN_PERCENT", 5))
+
+RISK_STATE_FILE = 'risk_state.json'
+
+PORTFOLIO_NOTIONAL = registry.register(Gauge(
+    'bot_portfolio_notional_usd', 'Notional bruto das posições abertas (USD)'))
+PORTFOLIO_NET_NOTIONAL = registry.register(Gauge(
+    'bot_portfolio_net_notional_usd', 'Notional direcional das posições (long - short, USD)'))
+PORTFOLIO_MARGIN_USAGE = registry.register(Gauge(
+    'bot_portfolio_margin_usage', 'Margem das posições sobre o patrimônio'))
+PORTFOLIO_WORST_CASE_LOSS = registry.register(Gauge(
+    'bot_portfolio_worst_case_loss_usd', 'Perda com todas as posições andando RISK_SHOCK_PERCENT contra'))
+PORTFOLIO_DAILY_PNL = registry.register(Gauge(
+    'bot_portfolio_daily_pnl_usd', 'Variação do patrimônio desde o início do dia (UTC)'))
+POSITION_LIQ_DISTANCE = registry.register(Gauge(
+    'bot_position_liquidation_distance_percent', 'Distância do mark ao preço de liquidação (%)', ('symbol',)))
+RISK_BLOCKED_ENTRIES = registry.register(Counter(
+    'bot_risk_blocked_entries_total', 'Aberturas automáticas barradas pelos limites da conta', ('reason',)))
+
+
+def _utc_day():
+    return time.strftime('%Y-%m-%d', time.gmtime())
+
+
+class PortfolioRisk:
+    """
+    Visão agregada das posições abertas em arrays NumPy (uma linha por
+    posição): quantidade com sinal, entrada, mark, liquidação e margem.
+    `update_price()` só troca o mark; `recompute()` refaz os agregados de uma
+    vez, barato o bastante para rodar a cada tick.
+
+    O patrimônio vem do saldo da conta (`update_equity`) e é ajustado pela
+    variação do PnL não realizado desde a última leitura, então a perda do
+    dia acompanha o preço sem consultar a API a cada tick.
+    """
+
+    def __init__(self, state_file=RISK_STATE_FILE):
+        self.state_file = state_file
+        self.symbols = []
+        self.index = {}
+        self.qty = np.zeros(0)
+        self.entry = np.zeros(0)
+        self.mark = np.zeros(0)
+        self.liq = np.zeros(0)
+        self.margin = np.zeros(0)
+        self._lock = threading.Lock()
+        self.manager = None
+        self._streamed = set()
+
+        self.equity_snapshot = None   # patrimônio lido da conta
+        self.upl_snapshot = 0.0       # PnL não realizado no momento dessa leitura
+        self.day = None
+        self.day_start_equity = None
+        self._load_state()
+
+        self.summary = self._empty_summary()
+
+    @staticmethod
+    def _empty_summary():
+        return {
+            'gross_notional': 0.0, 'net_notional': 0.0, 'margin': 0.0, 'unrealised_pnl': 0.0,
+            'equity': None, 'margin_usage': 0.0, 'worst_case_loss': 0.0, 'daily_pnl': 0.0,
+            'liq_distance': {}, 'min_liq_distance': None, 'min_liq_symbol': None,
+        }
+
+    # ------------------------------------------------------------------
+    # Entrada de dados
+    # ------------------------------------------------------------------
+
+    def load_positions(self, positions):
+        """Copia as colunas das posições abertas da PositionTable de fetch_open_positions (api.py)."""
+        table = PositionTable.from_positions(positions)
+        held = table.qty != 0
+        with self._lock:
+            self.symbols = [symbol for symbol, keep in zip(table.symbols, held) if keep]
+            self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+            self.qty = table.qty[held]
+            self.entry = table.entry[held]
+            # O mark é atualizado pelo stream: cópia própria, a tabela das posições não muda
+            self.mark = table.mark_or_entry()[held]
+            # NaN: sem liquidação conhecida
+            self.liq = table.liq[held]
+            self.margin = table.margin[held]
+        new_symbols = [symbol for symbol in self.symbols if symbol not in self._streamed]
+        if self.manager is not None and new_symbols:
+            self._streamed.update(new_symbols)
+            self.manager.subscribe('bybit', new_symbols)
+        return self.recompute()
+
+    def update_price(self, symbol, price):
+        i = self.index.get(symbol)
+        if i is not None and price:
+            self.mark[i] = price
+
+    def update_equity(self, equity):
+        """Patrimônio total da conta (totalEquity), lido junto com o saldo."""
+        with self._lock:
+            self.equity_snapshot = float(equity)
+            self.upl_snapshot = float(np.dot(self.qty, self.mark - self.entry)) if self.qty.size else 0.0
+            day = _utc_day()
+            if self.day != day or self.day_start_equity is None:
+                self.day = day
+                self.day_start_equity = self.equity_snapshot
+                self._save_state()
+
+    def attach_stream(self, manager):
+        """Atualiza o mark pelos tickers da Bybit; os símbolos das posições são assinados em load_positions."""
+        self.manager = manager
+        manager.add_listener(self._on_stream)
+
+    def _on_stream(self, exchange, symbol, price, data):
+        if exchange == 'bybit':
+            # O ticker traz o mark price (base do PnL e da liquidação); deltas podem trazer só parte dos campos
+            mark = data.get('markPrice')
+            self.update_price(symbol, float(mark) if mark else price)
+
+    # ------------------------------------------------------------------
+    # Agregados
+    # ------------------------------------------------------------------
+
+    def recompute(self):
+        with self._lock:
+            qty, entry, mark, liq, margin = self.qty, self.entry, self.mark, self.liq, self.margin
+            summary = self._empty_summary()
+            if qty.size:
+                notional = np.abs(qty) * mark
+                upl = qty * (mark - entry)
+                # Posições isoladas: a perda adicional de cada uma para na margem que ainda resta
+                remaining = np.maximum(margin + upl, 0.0)
+                shock = notional * (RISK_SHOCK_PERCENT / 100)
+                long = qty > 0
+                loss_if_down = np.minimum(shock, remaining)[long].sum() - shock[~long].sum()
+                loss_if_up = np.minimum(shock, remaining)[~long].sum() - shock[long].sum()
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    liq_distance = np.abs(mark - liq) / mark * 100
+
+                summary['gross_notional'] = float(notional.sum())
+                summary['net_notional'] = float((qty * mark).sum())
+                summary['margin'] = float(margin.sum())
+                summary['unrealised_pnl'] = float(upl.sum())
+                # Os dois lados andam juntos (cripto é muito correlacionada): vale o pior sentido
+                summary['worst_case_loss'] = float(max(loss_if_down, loss_if_up, 0.0))
+                known = ~np.isnan(liq_distance)
+                summary['liq_distance'] = {
+                    symbol: float(distance) for symbol, distance, ok in zip(self.symbols, liq_distance, known) if ok
+                }
+                if known.any():
+                    i = int(np.nanargmin(liq_distance))
+                    summary['min_liq_distance'] = float(liq_distance[i])
+                    summary['min_liq_symbol'] = self.symbols[i]
+
+            if self.equity_snapshot is not None:
+                equity = self.equity_snapshot + summary['unrealised_pnl'] - self.upl_snapshot
+                summary['equity'] = equity
+                if equity > 0:
+                    summary['margin_usage'] = summary['margin'] / equity
+                if self.day_start_equity is not None and self.day == _utc_day():
+                    summary['daily_pnl'] = equity - self.day_start_equity
+            self.summary = summary
+
+        PORTFOLIO_NOTIONAL.set(summary['gross_notional'])
+        PORTFOLIO_NET_NOTIONAL.set(summary['net_notional'])
+        PORTFOLIO_MARGIN_USAGE.set(summary['margin_usage'])
+        PORTFOLIO_WORST_CASE_LOSS.set(summary['worst_case_loss'])
+        PORTFOLIO_DAILY_PNL.set(summary['daily_pnl'])
+        POSITION_LIQ_DISTANCE.replace({(symbol,): d for symbol, d in summary['liq_distance'].items()})
+        return summary
+
+    def liquidation_warnings(self, threshold=RISK_LIQ_WARN_PERCENT):
+        """Posições cujo mark está a menos de `threshold`% da liquidação."""
+        return {s: d for s, d in self.summary['liq_distance'].items() if d < threshold}
+
+    # ------------------------------------------------------------------
+    # Limites
+    # ------------------------------------------------------------------
+
+    def check_entry(self, notional, margin):
+        """
+        (True, None) se uma nova posição de `notional` USD usando `margin` USD
+        cabe nos limites da conta; senão (False, motivo).
+        """
+        summary = self.recompute()
+        if RISK_MAX_DAILY_LOSS > 0 and summary['daily_pnl'] <= -RISK_MAX_DAILY_LOSS:
+            return self._blocked('daily_loss', f"perda do dia {summary['daily_pnl']:.2f} USD atingiu o limite de {RISK_MAX_DAILY_LOSS:.2f}")
+        if RISK_MAX_EXPOSURE > 0 and summary['gross_notional'] + notional > RISK_MAX_EXPOSURE:
+            return self._blocked(
+                'exposure',
+                f"exposição {summary['gross_notional'] + notional:.2f} USD passaria do limite de {RISK_MAX_EXPOSURE:.2f}"
+            )
+        equity = summary['equity']
+        if RISK_MAX_MARGIN_USAGE > 0 and equity:
+            usage = (summary['margin'] + margin) / equity
+            if usage > RISK_MAX_MARGIN_USAGE:
+                return self._blocked(
+                    'margin_usage', f"uso de margem {usage:.0%} passaria do limite de {RISK_MAX_MARGIN_USAGE:.0%}"
+                )
+        return True, None
+
+    @staticmethod
+    def _blocked(reason, message):
+        RISK_BLOCKED_ENTRIES.inc(reason=reason)
+        return False, message
+
+    # ------------------------------------------------------------------
+    # Persistência do início do dia (a perda diária sobrevive a reinícios)
+    # ------------------------------------------------------------------
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+            if state.get('day') == _utc_day():
+                self.day = state['day']
+                self.day_start_equity = float(state['day_start_equity'])
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Erro ao carregar {self.state_file}: {e}")
+
+    def _save_state(self):
+        try:
+            with open(self.state_file, 'w') as f:
+                json.dump({'day': self.day, 'day_start_equity': self.day_start_equity}, f)
+        except Exception as e:
+            logger.warning(f"Erro ao salvar {self.state_file}: {e}")
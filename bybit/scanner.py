@@ -0,0 +1,335 @@
+# scanner.py
+
+import os
+import time
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+from api import list_usdt_contracts, fetch_klines
+from decode import klines_array
+from events import bus, Signal
+from indicators import Candles, enabled_indicators, evaluate, live_lookback, split_name
+from metrics import registry, Histogram, Gauge
+from logger import get_logger
+
+load_dotenv()
+
+logger = get_logger('scanner')
+
+SCANNER_ENABLED = os.getenv("SCANNER_ENABLED", "False").lower() == "true"
+SCANNER_SYMBOLS = int(os.getenv("SCANNER_SYMBOLS", 300))
+SCANNER_CANDLES = int(os.getenv("SCANNER_CANDLES", 100))
+SCANNER_INTERVAL = float(os.getenv("SCANNER_INTERVAL", 5))
+SCANNER_REFRESH_SYMBOLS = float(os.getenv("SCANNER_REFRESH_SYMBOLS", 3600))
+
+# Mesmo mínimo de decide_trade_direction (SMA longa de 25 períodos)
+MIN_CANDLES = 26
+
+SCANNER_EVALUATION_SECONDS = registry.register(Histogram(
+    'bot_scanner_evaluation_seconds', 'Tempo da avaliação vetorizada de todos os símbolos do scanner',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)))
+SCANNER_SYMBOLS_GAUGE = registry.register(Gauge(
+    'bot_scanner_symbols', 'Símbolos acompanhados pelo scanner e com histórico suficiente', ('state',)))
+
+
+def evaluate_signals(closes, highs, lows, volumes, rsi_period=14, use_sma=True, use_rsi=True,
+                     use_volume=False, use_high_low=True, extra=(), strategy='unanimous'):
+    """
+    Versão vetorizada de decide_trade_direction: recebe matrizes
+    (símbolos x candles), do mais antigo para o mais novo, e roda os
+    indicadores registrados (indicators.py) em todas as linhas de uma vez.
+    Retorna um dict de arrays; `decision` vale 1 (buy), -1 (sell) ou 0 (wait).
+    """
+    candles = Candles(highs, lows, closes, volumes)
+    # Os buffers do scanner são só de 1m: indicadores 'nome@timeframe' ficam de fora
+    extra = tuple(name for name in extra if split_name(name)[1] is None)
+    enabled = enabled_indicators(use_sma, use_rsi, use_volume, use_high_low, extra)
+    # SMA e RSI entram sempre: são a base do ranking
+    names = ('sma', 'rsi') + tuple(name for name in enabled if name not in ('sma', 'rsi'))
+    # High/Low da janela inteira
+    params = {'rsi': {'period': rsi_period}, 'high_low': {'window': len(candles)}}
+    decision, outputs = evaluate(candles, names, enabled, params, strategy)
+
+    sma_short, sma_long = outputs['sma']['short'], outputs['sma']['long']
+    rsi = outputs['rsi']['value']
+    # Força do sinal para o ranking: afastamento das SMAs (%) + afastamento do RSI de 50
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sma_spread = np.abs(sma_short / sma_long - 1) * 100
+    score = np.nan_to_num(sma_spread) + np.abs(rsi - 50) / 50
+
+    return {
+        'decision': decision,
+        'score': score,
+        'sma_short': sma_short,
+        'sma_long': sma_long,
+        'rsi': rsi,
+        'price': closes[:, -1],
+    }
+
+
+class SignalScanner:
+    """
+    Mantém buffers de candles de 1m para centenas de contratos USDT em
+    matrizes NumPy (símbolos x candles) e avalia o conjunto de sinais de
+    decide_trade_direction em todos eles numa única passada.
+
+    Os candles são preenchidos uma vez via get_kline e depois atualizados
+    pelo stream de tickers da Bybit (attach_stream) ou, sem stream, por uma
+    única chamada get_tickers por ciclo (em vez de uma chamada por símbolo).
+    O ranking das oportunidades fica em `opportunities`; cada mudança de
+    decisão de um símbolo é publicada como Signal no barramento de eventos.
+    """
+
+    def __init__(self, max_symbols=SCANNER_SYMBOLS, candles=SCANNER_CANDLES, interval=SCANNER_INTERVAL):
+        self.max_symbols = max_symbols
+        self.candles = candles
+        self.interval = interval
+        self.signal_params = {}
+        self.opportunities = []
+        self._decisions = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._last_symbol_refresh = 0.0
+        self.stream = None
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._allocate([])
+
+    def _allocate(self, symbols):
+        n = len(symbols)
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.closes = np.zeros((n, self.candles))
+        self.highs = np.zeros((n, self.candles))
+        self.lows = np.zeros((n, self.candles))
+        self.volumes = np.zeros((n, self.candles))
+        self.filled = np.zeros(n, dtype=np.int32)
+        self.bar_minute = np.zeros(n, dtype=np.int64)
+        self.last_volume_24h = np.full(n, np.nan)
+        self.turnover_24h = np.zeros(n)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="signal-scanner", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def attach_stream(self, manager):
+        """Passa a receber os tickers pelo StreamManager em vez de consultar get_tickers a cada ciclo."""
+        self.stream = manager
+        manager.add_listener(self._on_stream)
+        if self.symbols:
+            manager.subscribe('bybit', self.symbols)
+
+    def _on_stream(self, exchange, symbol, price, data):
+        # Roda na thread do stream: só acumula, o ciclo do scanner aplica em lote
+        if exchange != 'bybit' or symbol not in self.index:
+            return
+        with self._pending_lock:
+            self._pending.setdefault(symbol, {'symbol': symbol}).update(data)
+
+    def _take_pending(self):
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        return list(pending.values())
+
+    # ------------------------------------------------------------------
+    # Dados
+    # ------------------------------------------------------------------
+
+    def refresh_symbols(self):
+        """Atualiza a lista dos contratos de maior volume, preservando o histórico dos que continuam."""
+        tickers = list_usdt_contracts(self.max_symbols)
+        if not tickers:
+            return
+        symbols = [t['symbol'] for t in tickers]
+        current = set(symbols)
+        dropped = [s for s in self.symbols if s not in current]
+        with self._lock:
+            old = {name: getattr(self, name) for name in ('closes', 'highs', 'lows', 'volumes', 'filled', 'bar_minute')}
+            old_index = self.index
+            self._allocate(symbols)
+            kept = [(i, old_index[s]) for i, s in enumerate(symbols) if s in old_index]
+            if kept:
+                new_rows, old_rows = (np.array(rows) for rows in zip(*kept))
+                for name, values in old.items():
+                    getattr(self, name)[new_rows] = values[old_rows]
+            missing = [s for s in symbols if s not in old_index]
+        self._last_symbol_refresh = time.time()
+        if self.stream is not None:
+            if dropped:
+                self.stream.unsubscribe('bybit', dropped)
+            self.stream.subscribe('bybit', symbols)
+
+        for symbol in missing:
+            if self._stop_event.is_set():
+                return
+            self.backfill(symbol, fetch_klines(symbol, "1", self.candles))
+        self.apply_tickers(tickers)
+        logger.info(f"Scanner acompanhando {len(symbols)} contratos ({len(missing)} novos)")
+
+    def backfill(self, symbol, klines):
+        """Preenche a linha do símbolo com candles [start, open, high, low, close, volume, ...]."""
+        if not klines:
+            return
+        data = klines_array(klines[-self.candles:])[:, 2:6]
+        count = len(data)
+        with self._lock:
+            i = self.index.get(symbol)
+            if i is None:
+                return
+            # Completa à esquerda com o primeiro candle para não haver lacunas nas médias
+            for column, target in enumerate((self.highs, self.lows, self.closes)):
+                target[i, -count:] = data[:, column]
+                target[i, :-count] = data[0, column]
+            self.volumes[i, -count:] = data[:, 3]
+            self.volumes[i, :-count] = 0
+            self.filled[i] = count
+            self.bar_minute[i] = int(klines[-1][0]) // 60000
+
+    def apply_tickers(self, tickers, now=None):
+        """Incorpora um snapshot de get_tickers no candle de 1m corrente de cada símbolo."""
+        minute = int((now if now is not None else time.time()) // 60)
+        rows, prices, volumes_24h, turnovers = [], [], [], []
+        for ticker in tickers:
+            i = self.index.get(ticker.get('symbol'))
+            if i is None or not ticker.get('lastPrice'):
+                continue
+            rows.append(i)
+            prices.append(float(ticker['lastPrice']))
+            # Deltas do stream podem vir sem volume; NaN mantém o valor anterior
+            volumes_24h.append(float(ticker['volume24h']) if ticker.get('volume24h') else np.nan)
+            turnovers.append(float(ticker['turnover24h']) if ticker.get('turnover24h') else np.nan)
+        if not rows:
+            return
+        rows = np.array(rows)
+        prices = np.array(prices)
+        volumes_24h = np.array(volumes_24h)
+        turnovers = np.array(turnovers)
+
+        with self._lock:
+            # Volume do período = variação do volume de 24h desde o último snapshot
+            previous = self.last_volume_24h[rows]
+            unknown = np.isnan(previous) | np.isnan(volumes_24h)
+            traded = np.where(unknown, 0, np.clip(volumes_24h - previous, 0, None))
+            self.last_volume_24h[rows] = np.where(np.isnan(volumes_24h), previous, volumes_24h)
+            self.turnover_24h[rows] = np.where(np.isnan(turnovers), self.turnover_24h[rows], turnovers)
+
+            # Símbolos sem nenhum dado: a linha inteira começa no preço atual
+            empty = self.filled[rows] == 0
+            if empty.any():
+                for target in (self.closes, self.highs, self.lows):
+                    target[rows[empty]] = prices[empty, None]
+                self.filled[rows[empty]] = 1
+                self.bar_minute[rows[empty]] = minute
+
+            # Virada de minuto: desloca as linhas e abre um candle novo
+            rolled = self.bar_minute[rows] < minute
+            if rolled.any():
+                roll_rows = rows[rolled]
+                for target in (self.closes, self.highs, self.lows, self.volumes):
+                    target[roll_rows, :-1] = target[roll_rows, 1:]
+                self.highs[roll_rows, -1] = prices[rolled]
+                self.lows[roll_rows, -1] = prices[rolled]
+                self.volumes[roll_rows, -1] = 0
+                self.filled[roll_rows] = np.minimum(self.filled[roll_rows] + 1, self.candles)
+                self.bar_minute[roll_rows] = minute
+
+            self.closes[rows, -1] = prices
+            self.highs[rows, -1] = np.maximum(self.highs[rows, -1], prices)
+            self.lows[rows, -1] = np.minimum(self.lows[rows, -1], prices)
+            self.volumes[rows, -1] += traded
+
+    # ------------------------------------------------------------------
+    # Avaliação
+    # ------------------------------------------------------------------
+
+    def evaluate(self):
+        """Roda os sinais em todos os símbolos e atualiza o ranking de oportunidades."""
+        start = time.perf_counter()
+        with self._lock:
+            if not self.symbols:
+                return []
+            result = evaluate_signals(self.closes, self.highs, self.lows, self.volumes, **self.signal_params)
+            # RSI longo e plugins com janela maior (MACD, por exemplo) esperam o histórico deles
+            extra = [name for name in self.signal_params.get('extra', ()) if split_name(name)[1] is None]
+            names = enabled_indicators(extra=extra)
+            lookback = live_lookback(names, {'rsi': {'period': self.signal_params.get('rsi_period', 14)}})
+            ready = self.filled >= max(MIN_CANDLES, lookback + 1)
+            symbols = self.symbols
+            turnover = self.turnover_24h.copy()
+
+        decision = np.where(ready, result['decision'], 0)
+        candidates = np.flatnonzero(decision)
+        # Maior força primeiro; empate decidido pelo volume financeiro
+        order = candidates[np.lexsort((-turnover[candidates], -result['score'][candidates]))]
+        self.opportunities = [
+            {
+                'symbol': symbols[i],
+                'decision': 'buy' if decision[i] > 0 else 'sell',
+                'score': float(result['score'][i]),
+                'rsi': float(result['rsi'][i]),
+                'sma_short': float(result['sma_short'][i]),
+                'sma_long': float(result['sma_long'][i]),
+                'price': float(result['price'][i]),
+            }
+            for i in order
+        ]
+        self._publish_signals({opportunity['symbol']: opportunity['decision'] for opportunity in self.opportunities})
+        SCANNER_EVALUATION_SECONDS.observe(time.perf_counter() - start)
+        SCANNER_SYMBOLS_GAUGE.set(len(symbols), state='tracked')
+        SCANNER_SYMBOLS_GAUGE.set(int(ready.sum()), state='ready')
+        return self.opportunities
+
+    def _publish_signals(self, decisions):
+        """Um Signal por símbolo cuja decisão mudou desde a última avaliação (sair do ranking vale 'wait')."""
+        for symbol in decisions.keys() | self._decisions.keys():
+            decision = decisions.get(symbol, 'wait')
+            if decision != self._decisions.get(symbol, 'wait'):
+                bus.publish(Signal(symbol, decision, source='scanner'))
+        self._decisions = decisions
+
+    def best_opportunity(self, direction='both', exclude=()):
+        """Primeira oportunidade do ranking na direção pedida, ignorando os símbolos em `exclude`."""
+        for opportunity in self.opportunities:
+            if opportunity['symbol'] in exclude:
+                continue
+            if direction in ('both', opportunity['decision']):
+                return opportunity
+        return None
+
+    def decision(self, symbol):
+        for opportunity in self.opportunities:
+            if opportunity['symbol'] == symbol:
+                return opportunity['decision']
+        return 'wait'
+
+    def last_price(self, symbol):
+        i = self.index.get(symbol)
+        if i is None or not self.filled[i]:
+            return None
+        return float(self.closes[i, -1])
+
+    # ------------------------------------------------------------------
+    # Laço
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                if time.time() - self._last_symbol_refresh >= SCANNER_REFRESH_SYMBOLS:
+                    self.refresh_symbols()
+                elif self.stream is not None:
+                    self.apply_tickers(self._take_pending())
+                else:
+                    self.apply_tickers(list_usdt_contracts(self.max_symbols))
+                self.evaluate()
+            except Exception as e:
+                logger.error(f"Erro no ciclo do scanner: {e}")
+            self._stop_event.wait(self.interval)
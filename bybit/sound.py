@@ -1,23 +1,36 @@
 import os
-from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
-from PyQt5.QtCore import QUrl
+
+from logger import get_logger
+
+logger = get_logger('sound')
 
 
 class SoundPlayer:
     def __init__(self, sound_file="correct-chime.mp3"):
+        # O QMediaPlayer (e o QtMultimedia) só é criado no primeiro som, fora da abertura da janela
+        self.sound_file_path = os.path.join(os.path.dirname(__file__), "assets/sounds", sound_file)
+        self.player = None
+
+    def _load(self):
+        from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
+        from PyQt5.QtCore import QUrl
+
         # Inicializa o player de mídia para alertas sonoros
         self.player = QMediaPlayer()
-        sound_file_path = os.path.join(os.path.dirname(__file__), "assets/sounds", sound_file)
-        if os.path.exists(sound_file_path):
-            self.player.setMedia(QMediaContent(QUrl.fromLocalFile(sound_file_path)))
+        if os.path.exists(self.sound_file_path):
+            self.player.setMedia(QMediaContent(QUrl.fromLocalFile(self.sound_file_path)))
         else:
-            print(f"Arquivo de som não encontrado: {sound_file_path}")
+            logger.warning(f"Arquivo de som não encontrado: {self.sound_file_path}")
         self.player.setVolume(100)  # Ajuste o volume conforme necessário
 
     def play_sound(self):
         """Reproduz um som de alerta."""
+        from PyQt5.QtMultimedia import QMediaPlayer
+
+        if self.player is None:
+            self._load()
         if self.player.mediaStatus() == QMediaPlayer.NoMedia:
-            print("Nenhum arquivo de mídia carregado para o player.")
+            logger.warning("Nenhum arquivo de mídia carregado para o player.")
             return
         self.player.stop()
         self.player.play()
@@ -0,0 +1,141 @@
+# stops.py
+
+import os
+import math
+import time
+import threading
+from dotenv import load_dotenv
+
+from metrics import registry, Counter
+from logger import get_logger
+
+load_dotenv()
+
+logger = get_logger('stops')
+
+# Espelha o trigger do trailing stop como stop loss na exchange (protege a posição se o bot travar)
+EXCHANGE_STOPS_ENABLED = os.getenv("EXCHANGE_STOPS_ENABLED", "true").lower() == "true"
+# Só move o stop da exchange quando o trigger andar mais que isto (pontos de PnL%)
+STOP_AMEND_THRESHOLD = float(os.getenv("STOP_AMEND_THRESHOLD", 0.5))
+# Espera depois de uma recusa da exchange antes de tentar de novo o mesmo símbolo
+STOP_RETRY_SECONDS = 30
+
+EXCHANGE_STOP_UPDATES = registry.register(Counter(
+    'bot_exchange_stop_updates_total', 'Stops gravados/movidos/removidos na exchange', ('result',)))
+
+
+def stop_price_for_trigger(avg_entry_price, leverage, is_long, trigger_percent, fee_percent):
+    """
+    Preço em que o PnL% (sobre a margem, já descontadas as taxas) chega a
+    `trigger_percent`: o PnL% vale aproximadamente a variação do preço vezes
+    a alavancagem, então basta inverter essa relação.
+    """
+    move = (trigger_percent + fee_percent) / 100 / leverage
+    return avg_entry_price * (1 + move) if is_long else avg_entry_price * (1 - move)
+
+
+def round_to_tick(price, tick, is_long):
+    """Arredonda para o tick a favor da proteção: para cima no long, para baixo no short."""
+    if not tick:
+        return price
+    steps = price / tick
+    steps = math.ceil(steps - 1e-9) if is_long else math.floor(steps + 1e-9)
+    return round(steps * tick, 10)
+
+
+class ExchangeStopSync:
+    """
+    Mantém o stop loss de cada posição na exchange alinhado ao trigger do
+    tracker. `update()` roda na thread da GUI a cada avaliação e só enfileira
+    quando o trigger andou mais que STOP_AMEND_THRESHOLD (ou a posição mudou);
+    uma thread própria envia as chamadas, ficando só com o pedido mais recente
+    de cada símbolo.
+
+    `set_stop(symbol, price_or_None)` grava o stop e retorna True/False;
+    `tick_size(symbol)` devolve o tick de preço do contrato.
+    """
+
+    def __init__(self, set_stop, tick_size, threshold=STOP_AMEND_THRESHOLD):
+        self.set_stop = set_stop
+        self.tick_size = tick_size
+        self.threshold = threshold
+        self.synced = {}     # symbol -> (trigger, price, chave da posição)
+        self.pending = {}    # symbol -> (trigger, price, chave da posição)
+        self.failed = {}     # symbol -> instante da última recusa
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="ExchangeStopSync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wakeup.set()
+
+    def _current(self, symbol):
+        with self._lock:
+            return self.pending.get(symbol, self.synced.get(symbol))
+
+    def update(self, symbol, position_key, trigger_percent, stop_price):
+        """
+        Pede o stop em `stop_price` (None = sem stop) para a posição
+        identificada por `position_key` = (lado, preço de entrada, alavancagem):
+        qualquer mudança nela move o preço do stop sem mexer no trigger.
+        """
+        if time.monotonic() - self.failed.get(symbol, -STOP_RETRY_SECONDS) < STOP_RETRY_SECONDS:
+            return
+        current = self._current(symbol)
+        if current is not None:
+            current_trigger, current_price, current_key = current
+            if current_key == position_key and (current_price is None) == (stop_price is None):
+                if stop_price is None or abs(trigger_percent - current_trigger) < self.threshold:
+                    return
+        elif stop_price is None:
+            return
+        with self._lock:
+            self.pending[symbol] = (trigger_percent, stop_price, position_key)
+        self._wakeup.set()
+
+    def forget(self, symbol):
+        """Posição fechada: o stop da Bybit some com ela, basta esquecer o estado."""
+        with self._lock:
+            self.synced.pop(symbol, None)
+            self.pending.pop(symbol, None)
+        self.failed.pop(symbol, None)
+
+    def _run(self):
+        while self._running:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while self._running:
+                with self._lock:
+                    if not self.pending:
+                        break
+                    symbol, request = self.pending.popitem()
+                trigger, price, position_key = request
+                if price is not None:
+                    is_long = position_key[0] == 'long'
+                    price = round_to_tick(price, self.tick_size(symbol), is_long)
+                if self.set_stop(symbol, price):
+                    self.failed.pop(symbol, None)
+                    EXCHANGE_STOP_UPDATES.inc(result='removed' if price is None else 'ok')
+                    with self._lock:
+                        # Um pedido mais novo pode ter chegado durante a chamada
+                        if symbol not in self.pending:
+                            self.synced[symbol] = (trigger, price, position_key)
+                    if price is None:
+                        logger.info(f"Stop na exchange removido: {symbol}", extra={'symbol': symbol})
+                    else:
+                        logger.info(
+                            f"Stop na exchange em {price} (trigger {trigger:.2f}%)", extra={'symbol': symbol}
+                        )
+                else:
+                    # Não marca como sincronizado: tenta de novo depois de STOP_RETRY_SECONDS
+                    self.failed[symbol] = time.monotonic()
+                    EXCHANGE_STOP_UPDATES.inc(result='error')
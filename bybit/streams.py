@@ -0,0 +1,631 @@
+# streams.py
+
+import os
+import json
+import time
+import random
+import asyncio
+import itertools
+import threading
+import requests
+import websockets
+from dotenv import load_dotenv
+
+from metrics import registry, Counter, Gauge, WS_MESSAGES, WS_RECONNECTS
+from events import bus, Tick
+from decode import loads, response_json
+from logger import get_logger
+
+load_dotenv()
+
+logger = get_logger('streams')
+
+# Reconexão com backoff exponencial: 1s, 2s, 4s ... até WS_RECONNECT_MAX (com jitter)
+RECONNECT_BASE = 1.0
+RECONNECT_MAX = float(os.getenv("WS_RECONNECT_MAX", 60))
+# Sem nenhum frame (dado, pong ou ack) por este tempo, a conexão é dada como morta
+LIVENESS_TIMEOUT = float(os.getenv("WS_LIVENESS_TIMEOUT", 30))
+# Símbolo vigiado sem tick por este tempo é considerado congelado
+STALE_SECONDS = float(os.getenv("WS_STALE_SECONDS", 10))
+# Intervalo das consultas REST de preço enquanto o feed estiver congelado
+REST_FALLBACK_INTERVAL = float(os.getenv("WS_REST_FALLBACK_INTERVAL", 2))
+
+WS_CONNECTIONS = registry.register(Gauge(
+    'bot_ws_connections', 'Conexões websocket abertas pelo gerenciador de streams', ('exchange',)))
+WS_SUBSCRIPTIONS = registry.register(Gauge(
+    'bot_ws_subscriptions', 'Símbolos assinados pelo gerenciador de streams', ('exchange',)))
+WS_SEQUENCE_ANOMALIES = registry.register(Counter(
+    'bot_ws_sequence_anomalies_total', 'Mensagens fora de ordem ou com lacuna de sequência', ('exchange', 'kind')))
+WS_STALE_EVENTS = registry.register(Counter(
+    'bot_ws_stale_total', 'Vezes em que um símbolo vigiado ficou sem ticks', ('exchange',)))
+WS_REST_FALLBACKS = registry.register(Counter(
+    'bot_ws_rest_fallback_total', 'Preços obtidos via REST enquanto o feed estava congelado', ('exchange',)))
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class BinanceStreams:
+    """Combined streams da Binance spot: várias assinaturas @miniTicker por conexão."""
+
+    name = 'binance'
+    max_topics = 200             # a Binance aceita até 1024 streams por conexão
+    topics_per_message = 100
+    ping_interval = None         # ping/pong no nível do protocolo (websockets)
+    contiguous = False           # miniTicker não tem número de sequência; a staleness cuida das lacunas
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+
+    async def endpoint(self):
+        return "wss://stream.binance.com:9443/stream"
+
+    def _request(self, method, symbols):
+        return [
+            json.dumps({'method': method, 'params': [f"{s.lower()}@miniTicker" for s in chunk], 'id': next(self._ids)})
+            for chunk in _chunks(symbols, self.topics_per_message)
+        ]
+
+    def subscribe(self, symbols):
+        return self._request('SUBSCRIBE', symbols)
+
+    def unsubscribe(self, symbols):
+        return self._request('UNSUBSCRIBE', symbols)
+
+    def ping(self):
+        return None
+
+    def parse(self, message):
+        """
+        Retorna [(symbol, price, None, data)]; respostas de SUBSCRIBE não têm
+        'stream'. O 'E' é hora do evento, não sequência: dois eventos no mesmo
+        milissegundo derrubariam o segundo como fora de ordem.
+        """
+        if '"data"' not in message:
+            return []
+        msg = loads(message)
+        data = msg.get('data')
+        if not data or 's' not in data:
+            return []
+        return [(data['s'], float(data['c']), None, data)]
+
+    def rest_price(self, symbol):
+        response = requests.get("https://api.binance.com/api/v3/ticker/price", params={'symbol': symbol}, timeout=5)
+        return float(response_json(response)['price'])
+
+
+class BybitStreams:
+    """Stream público v5 de contratos lineares da Bybit: tópicos tickers.<symbol>."""
+
+    name = 'bybit'
+    max_topics = 200
+    topics_per_message = 10
+    ping_interval = 20
+    contiguous = False
+
+    async def endpoint(self):
+        return "wss://stream.bybit.com/v5/public/linear"
+
+    def subscribe(self, symbols):
+        return [json.dumps({'op': 'subscribe', 'args': [f"tickers.{s}" for s in chunk]})
+                for chunk in _chunks(symbols, self.topics_per_message)]
+
+    def unsubscribe(self, symbols):
+        return [json.dumps({'op': 'unsubscribe', 'args': [f"tickers.{s}" for s in chunk]})
+                for chunk in _chunks(symbols, self.topics_per_message)]
+
+    def ping(self):
+        return json.dumps({'op': 'ping'})
+
+    def parse(self, message):
+        # Pongs e acks de assinatura não chegam a ser decodificados
+        if '"tickers.' not in message:
+            return []
+        msg = loads(message)
+        topic = msg.get('topic', '')
+        if not topic.startswith('tickers.'):
+            return []
+        data = msg.get('data') or {}
+        # Mensagens delta só trazem os campos que mudaram
+        price = float(data['lastPrice']) if 'lastPrice' in data else None
+        return [(topic[8:], price, msg.get('cs'), data)]
+
+    def rest_price(self, symbol):
+        response = requests.get(
+            "https://api.bybit.com/v5/market/tickers", params={'category': 'linear', 'symbol': symbol}, timeout=5
+        )
+        return float(response_json(response)['result']['list'][0]['lastPrice'])
+
+
+class KucoinStreams:
+    """Futuros da KuCoin: /contractMarket/ticker:<S1>,<S2>,... com token público via bullet-public."""
+
+    name = 'kucoin'
+    max_topics = 300             # a KuCoin limita 400 tópicos por conexão
+    topics_per_message = 100
+    ping_interval = 18
+    contiguous = False
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+
+    async def endpoint(self):
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(
+            None, lambda: requests.post("https://api-futures.kucoin.com/api/v1/bullet-public", timeout=10)
+        )
+        data = response_json(response)['data']
+        server = data['instanceServers'][0]
+        self.ping_interval = server.get('pingInterval', 18000) / 1000
+        return f"{server['endpoint']}?token={data['token']}&connectId={int(time.time() * 1000)}"
+
+    def _request(self, kind, symbols):
+        return [
+            json.dumps({'id': str(next(self._ids)), 'type': kind,
+                        'topic': '/contractMarket/ticker:' + ','.join(chunk), 'response': True})
+            for chunk in _chunks(symbols, self.topics_per_message)
+        ]
+
+    def subscribe(self, symbols):
+        return self._request('subscribe', symbols)
+
+    def unsubscribe(self, symbols):
+        return self._request('unsubscribe', symbols)
+
+    def ping(self):
+        return json.dumps({'id': str(next(self._ids)), 'type': 'ping'})
+
+    def parse(self, message):
+        if '/contractMarket/ticker:' not in message:
+            return []
+        msg = loads(message)
+        if msg.get('type') != 'message' or not msg.get('topic', '').startswith('/contractMarket/ticker:'):
+            return []
+        data = msg['data']
+        symbol = data.get('symbol') or msg['topic'].split(':', 1)[1]
+        return [(symbol, float(data['price']), data.get('sequence'), data)]
+
+    def rest_price(self, symbol):
+        response = requests.get("https://api-futures.kucoin.com/api/v1/ticker", params={'symbol': symbol}, timeout=5)
+        return float(response_json(response)['data']['price'])
+
+
+def _levels(levels):
+    return [(float(price), float(size)) for price, size in levels]
+
+
+class BinanceBookStreams(BinanceStreams):
+    """Diffs de profundidade da Binance (<symbol>@depth@100ms); snapshot via /api/v3/depth."""
+
+    name = 'binance_book'
+    max_topics = 100
+    contiguous = True
+
+    def _request(self, method, symbols):
+        return [
+            json.dumps({'method': method, 'params': [f"{s.lower()}@depth@100ms" for s in chunk], 'id': next(self._ids)})
+            for chunk in _chunks(symbols, self.topics_per_message)
+        ]
+
+    def parse(self, message):
+        if '"depthUpdate"' not in message:
+            return []
+        msg = loads(message)
+        data = msg.get('data')
+        if not data or data.get('e') != 'depthUpdate':
+            return []
+        return [(data['s'], None, None, {
+            'type': 'delta', 'first': data['U'], 'last': data['u'],
+            'bids': _levels(data['b']), 'asks': _levels(data['a'])
+        })]
+
+    def rest_snapshot(self, symbol):
+        response = requests.get("https://api.binance.com/api/v3/depth", params={'symbol': symbol, 'limit': 1000}, timeout=5)
+        data = response_json(response)
+        return _levels(data['bids']), _levels(data['asks']), data['lastUpdateId']
+
+
+class BybitBookStreams(BybitStreams):
+    """Livro da Bybit (orderbook.50.<symbol>): snapshot ao assinar, depois deltas com update id 'u'."""
+
+    name = 'bybit_book'
+    max_topics = 100
+    contiguous = True
+    depth = 50
+
+    def subscribe(self, symbols):
+        return [json.dumps({'op': 'subscribe', 'args': [f"orderbook.{self.depth}.{s}" for s in chunk]})
+                for chunk in _chunks(symbols, self.topics_per_message)]
+
+    def unsubscribe(self, symbols):
+        return [json.dumps({'op': 'unsubscribe', 'args': [f"orderbook.{self.depth}.{s}" for s in chunk]})
+                for chunk in _chunks(symbols, self.topics_per_message)]
+
+    def parse(self, message):
+        if '"orderbook.' not in message:
+            return []
+        msg = loads(message)
+        if not msg.get('topic', '').startswith('orderbook.'):
+            return []
+        data = msg['data']
+        # u == 1 também é snapshot (reinício do serviço da Bybit)
+        kind = 'snapshot' if msg.get('type') == 'snapshot' or data.get('u') == 1 else 'delta'
+        return [(data['s'], None, None, {
+            'type': kind, 'first': data['u'], 'last': data['u'],
+            'bids': _levels(data.get('b', [])), 'asks': _levels(data.get('a', []))
+        })]
+
+    def rest_snapshot(self, symbol):
+        return None  # a Bybit reenvia o snapshot ao reassinar
+
+
+class KucoinBookStreams(KucoinStreams):
+    """Level 2 dos futuros da KuCoin: um nível por mensagem ('preço,lado,tamanho') com sequência contínua."""
+
+    name = 'kucoin_book'
+    max_topics = 100
+    topics_per_message = 1
+    contiguous = True
+
+    def _request(self, kind, symbols):
+        return [
+            json.dumps({'id': str(next(self._ids)), 'type': kind,
+                        'topic': f'/contractMarket/level2:{symbol}', 'response': True})
+            for symbol in symbols
+        ]
+
+    def parse(self, message):
+        if '/contractMarket/level2:' not in message:
+            return []
+        msg = loads(message)
+        if msg.get('type') != 'message' or not msg.get('topic', '').startswith('/contractMarket/level2:'):
+            return []
+        data = msg['data']
+        price, side, size = data['change'].split(',')
+        level = [(float(price), float(size))]
+        return [(msg['topic'].split(':', 1)[1], None, None, {
+            'type': 'delta', 'first': data['sequence'], 'last': data['sequence'],
+            'bids': level if side == 'buy' else [], 'asks': level if side == 'sell' else []
+        })]
+
+    def rest_snapshot(self, symbol):
+        response = requests.get(
+            "https://api-futures.kucoin.com/api/v1/level2/snapshot", params={'symbol': symbol}, timeout=5
+        )
+        data = response_json(response)['data']
+        return _levels(data['bids']), _levels(data['asks']), data['sequence']
+
+
+ADAPTERS = {
+    'binance': BinanceStreams,
+    'bybit': BybitStreams,
+    'kucoin': KucoinStreams,
+    'binance_book': BinanceBookStreams,
+    'bybit_book': BybitBookStreams,
+    'kucoin_book': KucoinBookStreams,
+}
+
+
+class StreamConnection:
+    """Uma conexão websocket com um grupo (shard) de símbolos de uma exchange."""
+
+    def __init__(self, manager, adapter, conn_id):
+        self.manager = manager
+        self.adapter = adapter
+        self.conn_id = conn_id
+        self.symbols = set()
+        self.ws = None
+        self.task = None
+        self.last_frame = 0.0
+        self.last_data = 0.0
+        self._connected_once = False
+
+    @property
+    def label(self):
+        return f"{self.adapter.name}#{self.conn_id}"
+
+    async def _send(self, messages):
+        for message in messages:
+            await self.ws.send(message)
+            # Respeita os limites de mensagens de controle por conexão (Binance: 5/s)
+            await asyncio.sleep(0.25)
+
+    async def add(self, symbols):
+        new = [s for s in symbols if s not in self.symbols]
+        self.symbols.update(new)
+        if new and self.ws is not None:
+            await self._send(self.adapter.subscribe(new))
+
+    async def remove(self, symbols):
+        gone = [s for s in symbols if s in self.symbols]
+        self.symbols.difference_update(gone)
+        if not gone or self.ws is None:
+            return
+        if self.symbols:
+            await self._send(self.adapter.unsubscribe(gone))
+        else:
+            await self.ws.close()
+
+    async def reconnect(self, reason):
+        """Fecha a conexão atual; o laço de run() reconecta e reassina tudo."""
+        if self.ws is not None:
+            logger.warning(f"Stream {self.label}: {reason}. Reconectando...")
+            await self.ws.close()
+
+    async def _keepalive(self):
+        """Manda o ping de aplicação da exchange e derruba a conexão se nada chegar (nem o pong)."""
+        last_ping = time.monotonic()
+        while True:
+            await asyncio.sleep(1)
+            now = time.monotonic()
+            if self.adapter.ping_interval and now - last_ping >= self.adapter.ping_interval:
+                await self.ws.send(self.adapter.ping())
+                last_ping = now
+            if now - self.last_frame > LIVENESS_TIMEOUT:
+                await self.reconnect(f"sem resposta há {now - self.last_frame:.0f}s")
+                return
+            # Socket vivo (pongs chegando) mas sem dados: assinatura perdida do lado da exchange
+            if now - self.last_data > LIVENESS_TIMEOUT and self.symbols:
+                await self.reconnect(f"sem dados há {now - self.last_data:.0f}s")
+                return
+
+    async def run(self):
+        failures = 0
+        while self.manager.running and self.symbols:
+            keepalive_task = None
+            try:
+                url = await self.adapter.endpoint()
+                async with websockets.connect(url, ping_interval=20, ping_timeout=20, close_timeout=5) as ws:
+                    self.ws = ws
+                    self.last_frame = self.last_data = time.monotonic()
+                    if self._connected_once:
+                        WS_RECONNECTS.inc()
+                    self._connected_once = True
+                    # Sessão nova: a sequência anterior não vale mais
+                    self.manager.reset_sequences(self.adapter.name, self.symbols)
+                    logger.info(f"Stream {self.label} conectado ({len(self.symbols)} símbolos)")
+                    await self._send(self.adapter.subscribe(sorted(self.symbols)))
+                    keepalive_task = asyncio.ensure_future(self._keepalive())
+                    async for message in ws:
+                        self.last_frame = time.monotonic()
+                        for symbol, price, sequence, data in self.adapter.parse(message):
+                            self.last_data = self.last_frame
+                            failures = 0
+                            self.manager.dispatch(self.adapter.name, symbol, price, data, sequence)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Stream {self.label} caiu: {e}")
+            finally:
+                self.ws = None
+                if keepalive_task is not None:
+                    keepalive_task.cancel()
+            if self.manager.running and self.symbols:
+                delay = min(RECONNECT_MAX, RECONNECT_BASE * 2 ** failures) * random.uniform(0.5, 1.0)
+                failures += 1
+                logger.info(f"Stream {self.label}: nova tentativa em {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+
+class StreamManager:
+    """
+    Gerencia as assinaturas de preço de várias exchanges num único event
+    loop asyncio. Os símbolos são distribuídos em conexões de até
+    `max_topics` símbolos cada; assinar ou remover símbolos manda
+    subscribe/unsubscribe na conexão aberta, sem reconectar.
+
+    Os ouvintes recebem (exchange, symbol, price, data) na thread do loop;
+    cada preço também vai para o barramento de eventos como Tick.
+
+    Símbolos vigiados (watch) são supervisionados: sem tick por
+    STALE_SECONDS, os ouvintes de estado são avisados, o preço passa a vir
+    por REST a cada REST_FALLBACK_INTERVAL (com data={'source': 'rest'}) e
+    a conexão é refeita se o feed inteiro parou.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.running = True
+        self.adapters = {}
+        self.connections = {}
+        self.listeners = []
+        self.stale_listeners = []
+        self.sequences = {}
+        self.last_tick = {}
+        self.watched = {}
+        self.stale = set()
+        self._last_rest = {}
+        self._ids = itertools.count(1)
+        self._thread = None
+        self._supervisor = None
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def add_stale_listener(self, callback):
+        """callback(exchange, symbol, stale) quando um símbolo vigiado congela ou volta."""
+        self.stale_listeners.append(callback)
+
+    def watch(self, exchange, symbol):
+        self.watched[(exchange, symbol)] = time.monotonic()
+
+    def unwatch(self, exchange, symbol):
+        self.watched.pop((exchange, symbol), None)
+        self.stale.discard((exchange, symbol))
+
+    def reset_sequences(self, exchange, symbols):
+        for symbol in symbols:
+            self.sequences.pop((exchange, symbol), None)
+
+    def _check_sequence(self, exchange, symbol, sequence):
+        """Descarta mensagens repetidas/fora de ordem e pede ressincronização em lacunas."""
+        key = (exchange, symbol)
+        last = self.sequences.get(key)
+        if last is not None:
+            if sequence <= last:
+                WS_SEQUENCE_ANOMALIES.inc(exchange=exchange, kind='out_of_order')
+                return False
+            if self.adapters[exchange].contiguous and sequence != last + 1:
+                WS_SEQUENCE_ANOMALIES.inc(exchange=exchange, kind='gap')
+                logger.warning(f"Lacuna de sequência em {exchange}:{symbol} ({last} -> {sequence}). Reassinando...")
+                self.sequences.pop(key, None)
+                self.loop.create_task(self._resubscribe(exchange, [symbol]))
+                return False
+        self.sequences[key] = sequence
+        return True
+
+    def dispatch(self, exchange, symbol, price, data, sequence=None):
+        WS_MESSAGES.inc()
+        if sequence is not None and not self._check_sequence(exchange, symbol, sequence):
+            return
+        if price is not None:
+            key = (exchange, symbol)
+            self.last_tick[key] = time.monotonic()
+            if key in self.stale:
+                self.stale.discard(key)
+                logger.info(f"Feed de {exchange}:{symbol} normalizado")
+                self._notify_stale(exchange, symbol, False)
+        self._notify(exchange, symbol, price, data)
+        if price is not None:
+            bus.publish(Tick(exchange, symbol, price, data.get('source', 'ws')))
+
+    def _notify(self, exchange, symbol, price, data):
+        for callback in self.listeners:
+            try:
+                callback(exchange, symbol, price, data)
+            except Exception as e:
+                logger.error(f"Erro no ouvinte de {exchange}:{symbol}: {e}")
+
+    def _notify_stale(self, exchange, symbol, stale):
+        for callback in self.stale_listeners:
+            try:
+                callback(exchange, symbol, stale)
+            except Exception as e:
+                logger.error(f"Erro no ouvinte de estado de {exchange}:{symbol}: {e}")
+
+    def is_stale(self, exchange, symbol):
+        return (exchange, symbol) in self.stale
+
+    # Chamadas seguras a partir de qualquer thread; executam no loop
+    def subscribe(self, exchange, symbols):
+        return asyncio.run_coroutine_threadsafe(self._subscribe(exchange, list(symbols)), self.loop)
+
+    def unsubscribe(self, exchange, symbols):
+        return asyncio.run_coroutine_threadsafe(self._unsubscribe(exchange, list(symbols)), self.loop)
+
+    def resubscribe(self, exchange, symbols):
+        return asyncio.run_coroutine_threadsafe(self._resubscribe(exchange, list(symbols)), self.loop)
+
+    def subscriptions(self, exchange):
+        return set().union(*(conn.symbols for conn in self.connections.get(exchange, [])))
+
+    def _update_gauges(self, exchange):
+        connections = self.connections.get(exchange, [])
+        WS_CONNECTIONS.set(len(connections), exchange=exchange)
+        WS_SUBSCRIPTIONS.set(sum(len(conn.symbols) for conn in connections), exchange=exchange)
+
+    async def _subscribe(self, exchange, symbols):
+        adapter = self.adapters.get(exchange)
+        if adapter is None:
+            adapter = self.adapters[exchange] = ADAPTERS[exchange]()
+        connections = self.connections.setdefault(exchange, [])
+        pending = [s for s in dict.fromkeys(symbols) if s not in self.subscriptions(exchange)]
+
+        # Preenche as conexões existentes antes de abrir novas
+        for conn in connections:
+            room = adapter.max_topics - len(conn.symbols)
+            if room > 0 and pending:
+                await conn.add(pending[:room])
+                pending = pending[room:]
+        while pending:
+            conn = StreamConnection(self, adapter, next(self._ids))
+            await conn.add(pending[:adapter.max_topics])
+            pending = pending[adapter.max_topics:]
+            conn.task = self.loop.create_task(conn.run())
+            connections.append(conn)
+        self._update_gauges(exchange)
+
+    async def _resubscribe(self, exchange, symbols):
+        for conn in self.connections.get(exchange, []):
+            present = [s for s in symbols if s in conn.symbols]
+            if present and conn.ws is not None:
+                await conn._send(conn.adapter.unsubscribe(present))
+                await conn._send(conn.adapter.subscribe(present))
+
+    async def _rest_fallback(self, exchange, symbol):
+        loop = asyncio.get_running_loop()
+        try:
+            price = await loop.run_in_executor(None, self.adapters[exchange].rest_price, symbol)
+        except Exception as e:
+            logger.warning(f"Fallback REST de {exchange}:{symbol} falhou: {e}")
+            return
+        # Um tick do websocket pode ter chegado enquanto o REST respondia
+        if (exchange, symbol) in self.stale:
+            WS_REST_FALLBACKS.inc(exchange=exchange)
+            self._notify(exchange, symbol, price, {'source': 'rest'})
+            # A janela recebe preços só pelo barramento: sem isto o rótulo e os stops congelariam
+            bus.publish(Tick(exchange, symbol, price, 'rest'))
+
+    async def _supervise(self):
+        """Vigia os símbolos marcados com watch(): feed congelado -> aviso, REST e reconexão."""
+        while self.running:
+            await asyncio.sleep(1)
+            now = time.monotonic()
+            for (exchange, symbol), watched_since in list(self.watched.items()):
+                key = (exchange, symbol)
+                age = now - max(self.last_tick.get(key, 0.0), watched_since)
+                if age <= STALE_SECONDS:
+                    continue
+                if key not in self.stale:
+                    self.stale.add(key)
+                    WS_STALE_EVENTS.inc(exchange=exchange)
+                    logger.warning(f"Feed de {exchange}:{symbol} sem ticks há {age:.0f}s. Usando preço via REST.")
+                    self._notify_stale(exchange, symbol, True)
+                    for conn in self.connections.get(exchange, []):
+                        if symbol in conn.symbols and now - conn.last_data > STALE_SECONDS:
+                            self.loop.create_task(conn.reconnect("feed congelado"))
+                if exchange in self.adapters and now - self._last_rest.get(key, 0.0) >= REST_FALLBACK_INTERVAL:
+                    self._last_rest[key] = now
+                    self.loop.create_task(self._rest_fallback(exchange, symbol))
+
+    async def _unsubscribe(self, exchange, symbols):
+        connections = self.connections.get(exchange, [])
+        for conn in list(connections):
+            await conn.remove(symbols)
+            if not conn.symbols:
+                connections.remove(conn)
+        self._update_gauges(exchange)
+
+    def run(self):
+        """Roda o loop na thread atual até stop()."""
+        asyncio.set_event_loop(self.loop)
+        self._supervisor = self.loop.create_task(self._supervise())
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def start(self):
+        """Roda o loop numa thread daemon própria."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="stream-manager", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self.running = False
+
+        async def shutdown():
+            if self._supervisor is not None:
+                self._supervisor.cancel()
+            for connections in self.connections.values():
+                for conn in connections:
+                    if conn.ws is not None:
+                        await conn.ws.close()
+                    if conn.task is not None:
+                        conn.task.cancel()
+            self.loop.stop()
+
+        if self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(shutdown(), self.loop)
@@ -0,0 +1,290 @@
+# symbols.py
+
+import os
+import re
+import json
+import time
+import threading
+import requests
+from dotenv import load_dotenv
+
+from metrics import registry, Gauge
+from logger import get_logger
+
+load_dotenv()
+
+logger = get_logger('symbols')
+
+# Listas de instrumentos das três exchanges, salvas entre sessões
+SYMBOLS_CACHE_FILE = os.getenv("SYMBOLS_CACHE_FILE", "symbols_cache.json")
+# Idade máxima do cache antes de buscar as listas de novo
+SYMBOLS_REFRESH_SECONDS = float(os.getenv("SYMBOLS_REFRESH_SECONDS", 86400))
+
+VENUES = ('bybit', 'kucoin', 'binance')
+# Moedas de cotação reconhecidas ao interpretar um símbolo desconhecido (mais longas primeiro)
+QUOTES = ('FDUSD', 'USDT', 'USDC', 'USD')
+# A KuCoin chama o bitcoin de XBT
+ALIASES = {'XBT': 'BTC'}
+VENUE_ALIASES = {'kucoin': {'BTC': 'XBT'}}
+# Contratos cotados em lotes de 1000, 10000... unidades (1000PEPEUSDT, SHIB1000USDT)
+SCALED_BASE = re.compile(r'^(10{3,})(\D\w*)$|^(\D\w*?)(10{3,})$')
+
+SYMBOLS_LOADED = registry.register(Gauge(
+    'bot_symbols_loaded', 'Instrumentos carregados no registro de símbolos', ('venue',)))
+
+
+class Instrument:
+    """Um contrato (ou par) de uma exchange e o instrumento canônico (BASE/QUOTE) a que corresponde."""
+
+    def __init__(self, venue, symbol, base, quote, tick_size=None, lot_size=None,
+                 min_qty=None, multiplier=1.0, price_factor=1):
+        self.venue = venue
+        self.symbol = symbol
+        self.base = base
+        self.quote = quote
+        self.canonical = f"{base}/{quote}"
+        self.tick_size = tick_size
+        self.lot_size = lot_size          # passo de quantidade (contratos na KuCoin)
+        self.min_qty = min_qty
+        self.multiplier = multiplier      # unidades da moeda base por contrato
+        self.price_factor = price_factor  # preço do contrato = preço canônico × price_factor
+
+    def __repr__(self):
+        return f"Instrument({self.venue}:{self.symbol} -> {self.canonical})"
+
+
+def _split_scaled(base):
+    """'1000PEPE' -> ('PEPE', 1000); bases sem multiplicador voltam com fator 1."""
+    match = SCALED_BASE.match(base)
+    if match is None:
+        return base, 1
+    if match.group(1):
+        return match.group(2), int(match.group(1))
+    return match.group(3), int(match.group(4))
+
+
+def _rows_bybit():
+    rows, cursor = [], ''
+    while True:
+        response = requests.get(
+            "https://api.bybit.com/v5/market/instruments-info",
+            params={'category': 'linear', 'limit': 1000, 'cursor': cursor}, timeout=10
+        ).json()
+        result = response['result']
+        for item in result['list']:
+            if item.get('contractType') != 'LinearPerpetual' or item.get('status') != 'Trading':
+                continue
+            lot = item['lotSizeFilter']
+            rows.append([item['symbol'], item['baseCoin'], item['quoteCoin'],
+                         float(item['priceFilter']['tickSize']), float(lot['qtyStep']),
+                         float(lot['minOrderQty']), 1.0])
+        cursor = result.get('nextPageCursor')
+        if not cursor:
+            return rows
+
+
+def _rows_kucoin():
+    response = requests.get("https://api-futures.kucoin.com/api/v1/contracts/active", timeout=10).json()
+    rows = []
+    for item in response['data']:
+        # FFWCSX = perpétuo; os futuros com vencimento ficam de fora
+        if item.get('type') != 'FFWCSX':
+            continue
+        rows.append([item['symbol'], item['baseCurrency'], item['quoteCurrency'],
+                     float(item['tickSize']), float(item['lotSize']), float(item['lotSize']),
+                     float(item['multiplier'])])
+    return rows
+
+
+def _rows_binance():
+    response = requests.get(
+        "https://api.binance.com/api/v3/exchangeInfo", params={'symbolStatus': 'TRADING'}, timeout=10
+    ).json()
+    rows = []
+    for item in response['symbols']:
+        if item['quoteAsset'] not in QUOTES:
+            continue
+        filters = {f['filterType']: f for f in item['filters']}
+        price_filter = filters.get('PRICE_FILTER', {})
+        lot_filter = filters.get('LOT_SIZE', {})
+        rows.append([item['symbol'], item['baseAsset'], item['quoteAsset'],
+                     float(price_filter.get('tickSize', 0)) or None, float(lot_filter.get('stepSize', 0)) or None,
+                     float(lot_filter.get('minQty', 0)) or None, 1.0])
+    return rows
+
+
+FETCHERS = {'bybit': _rows_bybit, 'kucoin': _rows_kucoin, 'binance': _rows_binance}
+
+
+class SymbolRegistry:
+    """
+    Tradução de símbolos entre exchanges (XBTUSDTM na KuCoin, BTCUSDT na
+    Bybit e na Binance) por um instrumento canônico, 'BTC/USDT', com tick,
+    lote e multiplicador de cada contrato.
+
+    Os índices são montados uma vez a partir das listas de instrumentos
+    (cache em SYMBOLS_CACHE_FILE, renovado por `start()` numa thread) e cada
+    consulta é um acesso a dicionário. Símbolos fora das listas (cache ainda
+    vazio, contrato novo) caem numa regra de nomes, memorizada na primeira vez.
+    """
+
+    def __init__(self, cache_file=SYMBOLS_CACHE_FILE, fetchers=FETCHERS):
+        self.cache_file = cache_file
+        self.fetchers = fetchers
+        self.rows = {}
+        self.updated = 0.0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._thread = None
+        self._build()
+
+    # ------------------------------------------------------------------
+    # Carga
+    # ------------------------------------------------------------------
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                with open(self.cache_file, 'r') as f:
+                    cache = json.load(f)
+                self.rows = cache.get('venues', {})
+                self.updated = cache.get('updated', 0.0)
+                self._build()
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"Erro ao carregar {self.cache_file}: {e}")
+            self._loaded = True
+
+    def start(self):
+        """Busca as listas de instrumentos numa thread se o cache estiver velho ou incompleto."""
+        if self._thread is not None:
+            return
+        self._ensure_loaded()
+        stale = time.time() - self.updated >= SYMBOLS_REFRESH_SECONDS
+        if not stale and all(self.rows.get(venue) for venue in self.fetchers):
+            return
+        self._thread = threading.Thread(target=self.refresh, name="SymbolRegistry", daemon=True)
+        self._thread.start()
+
+    def refresh(self):
+        self._ensure_loaded()
+        rows = dict(self.rows)
+        for venue, fetch in self.fetchers.items():
+            try:
+                rows[venue] = fetch()
+            except Exception as e:
+                # Falha: mantém a lista anterior dessa exchange
+                logger.warning(f"Erro ao obter os instrumentos da {venue}: {e}")
+        with self._lock:
+            self.rows = rows
+            self.updated = time.time()
+            self._build()
+        try:
+            with open(self.cache_file, 'w') as f:
+                json.dump({'updated': self.updated, 'venues': rows}, f)
+        except Exception as e:
+            logger.warning(f"Erro ao salvar {self.cache_file}: {e}")
+
+    def _build(self):
+        by_symbol = {}      # (venue, símbolo) -> Instrument
+        by_canonical = {}   # (canônico, venue) -> Instrument
+        any_venue = {}      # símbolo -> Instrument, para símbolos sem exchange informada
+        for venue in VENUES:
+            for symbol, base, quote, tick, lot, min_qty, multiplier in self.rows.get(venue, ()):
+                base = ALIASES.get(base, base)
+                canonical_base, factor = _split_scaled(base)
+                if (f"{canonical_base}/{quote}", venue) in by_canonical:
+                    # Já existe o contrato sem multiplicador nesta exchange
+                    canonical_base, factor = base, 1
+                instrument = Instrument(venue, symbol, canonical_base, quote, tick, lot, min_qty, multiplier, factor)
+                by_symbol[(venue, symbol)] = instrument
+                by_canonical.setdefault((instrument.canonical, venue), instrument)
+                any_venue.setdefault(symbol, instrument)
+        for venue in VENUES:
+            SYMBOLS_LOADED.set(len(self.rows.get(venue, ())), venue=venue)
+        # Troca os índices de uma vez: as consultas de outras threads nunca veem um índice pela metade
+        self._index = (by_symbol, by_canonical, any_venue, {}, {})
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def instrument(self, venue, symbol):
+        """Instrument do símbolo na exchange, ou None se ele não está nas listas carregadas."""
+        self._ensure_loaded()
+        return self._index[0].get((venue, symbol))
+
+    def canonical(self, symbol, venue=None):
+        """'XBTUSDTM' -> 'BTC/USDT'. Sem `venue`, aceita o símbolo de qualquer exchange."""
+        self._ensure_loaded()
+        by_symbol, _, any_venue, guessed, _ = self._index
+        instrument = by_symbol.get((venue, symbol)) if venue else any_venue.get(symbol)
+        if instrument is not None:
+            return instrument.canonical
+        canonical = guessed.get(symbol)
+        if canonical is None:
+            canonical = guessed[symbol] = self._guess_canonical(symbol)
+        return canonical
+
+    def symbol(self, canonical, venue):
+        """'BTC/USDT' -> símbolo na exchange ('BTCUSDT', 'XBTUSDTM')."""
+        self._ensure_loaded()
+        _, by_canonical, _, _, guessed = self._index
+        instrument = by_canonical.get((canonical, venue))
+        if instrument is not None:
+            return instrument.symbol
+        symbol = guessed.get((canonical, venue))
+        if symbol is None:
+            symbol = guessed[(canonical, venue)] = self._guess_symbol(canonical, venue)
+        return symbol
+
+    def convert(self, symbol, venue, source=None):
+        """Símbolo de qualquer exchange (ou de `source`) -> símbolo em `venue`."""
+        self._ensure_loaded()
+        if self._index[0].get((venue, symbol)) is not None and source in (None, venue):
+            return symbol
+        return self.symbol(self.canonical(symbol, source), venue)
+
+    def price_factor(self, symbol, venue=None):
+        """Multiplicador de preço do contrato (1000 em 1000PEPEUSDT); 1 para símbolos fora das listas."""
+        self._ensure_loaded()
+        by_symbol, _, any_venue, _, _ = self._index
+        instrument = by_symbol.get((venue, symbol)) if venue else any_venue.get(symbol)
+        return instrument.price_factor if instrument is not None else 1
+
+    def convert_price(self, price, symbol, venue, source=None):
+        """Preço de `symbol` (de `source` ou de qualquer exchange) expresso no contrato equivalente em `venue`."""
+        target = self.convert(symbol, venue, source)
+        return price / self.price_factor(symbol, source) * self.price_factor(target, venue)
+
+    # ------------------------------------------------------------------
+    # Regra de nomes para símbolos fora das listas
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _guess_canonical(symbol):
+        name = symbol.upper()
+        # Perpétuos da KuCoin terminam em M: XBTUSDTM, ETHUSDM
+        if name.endswith('M') and name[:-1].endswith(QUOTES):
+            name = name[:-1]
+        for quote in QUOTES:
+            if name.endswith(quote) and len(name) > len(quote):
+                base = name[:-len(quote)]
+                return f"{ALIASES.get(base, base)}/{quote}"
+        return name
+
+    @staticmethod
+    def _guess_symbol(canonical, venue):
+        if '/' not in canonical:
+            return canonical
+        base, quote = canonical.split('/', 1)
+        base = VENUE_ALIASES.get(venue, {}).get(base, base)
+        return f"{base}{quote}M" if venue == 'kucoin' else f"{base}{quote}"
+
+
+symbol_registry = SymbolRegistry()
@@ -0,0 +1,135 @@
+#!/bin/env python3
+
+from entry import (
+    EntryStateMachine, PriceMoveRule, SignalHoldRule,
+    IDLE, SIGNAL, CONFIRMING, ORDERING, OPEN, ENTRY_OPEN_TIMEOUT
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_machine(rules, decision='wait', price=100.0, opened=True):
+    """Máquina com relógio manual; `calls` guarda as ordens enviadas e os estados vistos na hora do envio."""
+    clock = FakeClock()
+    market = {'decision': decision, 'price': price}
+    calls = []
+    machine = None
+
+    def open_position(symbol, side, size, leverage, at_price):
+        calls.append((symbol, side, size, leverage, at_price, machine.state))
+        return opened
+
+    machine = EntryStateMachine(
+        open_position,
+        lambda symbol: market['decision'],
+        lambda symbol: market['price'],
+        rules=rules,
+        clock=clock
+    )
+    return machine, clock, market, calls
+
+
+def test_full_cycle():
+    machine, clock, market, calls = make_machine([PriceMoveRule(30)])
+    assert machine.state == IDLE
+
+    assert machine.arm('BTCUSDT', 0.01, 10)
+    assert machine.state == SIGNAL
+
+    machine.on_signal('BTCUSDT', 'buy')
+    assert machine.state == CONFIRMING
+    assert machine.reference_price == 100.0
+    assert machine.deadline() == clock.now + 30
+
+    clock.now += 10
+    machine.on_tick('BTCUSDT', 101.0)
+    assert machine.state == CONFIRMING and not calls
+
+    clock.now += 20
+    machine.on_tick('BTCUSDT', 101.0)
+    assert calls == [('BTCUSDT', 'buy', 0.01, 10, 101.0, ORDERING)]
+    assert machine.state == OPEN
+
+    machine.on_positions([{'symbol': 'BTCUSDT', 'currentQty': 0.01}])
+    assert machine.state == OPEN and machine.seen_position
+
+    machine.on_positions([])
+    assert machine.state == IDLE
+    assert machine.arm('BTCUSDT', 0.01, 10)
+
+
+def test_rejected_confirmation():
+    machine, clock, market, calls = make_machine([PriceMoveRule(30)])
+    machine.arm('BTCUSDT', 0.01, 10)
+    machine.on_signal('BTCUSDT', 'sell')
+    assert machine.state == CONFIRMING
+
+    # Janela acaba sem ticks, com o preço contra o sinal: poll() decide
+    clock.now += 30
+    market['price'] = 100.5
+    machine.poll()
+    assert machine.state == IDLE
+    assert not calls
+
+
+def test_signal_flip_rejects_immediately():
+    machine, clock, market, calls = make_machine([SignalHoldRule(30)])
+    machine.arm('BTCUSDT', 0.01, 10)
+    machine.on_signal('BTCUSDT', 'buy')
+    machine.on_signal('BTCUSDT', 'sell')
+    assert machine.state == IDLE
+    assert not calls
+
+
+def test_other_symbols_do_not_interrupt_confirmation():
+    machine, clock, market, calls = make_machine([PriceMoveRule(30)])
+    machine.arm('BTCUSDT', 0.01, 10)
+    machine.on_signal('BTCUSDT', 'buy')
+
+    machine.on_positions([{'symbol': 'ETHUSDT', 'currentQty': 1}, {'symbol': 'SOLUSDT', 'currentQty': -3}])
+    assert machine.state == CONFIRMING
+    machine.on_tick('ETHUSDT', 1.0)
+    assert machine.state == CONFIRMING
+
+    # A do próprio símbolo cancela: a posição foi aberta por fora
+    machine.on_positions([{'symbol': 'BTCUSDT', 'currentQty': 0.01}])
+    assert machine.state == IDLE
+    assert not calls
+
+
+def test_open_timeout_resets():
+    machine, clock, market, calls = make_machine([], decision='buy')
+    machine.arm('BTCUSDT', 0.01, 10)
+    assert machine.state == OPEN and len(calls) == 1
+    assert machine.deadline() == clock.now + ENTRY_OPEN_TIMEOUT
+
+    # Posições de outros contratos não contam como a posição aparecendo
+    machine.on_positions([{'symbol': 'ETHUSDT', 'currentQty': 1}])
+    clock.now += ENTRY_OPEN_TIMEOUT - 1
+    machine.poll()
+    assert machine.state == OPEN
+
+    clock.now += 1
+    machine.poll()
+    assert machine.state == IDLE
+    assert machine.deadline() is None
+
+
+def test_failed_order_returns_to_idle():
+    machine, clock, market, calls = make_machine([], decision='buy', opened=False)
+    machine.arm('BTCUSDT', 0.01, 10)
+    assert len(calls) == 1
+    assert machine.state == IDLE
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+    print("ok")
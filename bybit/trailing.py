@@ -0,0 +1,189 @@
+# trailing.py
+
+import os
+import time
+import threading
+from dotenv import load_dotenv
+
+from logger import get_logger
+
+load_dotenv()
+
+logger = get_logger('trailing')
+
+# 'ladder': faixas fixas (trailing_stop_*) ou pnl * 0.5 com auto_calc_trailing_stop
+# 'atr': distância do trailing proporcional à volatilidade atual (ATR de 1m)
+TRAILING_STOP_MODES = ('ladder', 'atr')
+# Períodos (candles de 1m) do ATR do modo 'atr'
+ATR_STOP_PERIOD = int(os.getenv("ATR_STOP_PERIOD", 14))
+# Candles de 1m usados para semear o ATR de um símbolo novo
+ATR_SEED_CANDLES = int(os.getenv("ATR_SEED_CANDLES", 100))
+
+
+def ladder_stop(pnl_percent, real_leverage, default_stop_loss, tiers, auto_calc):
+    """
+    Trigger das faixas fixas: `tiers` = (1-15, 16-30, 31-50, acima de 50),
+    em pontos de PnL abaixo do PnL atual; com `auto_calc`, metade do PnL.
+    """
+    calculated_stop_loss = default_stop_loss
+    if not auto_calc:
+        tier_1_15, tier_16_30, tier_31_50, tier_above_50 = tiers
+        if 0.5 <= pnl_percent <= 3 and real_leverage >= 20:
+            pass  # mantém o stop padrão
+        elif 4 <= pnl_percent < 5:
+            calculated_stop_loss = 2
+        elif 5 <= pnl_percent <= 15.9:
+            if (pnl_percent - tier_1_15) > 2 and pnl_percent > 0:
+                tmp_calculated_stop_loss = pnl_percent - tier_1_15
+                if tmp_calculated_stop_loss > calculated_stop_loss:
+                    calculated_stop_loss = tmp_calculated_stop_loss
+        elif 16 <= pnl_percent <= 30:
+            calculated_stop_loss = pnl_percent - tier_16_30
+        elif 31 <= pnl_percent <= 50:
+            calculated_stop_loss = pnl_percent - tier_31_50
+        elif pnl_percent > 50:
+            calculated_stop_loss = pnl_percent - tier_above_50
+    elif pnl_percent >= 1:
+        calculated_stop_loss = pnl_percent * 0.5
+    return calculated_stop_loss
+
+
+def atr_stop(pnl_percent, real_leverage, default_stop_loss, atr_percent, multiplier):
+    """
+    Trigger pela volatilidade: a distância é `multiplier` ATRs, convertida
+    de % do preço para pontos de PnL pela alavancagem. O trailing só começa
+    quando o PnL cobre a distância, então o primeiro trigger fica no zero a zero.
+    """
+    distance = multiplier * atr_percent * max(real_leverage, 1)
+    if distance > 0 and pnl_percent >= distance:
+        return pnl_percent - distance
+    return default_stop_loss
+
+
+def next_trigger(current_trigger, calculated_stop_loss, pnl_percent):
+    """O trigger só sobe; no prejuízo, volta ao stop calculado se ele for mais baixo."""
+    if calculated_stop_loss > current_trigger or (pnl_percent < 0 and calculated_stop_loss < current_trigger):
+        return calculated_stop_loss
+    return current_trigger
+
+
+class AtrState:
+    """ATR de Wilder em candles de 1m, montados a partir dos ticks."""
+
+    def __init__(self, period):
+        self.period = period
+        self.atr = None
+        self.samples = []
+        self.prev_close = None
+        self.minute = None
+        self.high = self.low = self.close = None
+
+    def _true_range(self, high, low):
+        if self.prev_close is None:
+            return high - low
+        return max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+
+    def add_candle(self, high, low, close):
+        true_range = self._true_range(high, low)
+        if self.atr is None:
+            # Média simples dos primeiros `period` TRs, depois a suavização de Wilder
+            self.samples.append(true_range)
+            if len(self.samples) == self.period:
+                self.atr = sum(self.samples) / self.period
+                self.samples = []
+        else:
+            self.atr += (true_range - self.atr) / self.period
+        self.prev_close = close
+
+    def on_tick(self, price, ts):
+        minute = int(ts // 60)
+        if self.minute is not None and minute > self.minute:
+            self.add_candle(self.high, self.low, self.close)
+            self.minute = None
+        if self.minute is None:
+            self.minute, self.high, self.low = minute, price, price
+        self.high = max(self.high, price)
+        self.low = min(self.low, price)
+        self.close = price
+
+    def value(self):
+        """ATR atual; um pico dentro do minuto já alarga o valor, um minuto calmo só conta ao fechar."""
+        if self.atr is None:
+            return None
+        if self.minute is None:
+            return self.atr
+        partial = self.atr + (self._true_range(self.high, self.low) - self.atr) / self.period
+        return max(self.atr, partial)
+
+
+class VolatilityTracker:
+    """
+    ATR incremental por símbolo para o trailing stop em modo 'atr'.
+
+    Cada símbolo é semeado uma vez com candles de 1m (`seed(symbol, count)`
+    -> klines, numa thread) e depois segue os Ticks do barramento de eventos
+    (`on_event`), atualizado a cada preço. Com `exchange`, só os ticks dessa
+    exchange entram e os símbolos são os dela (`normalize` traduz os de
+    fora): o ATR não mistura contratos com escalas de preço diferentes
+    (1000PEPEUSDT e PEPEUSDTM), e as klines da semeadura devem vir dela também.
+    """
+
+    def __init__(self, seed=None, normalize=None, period=ATR_STOP_PERIOD, clock=time.time, exchange=None):
+        self.seed = seed
+        self.normalize = normalize or (lambda symbol: symbol)
+        self.exchange = exchange
+        self.period = period
+        self.clock = clock
+        self.states = {}
+        self._lock = threading.Lock()
+
+    def track(self, symbol):
+        """Passa a acompanhar `symbol` (a semeadura roda em segundo plano); falso se já acompanhava."""
+        key = self.normalize(symbol)
+        with self._lock:
+            if key in self.states:
+                return False
+            self.states[key] = AtrState(self.period)
+        if self.seed is not None:
+            threading.Thread(target=self._seed, args=(symbol, key), name="VolatilitySeed", daemon=True).start()
+        return True
+
+    def _seed(self, symbol, key):
+        try:
+            klines = self.seed(symbol, ATR_SEED_CANDLES)
+        except Exception as e:
+            logger.warning(f"Erro ao semear o ATR de {symbol}: {e}")
+            return
+        state = AtrState(self.period)
+        # A última kline ainda está em formação: os ticks continuam a partir dela
+        for kline in klines[:-1]:
+            state.add_candle(float(kline[2]), float(kline[3]), float(kline[4]))
+        with self._lock:
+            live = self.states.get(key)
+            if live is not None and live.minute is not None:
+                state.minute, state.high, state.low, state.close = live.minute, live.high, live.low, live.close
+            self.states[key] = state
+
+    def on_tick(self, symbol, price, ts=None):
+        key = self.normalize(symbol)
+        with self._lock:
+            state = self.states.get(key)
+            if state is not None:
+                state.on_tick(price, self.clock() if ts is None else ts)
+
+    def on_event(self, tick):
+        if self.exchange is None or tick.exchange == self.exchange:
+            self.on_tick(tick.symbol, tick.price, tick.ts)
+
+    def atr_percent(self, symbol, price=None):
+        """ATR em % do preço (o último tick, se `price` não vier); None até haver candles suficientes."""
+        key = self.normalize(symbol)
+        with self._lock:
+            state = self.states.get(key)
+            if state is None:
+                return None
+            atr = state.value()
+            price = price or state.close or state.prev_close
+        if atr is None or not price:
+            return None
+        return atr / price * 100
@@ -1,14 +1,16 @@
 # ui.py
 
+import math
 import time
 import json
+import threading
 from PyQt5.QtWidgets import (
     QWidget, QLabel, QLineEdit, QVBoxLayout, QHBoxLayout, QFormLayout,
     QTableWidget, QTableWidgetItem, QHeaderView, QPushButton, QCheckBox,
-    QRadioButton, QButtonGroup
+    QRadioButton, QButtonGroup, QShortcut
 )
-from PyQt5.QtGui import QFont, QColor, QBrush
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QFont, QColor, QBrush, QKeySequence
+from PyQt5.QtCore import Qt, QTimer, QObject, pyqtSignal
 
 from sound import SoundPlayer
 from websocket_client import PriceWebsocketClient
@@ -18,50 +20,144 @@ from api import (
     close_position_market,
     open_new_position_market,
     decide_trade_direction,
-    get_account_overview
+    get_account_overview,
+    set_position_leverage,
+    cancel_open_orders,
+    set_stop_loss,
+    fetch_tick_size,
+    add_position_margin,
+    fetch_fee_rates,
+    fetch_funding_rates,
+    to_bybit_symbol,
+    fetch_klines
 )
 from utils import send_email_notification
+from logger import get_logger
+from latency import tracer
+from profiler import profiler, install_signal_handler
+from metrics import (
+    start_metrics_server,
+    OPEN_POSITIONS,
+    POSITION_PNL_PERCENT,
+    POSITION_TRIGGER_PERCENT,
+    PERSISTENCE_WRITE_SECONDS
+)
+from scanner import SignalScanner, SCANNER_ENABLED
+from streams import STALE_SECONDS
+from orderbook import OrderBookMirror, MAX_ENTRY_SLIPPAGE_BPS
+from risk import PortfolioRisk, RISK_LIQ_WARN_PERCENT
+from stops import ExchangeStopSync, EXCHANGE_STOPS_ENABLED, stop_price_for_trigger
+from trailing import VolatilityTracker, ladder_stop, atr_stop, next_trigger
+from execution import ExecutionEngine, BybitExecution, ParentOrder, SLICE_MIN_NOTIONAL, EXIT_SLICE_DEADLINE
+from margin import MarginCallEngine
+from costs import CostModel
+from accounts import AccountOrchestrator
+from entry import EntryStateMachine, IDLE
+from events import bus, Tick, Signal, PositionUpdate, OrderAck, Fill
+from positions import Position, PositionTable, to_json
+from symbols import symbol_registry
+from indicators import INDICATORS, STRATEGIES, LEGACY_INDICATORS
+from config import ConfigStore, Settings, ConfigError, CONFIG_DEBOUNCE_MS
+
+logger = get_logger('ui')
+
+# Últimas posições, saldo, máxima/mínima e indicadores: a janela abre com eles enquanto os dados ao vivo chegam
+STARTUP_SNAPSHOT_FILE = 'startup_snapshot.json'
+
+
+class ExecutionEvents(QObject):
+    """Leva as atualizações das ordens-mãe da thread de execução para a thread da GUI."""
+    updated = pyqtSignal(object)
+
+
+class StartupEvents(QObject):
+    """Leva os dados da primeira leitura ao vivo (tipo, valor) da thread de carga para a thread da GUI."""
+    loaded = pyqtSignal(str, object)
+
+
+class ConfigEvents(QObject):
+    """Leva o Settings recarregado de configurations.json da thread de verificação para a thread da GUI."""
+    reloaded = pyqtSignal(object)
+
+
+class MarginEvents(QObject):
+    """Leva as chamadas de margem concluídas (símbolo, chamadas usadas, valor) para a thread da GUI."""
+    called = pyqtSignal(str, int, float)
+
+
+class BusEvents(QObject):
+    """Avisa a thread da GUI que chegaram eventos do barramento na fila dela."""
+    ready = pyqtSignal()
+    ticks_ready = pyqtSignal()
+
+
+class PositionsRefresher:
+    """
+    Leitura REST das posições fora da thread da GUI: cada leitura sai como
+    PositionUpdate no barramento. Pedidos feitos durante uma leitura (timer,
+    execuções de ordens fatiadas) viram uma única leitura logo em seguida.
+    """
+
+    def __init__(self, fetch):
+        self.fetch = fetch
+        self.last = None
+        self._running = False
+        self._pending = False
+        self._lock = threading.Lock()
+
+    def request(self):
+        with self._lock:
+            if self._running:
+                self._pending = True
+                return
+            self._running = True
+        threading.Thread(target=self._run, name="PositionsRefresh", daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                data = self.fetch()
+                if data is None:
+                    logger.error("Erro ao obter posições: dados da API são None.")
+                else:
+                    changed = data != self.last
+                    self.last = data
+                    bus.publish(PositionUpdate(data, changed))
+            except Exception as e:
+                logger.error(f"Erro ao obter posições: {e}")
+            with self._lock:
+                if not self._pending:
+                    self._running = False
+                    return
+                self._pending = False
 
 
 class MainWindow(QWidget):
     def __init__(self):
         super().__init__()
 
-        self.selected_symbol = 'XBTUSDTM'
-        self.binance_symbol = 'BTCUSDT'
-        self.default_leverage = 20
-        self.default_stop_loss = -3.5
-        self.stop_loss_price = ''  # Novo campo Stop Loss Price
-        self.auto_calc_trailing_stop = True
-        self.trailing_stop_1_15 = 1.5
-        self.trailing_stop_16_30 = 5
-        self.trailing_stop_31_50 = 8
-        self.trailing_stop_above_50 = 10
-        self.alert_price_above = 0
-        self.alert_price_below = 0
-        self.default_contract_qty = 1
-        self.rsi_period = 14
-        self.use_sma = True
-        self.use_rsi = True
-        self.use_volume = False
-        self.use_high_low = True
-        self.auto_open_new_position = False
-        self.auto_close_positions = True
-        self.granularity = '5'
-        self.margin_calls = 0
+        # Configuração validada (config.py): leverage, trailing stops, indicadores, moedas ignoradas...
+        # Os atributos de configuração vêm sempre de um Settings inteiro (apply_settings)
+        self.settings = None
+        self.apply_settings(Settings())
+        self.config_events = ConfigEvents()
+        self.config_events.reloaded.connect(self.on_config_reloaded)
+        self.config_store = ConfigStore(on_reload=self.config_events.reloaded.emit)
         self.fetch_open_positions_empty_count = 0
 
-        # NOVO CAMPO: IGNORAR MOEDAS
-        # Aqui vamos armazenar a string com as moedas a ignorar no formato "TRUMP,TESTE,ETC"
-        self.ignore_coins_sl = ''  # Texto inicial
-        self.ignore_coins_sl_list = []  # Lista (parsed) para fazer a checagem
-        self.ignore_coins_tp = ''  # Texto inicial
-        self.ignore_coins_tp_list = []  # Lista (parsed) para fazer a checagem
-
         self.position_trackers = {}
         self.load_position_trackers()
 
-        self.monitoring_signal = False
+        # Entrada automática: sinal -> confirmação -> ordem, movida pelos eventos de indicador, preço e posições
+        # O timer só dispara no prazo da máquina (fim da janela sem ticks, posição que não apareceu)
+        self.entry_timer = QTimer()
+        self.entry_timer.setSingleShot(True)
+        self.entry = EntryStateMachine(
+            self.start_entry, self.decision_for, self.price_for, normalize=symbol_registry.canonical,
+            on_change=self.schedule_entry_poll
+        )
+        self.entry_timer.timeout.connect(self.entry.poll)
+        self.entry_timer.timeout.connect(self.schedule_entry_poll)
         self.decision_value = 'wait'
         self.sma_value = ''
         self.rsi_value = ''
@@ -69,30 +165,40 @@ class MainWindow(QWidget):
         self.high_low_value = ''
         self.first_run = True
 
+        # Últimos dados ao vivo, gravados no snapshot da abertura
+        self.last_positions = None
+        self.balance = None
+        self.high_low_prices = (None, None)
+        self.indicators = None
+
         self.price_alert_above = 0
         self.price_alert_below = 0
         self.last_price = 0
         self.alert_above_triggered = False
         self.alert_below_triggered = False
         self.last_updated_price_time = 0
-
-        # Trade direction option ('both', 'buy', 'sell')
-        self.trade_direction_option = 'both'
+        self.last_price_ts = 0.0  # time.monotonic() do último preço recebido (websocket ou REST)
+        self.positions_updated_ts = 0.0  # time.monotonic() da última leitura de posições
+        self.price_feed_stale = False
+
+        # Risco agregado das posições (init_ui já consulta o saldo)
+        self.risk = PortfolioRisk()
+        # Taxas da conta e funding em cache: PnL líquido e preço dos stops usam os custos reais
+        self.costs = CostModel(fetch_fee_rates, fetch_funding_rates)
+        self.costs.start()
+        # Listas de instrumentos das exchanges: usa o cache em disco e renova numa thread se estiver velho
+        symbol_registry.start()
 
         # Carregar configs
         self.load_configurations()
+        self.snapshot = self.load_startup_snapshot()
+        self.startup_events = StartupEvents()
+        self.startup_events.loaded.connect(self.on_startup_data)
         self.init_ui()
 
-        # Ajusta radio buttons conforme config
-        if self.trade_direction_option == 'both':
-            self.trade_direction_both.setChecked(True)
-        elif self.trade_direction_option == 'buy':
-            self.trade_direction_buy.setChecked(True)
-        elif self.trade_direction_option == 'sell':
-            self.trade_direction_sell.setChecked(True)
-
-        # Ajusta interface dos trailing stops
-        self.toggle_input_opacity(self.auto_calc_trailing_stop)
+        # Ajusta radio buttons e trailing stops conforme config
+        self.show_settings(self.settings)
+        self.config_store.start()
 
         # Sons
         self.sound_player = SoundPlayer("correct-chime.mp3")
@@ -102,13 +208,88 @@ class MainWindow(QWidget):
         self.sound_price_below = SoundPlayer("price-below.mp3")
         self.sound_open_position = SoundPlayer("coin.mp3")
 
+        # Endpoint local de métricas (GET /metrics e /latency)
+        self.metrics_server = start_metrics_server()
+
+        # Profiler por amostragem: Ctrl+Shift+P, `kill -USR2 <pid>` ou POST /profile/start
+        self.profiler_shortcut = QShortcut(QKeySequence("Ctrl+Shift+P"), self)
+        self.profiler_shortcut.activated.connect(self.toggle_profiler)
+        install_signal_handler()
+
+        # Scanner multi-símbolo (SCANNER_ENABLED=true no .env): escolhe o contrato da próxima abertura automática
+        self.scanner = SignalScanner() if SCANNER_ENABLED else None
+        if self.scanner is not None:
+            self.update_scanner_params()
+
         # Websocket de preços
         self.price_ws_client = PriceWebsocketClient(self.selected_symbol)
-        self.price_ws_client.price_updated.connect(self.update_price_label)
+        self.price_ws_client.feed_stale.connect(self.set_price_feed_stale)
         self.price_ws_client.start()
-        self.sound_player.play_sound()
+        # Livro L2 da Bybit do símbolo operado, no mesmo loop de streams
+        self.order_books = OrderBookMirror(self.price_ws_client.manager)
+        self.order_books.track('bybit', to_bybit_symbol(self.selected_symbol))
+        # ATR por símbolo para o trailing stop em modo 'atr', atualizado a cada tick do mesmo loop
+        self.volatility = VolatilityTracker(self.volatility_candles, normalize=to_bybit_symbol, exchange='bybit')
+        bus.subscribe(Tick, self.volatility.on_event, name='volatility', mode='loop',
+                      loop=self.price_ws_client.manager.loop)
+        # Preço, sinais do scanner, posições e ordens chegam à GUI pelo barramento, em lote a cada volta do Qt
+        self.bus_events = BusEvents()
+        # Eventos de controle (raros) numa fila sem limite: um surto de ticks nunca descarta ordens ou posições
+        self.bus_subscription = bus.subscribe(
+            (Signal, PositionUpdate, OrderAck, Fill), self.handle_events, name='gui', size=None,
+            mode='wake', wake=self.bus_events.ready.emit, batch=True
+        )
+        # Ticks à parte: só os símbolos que a janela usa, e só o último de cada um
+        self.update_tick_symbols()
+        self.tick_subscription = bus.subscribe(
+            Tick, self.handle_events, name='gui_ticks', accept=self.wants_tick,
+            key=lambda tick: (tick.exchange, tick.symbol),
+            mode='wake', wake=self.bus_events.ticks_ready.emit, batch=True
+        )
+        # Sempre enfileirado: eventos publicados pela própria GUI são tratados na próxima volta do loop do Qt
+        self.bus_events.ready.connect(self.bus_subscription.drain, Qt.QueuedConnection)
+        self.bus_events.ticks_ready.connect(self.tick_subscription.drain, Qt.QueuedConnection)
+        # A consulta REST das posições roda numa thread; o resultado volta como PositionUpdate
+        self.positions_refresher = PositionsRefresher(fetch_open_positions)
+        # Ordens grandes são fatiadas em filhas (TWAP/iceberg/livro) fora da thread da GUI
+        self.execution_events = ExecutionEvents()
+        self.execution_events.updated.connect(self.on_execution_update)
+        self.execution = ExecutionEngine(
+            BybitExecution(),
+            book_for=lambda symbol: self.order_books.get('bybit', symbol),
+            on_update=self.execution_events.updated.emit
+        )
+        # O mark das posições do risco agregado vem dos tickers da Bybit no mesmo loop de streams
+        self.risk.attach_stream(self.price_ws_client.manager)
+        self.liq_warned = set()
+        # Chamadas de margem: adiciona margem isolada perto da liquidação, até self.margin_calls vezes por posição
+        self.margin_events = MarginEvents()
+        self.margin_events.called.connect(self.on_margin_call)
+        self.margin_engine = MarginCallEngine(
+            add_position_margin, on_call=self.margin_events.called.emit, max_calls=self.margin_calls
+        )
+        self.margin_engine.attach_stream(self.price_ws_client.manager)
+        self.margin_engine.start()
+        # Contas extras de accounts.json (subcontas, KuCoin, Binance) no mesmo loop de streams; painel em GET /accounts
+        self.accounts = AccountOrchestrator.from_file(manager=self.price_ws_client.manager)
+        if self.accounts is not None:
+            self.accounts.start()
+        # Stop loss espelhado na Bybit (EXCHANGE_STOPS_ENABLED=false no .env desliga)
+        self.exchange_stops = ExchangeStopSync(set_stop_loss, fetch_tick_size) if EXCHANGE_STOPS_ENABLED else None
+        if self.exchange_stops is not None:
+            self.exchange_stops.start()
+        if self.scanner is not None:
+            # O scanner assina os tickers no mesmo loop de streams do preço principal
+            self.scanner.attach_stream(self.price_ws_client.manager)
+            self.scanner.start()
 
     def init_ui(self):
+        # Campos de texto: aplica a configuração quando a digitação para, não a cada tecla
+        self.config_debounce = QTimer(self)
+        self.config_debounce.setSingleShot(True)
+        self.config_debounce.setInterval(CONFIG_DEBOUNCE_MS)
+        self.config_debounce.timeout.connect(self.apply_config_inputs)
+
         self.setWindowTitle("Leverage Trading Bot")
         self.setGeometry(0, 0, 1240, 800)
         main_layout = QVBoxLayout()
@@ -203,6 +384,21 @@ class MainWindow(QWidget):
         )
         config_left_layout.addRow(auto_calc_trailing_stop_label, self.auto_calc_trailing_stop_checkbox)
 
+        atr_trailing_stop_label = QLabel("ATR Trailing Stop:")
+        atr_trailing_stop_label.setFont(QFont("Arial", 12))
+        self.atr_trailing_stop_checkbox = QCheckBox()
+        self.atr_trailing_stop_checkbox.setChecked(self.trailing_stop_mode == 'atr')
+        self.atr_trailing_stop_checkbox.stateChanged.connect(self.toggle_atr_trailing_stop)
+        config_left_layout.addRow(atr_trailing_stop_label, self.atr_trailing_stop_checkbox)
+
+        atr_stop_multiplier_label = QLabel("Multiplicador ATR:")
+        atr_stop_multiplier_label.setFont(QFont("Arial", 12))
+        self.atr_stop_multiplier_input = QLineEdit(str(self.atr_stop_multiplier))
+        self.atr_stop_multiplier_input.setFont(QFont("Arial", 12))
+        self.atr_stop_multiplier_input.setFixedWidth(100)
+        self.atr_stop_multiplier_input.textChanged.connect(self.check_parameters_changes)
+        config_left_layout.addRow(atr_stop_multiplier_label, self.atr_stop_multiplier_input)
+
         trailing_stop_1_15_label = QLabel("Trailing Stop 5-15%:")
         trailing_stop_1_15_label.setFont(QFont("Arial", 12))
         self.trailing_stop_1_15_input = QLineEdit(str(self.trailing_stop_1_15))
@@ -339,7 +535,7 @@ class MainWindow(QWidget):
         # Buttons
         self.save_config_button = QPushButton("Salvar configurações")
         self.save_config_button.setStyleSheet("min-height: 30px;")
-        self.save_config_button.clicked.connect(self.check_parameters_changes)
+        self.save_config_button.clicked.connect(lambda: self.apply_config_inputs(flash=True))
         self.buy_market_button = QPushButton("Buy Market")
         self.buy_market_button.setStyleSheet("min-height: 30px;")
         self.buy_market_button.clicked.connect(self.buy_market)
@@ -428,6 +624,38 @@ class MainWindow(QWidget):
         indicator_layout_line2.addStretch()
         indicator_layout.addLayout(indicator_layout_line2)
 
+        # Plugins de indicators.py além dos quatro originais e a estratégia que combina os sinais
+        indicator_layout_line3 = QHBoxLayout()
+        indicator_layout_line3.addStretch()
+        self.plugin_checkboxes = {}
+        for name, indicator in INDICATORS.items():
+            if name in LEGACY_INDICATORS:
+                continue
+            checkbox = QCheckBox(indicator.label)
+            checkbox.setChecked(name in self.settings.extra_indicators_list)
+            checkbox.setFont(QFont("Arial", 12))
+            checkbox.stateChanged.connect(lambda state, name=name: self.toggle_indicator(state, name))
+            checkbox.setStyleSheet("QCheckBox { color: white; margin: 20px 0; min-width: 200px;}")
+            indicator_layout_line3.addWidget(checkbox)
+            self.plugin_checkboxes[name] = checkbox
+        indicator_layout_line3.addStretch()
+        indicator_layout.addLayout(indicator_layout_line3)
+
+        strategy_layout = QHBoxLayout()
+        strategy_layout.addStretch()
+        self.strategy_group = QButtonGroup(self)
+        self.strategy_buttons = {}
+        for name in STRATEGIES:
+            button = QRadioButton(name.capitalize())
+            button.setFont(QFont("Arial", 12))
+            button.setChecked(name == self.strategy)
+            button.toggled.connect(lambda checked: checked and self.apply_config_inputs())
+            strategy_layout.addWidget(button)
+            self.strategy_group.addButton(button)
+            self.strategy_buttons[name] = button
+        strategy_layout.addStretch()
+        indicator_layout.addLayout(strategy_layout)
+
         main_layout.addLayout(indicator_layout)
 
         # Trade Direction Radio Buttons
@@ -493,14 +721,9 @@ class MainWindow(QWidget):
         self.timer.timeout.connect(self.fetch_open_positions)
         self.timer.start(1000)
 
-        self.auto_close_timer = QTimer()
-        self.auto_close_timer.timeout.connect(self.check_auto_close_positions)
-        self.auto_close_timer.start(1000)
-
         self.high_low_timer = QTimer()
         self.high_low_timer.timeout.connect(self.fetch_high_low_prices)
         self.high_low_timer.start(60000)
-        self.fetch_high_low_prices()
 
         self.get_indicators_timer = QTimer()
         self.get_indicators_timer.timeout.connect(self.check_decision_indicators)
@@ -509,26 +732,23 @@ class MainWindow(QWidget):
         self.balance_timer = QTimer()
         self.balance_timer.timeout.connect(self.update_balance_label)
         self.balance_timer.start(60000)
-        self.update_balance_label()
+
+        self.latency_summary_timer = QTimer()
+        self.latency_summary_timer.timeout.connect(self.log_latency_summary)
+        self.latency_summary_timer.start(60000)
+
+        # Primeira tela com o snapshot da última sessão; os dados ao vivo chegam depois, fora da thread da GUI
+        self.paint_startup_snapshot()
+        QTimer.singleShot(0, self.load_live_data)
 
     def update_trade_direction_option(self):
-        if self.trade_direction_both.isChecked():
-            self.trade_direction_option = 'both'
-        elif self.trade_direction_buy.isChecked():
-            self.trade_direction_option = 'buy'
-        elif self.trade_direction_sell.isChecked():
-            self.trade_direction_option = 'sell'
-        self.check_parameters_changes()
+        self.apply_config_inputs()
 
     def toggle_auto_open(self, state, checkbox=None):
-        if checkbox == self.auto_open_checkbox:
-            self.auto_open_new_position = state == Qt.Checked
-        self.check_parameters_changes()
+        self.apply_config_inputs()
 
     def toggle_auto_close(self, state, checkbox=None):
-        if checkbox == self.auto_close_checkbox:
-            self.auto_close_positions = state == Qt.Checked
-        self.check_parameters_changes()
+        self.apply_config_inputs()
 
     def toggle_input_opacity(self, isChecked):
         # trailing input opacity
@@ -544,40 +764,35 @@ class MainWindow(QWidget):
             self.trailing_stop_above_50_input.setStyleSheet("background-color: #1e1e1e; color: white;")
 
     def toggle_auto_calc_trailing_stop(self, state, checkbox):
-        print(f"Auto Calc Trailing Stop: {state}")
-        self.auto_calc_trailing_stop = state == Qt.Checked
-        self.check_parameters_changes()
+        logger.debug("Auto Calc Trailing Stop: %s", state)
+        self.apply_config_inputs()
+        self.show_trailing_stop_inputs(state == Qt.Checked or self.trailing_stop_mode == 'atr')
 
+    def toggle_atr_trailing_stop(self, state):
+        self.apply_config_inputs()
+        self.show_trailing_stop_inputs(state == Qt.Checked or self.auto_calc_trailing_stop)
+
+    def show_trailing_stop_inputs(self, auto_calc):
         # disable trailing stop inputs if auto calc is enabled
-        self.trailing_stop_1_15_input.setEnabled(not self.auto_calc_trailing_stop)
-        self.trailing_stop_16_30_input.setEnabled(not self.auto_calc_trailing_stop)
-        self.trailing_stop_31_50_input.setEnabled(not self.auto_calc_trailing_stop)
-        self.trailing_stop_above_50_input.setEnabled(not self.auto_calc_trailing_stop)
-        self.toggle_input_opacity(self.auto_calc_trailing_stop)
+        self.trailing_stop_1_15_input.setEnabled(not auto_calc)
+        self.trailing_stop_16_30_input.setEnabled(not auto_calc)
+        self.trailing_stop_31_50_input.setEnabled(not auto_calc)
+        self.trailing_stop_above_50_input.setEnabled(not auto_calc)
+        self.toggle_input_opacity(auto_calc)
 
     def toggle_indicator(self, state, indicator):
-        if indicator == 'sma':
-            self.use_sma = state == Qt.Checked
-        elif indicator == 'rsi':
-            self.use_rsi = state == Qt.Checked
-        elif indicator == 'volume':
-            self.use_volume = state == Qt.Checked
-        elif indicator == 'high_low':
-            self.use_high_low = state == Qt.Checked
-        self.check_parameters_changes()
+        self.apply_config_inputs()
 
     def select_granularity(self, state, checkbox):
         if checkbox == self.granularity_1m_checkbox:
             self.granularity_5m_checkbox.setChecked(False)
             if state != Qt.Checked:
                 self.granularity_1m_checkbox.setChecked(True)
-            self.granularity = '1'
         elif checkbox == self.granularity_5m_checkbox:
             self.granularity_1m_checkbox.setChecked(False)
             if state != Qt.Checked:
                 self.granularity_5m_checkbox.setChecked(True)
-            self.granularity = '5'
-        self.check_parameters_changes()
+        self.apply_config_inputs()
 
     def reset_alerts(self):
         self.alert_above_triggered = False
@@ -585,93 +800,205 @@ class MainWindow(QWidget):
 
     def check_parameters_changes(self):
         """
-        Valida e salva as configurações sempre que algum QLineEdit/QCheckBox muda.
+        Chamado a cada tecla nos campos de configuração: só reinicia o debounce.
+        """
+        self.config_debounce.start()
+
+    def read_config_inputs(self):
+        """Valores brutos dos campos da janela, validados depois por Settings.from_dict."""
+        if self.trade_direction_buy.isChecked():
+            trade_direction = 'buy'
+        elif self.trade_direction_sell.isChecked():
+            trade_direction = 'sell'
+        else:
+            trade_direction = 'both'
+        return {
+            'default_leverage': self.leverage_input.text(),
+            'default_stop_loss': self.default_stop_loss_input.text(),
+            'stop_loss_price': self.stop_loss_price_input.text(),
+            'auto_calc_trailing_stop': self.auto_calc_trailing_stop_checkbox.isChecked(),
+            'trailing_stop_1_15': self.trailing_stop_1_15_input.text(),
+            'trailing_stop_16_30': self.trailing_stop_16_30_input.text(),
+            'trailing_stop_31_50': self.trailing_stop_31_50_input.text(),
+            'trailing_stop_above_50': self.trailing_stop_above_50_input.text(),
+            'trailing_stop_mode': 'atr' if self.atr_trailing_stop_checkbox.isChecked() else 'ladder',
+            'atr_stop_multiplier': self.atr_stop_multiplier_input.text(),
+            'alert_price_above': self.alert_entry_above.text(),
+            'alert_price_below': self.alert_entry_below.text(),
+            'default_contract_qty': self.default_contract_qty_input.text(),
+            'rsi_period': self.rsi_period_input.text(),
+            'margin_calls': self.margin_calls_input.text(),
+            'use_sma': self.use_sma_checkbox.isChecked(),
+            'use_rsi': self.use_rsi_checkbox.isChecked(),
+            'use_volume': self.use_volume_checkbox.isChecked(),
+            'use_high_low': self.use_high_low_checkbox.isChecked(),
+            'extra_indicators': ','.join(
+                [name for name, box in self.plugin_checkboxes.items() if box.isChecked()]
+                # Indicadores em outro timeframe só existem no arquivo
+                + [name for name in self.settings.extra_indicators_list if '@' in name]
+            ),
+            'strategy': next(name for name, button in self.strategy_buttons.items() if button.isChecked()),
+            'granularity': '1' if self.granularity_1m_checkbox.isChecked() else '5',
+            'auto_open_new_position': self.auto_open_checkbox.isChecked(),
+            'auto_close_positions': self.auto_close_checkbox.isChecked(),
+            'trade_direction_option': trade_direction,
+            'ignore_coins_sl': self.ignore_coins_sl_input.text(),
+            'ignore_coins_tp': self.ignore_coins_tp_input.text(),
+        }
+
+    def apply_config_inputs(self, flash=False):
         """
+        Valida todos os campos da janela e troca a configuração inteira, ou
+        nenhuma; só grava o arquivo se algo mudou.
+        """
+        self.config_debounce.stop()
         try:
-            new_leverage = int(self.leverage_input.text())
-            new_default_stop_loss = float(self.default_stop_loss_input.text())
-            new_stop_loss_price = self.stop_loss_price_input.text()
-            new_auto_calc_trailing_stop = self.auto_calc_trailing_stop_checkbox.isChecked()
-            new_trailing_stop_1_15 = float(self.trailing_stop_1_15_input.text())
-            new_trailing_stop_16_30 = float(self.trailing_stop_16_30_input.text())
-            new_trailing_stop_31_50 = float(self.trailing_stop_31_50_input.text())
-            new_trailing_stop_above_50 = float(self.trailing_stop_above_50_input.text())
-            new_alert_price_above = float(self.alert_entry_above.text())
-            new_alert_price_below = float(self.alert_entry_below.text())
-            new_default_contract_qty = int(self.default_contract_qty_input.text())
-            new_rsi_period = int(self.rsi_period_input.text())
-            new_margin_calls = int(self.margin_calls_input.text())
-
-            # Novo: ignorar moedas
-            new_ignore_coins_sl = self.ignore_coins_sl_input.text().strip()
-            # parse e salva em self.ignore_coins_list
-            ignore_list_sl = [c.strip() for c in new_ignore_coins_sl.split(',') if c.strip()]
-
-            new_ignore_coins_tp = self.ignore_coins_tp_input.text().strip()
-            ignore_list_tp = [c.strip() for c in new_ignore_coins_tp.split(',') if c.strip()]
-
-            self.default_leverage = new_leverage
-            self.default_stop_loss = new_default_stop_loss
-            self.stop_loss_price = new_stop_loss_price
-            self.auto_calc_trailing_stop = new_auto_calc_trailing_stop
-            self.trailing_stop_1_15 = new_trailing_stop_1_15
-            self.trailing_stop_16_30 = new_trailing_stop_16_30
-            self.trailing_stop_31_50 = new_trailing_stop_31_50
-            self.trailing_stop_above_50 = new_trailing_stop_above_50
-            self.alert_price_above = new_alert_price_above
-            self.alert_price_below = new_alert_price_below
-            self.default_contract_qty = new_default_contract_qty
-            self.rsi_period = new_rsi_period
-            self.margin_calls = new_margin_calls
-
-            # Guarda e parseia ignore_coins
-            self.ignore_coins_sl = new_ignore_coins_sl
-            self.ignore_coins_sl_list = ignore_list_sl
-
-            self.ignore_coins_tp = new_ignore_coins_tp
-            self.ignore_coins_tp_list = ignore_list_tp
+            settings = Settings.from_dict(self.read_config_inputs(), self.settings)
+        except ConfigError as e:
+            logger.warning(f"Erro ao salvar configurações. Verifique os valores inseridos: {e}")
+            self.flash_save_button(False)
+            return
 
-            self.reset_alerts()
+        changed = self.apply_settings(settings)
+        if changed:
+            self.save_configurations()
+        if changed or flash:
+            self.flash_save_button(True)
 
-            # Feedback de sucesso no botão
+    def apply_settings(self, settings):
+        """
+        Troca a configuração numa única chamada na thread da GUI: os timers de
+        avaliação nunca veem trailing stops ou indicadores pela metade.
+        Retorna os campos alterados.
+        """
+        previous = self.settings
+        self.settings = settings
+        for name, value in settings.as_dict().items():
+            setattr(self, name, value)
+        self.ignore_coins_sl_list = settings.ignore_coins_sl_list
+        self.ignore_coins_tp_list = settings.ignore_coins_tp_list
+        if previous is None:
+            return []
+
+        changed = previous.changed(settings)
+        if 'alert_price_above' in changed or 'alert_price_below' in changed:
+            self.reset_alerts()
+        if getattr(self, 'scanner', None) is not None:
+            self.update_scanner_params()
+        return changed
+
+    def show_settings(self, settings):
+        """Preenche os campos da janela com `settings`, sem disparar os sinais de mudança."""
+        texts = (
+            (self.leverage_input, settings.default_leverage),
+            (self.default_stop_loss_input, settings.default_stop_loss),
+            (self.stop_loss_price_input, settings.stop_loss_price),
+            (self.trailing_stop_1_15_input, settings.trailing_stop_1_15),
+            (self.trailing_stop_16_30_input, settings.trailing_stop_16_30),
+            (self.trailing_stop_31_50_input, settings.trailing_stop_31_50),
+            (self.trailing_stop_above_50_input, settings.trailing_stop_above_50),
+            (self.atr_stop_multiplier_input, settings.atr_stop_multiplier),
+            (self.alert_entry_above, settings.alert_price_above),
+            (self.alert_entry_below, settings.alert_price_below),
+            (self.default_contract_qty_input, settings.default_contract_qty),
+            (self.rsi_period_input, settings.rsi_period),
+            (self.margin_calls_input, settings.margin_calls),
+            (self.ignore_coins_sl_input, settings.ignore_coins_sl),
+            (self.ignore_coins_tp_input, settings.ignore_coins_tp),
+        )
+        checks = (
+            (self.auto_calc_trailing_stop_checkbox, settings.auto_calc_trailing_stop),
+            (self.atr_trailing_stop_checkbox, settings.trailing_stop_mode == 'atr'),
+            (self.use_sma_checkbox, settings.use_sma),
+            (self.use_rsi_checkbox, settings.use_rsi),
+            (self.use_volume_checkbox, settings.use_volume),
+            (self.use_high_low_checkbox, settings.use_high_low),
+            (self.granularity_1m_checkbox, settings.granularity == '1'),
+            (self.granularity_5m_checkbox, settings.granularity == '5'),
+            (self.auto_open_checkbox, settings.auto_open_new_position),
+            (self.auto_close_checkbox, settings.auto_close_positions),
+            (self.trade_direction_both, settings.trade_direction_option == 'both'),
+            (self.trade_direction_buy, settings.trade_direction_option == 'buy'),
+            (self.trade_direction_sell, settings.trade_direction_option == 'sell'),
+            *((box, name in settings.extra_indicators_list) for name, box in self.plugin_checkboxes.items()),
+            *((button, name == settings.strategy) for name, button in self.strategy_buttons.items()),
+        )
+        for widget, value in texts:
+            widget.blockSignals(True)
+            if widget.text() != str(value):
+                widget.setText(str(value))
+            widget.blockSignals(False)
+        for widget, value in checks:
+            widget.blockSignals(True)
+            if value:
+                widget.setChecked(True)
+            elif not isinstance(widget, QRadioButton):
+                widget.setChecked(False)
+            widget.blockSignals(False)
+        self.show_trailing_stop_inputs(settings.auto_calc_trailing_stop or settings.trailing_stop_mode == 'atr')
+
+    def on_config_reloaded(self, settings):
+        """configurations.json mudou fora do bot: aplica tudo de uma vez e atualiza os campos da janela."""
+        if settings.selected_symbol != self.selected_symbol:
+            # Os streams e o livro seguem o símbolo da abertura
+            logger.warning(f"selected_symbol só muda ao reiniciar o bot; mantendo {self.selected_symbol}.")
+            settings = Settings.from_dict({'selected_symbol': self.selected_symbol}, settings)
+        self.config_debounce.stop()
+        changed = self.apply_settings(settings)
+        self.show_settings(settings)
+        if changed:
+            logger.info(f"Configurações recarregadas de {self.config_store.path}: {', '.join(changed)}")
+
+    def flash_save_button(self, ok):
+        # Feedback no botão, desfeito depois de meio segundo
+        if ok:
             self.save_config_button.setStyleSheet("background-color: #00ff00; color: black; min-height: 30px;")
             self.save_config_button.setText("Salvo com sucesso!")
-            QTimer.singleShot(500, lambda: self.save_config_button.setStyleSheet("min-height: 30px;"))
-            QTimer.singleShot(500, lambda: self.save_config_button.setText("Salvar configurações"))
-
-            self.save_configurations()
-
-        except ValueError as e:
-            print(f"Erro ao salvar configurações. Verifique os valores inseridos: {e}")
+        else:
             self.save_config_button.setStyleSheet("background-color: #ff0000; color: black; min-height: 30px;")
             self.save_config_button.setText("Ocorreu um erro!")
-            QTimer.singleShot(500, lambda: self.save_config_button.setStyleSheet("min-height: 30px;"))
-            QTimer.singleShot(500, lambda: self.save_config_button.setText("Salvar configurações"))
+        QTimer.singleShot(500, self.reset_save_button)
 
-    def fetch_open_positions(self):
-        try:
-            data = fetch_open_positions()
-            if data is not None:
-                self.update_positions_display(data)
+    def reset_save_button(self):
+        self.save_config_button.setStyleSheet("min-height: 30px;")
+        self.save_config_button.setText("Salvar configurações")
 
-                if data:
-                    self.monitoring_signal = False
-                    self.fetch_open_positions_empty_count = 0
-                else:
-                    self.fetch_open_positions_empty_count += 1
+    def fetch_open_positions(self):
+        """Pede uma leitura das posições; a consulta REST roda fora da thread da GUI (PositionsRefresher)."""
+        self.positions_refresher.request()
 
-                # Se não há posições, e auto_open_new_position estiver ativo, tentamos abrir
-                if not data and self.auto_open_new_position and not self.monitoring_signal and self.fetch_open_positions_empty_count > 3:
-                    print(f"Empty count: {self.fetch_open_positions_empty_count}, abrindo nova posição...")
-                    self.open_new_position_after_close(None)
+    def apply_positions(self, data):
+        """Leitura de posições vinda do barramento (PositionUpdate), na thread da GUI."""
+        try:
+            self.positions_updated_ts = time.monotonic()
+            for position in data:
+                self.order_books.track('bybit', to_bybit_symbol(position['symbol']))
+            self.risk.load_positions(data)
+            self.update_positions_display(data)
+            self.last_positions = data
+            self.margin_engine.max_calls = self.margin_calls
+            self.margin_engine.sync(data, self.position_trackers)
+            self.costs.publish(data.symbols)
+            self.entry.on_positions(data)
+            self.update_tick_symbols()
+
+            if data:
+                self.fetch_open_positions_empty_count = 0
             else:
-                print("Erro ao obter posições: dados da API são None.")
+                self.fetch_open_positions_empty_count += 1
+
+            # Se não há posições, e auto_open_new_position estiver ativo, tentamos abrir
+            if not data and self.auto_open_new_position and self.entry.state == IDLE and self.fetch_open_positions_empty_count > 3:
+                logger.info(f"Empty count: {self.fetch_open_positions_empty_count}, abrindo nova posição...")
+                self.open_new_position_after_close(None)
         except Exception as e:
-            print(f"Erro ao obter posições: {e}")
-            self.monitoring_signal = False
+            logger.error(f"Erro ao obter posições: {e}")
 
     def fetch_high_low_prices(self):
-        high_price, low_price = fetch_high_low_prices(self.selected_symbol)
+        self.show_high_low(*fetch_high_low_prices(self.selected_symbol))
+
+    def show_high_low(self, high_price, low_price):
+        self.high_low_prices = (high_price, low_price)
         if high_price is not None and low_price is not None:
             self.high_label.setText(f"High: ${high_price:,.2f}")
             self.low_label.setText(f"Low: ${low_price:,.2f}")
@@ -679,9 +1006,13 @@ class MainWindow(QWidget):
             self.high_label.setText("High: N/A")
             self.low_label.setText("Low: N/A")
 
-    def update_positions_display(self, positions):
+    def update_positions_display(self, positions, sync_trackers=True):
+        """Redesenha a tabela. Com sync_trackers=False (snapshot da abertura) só desenha, sem mexer nos trackers."""
         self.positions_table.setRowCount(0)
         current_positions_ids = set()
+        # PnL líquido de todas as linhas numa conta de arrays (o snapshot chega como lista de dicts)
+        positions = PositionTable.from_positions(positions)
+        net_pnl, net_pnl_percent, _ = self.costs.net_pnl_table(positions)
 
         for position in positions:
             row_position = self.positions_table.rowCount()
@@ -702,18 +1033,9 @@ class MainWindow(QWidget):
             pos_margin = position.get('posMargin', 0)
             unrealised_pnl_value = position.get('unrealisedPnl', 0)
 
-            fee_percent = 0.06 * 2 * real_leverage
-            total_fees_percent = fee_percent
-
-            if pos_margin != 0:
-                pnl_percent = (unrealised_pnl_value / pos_margin) * 100
-                pnl_percent -= total_fees_percent
-            else:
-                pnl_percent = 0.0
-
-            fee_rate = 0.0006 * 2
-            total_fees_paid = fee_rate * real_leverage * maint_margin
-            adjusted_unrealised_pnl_value = unrealised_pnl_value - total_fees_paid
+            adjusted_unrealised_pnl_value = float(net_pnl[position.i])
+            pnl_percent = float(net_pnl_percent[position.i])
+            total_fees_paid = unrealised_pnl_value - adjusted_unrealised_pnl_value
 
             unrealised_pnl = f"{adjusted_unrealised_pnl_value:.2f} ({pnl_percent:.2f}%)"
 
@@ -809,10 +1131,14 @@ class MainWindow(QWidget):
             market_button = QPushButton("Fechar Posição")
             market_button.setStyleSheet("height: 100%;")
             market_button.clicked.connect(lambda _, pos=position: self.close_position_market(pos))
+            # Linha do snapshot: a posição pode ter mudado, o fechamento espera os dados ao vivo
+            market_button.setEnabled(sync_trackers)
             actions_layout.addWidget(market_button)
             actions_widget.setLayout(actions_layout)
             self.positions_table.setCellWidget(row_position, 8, actions_widget)
 
+            if not sync_trackers:
+                continue
             current_positions_ids.add(position_id)
             if position_id not in self.position_trackers:
                 self.position_trackers[position_id] = {
@@ -829,21 +1155,43 @@ class MainWindow(QWidget):
                 used_calls = tracker.get('used_margin_calls', 0)
                 self.update_used_margin_calls_label(used_calls)
 
+        if not sync_trackers:
+            return
         # Remove trackers que não estão mais em posições abertas
         for pid in list(self.position_trackers.keys()):
-            if pid not in current_positions_ids:
+            if pid not in current_positions_ids and 'working_order' not in self.position_trackers[pid]:
                 del self.position_trackers[pid]
                 self.save_position_trackers()
+                if self.exchange_stops is not None:
+                    self.exchange_stops.forget(to_bybit_symbol(pid))
 
     def check_auto_close_positions(self):
+        tracer.since_tick('tick_to_evaluation')
+        evaluation_start = time.perf_counter()
+        self.check_portfolio_risk()
+
+        # Stops nunca são avaliados com dados congelados
+        now = time.monotonic()
+        if self.position_trackers and now - self.positions_updated_ts > STALE_SECONDS:
+            logger.warning(f"Posições sem atualização há {now - self.positions_updated_ts:.0f}s. Stops não avaliados.")
+            return
+        price_fresh = now - self.last_price_ts <= STALE_SECONDS
+        if self.stop_loss_price != '' and not price_fresh:
+            logger.warning("Preço sem atualização. Stop Loss Price não avaliado.")
         positions_to_delete = []
+        pnl_by_symbol = {}
+        # PnL líquido de todas as posições da última leitura numa conta de arrays
+        table = self.last_positions
+        _, table_pnl_percent, table_fee_percent = self.costs.net_pnl_table(table) if table is not None else (None,) * 3
 
         position_trackers_copy = list(self.position_trackers.items())
         for symbol, tracker in position_trackers_copy:
+            working = self.execution.working.get(to_bybit_symbol(symbol))
+            if working is not None and working.reduce_only:
+                continue  # fechamento fatiado em andamento
             position = tracker['position']
             position_id = position['symbol']
             pos_margin = position.get('posMargin', 1)
-            unrealised_pnl = position.get('unrealisedPnl', 0)
             real_leverage = position.get('realLeverage', 0)
             avg_entry_price = position.get('avgEntryPrice', 0)
             current_qty = position.get('currentQty', 0)
@@ -851,44 +1199,38 @@ class MainWindow(QWidget):
             if pos_margin == 0:
                 continue
 
-            pnl_percent = (unrealised_pnl / pos_margin) * 100
-            fee_percent = 0.06 * 2 * real_leverage
-            pnl_percent -= fee_percent
+            if isinstance(position, Position) and position.table is table:
+                pnl_percent, fee_percent = table_pnl_percent[position.i], table_fee_percent[position.i]
+            else:
+                # Tracker ainda com a posição do arquivo ou da ordem recém-enviada
+                _, pnl_percent, fee_percent = self.costs.net_pnl(position)
 
             current_trigger = tracker.get('trigger_stop_loss_percent', self.default_stop_loss)
-            calculated_stop_loss = self.default_stop_loss
-
-            # Lógica do trailing stop
-            # converter pnl_percent para float
             pnl_percent = float(pnl_percent)
 
-            # print(f"pnl_percent: {pnl_percent:.2f} | auto_calc_trailing_stop: {self.auto_calc_trailing_stop} | {self.trailing_stop_1_15}")
-            if not self.auto_calc_trailing_stop:
-                # print("Calculando stop loss manualmente...")
-                if 0.5 <= pnl_percent <= 3 and real_leverage >= 20:
-                    calculated_stop_loss = calculated_stop_loss
-                elif 4 <= pnl_percent < 5:
-                    # calculated_stop_loss = pnl_percent * 0.5
-                    # calculated_stop_loss = calculated_stop_loss
-                    calculated_stop_loss = 2
-                elif 5 <= pnl_percent <= 15.9:
-                    if (pnl_percent - self.trailing_stop_1_15) > 2 and pnl_percent > 0:
-                        tmp_calculated_stop_loss = pnl_percent - self.trailing_stop_1_15
-                        if tmp_calculated_stop_loss > calculated_stop_loss:
-                            calculated_stop_loss = tmp_calculated_stop_loss
-                elif 16 <= pnl_percent <= 30:
-                    calculated_stop_loss = pnl_percent - self.trailing_stop_16_30
-                elif 31 <= pnl_percent <= 50:
-                    calculated_stop_loss = pnl_percent - self.trailing_stop_31_50
-                elif pnl_percent > 50:
-                    calculated_stop_loss = pnl_percent - self.trailing_stop_above_50
+            # Lógica do trailing stop: ATR enquanto houver volatilidade medida, senão as faixas fixas
+            atr_percent = None
+            if self.trailing_stop_mode == 'atr':
+                atr_percent = self.volatility.atr_percent(symbol)
+                if atr_percent is None:
+                    self.track_volatility(symbol)
+            if atr_percent is not None:
+                calculated_stop_loss = atr_stop(
+                    pnl_percent, real_leverage, self.default_stop_loss, atr_percent, self.atr_stop_multiplier)
             else:
-                if pnl_percent >= 1:
-                    calculated_stop_loss = pnl_percent * 0.5
-
-            if calculated_stop_loss > current_trigger or (pnl_percent < 0 and calculated_stop_loss < current_trigger):
-                tracker['trigger_stop_loss_percent'] = calculated_stop_loss
-                print(f"Trigger atualizado para {calculated_stop_loss:.2f}% | PNL Atual: {pnl_percent:.2f}%")
+                calculated_stop_loss = ladder_stop(
+                    pnl_percent, real_leverage, self.default_stop_loss,
+                    (self.trailing_stop_1_15, self.trailing_stop_16_30, self.trailing_stop_31_50,
+                     self.trailing_stop_above_50),
+                    self.auto_calc_trailing_stop
+                )
+
+            trigger = next_trigger(current_trigger, calculated_stop_loss, pnl_percent)
+            if trigger != current_trigger:
+                tracker['trigger_stop_loss_percent'] = trigger
+                logger.debug("Trigger atualizado para %.2f%% | PNL Atual: %.2f%%", trigger, pnl_percent,
+                             extra={'symbol': symbol})
+            pnl_by_symbol[symbol] = pnl_percent
 
             if pnl_percent > tracker.get('max_pnl_percent', 0):
                 tracker['max_pnl_percent'] = pnl_percent
@@ -896,7 +1238,7 @@ class MainWindow(QWidget):
                 tracker['max_pnl_percent'] = pnl_percent
 
             # Verificar Stop Loss Price
-            if self.stop_loss_price != '':
+            if self.stop_loss_price != '' and price_fresh:
                 try:
                     stop_loss_price = float(self.stop_loss_price)
                     current_price = self.last_price
@@ -905,7 +1247,7 @@ class MainWindow(QWidget):
                         if stop_loss_price >= avg_entry_price:
                             # Take Profit
                             if current_price >= stop_loss_price:
-                                print(f"Stop Loss Price atingido (Take Profit) para posição LONG em {stop_loss_price}")
+                                logger.warning(f"Stop Loss Price atingido (Take Profit) para posição LONG em {stop_loss_price}")
                                 if self.auto_close_positions:
                                     self.close_position_market(position)
                                     positions_to_delete.append(symbol)
@@ -913,7 +1255,7 @@ class MainWindow(QWidget):
                         else:
                             # Stop Loss
                             if current_price <= stop_loss_price:
-                                print(f"Stop Loss Price atingido (Stop Loss) para posição LONG em {stop_loss_price}")
+                                logger.warning(f"Stop Loss Price atingido (Stop Loss) para posição LONG em {stop_loss_price}")
                                 if self.auto_close_positions:
                                     self.close_position_market(position)
                                     positions_to_delete.append(symbol)
@@ -922,7 +1264,7 @@ class MainWindow(QWidget):
                         if stop_loss_price <= avg_entry_price:
                             # Take Profit
                             if current_price <= stop_loss_price:
-                                print(f"Stop Loss Price atingido (Take Profit) para posição SHORT em {stop_loss_price}")
+                                logger.warning(f"Stop Loss Price atingido (Take Profit) para posição SHORT em {stop_loss_price}")
                                 if self.auto_close_positions:
                                     self.close_position_market(position)
                                     positions_to_delete.append(symbol)
@@ -930,13 +1272,13 @@ class MainWindow(QWidget):
                         else:
                             # Stop Loss
                             if current_price >= stop_loss_price:
-                                print(f"Stop Loss Price atingido (Stop Loss) para posição SHORT em {stop_loss_price}")
+                                logger.warning(f"Stop Loss Price atingido (Stop Loss) para posição SHORT em {stop_loss_price}")
                                 if self.auto_close_positions:
                                     self.close_position_market(position)
                                     positions_to_delete.append(symbol)
                                 continue
                 except ValueError:
-                    print("Valor inválido para Stop Loss Price. Ignorando.")
+                    logger.warning("Valor inválido para Stop Loss Price. Ignorando.")
 
             # verificar se a moeda é ignorada
             sl_ignored = False
@@ -949,6 +1291,8 @@ class MainWindow(QWidget):
                 if coin and symbol.startswith(coin):
                     tp_ignored = True
 
+            self.sync_exchange_stop(symbol, tracker, fee_percent, sl_ignored, tp_ignored)
+
             # Verificar Stop Loss Percentual
             delete_position = False
             if pnl_percent <= tracker['trigger_stop_loss_percent'] and self.auto_close_positions:
@@ -981,104 +1325,286 @@ class MainWindow(QWidget):
         for pid in positions_to_delete:
             if pid in self.position_trackers:
                 del self.position_trackers[pid]
-                print(f"Posição {pid} fechada automaticamente.")
+                logger.info(f"Posição {pid} fechada automaticamente.")
                 must_update = True
 
         if must_update:
             self.save_position_trackers()
 
+        OPEN_POSITIONS.set(len(self.position_trackers))
+        POSITION_PNL_PERCENT.replace({
+            (symbol,): pnl for symbol, pnl in pnl_by_symbol.items() if symbol in self.position_trackers
+        })
+        POSITION_TRIGGER_PERCENT.replace({
+            (symbol,): tracker.get('trigger_stop_loss_percent', self.default_stop_loss)
+            for symbol, tracker in self.position_trackers.items()
+        })
+        tracer.observe('evaluation', (time.perf_counter() - evaluation_start) * 1000)
+
     def open_new_position_after_close(self, closed_position):
         symbol = self.selected_symbol
         leverage = self.default_leverage
         size = self.default_contract_qty
 
-        print("Iniciando monitoramento de sinais para nova posição...")
-        self.monitor_trade_signals(symbol, size, leverage)
+        if self.scanner is not None:
+            opportunity = self.scanner.best_opportunity(self.trade_direction_option, exclude=self.position_trackers)
+            if opportunity:
+                symbol = opportunity['symbol']
+                logger.info(
+                    f"Scanner: {symbol} {opportunity['decision'].upper()} (score {opportunity['score']:.2f}, "
+                    f"RSI {opportunity['rsi']:.0f})"
+                )
+
+        self.entry.arm(symbol, size, leverage, self.trade_direction_option)
+
+    def start_entry(self, symbol, side, size, leverage, price):
+        """Ordem da entrada confirmada pela máquina de estados; verdadeiro se a ordem saiu."""
+        if not self.entry_liquidity_ok(symbol, side, size):
+            return False
+        opened = self.open_position(symbol, side, size, leverage, price)
+        self.update_balance_label()
+        return opened
+
+    def check_portfolio_risk(self):
+        """Recalcula os agregados e avisa uma vez quando uma posição entra na zona de liquidação."""
+        self.risk.recompute()
+        near = self.risk.liquidation_warnings()
+        for symbol, distance in near.items():
+            if symbol not in self.liq_warned:
+                logger.warning(
+                    f"{symbol} a {distance:.1f}% do preço de liquidação (aviso abaixo de {RISK_LIQ_WARN_PERCENT:g}%)",
+                    extra={'symbol': symbol}
+                )
+                self.sound_price_below.play_sound()
+        self.liq_warned = set(near)
 
-    def monitor_trade_signals(self, symbol, size, leverage):
-        if self.monitoring_signal:
+    def sync_exchange_stop(self, symbol, tracker, fee_percent, sl_ignored, tp_ignored):
+        """
+        Espelha o trigger do tracker como stop loss na Bybit. Sem fechamento
+        automático ou com a moeda ignorada, o stop da exchange é removido.
+        """
+        if self.exchange_stops is None:
             return
-        self.monitoring_signal = True
-
-        def check_signal():
-            if not self.monitoring_signal:
-                return
-
-            side = self.decision_value
-            # Check trade direction
-            if self.trade_direction_option != 'both' and side != self.trade_direction_option and side in ['buy', 'sell']:
-                print(f"Sinal {side.upper()} não corresponde à direção selecionada ({self.trade_direction_option.upper()}).")
-                self.monitoring_signal = False
+        position = tracker['position']
+        avg_entry_price = float(position.get('avgEntryPrice', 0) or 0)
+        real_leverage = float(position.get('realLeverage', 0) or 0)
+        current_qty = position.get('currentQty', 0)
+        mark_price = float(position.get('markPrice', 0) or 0)
+        if avg_entry_price <= 0 or real_leverage <= 0 or current_qty == 0:
+            return
+        is_long = current_qty > 0
+        trigger = tracker['trigger_stop_loss_percent']
+        ignored = tp_ignored if trigger >= 0 else sl_ignored
+        stop_price = None
+        if self.auto_close_positions and not ignored:
+            stop_price = stop_price_for_trigger(avg_entry_price, real_leverage, is_long, trigger, fee_percent)
+            # Stop do lado errado do mark seria recusado; o fechamento local cuida desse caso
+            if mark_price and (stop_price >= mark_price if is_long else stop_price <= mark_price):
                 return
+        position_key = ('long' if is_long else 'short', avg_entry_price, real_leverage)
+        self.exchange_stops.update(to_bybit_symbol(symbol), position_key, trigger, stop_price)
 
-            if side in ['buy', 'sell']:
-                print(f"Sinal identificado: {side.upper()}. Armazenando preço atual e aguardando 1 minuto.")
-                stored_price = self.last_price
+    def open_position(self, symbol, side, size, leverage, price):
+        """
+        Abre a posição com uma única ordem a mercado ou, a partir de
+        SLICE_MIN_NOTIONAL, com uma ordem-mãe fatiada pelo motor de execução.
+        O tracker é criado na hora e acompanha as execuções parciais.
+        """
+        # O preço vem do feed do símbolo selecionado (KuCoin): a ordem sai no contrato da Bybit
+        price = symbol_registry.convert_price(price, symbol, 'bybit')
+        notional = float(size) * price
+        allowed, reason = self.risk.check_entry(notional, notional / float(leverage))
+        if not allowed:
+            logger.warning(f"Limite de risco da conta: {reason}. Não abrindo posição em {symbol}.")
+            return False
+
+        if notional < SLICE_MIN_NOTIONAL:
+            position_details = open_new_position_market(symbol, side, size, leverage)
+            if position_details:
+                self.position_trackers[symbol] = {
+                    'position': position_details,
+                    'max_pnl_percent': 0,
+                    'trigger_stop_loss_percent': self.default_stop_loss,
+                    'used_margin_calls': 0
+                }
+                self.save_position_trackers()
+                self.sound_open_position.play_sound()
+                subject = f"Nova posição aberta: {symbol}"
+                message = f"Nova posição aberta: {symbol} - {side.upper()} {leverage}x com {size} contratos."
+                send_email_notification(subject, message)
+                return True
+            logger.warning("Falha ao abrir nova posição.")
+            return False
+
+        set_position_leverage(symbol, leverage)
+        parent = ParentOrder(to_bybit_symbol(symbol), side, size, reference_price=price)
+        if not self.execution.submit(parent):
+            logger.warning(f"Já existe uma ordem em execução para {symbol}. Não abrindo posição.")
+            return False
+        self.position_trackers[symbol] = {
+            'position': {'symbol': symbol, 'side': side.upper(), 'size': 0, 'leverage': leverage},
+            'max_pnl_percent': 0,
+            'trigger_stop_loss_percent': self.default_stop_loss,
+            'used_margin_calls': 0,
+            'working_order': parent.id
+        }
+        self.save_position_trackers()
+        logger.info(f"Abertura de {symbol} fatiada ({parent.strategy}): {side.upper()} {size} em ordens filhas.")
+        return True
+
+    def on_execution_update(self, parent):
+        """Recebe (na thread da GUI) cada execução parcial e o fim das ordens-mãe."""
+        tracker_key = next(
+            (key for key, tracker in self.position_trackers.items() if tracker.get('working_order') == parent.id),
+            None
+        )
+        tracker = self.position_trackers.get(tracker_key)
+        finished = parent.status != 'working'
+
+        if parent.reduce_only:
+            if finished and parent.status == 'done':
+                if tracker_key is not None:
+                    del self.position_trackers[tracker_key]
+                    self.save_position_trackers()
+                self.update_used_margin_calls_label(0)
+                self.update_balance_label()
+            elif finished:
+                if tracker is not None:
+                    tracker.pop('working_order', None)
+                    self.save_position_trackers()
+                logger.error(f"Fechamento fatiado de {parent.symbol} {parent.status}: {parent.filled}/{parent.quantity} executado.")
+            return
 
-                def after_wait():
-                    if not self.monitoring_signal:
-                        return
+        if tracker is None:
+            return
+        if isinstance(tracker['position'], dict):
+            tracker['position']['size'] = parent.filled
+        if not finished:
+            self.save_position_trackers()
+            return
+        tracker.pop('working_order', None)
+        if parent.filled == 0:
+            del self.position_trackers[tracker_key]
+            self.save_position_trackers()
+            logger.warning(f"Falha ao abrir nova posição fatiada em {parent.symbol} ({parent.error or parent.status}).")
+            return
+        self.save_position_trackers()
+        self.sound_open_position.play_sound()
+        leverage = tracker['position'].get('leverage') or tracker['position'].get('realLeverage')
+        subject = f"Nova posição aberta: {tracker_key}"
+        message = (
+            f"Nova posição aberta: {tracker_key} - {parent.side.upper()} {leverage}x com {parent.filled} contratos "
+            f"em {len(parent.children)} ordens (preço médio {parent.avg_price:.4f})."
+        )
+        send_email_notification(subject, message)
+        self.update_balance_label()
 
-                    current_price = self.last_price
-                    if side == 'buy':
-                        if current_price > stored_price:
-                            print(f"O preço aumentou de {stored_price} para {current_price}. Abrindo posição BUY.")
-                            position_details = open_new_position_market(symbol, side, size, leverage)
-                            if position_details:
-                                self.position_trackers[symbol] = {
-                                    'position': position_details,
-                                    'max_pnl_percent': 0,
-                                    'trigger_stop_loss_percent': self.default_stop_loss,
-                                    'used_margin_calls': 0
-                                }
-                                self.save_position_trackers()
-                                self.sound_open_position.play_sound()
-                                subject = f"Nova posição aberta: {symbol}"
-                                message = f"Nova posição aberta: {symbol} - {side.upper()} {leverage}x com {size} contratos."
-                                send_email_notification(subject, message)
-                            else:
-                                print("Falha ao abrir nova posição.")
-                        else:
-                            print(f"O preço {current_price} não aumentou após 1 minuto. Não abrindo posição BUY.")
-                    elif side == 'sell':
-                        if current_price < stored_price:
-                            print(f"O preço diminuiu de {stored_price} para {current_price}. Abrindo posição SELL.")
-                            position_details = open_new_position_market(symbol, side, size, leverage)
-                            if position_details:
-                                self.position_trackers[symbol] = {
-                                    'position': position_details,
-                                    'max_pnl_percent': 0,
-                                    'trigger_stop_loss_percent': self.default_stop_loss,
-                                    'used_margin_calls': 0
-                                }
-                                self.save_position_trackers()
-                                self.sound_open_position.play_sound()
-                                subject = f"Nova posição aberta: {symbol}"
-                                message = f"Nova posição aberta: {symbol} - {side.upper()} {leverage}x com {size} contratos."
-                                send_email_notification(subject, message)
-                            else:
-                                print("Falha ao abrir nova posição.")
-                        else:
-                            print(f"O preço {current_price} não diminuiu após 1 minuto. Não abrindo posição SELL.")
-                    else:
-                        print("Sinal não identificado após 1 minuto.")
-                    self.monitoring_signal = False
-                    self.update_balance_label()
-
-                # Aguarda 30 segundos
-                QTimer.singleShot(30000, after_wait)
-            else:
-                QTimer.singleShot(5000, check_signal)
+    def close_position_sliced(self, position, tracker_key):
+        """Fechamento reduce-only fatiado pelo livro; vencido EXIT_SLICE_DEADLINE, o restante sai de uma vez."""
+        symbol = to_bybit_symbol(position.get('symbol', ''))
+        current_qty = position.get('currentQty', 0)
+        cancel_open_orders(symbol)
+        parent = ParentOrder(
+            symbol, 'buy' if current_qty < 0 else 'sell', abs(current_qty), strategy='book',
+            reduce_only=True, deadline=EXIT_SLICE_DEADLINE, reference_price=float(position.get('markPrice') or 0) or None
+        )
+        if not self.execution.submit(parent):
+            return False
+        if tracker_key in self.position_trackers:
+            self.position_trackers[tracker_key]['working_order'] = parent.id
+            self.save_position_trackers()
+        return True
 
-        check_signal()
+    def entry_liquidity_ok(self, symbol, side, size):
+        """
+        Consulta o livro espelhado antes da abertura automática: não abre se a
+        ordem a mercado de `size` custar mais que MAX_ENTRY_SLIPPAGE_BPS ou se
+        o livro não tiver profundidade. Sem livro sincronizado, não bloqueia.
+        """
+        book = self.order_books.get('bybit', to_bybit_symbol(symbol))
+        if book is None:
+            return True
+        estimate = book.estimate(side, float(size))
+        if estimate is None:
+            return True
+        logger.info(
+            f"Livro {symbol}: {side.upper()} {size} -> preço médio {estimate['avg_price']:.4f}, "
+            f"slippage estimado {estimate['slippage_bps']:.1f} bps em {estimate['levels']} níveis"
+        )
+        if not estimate['complete'] or estimate['slippage_bps'] > MAX_ENTRY_SLIPPAGE_BPS:
+            logger.warning(f"Livro raso para {symbol} (limite {MAX_ENTRY_SLIPPAGE_BPS:.0f} bps). Não abrindo posição.")
+            return False
+        return True
+
+    def log_expected_slippage(self, symbol, side, size):
+        """Fechamentos nunca são bloqueados; o slippage esperado só é registrado."""
+        book = self.order_books.get('bybit', to_bybit_symbol(symbol))
+        estimate = book.estimate(side, float(size)) if book is not None else None
+        if estimate is not None:
+            logger.info(
+                f"Fechamento {symbol}: preço médio esperado {estimate['avg_price']:.4f}, "
+                f"slippage {estimate['slippage_bps']:.1f} bps",
+                extra={'symbol': symbol}
+            )
+
+    def decision_for(self, symbol):
+        """Sinal atual do símbolo: o do painel para o símbolo selecionado, o do scanner para os demais."""
+        if symbol == self.selected_symbol or self.scanner is None:
+            return self.decision_value
+        return self.scanner.decision(symbol)
+
+    def price_for(self, symbol):
+        if symbol == self.selected_symbol or self.scanner is None:
+            return self.last_price
+        return self.scanner.last_price(symbol)
+
+    def volatility_candles(self, symbol, count):
+        """
+        Candles de 1m do contrato da Bybit para semear o ATR (fora da thread
+        da GUI): mesma exchange e mesma escala de preço dos ticks que o
+        atualizam (1000PEPEUSDT não tem o preço da PEPEUSDT da Binance).
+        """
+        return fetch_klines(to_bybit_symbol(symbol), "1", count)
+
+    def track_volatility(self, symbol):
+        """Começa a medir o ATR de `symbol` e assina os ticks dele na Bybit."""
+        if self.volatility.track(symbol):
+            self.price_ws_client.manager.subscribe('bybit', [to_bybit_symbol(symbol)])
+
+    def update_scanner_params(self):
+        settings = self.settings
+        self.scanner.signal_params = {
+            'rsi_period': int(settings.rsi_period),
+            'use_sma': settings.use_sma,
+            'use_rsi': settings.use_rsi,
+            'use_volume': settings.use_volume,
+            'use_high_low': settings.use_high_low,
+            'extra': settings.extra_indicators_list,
+            'strategy': settings.strategy,
+        }
 
     def check_decision_indicators(self):
-        granularity = int(self.granularity)
-        decisions = decide_trade_direction(
-            self.binance_symbol, self.rsi_period, self.use_sma,
-            self.use_rsi, self.use_volume, granularity, self.use_high_low
+        self.show_indicators(self.fetch_decisions())
+
+    def fetch_decisions(self):
+        # Roda também fora da thread da GUI: lê um único Settings
+        settings = self.settings
+        return decide_trade_direction(
+            symbol_registry.convert(settings.selected_symbol, 'binance'), settings.rsi_period, settings.use_sma,
+            settings.use_rsi, settings.use_volume, int(settings.granularity), settings.use_high_low,
+            settings.extra_indicators_list, settings.strategy
         )
-        self.decision_value = decisions['decision']
+
+    def show_indicators(self, decisions, live=True):
+        """Atualiza os rótulos dos indicadores; só dados ao vivo (não o snapshot) viram decisão de entrada."""
+        self.indicators = decisions
+        if live:
+            if decisions['decision'] != self.decision_value:
+                bus.publish(Signal(self.selected_symbol, decisions['decision'], details=decisions))
+            self.decision_value = decisions['decision']
+            if self.scanner is not None:
+                self.update_scanner_params()
+            self.entry.on_signal(self.selected_symbol, self.decision_value)
         self.sma_value = f"SMA: {decisions['sma']}"
         self.rsi_value = f"RSI: {decisions['rsi']}"
         self.volume_value = f"Volume: {decisions['volume']}"
@@ -1087,9 +1613,13 @@ class MainWindow(QWidget):
         self.use_rsi_checkbox.setText(self.rsi_value)
         self.use_volume_checkbox.setText(self.volume_value)
         self.use_high_low_checkbox.setText(self.high_low_value)
+        for name, checkbox in self.plugin_checkboxes.items():
+            value = decisions.get(name)
+            label = INDICATORS[name].label
+            checkbox.setText(f"{label}: {value}" if value is not None else label)
 
     def show_alert_message(self, message):
-        print(message)
+        logger.info(message)
         if 'LUCRO' in message:
             self.sound_closed_position_win.play_sound()
         elif 'Prejuízo' in message:
@@ -1100,7 +1630,7 @@ class MainWindow(QWidget):
             self.sound_price_below.play_sound()
 
     def show_closed_positions_message(self, message):
-        print(message)
+        logger.info(message)
 
     def close_position_market(self, position):
         """
@@ -1114,23 +1644,11 @@ class MainWindow(QWidget):
         real_leverage = position.get('realLeverage', 0)
         maint_margin = position.get('maintMargin', 0)
         pos_margin = position.get('posMargin', 0)
-        unrealised_pnl_value = position.get('unrealisedPnl', 0)
         realised_pnl_value = position.get('realisedPnl', 0)
         current_qty = position.get('currentQty', 0)
         mark_price = position.get('markPrice', 0)
 
-        fee_percent = 0.06 * 2 * real_leverage
-        total_fees_percent = fee_percent
-
-        if pos_margin != 0:
-            pnl_percent = (unrealised_pnl_value / pos_margin) * 100
-            pnl_percent -= total_fees_percent
-        else:
-            pnl_percent = 0.0
-
-        fee_rate = 0.0006 * 2
-        total_fees_paid = fee_rate * real_leverage * maint_margin
-        adjusted_unrealised_pnl_value = unrealised_pnl_value - total_fees_paid
+        adjusted_unrealised_pnl_value, pnl_percent, _ = self.costs.net_pnl(position)
 
         if current_qty < 0:
             position_direction = "SHORT"
@@ -1149,15 +1667,25 @@ class MainWindow(QWidget):
         if lucro_prejuizo == "Prejuízo":
             for coin in self.ignore_coins_sl_list:
                 if coin and symbol.startswith(coin):
-                    print(f"Não fechar posições no prejuízo de {coin}. Symbol: {symbol}")
+                    logger.info(f"Não fechar posições no prejuízo de {coin}. Symbol: {symbol}")
                     return
         else:
             for coin in self.ignore_coins_tp_list:
                 if coin and symbol.startswith(coin):
-                    print(f"Não fechar posições no lucro de {coin}. Symbol: {symbol}")
+                    logger.info(f"Não fechar posições no lucro de {coin}. Symbol: {symbol}")
                     return
 
-        print(f"Fechando posição: {symbol}")
+        working = self.execution.working.get(to_bybit_symbol(symbol))
+        if working is not None:
+            if working.reduce_only:
+                logger.info(f"Fechamento de {symbol} já em execução.")
+                return
+            # Stop durante uma abertura fatiada: interrompe a entrada e fecha o que já foi executado
+            logger.info(f"Cancelando abertura fatiada de {symbol} para fechar a posição.")
+            self.execution.cancel(working.symbol)
+
+        logger.info(f"Fechando posição: {symbol}")
+        self.log_expected_slippage(symbol, 'buy' if current_qty < 0 else 'sell', abs(current_qty))
 
         subject = f"Posição Fechada {lucro_prejuizo}: {symbol}"
         message = (
@@ -1173,6 +1701,10 @@ class MainWindow(QWidget):
         )
 
         send_email_notification(subject, message)
+        tracer.since_tick('tick_to_close_call')
+        if abs(current_qty) * float(mark_price or 0) >= SLICE_MIN_NOTIONAL and self.close_position_sliced(position, symbol):
+            # O tracker sai quando a ordem-mãe terminar (on_execution_update)
+            return
         close_position_market(position)
 
         if symbol in self.position_trackers:
@@ -1182,11 +1714,77 @@ class MainWindow(QWidget):
 
         self.update_balance_label()
 
+    def handle_events(self, events):
+        """
+        Lote de eventos do barramento, na thread da GUI. Cada efeito roda no
+        máximo uma vez por lote: o rótulo com o último preço, uma avaliação
+        dos stops e um pedido de leitura das posições (numa thread) depois de
+        ordens e execuções.
+        """
+        price = positions = None
+        evaluate_stops = refresh_positions = False
+        for event in events:
+            if isinstance(event, Tick):
+                if event.exchange == self.price_ws_client.exchange and event.symbol == self.price_ws_client.symbol:
+                    price = event.price
+                elif event.exchange == 'bybit':
+                    # Mark do risco agregado mudou; ticks do símbolo de uma entrada vinda do scanner
+                    evaluate_stops = evaluate_stops or event.symbol in self.tracked_symbols
+                    if event.symbol == self.entry.symbol and event.symbol != self.selected_symbol:
+                        self.entry.on_tick(event.symbol, event.price)
+            elif isinstance(event, Signal):
+                # O sinal do painel já foi entregue por show_indicators
+                if event.source == 'scanner':
+                    self.entry.on_signal(event.symbol, event.decision)
+            elif isinstance(event, PositionUpdate):
+                # Vale a leitura mais nova do lote; os stops só são reavaliados quando algo mudou
+                positions = event.positions
+                evaluate_stops = evaluate_stops or event.changed
+            elif isinstance(event, (OrderAck, Fill)):
+                refresh_positions = True
+        if positions is not None:
+            self.apply_positions(positions)
+        if price is not None:
+            self.update_price_label(price)
+            evaluate_stops = evaluate_stops or self.stop_loss_price != ''
+        if refresh_positions:
+            self.fetch_open_positions()
+        if evaluate_stops and self.position_trackers:
+            self.check_auto_close_positions()
+
+    def wants_tick(self, tick):
+        """Filtro dos ticks da GUI, na thread do stream: o símbolo selecionado e os de `tick_symbols`."""
+        return (tick.exchange == self.price_ws_client.exchange and tick.symbol == self.price_ws_client.symbol) \
+            or (tick.exchange, tick.symbol) in self.tick_symbols
+
+    def update_tick_symbols(self):
+        """Símbolos da Bybit cujos ticks a janela precisa: posições com tracker e a entrada em andamento."""
+        self.tracked_symbols = frozenset(to_bybit_symbol(symbol) for symbol in self.position_trackers)
+        symbols = {('bybit', symbol) for symbol in self.tracked_symbols}
+        if self.entry.symbol:
+            symbols.add(('bybit', self.entry.symbol))
+        # Troca o conjunto inteiro: a thread do stream nunca lê um conjunto pela metade
+        self.tick_symbols = frozenset(symbols)
+
+    def schedule_entry_poll(self):
+        """Reagenda o timer de uma vez da entrada para o próximo prazo da máquina de estados."""
+        self.update_tick_symbols()
+        deadline = self.entry.deadline()
+        if deadline is None:
+            self.entry_timer.stop()
+        else:
+            self.entry_timer.start(max(0, math.ceil((deadline - time.monotonic()) * 1000)))
+
     def update_price_label(self, price):
+        tracer.since_tick('qt_delivery')
         previous_price = self.last_price
         self.last_price = price
+        self.last_price_ts = time.monotonic()
         formatted_price = f"{self.selected_symbol} ${price:,.2f}"
+        if self.price_feed_stale:
+            formatted_price += " (REST)"
         self.price_label.setText(formatted_price)
+        self.entry.on_tick(self.selected_symbol, price)
 
         current_time = time.time()
         time_since_last_update = current_time - self.last_updated_price_time
@@ -1204,7 +1802,7 @@ class MainWindow(QWidget):
         if self.alert_price_above > 0 and price >= self.alert_price_above:
             if not self.alert_above_triggered:
                 self.alert_above_triggered = True
-                print("ALERTA: Preço acima do valor definido")
+                logger.info("ALERTA: Preço acima do valor definido")
                 self.sound_price_above.play_sound()
                 self.show_alert_message(f"Alerta: Preço acima de {self.alert_price_above}")
         else:
@@ -1213,7 +1811,7 @@ class MainWindow(QWidget):
         if self.alert_price_below > 0 and price <= self.alert_price_below:
             if not self.alert_below_triggered:
                 self.alert_below_triggered = True
-                print("ALERTA: Preço abaixo do valor definido")
+                logger.info("ALERTA: Preço abaixo do valor definido")
                 self.sound_price_below.play_sound()
                 self.show_alert_message(f"Alerta: Preço abaixo de {self.alert_price_below}")
         else:
@@ -1242,14 +1840,13 @@ class MainWindow(QWidget):
             self.save_position_trackers()
             self.sound_open_position.play_sound()
             self.update_used_margin_calls_label(0)
-            self.monitoring_signal = False
 
             subject = f"Nova posição aberta: {symbol}"
             message = f"Nova posição aberta: {symbol} - BUY {leverage}x com {size} contratos."
             send_email_notification(subject, message)
         else:
-            print("Falha ao abrir posição BUY.")
-        self.monitoring_signal = False
+            logger.warning("Falha ao abrir posição BUY.")
+        self.entry.cancel("ordem manual")
 
     def sell_market(self):
         symbol = self.selected_symbol
@@ -1267,114 +1864,133 @@ class MainWindow(QWidget):
             self.save_position_trackers()
             self.sound_open_position.play_sound()
             self.update_used_margin_calls_label(0)
-            self.monitoring_signal = False
 
             subject = f"Nova posição aberta: {symbol}"
             message = f"Nova posição aberta: {symbol} - SELL {leverage}x com {size} contratos."
             send_email_notification(subject, message)
         else:
-            print("Falha ao abrir posição SELL.")
-        self.monitoring_signal = False
+            logger.warning("Falha ao abrir posição SELL.")
+        self.entry.cancel("ordem manual")
 
     def load_configurations(self):
         try:
-            with open('configurations.json', 'r') as f:
-                config = json.load(f)
-                self.default_leverage = config.get('default_leverage', self.default_leverage)
-                self.default_stop_loss = config.get('default_stop_loss', self.default_stop_loss)
-                self.stop_loss_price = config.get('stop_loss_price', self.stop_loss_price)
-                self.auto_calc_trailing_stop = config.get('auto_calc_trailing_stop', self.auto_calc_trailing_stop)
-                self.trailing_stop_1_15 = config.get('trailing_stop_1_15', self.trailing_stop_1_15)
-                self.trailing_stop_16_30 = config.get('trailing_stop_16_30', self.trailing_stop_16_30)
-                self.trailing_stop_31_50 = config.get('trailing_stop_31_50', self.trailing_stop_31_50)
-                self.trailing_stop_above_50 = config.get('trailing_stop_above_50', self.trailing_stop_above_50)
-                self.alert_price_above = config.get('alert_price_above', self.alert_price_above)
-                self.alert_price_below = config.get('alert_price_below', self.alert_price_below)
-                self.default_contract_qty = config.get('default_contract_qty', self.default_contract_qty)
-                self.rsi_period = config.get('rsi_period', self.rsi_period)
-                self.use_sma = config['use_sma']
-                self.use_rsi = config['use_rsi']
-                self.use_volume = config['use_volume']
-                self.use_high_low = config['use_high_low']
-                self.granularity = config.get('granularity', self.granularity)
-                self.selected_symbol = config.get('selected_symbol', self.selected_symbol)
-                self.auto_open_new_position = config.get('auto_open_new_position', self.auto_open_new_position)
-                self.auto_close_positions = config.get('auto_close_positions', self.auto_close_positions)
-                self.margin_calls = config.get('margin_calls', self.margin_calls)
-                self.trade_direction_option = config.get('trade_direction_option', self.trade_direction_option)
-
-                # Novo: ignorar moedas
-                self.ignore_coins_sl = config.get('ignore_coins_sl', self.ignore_coins_sl)
-                self.ignore_coins_sl_list = [c.strip() for c in self.ignore_coins_sl.split(',') if c.strip()]
-
-                self.ignore_coins_tp = config.get('ignore_coins_tp', self.ignore_coins_tp)
-                self.ignore_coins_tp_list = [c.strip() for c in self.ignore_coins_tp.split(',') if c.strip()]
-
-            print("Configurações carregadas com sucesso.")
+            self.apply_settings(self.config_store.load(self.settings))
+            logger.info("Configurações carregadas com sucesso.")
         except FileNotFoundError:
-            print("Arquivo de configurações não encontrado. Usando configurações padrão.")
+            logger.warning("Arquivo de configurações não encontrado. Usando configurações padrão.")
+        except ConfigError as e:
+            logger.error(f"Configurações inválidas, usando os padrões: {e}")
         except Exception as e:
-            print(f"Erro ao carregar configurações: {e}")
+            logger.error(f"Erro ao carregar configurações: {e}")
 
     def save_configurations(self):
         try:
-            config = {
-                'default_leverage': self.default_leverage,
-                'default_stop_loss': self.default_stop_loss,
-                'stop_loss_price': self.stop_loss_price,
-                'auto_calc_trailing_stop': self.auto_calc_trailing_stop,
-                'trailing_stop_1_15': self.trailing_stop_1_15,
-                'trailing_stop_16_30': self.trailing_stop_16_30,
-                'trailing_stop_31_50': self.trailing_stop_31_50,
-                'trailing_stop_above_50': self.trailing_stop_above_50,
-                'alert_price_above': self.alert_price_above,
-                'alert_price_below': self.alert_price_below,
-                'default_contract_qty': self.default_contract_qty,
-                'rsi_period': self.rsi_period,
-                'use_sma': self.use_sma,
-                'use_rsi': self.use_rsi,
-                'use_volume': self.use_volume,
-                'use_high_low': self.use_high_low,
-                'granularity': self.granularity,
-                'selected_symbol': self.selected_symbol,
-                'auto_open_new_position': self.auto_open_new_position,
-                'auto_close_positions': self.auto_close_positions,
-                'margin_calls': self.margin_calls,
-                'trade_direction_option': self.trade_direction_option,
-                # salva ignore_coins
-                'ignore_coins_sl': self.ignore_coins_sl,
-                'ignore_coins_tp': self.ignore_coins_tp
-            }
-            with open('configurations.json', 'w') as f:
-                json.dump(config, f)
-            print("Configurações salvas com sucesso.")
+            with PERSISTENCE_WRITE_SECONDS.time(file=self.config_store.path):
+                self.config_store.save(self.settings)
+            logger.info("Configurações salvas com sucesso.")
         except Exception as e:
-            print(f"Erro ao salvar configurações: {e}")
+            logger.error(f"Erro ao salvar configurações: {e}")
+
+    def load_startup_snapshot(self):
+        try:
+            with open(STARTUP_SNAPSHOT_FILE, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Erro ao carregar {STARTUP_SNAPSHOT_FILE}: {e}")
+            return {}
+
+    def save_startup_snapshot(self):
+        # O saldo costuma chegar antes da primeira leitura de posições: o que ainda não foi
+        # lido ao vivo mantém o valor do snapshot carregado, em vez de gravar null por cima
+        previous = self.snapshot if self.snapshot.get('symbol') == self.selected_symbol else {}
+        snapshot = {
+            'symbol': self.selected_symbol,
+            'positions': self.last_positions if self.last_positions is not None else self.snapshot.get('positions'),
+            'balance': self.balance if self.balance is not None else self.snapshot.get('balance'),
+            'high_low': self.high_low_prices if any(self.high_low_prices) else previous.get('high_low'),
+            'indicators': self.indicators if self.indicators is not None else previous.get('indicators'),
+        }
+        try:
+            with PERSISTENCE_WRITE_SECONDS.time(file=STARTUP_SNAPSHOT_FILE):
+                with open(STARTUP_SNAPSHOT_FILE, 'w') as f:
+                    json.dump(snapshot, f, default=to_json)
+        except Exception as e:
+            logger.warning(f"Erro ao salvar {STARTUP_SNAPSHOT_FILE}: {e}")
+
+    def paint_startup_snapshot(self):
+        """Preenche a janela com o snapshot da última sessão, sem chamadas REST."""
+        snapshot = self.snapshot
+        if snapshot.get('positions'):
+            self.update_positions_display(snapshot['positions'], sync_trackers=False)
+        if snapshot.get('balance') is not None:
+            self.show_balance({'availableBalance': snapshot['balance']}, live=False)
+        if snapshot.get('symbol') == self.selected_symbol and snapshot.get('high_low'):
+            self.show_high_low(*snapshot['high_low'])
+        if snapshot.get('indicators'):
+            self.show_indicators(snapshot['indicators'], live=False)
+
+    def load_live_data(self):
+        """Primeira leitura ao vivo numa thread; cada resultado substitui o snapshot assim que chega."""
+        def load():
+            for kind, fetch in (
+                ('high_low', lambda: fetch_high_low_prices(self.selected_symbol)),
+                ('balance', get_account_overview),
+                ('indicators', self.fetch_decisions),
+            ):
+                try:
+                    self.startup_events.loaded.emit(kind, fetch())
+                except Exception as e:
+                    logger.error(f"Erro na carga inicial ({kind}): {e}")
+
+        threading.Thread(target=load, name="startup-load", daemon=True).start()
+        self.sound_player.play_sound()
+
+    def on_startup_data(self, kind, value):
+        if kind == 'high_low':
+            self.show_high_low(*value)
+        elif kind == 'balance':
+            self.show_balance(value)
+            self.save_startup_snapshot()
+        elif kind == 'indicators':
+            self.show_indicators(value)
 
     def load_position_trackers(self):
         try:
             with open('position_trackers.json', 'r') as f:
                 self.position_trackers = json.load(f)
-            print("Position trackers carregados com sucesso.")
+            # Ordens fatiadas não sobrevivem ao reinício: a posição real vem da sincronização
+            for tracker in self.position_trackers.values():
+                tracker.pop('working_order', None)
+            logger.info("Position trackers carregados com sucesso.")
         except FileNotFoundError:
-            print("Arquivo de position trackers não encontrado. Iniciando novo.")
+            logger.warning("Arquivo de position trackers não encontrado. Iniciando novo.")
             self.position_trackers = {}
         except Exception as e:
-            print(f"Erro ao carregar position trackers: {e}")
+            logger.error(f"Erro ao carregar position trackers: {e}")
             self.position_trackers = {}
 
     def save_position_trackers(self):
         try:
-            with open('position_trackers.json', 'w') as f:
-                json.dump(self.position_trackers, f)
-            print("Position trackers salvos com sucesso.")
+            with PERSISTENCE_WRITE_SECONDS.time(file='position_trackers.json'):
+                with open('position_trackers.json', 'w') as f:
+                    json.dump(self.position_trackers, f, default=to_json)
+            logger.debug("Position trackers salvos com sucesso.")
         except Exception as e:
-            print(f"Erro ao salvar position trackers: {e}")
+            logger.error(f"Erro ao salvar position trackers: {e}")
 
     def update_balance_label(self):
-        account_info = get_account_overview()
+        self.show_balance(get_account_overview())
+        self.save_startup_snapshot()
+
+    def show_balance(self, account_info, live=True):
         if account_info:
             usdt_balance = float(account_info.get('availableBalance', 0))
+            self.balance = usdt_balance
+            # 'availableBalance' aqui é o totalEquity da conta
+            if live:
+                self.risk.update_equity(usdt_balance)
             self.balance_label.setText(f"${usdt_balance:.2f}")
             if usdt_balance < 0:
                 self.balance_label.setStyleSheet("color: #ff3333;")
@@ -1386,3 +2002,31 @@ class MainWindow(QWidget):
     def update_used_margin_calls_label(self, used_calls):
         self.used_margin_calls_label.setText(f"({used_calls})")
 
+    def on_margin_call(self, symbol, used_calls, amount):
+        tracker = self.position_trackers.get(symbol)
+        if tracker is not None:
+            tracker['used_margin_calls'] = used_calls
+            self.save_position_trackers()
+        self.update_used_margin_calls_label(used_calls)
+        send_email_notification(
+            f"Chamada de margem {used_calls}/{self.margin_calls}: {symbol}",
+            f"Adicionados {amount} USDT de margem isolada em {symbol} perto do preço de liquidação."
+        )
+
+    def set_price_feed_stale(self, stale):
+        """Websocket congelado: o preço passa a vir do fallback REST e o rótulo fica cinza."""
+        self.price_feed_stale = stale
+        if stale:
+            self.price_label.setStyleSheet("color: #888888;")
+
+    def toggle_profiler(self):
+        profiler.toggle()
+
+    def log_latency_summary(self):
+        lines = tracer.summary_lines()
+        if not lines:
+            return
+        logger.info("Latência (tick -> ack):")
+        for line in lines:
+            logger.info(f"  {line}")
+
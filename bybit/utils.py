@@ -6,8 +6,12 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
 
+from logger import get_logger
+
 load_dotenv()
 
+logger = get_logger('utils')
+
 # Carregar configurações do servidor de e-mail a partir do .env
 SMTP_HOST = os.getenv('SMTP_HOST')
 SMTP_PORT = int(os.getenv('SMTP_PORT', 587))  # Porta padrão para TLS é 587
@@ -23,7 +27,7 @@ def send_email_notification(subject, message):
     Envia uma notificação por e-mail com o assunto e mensagem fornecidos.
     """
     if not all([SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, FROM_EMAIL, TO_EMAIL]):
-        print("Configurações de e-mail incompletas. Verifique o arquivo .env.")
+        logger.warning("Configurações de e-mail incompletas. Verifique o arquivo .env.")
         return
 
     try:
@@ -44,7 +48,7 @@ def send_email_notification(subject, message):
         # Enviar o e-mail
         server.send_message(msg)
         server.quit()
-        print("E-mail enviado com sucesso.")
+        logger.info("E-mail enviado com sucesso.")
 
     except Exception as e:
-        print(f"Erro ao enviar e-mail: {e}")
+        logger.error(f"Erro ao enviar e-mail: {e}")
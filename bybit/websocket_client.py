@@ -1,55 +1,49 @@
 # websocket_client.py
 
-import asyncio
+import threading
 from PyQt5.QtCore import QThread, pyqtSignal
-from kucoin.client import WsToken
-from kucoin.ws_client import KucoinWsClient
-from dotenv import load_dotenv
-import os
 
-load_dotenv()
-API_KEY = os.getenv("KUCOIN_API_KEY")
-API_SECRET = os.getenv("KUCOIN_API_SECRET")
-API_PASSWORD = os.getenv("KUCOIN_API_PASSWORD")
+from latency import tracer
+from streams import StreamManager
+from logger import get_logger
 
+logger = get_logger('websocket_client')
 
-class PriceWebsocketClient(QThread):
-    price_updated = pyqtSignal(float)
 
-    def __init__(self, symbol):
+class PriceWebsocketClient(QThread):
+    """
+    Thread do Qt que hospeda o StreamManager (um único event loop para todas
+    as conexões). Os preços chegam à GUI como Ticks do barramento de eventos;
+    aqui só se marca a chegada dos ticks do símbolo selecionado para a
+    medição de latência. Outros consumidores (ex.: o scanner) assinam
+    símbolos no mesmo `manager`.
+    """
+    feed_stale = pyqtSignal(bool)
+
+    def __init__(self, symbol, exchange='kucoin'):
         super().__init__()
         self.symbol = symbol
-        self.ws_client = None
-        self.loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(self.loop)
-        self._is_running = True
-
-    async def handle_message(self, msg):
-        """Handles received messages and emits the price."""
-        if msg['topic'] == f'/contractMarket/ticker:{self.symbol}':
-            price = float(msg['data']['price'])
-            self.price_updated.emit(price)
-
-    async def update_price_via_websocket(self):
-        while self._is_running:
-            try:
-                if self.ws_client is None:
-                    client = WsToken(key=API_KEY, secret=API_SECRET, passphrase=API_PASSWORD)
-                    self.ws_client = await KucoinWsClient.create(None, client, self.handle_message, private=False)
-                    await self.ws_client.subscribe(f'/contractMarket/ticker:{self.symbol}')
-                while self._is_running:
-                    await asyncio.sleep(1)
-            except Exception as e:
-                print(f"Connection error: {e}. Retrying in 5 seconds...")
-                await asyncio.sleep(5)
-                self.ws_client = None
+        self.exchange = exchange
+        self.manager = StreamManager()
+        self.manager.add_listener(self.handle_price)
+        self.manager.add_stale_listener(self.handle_stale)
+        self.manager.subscribe(self.exchange, [self.symbol])
+        self.manager.watch(self.exchange, self.symbol)
+
+    def handle_price(self, exchange, symbol, price, data):
+        """Marks the arrival of the selected symbol's websocket ticks."""
+        # Preço do fallback REST não entra na medição de latência do websocket
+        if exchange == self.exchange and symbol == self.symbol and price is not None and data.get('source') != 'rest':
+            tracer.tick_received()
+
+    def handle_stale(self, exchange, symbol, stale):
+        if exchange == self.exchange and symbol == self.symbol:
+            self.feed_stale.emit(stale)
 
     def stop(self):
-        self._is_running = False
-        if self.ws_client:
-            self.loop.create_task(self.ws_client.unsubscribe(f'/contractMarket/ticker:{self.symbol}'))
-            self.ws_client = None
+        self.manager.stop()
 
     def run(self):
-        self.loop.run_until_complete(self.update_price_via_websocket())
-
+        # Dá nome à thread nativa do QThread para aparecer no profiler
+        threading.current_thread().name = "PriceWebsocketClient"
+        self.manager.run()
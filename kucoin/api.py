@@ -8,6 +8,7 @@ import base64
 import requests
 import json
 import uuid
+import math
 import numpy as np
 from dotenv import load_dotenv
 
@@ -18,35 +19,57 @@ API_PASSWORD = os.getenv("KUCOIN_API_PASSWORD")
 
 BINANCE_BASE_URL = 'https://api.binance.com'
 
+# Stop loss espelhado na KuCoin (ordem stop closeOrder disparada pelo mark price)
+EXCHANGE_STOPS_ENABLED = os.getenv("EXCHANGE_STOPS_ENABLED", "true").lower() == "true"
+# Só move a ordem stop quando o trigger andar mais que isto (pontos de PnL%)
+STOP_AMEND_THRESHOLD = float(os.getenv("STOP_AMEND_THRESHOLD", 0.5))
+
+# Chamadas de margem: distância do mark à liquidação (%) que dispara o depósito
+MARGIN_CALL_LIQ_PERCENT = float(os.getenv("MARGIN_CALL_LIQ_PERCENT", 3))
+# Margem depositada em cada chamada, como fração da margem atual da posição
+MARGIN_CALL_RATIO = float(os.getenv("MARGIN_CALL_RATIO", 0.5))
+
+# Modelo de custos: intervalos de releitura das taxas da conta e do funding
+COST_FEE_REFRESH_SECONDS = float(os.getenv("COST_FEE_REFRESH_SECONDS", 3600))
+COST_FUNDING_REFRESH_SECONDS = float(os.getenv("COST_FUNDING_REFRESH_SECONDS", 60))
+# Funding previsto que vence dentro deste prazo já entra no PnL líquido
+FUNDING_HORIZON_SECONDS = float(os.getenv("FUNDING_HORIZON_SECONDS", 300))
+# Taxa taker usada enquanto a faixa da conta não foi lida (a aproximação antiga de 0,06% por lado)
+DEFAULT_TAKER_FEE = 0.0006
+
+def signed_headers(now, method, request_path, body_json=''):
+    """Monta os headers autenticados (API key v2) de uma requisição à KuCoin Futures."""
+    str_to_sign = str(now) + method + request_path + body_json
+    signature = base64.b64encode(
+        hmac.new(
+            API_SECRET.encode('utf-8'),
+            str_to_sign.encode('utf-8'),
+            hashlib.sha256
+        ).digest()
+    ).decode()
+
+    passphrase = base64.b64encode(
+        hmac.new(
+            API_SECRET.encode('utf-8'),
+            API_PASSWORD.encode('utf-8'),
+            hashlib.sha256
+        ).digest()
+    ).decode()
+
+    return {
+        "KC-API-KEY": API_KEY,
+        "KC-API-SIGN": signature,
+        "KC-API-TIMESTAMP": str(now),
+        "KC-API-PASSPHRASE": passphrase,
+        "KC-API-KEY-VERSION": "2",
+        "Content-Type": "application/json"
+    }
+
 def fetch_open_positions():
     try:
         url = "https://api-futures.kucoin.com/api/v1/positions"
         now = int(time.time() * 1000)
-        str_to_sign = str(now) + 'GET' + '/api/v1/positions'
-        signature = base64.b64encode(
-            hmac.new(
-                API_SECRET.encode('utf-8'),
-                str_to_sign.encode('utf-8'),
-                hashlib.sha256
-            ).digest()
-        ).decode()
-
-        passphrase = base64.b64encode(
-            hmac.new(
-                API_SECRET.encode('utf-8'),
-                API_PASSWORD.encode('utf-8'),
-                hashlib.sha256
-            ).digest()
-        ).decode()
-
-        headers = {
-            "KC-API-KEY": API_KEY,
-            "KC-API-SIGN": signature,
-            "KC-API-TIMESTAMP": str(now),
-            "KC-API-PASSPHRASE": passphrase,
-            "KC-API-KEY-VERSION": "2",
-            "Content-Type": "application/json"
-        }
+        headers = signed_headers(now, 'GET', '/api/v1/positions')
         response = requests.get(url, headers=headers)
         if response.status_code == 200:
             data = response.json().get("data", [])
@@ -91,6 +114,9 @@ def close_position_market(position):
             print("Posição já fechada.")
             return
 
+        # A ordem stop espelhada não pode sobrar depois do fechamento
+        cancel_stop_orders(symbol)
+
         side = 'buy' if current_qty < 0 else 'sell'
         size = abs(current_qty)
         client_oid = str(uuid.uuid4())
@@ -108,31 +134,7 @@ def close_position_market(position):
             "marginMode": "ISOLATED"
         }
         body_json = json.dumps(body)
-        str_to_sign = str(now) + 'POST' + request_path + body_json
-        signature = base64.b64encode(
-            hmac.new(
-                API_SECRET.encode('utf-8'),
-                str_to_sign.encode('utf-8'),
-                hashlib.sha256
-            ).digest()
-        ).decode()
-
-        passphrase = base64.b64encode(
-            hmac.new(
-                API_SECRET.encode('utf-8'),
-                API_PASSWORD.encode('utf-8'),
-                hashlib.sha256
-            ).digest()
-        ).decode()
-
-        headers = {
-            "KC-API-KEY": API_KEY,
-            "KC-API-SIGN": signature,
-            "KC-API-TIMESTAMP": str(now),
-            "KC-API-PASSPHRASE": passphrase,
-            "KC-API-KEY-VERSION": "2",
-            "Content-Type": "application/json"
-        }
+        headers = signed_headers(now, 'POST', request_path, body_json)
 
         response = requests.post(url, headers=headers, data=body_json)
         print('Enviar:', body_json)
@@ -164,31 +166,7 @@ def open_new_position_market(symbol, side, size, leverage):
             "marginType": "isolated"
         }
         body_json = json.dumps(body)
-        str_to_sign = str(now) + 'POST' + request_path + body_json
-        signature = base64.b64encode(
-            hmac.new(
-                API_SECRET.encode('utf-8'),
-                str_to_sign.encode('utf-8'),
-                hashlib.sha256
-            ).digest()
-        ).decode()
-
-        passphrase = base64.b64encode(
-            hmac.new(
-                API_SECRET.encode('utf-8'),
-                API_PASSWORD.encode('utf-8'),
-                hashlib.sha256
-            ).digest()
-        ).decode()
-
-        headers = {
-            "KC-API-KEY": API_KEY,
-            "KC-API-SIGN": signature,
-            "KC-API-TIMESTAMP": str(now),
-            "KC-API-PASSPHRASE": passphrase,
-            "KC-API-KEY-VERSION": "2",
-            "Content-Type": "application/json"
-        }
+        headers = signed_headers(now, 'POST', request_path, body_json)
 
         response = requests.post(url, headers=headers, data=body_json)
         print('Enviar:', body_json)
@@ -327,31 +305,7 @@ def get_account_overview(currency="USDT"):
     try:
         url = f"https://api-futures.kucoin.com/api/v1/account-overview?currency={currency}"
         now = int(time.time() * 1000)
-        str_to_sign = str(now) + 'GET' + f'/api/v1/account-overview?currency={currency}'
-        signature = base64.b64encode(
-            hmac.new(
-                API_SECRET.encode('utf-8'),
-                str_to_sign.encode('utf-8'),
-                hashlib.sha256
-            ).digest()
-        ).decode()
-
-        passphrase = base64.b64encode(
-            hmac.new(
-                API_SECRET.encode('utf-8'),
-                API_PASSWORD.encode('utf-8'),
-                hashlib.sha256
-            ).digest()
-        ).decode()
-
-        headers = {
-            "KC-API-KEY": API_KEY,
-            "KC-API-SIGN": signature,
-            "KC-API-TIMESTAMP": str(now),
-            "KC-API-PASSPHRASE": passphrase,
-            "KC-API-KEY-VERSION": "2",
-            "Content-Type": "application/json"
-        }
+        headers = signed_headers(now, 'GET', f'/api/v1/account-overview?currency={currency}')
         response = requests.get(url, headers=headers)
         if response.status_code == 200:
             data = response.json().get("data", {})
@@ -363,3 +317,183 @@ def get_account_overview(currency="USDT"):
         print(f"Erro ao obter saldo: {e}")
         return None
 
+_tick_sizes = {}
+
+def fetch_tick_size(symbol):
+    if symbol in _tick_sizes:
+        return _tick_sizes[symbol]
+    try:
+        response = requests.get(f"https://api-futures.kucoin.com/api/v1/contracts/{symbol}", timeout=10)
+        if response.status_code == 200:
+            tick_size = float(response.json()["data"]["tickSize"])
+            _tick_sizes[symbol] = tick_size
+            return tick_size
+        print(f"Erro ao obter tick size: {response.status_code}, {response.text}")
+        return None
+    except Exception as e:
+        print(f"Erro ao obter tick size: {e}")
+        return None
+
+# Taxas da conta e funding em cache: symbol -> (valor, instante da leitura)
+_fee_rates = {}
+_funding_rates = {}
+
+def fetch_taker_fee(symbol):
+    """Taxa taker da faixa da conta no contrato, relida a cada COST_FEE_REFRESH_SECONDS."""
+    cached = _fee_rates.get(symbol)
+    if cached and time.time() - cached[1] < COST_FEE_REFRESH_SECONDS:
+        return cached[0]
+    taker = cached[0] if cached else DEFAULT_TAKER_FEE
+    try:
+        request_path = f'/api/v1/trade-fees?symbol={symbol}'
+        now = int(time.time() * 1000)
+        headers = signed_headers(now, 'GET', request_path)
+        response = requests.get("https://api-futures.kucoin.com" + request_path, headers=headers, timeout=10)
+        if response.status_code == 200 and response.json().get("code") == "200000":
+            taker = float(response.json()["data"]["takerFeeRate"])
+        else:
+            print(f"Erro ao obter taxas da conta: {response.status_code}, {response.text}")
+    except Exception as e:
+        print(f"Erro em fetch_taker_fee: {e}")
+    # Em caso de falha guarda o último valor conhecido e só tenta de novo no próximo intervalo
+    _fee_rates[symbol] = (taker, time.time())
+    return taker
+
+def fetch_funding_rate(symbol):
+    """(taxa prevista, próximo acerto em ms) do contrato, relida a cada COST_FUNDING_REFRESH_SECONDS."""
+    cached = _funding_rates.get(symbol)
+    if cached and time.time() - cached[1] < COST_FUNDING_REFRESH_SECONDS:
+        return cached[0]
+    funding = cached[0] if cached else None
+    try:
+        response = requests.get(f"https://api-futures.kucoin.com/api/v1/funding-rate/{symbol}/current", timeout=10)
+        if response.status_code == 200 and response.json().get("code") == "200000":
+            data = response.json()["data"]
+            rate = data.get("predictedValue")
+            funding = (float(rate if rate is not None else data["value"]), int(data["timePoint"]) + int(data["granularity"]))
+        else:
+            print(f"Erro ao obter funding: {response.status_code}, {response.text}")
+    except Exception as e:
+        print(f"Erro em fetch_funding_rate: {e}")
+    _funding_rates[symbol] = (funding, time.time())
+    return funding
+
+def net_pnl(position):
+    """
+    (PnL líquido em USDT, PnL% líquido sobre a margem, custos em % da margem).
+    Custos = taxas e funding já realizados na posição (realisedPnl) + taxa taker
+    de saída sobre o valor a mercado + funding previsto, se o acerto vence em
+    até FUNDING_HORIZON_SECONDS. Fora a releitura periódica das taxas, é só conta.
+    """
+    symbol = position['symbol']
+    mark_value = float(position.get('markValue', 0) or 0)
+    margin = float(position.get('posMargin', 0) or 0)
+    unrealised = float(position.get('unrealisedPnl', 0) or 0)
+
+    costs = -float(position.get('realisedPnl', 0) or 0) + fetch_taker_fee(symbol) * abs(mark_value)
+    funding = fetch_funding_rate(symbol)
+    if funding and funding[1] / 1000 - time.time() <= FUNDING_HORIZON_SECONDS:
+        # Taxa positiva: long paga, short recebe (markValue é negativo no short)
+        costs += funding[0] * mark_value
+
+    net = unrealised - costs
+    if margin == 0:
+        return net, 0.0, 0.0
+    return net, net / margin * 100, costs / margin * 100
+
+def stop_price_for_trigger(avg_entry_price, leverage, is_long, trigger_percent, fee_percent, tick_size=None):
+    """
+    Preço em que o PnL% (sobre a margem, já descontadas as taxas) chega ao
+    trigger: o PnL% vale aproximadamente a variação do preço vezes a
+    alavancagem. Arredonda para o tick a favor da proteção.
+    """
+    move = (trigger_percent + fee_percent) / 100 / leverage
+    price = avg_entry_price * (1 + move) if is_long else avg_entry_price * (1 - move)
+    return round_to_tick(price, tick_size, is_long)
+
+def round_to_tick(price, tick_size, is_long):
+    """Arredonda para o tick a favor da proteção: para cima no long, para baixo no short."""
+    if not tick_size:
+        return price
+    steps = price / tick_size
+    steps = math.ceil(steps - 1e-9) if is_long else math.floor(steps + 1e-9)
+    return round(steps * tick_size, 10)
+
+def place_stop_order(symbol, is_long, stop_price):
+    """Ordem stop a mercado que fecha a posição inteira (closeOrder) quando o mark price cruzar stop_price."""
+    try:
+        url = "https://api-futures.kucoin.com/api/v1/orders"
+        now = int(time.time() * 1000)
+        request_path = '/api/v1/orders'
+        body = {
+            "clientOid": str(uuid.uuid4()),
+            "symbol": symbol,
+            "side": 'sell' if is_long else 'buy',
+            "type": "market",
+            "stop": 'down' if is_long else 'up',
+            "stopPriceType": "MP",
+            "stopPrice": str(stop_price),
+            "closeOrder": True,
+            "marginMode": "ISOLATED"
+        }
+        body_json = json.dumps(body)
+        headers = signed_headers(now, 'POST', request_path, body_json)
+        response = requests.post(url, headers=headers, data=body_json)
+        if response.status_code in [200, 201] and response.json().get("code") == "200000":
+            return response.json()["data"]["orderId"]
+        print(f"Erro ao enviar ordem stop: {response.status_code}, {response.text}")
+        return None
+    except Exception as e:
+        print(f"Erro em place_stop_order: {e}")
+        return None
+
+def cancel_order(order_id):
+    try:
+        request_path = f'/api/v1/orders/{order_id}'
+        now = int(time.time() * 1000)
+        headers = signed_headers(now, 'DELETE', request_path)
+        response = requests.delete("https://api-futures.kucoin.com" + request_path, headers=headers)
+        if response.status_code == 200:
+            return True
+        print(f"Erro ao cancelar ordem {order_id}: {response.status_code}, {response.text}")
+        return False
+    except Exception as e:
+        print(f"Erro em cancel_order: {e}")
+        return False
+
+def cancel_stop_orders(symbol):
+    """Cancela todas as ordens stop ainda não disparadas do contrato."""
+    try:
+        request_path = f'/api/v1/stopOrders?symbol={symbol}'
+        now = int(time.time() * 1000)
+        headers = signed_headers(now, 'DELETE', request_path)
+        response = requests.delete("https://api-futures.kucoin.com" + request_path, headers=headers)
+        if response.status_code != 200:
+            print(f"Erro ao cancelar ordens stop: {response.status_code}, {response.text}")
+    except Exception as e:
+        print(f"Erro em cancel_stop_orders: {e}")
+
+def deposit_margin(symbol, amount, biz_no):
+    """
+    Adiciona margem isolada à posição. `biz_no` identifica a chamada: a KuCoin
+    ignora um segundo depósito com o mesmo bizNo, então repetir após timeout é seguro.
+    """
+    try:
+        url = "https://api-futures.kucoin.com/api/v1/position/margin/deposit-margin"
+        now = int(time.time() * 1000)
+        request_path = '/api/v1/position/margin/deposit-margin'
+        body = {
+            "symbol": symbol,
+            "margin": amount,
+            "bizNo": biz_no
+        }
+        body_json = json.dumps(body)
+        headers = signed_headers(now, 'POST', request_path, body_json)
+        response = requests.post(url, headers=headers, data=body_json)
+        if response.status_code in [200, 201] and response.json().get("code") == "200000":
+            return True
+        print(f"Erro ao adicionar margem ({biz_no}): {response.status_code}, {response.text}")
+        return False
+    except Exception as e:
+        print(f"Erro em deposit_margin: {e}")
+        return False
@@ -2,13 +2,14 @@
 
 import time
 import json
+import threading
 from PyQt5.QtWidgets import (
     QWidget, QLabel, QLineEdit, QVBoxLayout, QHBoxLayout, QFormLayout,
     QTableWidget, QTableWidgetItem, QHeaderView, QPushButton, QCheckBox,
     QRadioButton, QButtonGroup
 )
 from PyQt5.QtGui import QFont, QColor, QBrush
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 
 from sound import SoundPlayer
 from websocket_client import PriceWebsocketClient
@@ -18,12 +19,30 @@ from api import (
     close_position_market,
     open_new_position_market,
     decide_trade_direction,
-    get_account_overview
+    get_account_overview,
+    fetch_tick_size,
+    stop_price_for_trigger,
+    round_to_tick,
+    place_stop_order,
+    cancel_order,
+    deposit_margin,
+    net_pnl,
+    EXCHANGE_STOPS_ENABLED,
+    STOP_AMEND_THRESHOLD,
+    MARGIN_CALL_LIQ_PERCENT,
+    MARGIN_CALL_RATIO
 )
 from utils import send_email_notification
+from entry import EntryStateMachine, IDLE
+from stops import ExchangeStopSync
 
 
 class MainWindow(QWidget):
+    # Resultado de um depósito de margem (símbolo, número da chamada, valor, sucesso), vindo da thread do depósito
+    margin_call_done = pyqtSignal(str, int, float, bool)
+    # Ordem stop que ficou na exchange (símbolo, tracker, ordem ou None), vinda da thread do ExchangeStopSync
+    exchange_stop_done = pyqtSignal(str, object, object)
+
     def __init__(self):
         super().__init__()
 
@@ -47,14 +66,23 @@ class MainWindow(QWidget):
         self.use_high_low = True
         self.auto_open_new_position = False
         self.auto_close_positions = True
+        self.exchange_stops = ExchangeStopSync(
+            self.replace_exchange_stop, self.exchange_stop_done.emit, STOP_AMEND_THRESHOLD
+        )
+        self.exchange_stop_done.connect(self.on_exchange_stop_done)
+        self.exchange_stops.start()
         self.granularity = '5'
         self.margin_calls = 0
+        self.margin_calls_inflight = set()
+        self.margin_call_failures = {}
+        self.margin_call_done.connect(self.on_margin_call_done)
         self.fetch_open_positions_empty_count = 0
 
         self.position_trackers = {}
         self.load_position_trackers()
 
-        self.monitoring_signal = False
+        # Entrada automática: sinal -> confirmação -> ordem, movida pelos eventos de indicador, preço e posições
+        self.entry = EntryStateMachine(self.start_entry, lambda symbol: self.decision_value, lambda symbol: self.last_price)
         self.decision_value = 'wait'
         self.sma_value = ''
         self.rsi_value = ''
@@ -457,6 +485,11 @@ class MainWindow(QWidget):
         self.auto_close_timer.timeout.connect(self.check_auto_close_positions)
         self.auto_close_timer.start(1000)
 
+        # Fim da janela de confirmação mesmo sem ticks
+        self.entry_timer = QTimer()
+        self.entry_timer.timeout.connect(self.entry.poll)
+        self.entry_timer.start(1000)
+
         self.high_low_timer = QTimer()
         self.high_low_timer.timeout.connect(self.fetch_high_low_prices)
         self.high_low_timer.start(60000)
@@ -593,21 +626,20 @@ class MainWindow(QWidget):
             data = fetch_open_positions()
             if data is not None:
                 self.update_positions_display(data)
+                self.entry.on_positions(data)
 
                 if data:
-                    self.monitoring_signal = False
                     self.fetch_open_positions_empty_count = 0
                 else:
                     self.fetch_open_positions_empty_count += 1
 
-                if not data and self.auto_open_new_position and not self.monitoring_signal and self.fetch_open_positions_empty_count > 3:
+                if not data and self.auto_open_new_position and self.entry.state == IDLE and self.fetch_open_positions_empty_count > 3:
                     print(f"Empty count: {self.fetch_open_positions_empty_count}, abrindo nova posição...")
                     self.open_new_position_after_close(None)
             else:
                 print("Erro ao obter posições: dados da API são None.")
         except Exception as e:
             print(f"Erro ao obter posições: {e}")
-            self.monitoring_signal = False
 
     def fetch_high_low_prices(self):
         high_price, low_price = fetch_high_low_prices(self.selected_symbol)
@@ -640,18 +672,8 @@ class MainWindow(QWidget):
             pos_margin = position.get('posMargin', 0)
             unrealised_pnl_value = position.get('unrealisedPnl', 0)
 
-            fee_percent = 0.06 * 2 * real_leverage
-            total_fees_percent = fee_percent
-
-            if pos_margin != 0:
-                pnl_percent = (unrealised_pnl_value / pos_margin) * 100
-                pnl_percent -= total_fees_percent
-            else:
-                pnl_percent = 0.0
-
-            fee_rate = 0.0006 * 2
-            total_fees_paid = fee_rate * real_leverage * maint_margin
-            adjusted_unrealised_pnl_value = unrealised_pnl_value - total_fees_paid
+            adjusted_unrealised_pnl_value, pnl_percent, _ = net_pnl(position)
+            total_fees_paid = unrealised_pnl_value - adjusted_unrealised_pnl_value
 
             unrealised_pnl = f"{adjusted_unrealised_pnl_value:.2f} ({pnl_percent:.2f}%)"
 
@@ -780,18 +802,13 @@ class MainWindow(QWidget):
             position = tracker['position']
             position_id = position['symbol']
             pos_margin = position.get('posMargin', 1)
-            unrealised_pnl = position.get('unrealisedPnl', 0)
-            real_leverage = position.get('realLeverage', 0)
             avg_entry_price = position.get('avgEntryPrice', 0)
             current_qty = position.get('currentQty', 0)
 
             if pos_margin == 0:
                 continue
 
-            pnl_percent = (unrealised_pnl / pos_margin) * 100
-
-            fee_percent = 0.06 * 2 * real_leverage
-            pnl_percent -= fee_percent
+            _, pnl_percent, fee_percent = net_pnl(position)
 
             current_trigger = tracker.get('trigger_stop_loss_percent', self.default_stop_loss)
 
@@ -824,6 +841,9 @@ class MainWindow(QWidget):
             elif pnl_percent < 0 and pnl_percent < tracker.get('max_pnl_percent', 0):
                 tracker['max_pnl_percent'] = pnl_percent
 
+            self.sync_exchange_stop(tracker, fee_percent)
+            self.check_margin_call(symbol, tracker, float(position.get('markPrice', 0) or 0))
+
             # Verificar Stop Loss Price
             if self.stop_loss_price != '':
                 try:
@@ -903,95 +923,34 @@ class MainWindow(QWidget):
         leverage = self.default_leverage
         size = self.default_contract_qty
 
-        print("Iniciando monitoramento de sinais para nova posição...")
-        self.monitor_trade_signals(symbol, size, leverage)
+        self.entry.arm(symbol, size, leverage, self.trade_direction_option)
 
-    def monitor_trade_signals(self, symbol, size, leverage):
-        if self.monitoring_signal:
-            return
-        self.monitoring_signal = True
-
-        def check_signal():
-            if not self.monitoring_signal:
-                return
-
-            side = self.decision_value
-            # Check if side matches the selected trade direction option
-            if self.trade_direction_option != 'both' and side != self.trade_direction_option and side in ['buy', 'sell']:
-                print(f"Sinal {side.upper()} não corresponde à direção selecionada ({self.trade_direction_option.upper()}).")
-                self.monitoring_signal = False
-                return
-
-            if side in ['buy', 'sell']:
-                print(f"Sinal identificado: {side.upper()}. Armazenando preço atual e aguardando 1 minuto.")
-                stored_price = self.last_price  # Armazena o preço atual
-
-                def after_wait():
-                    if not self.monitoring_signal:
-                        return
-
-                    current_price = self.last_price  # Obtém o preço atual após 1 minuto
-                    if side == 'buy':
-                        if current_price > stored_price:
-                            print(f"O preço aumentou de {stored_price} para {current_price}. Abrindo posição BUY.")
-                            # Prossegue para abrir a posição
-                            position_details = open_new_position_market(symbol, side, size, leverage)
-                            if position_details:
-                                self.position_trackers[symbol] = {
-                                    'position': position_details,
-                                    'max_pnl_percent': 0,
-                                    'trigger_stop_loss_percent': self.default_stop_loss,
-                                    'used_margin_calls': 0
-                                }
-                                self.save_position_trackers()
-                                self.sound_open_position.play_sound()
-
-                                subject = f"Nova posição aberta: {symbol}"
-                                message = f"Nova posição aberta: {symbol} - {side.upper()} {leverage}x com {size} contratos."
-                                send_email_notification(subject, message)
-                            else:
-                                print("Falha ao abrir nova posição.")
-                        else:
-                            print(f"O preço {current_price} não aumentou após 1 minuto. Não abrindo posição BUY.")
-                    elif side == 'sell':
-                        if current_price < stored_price:
-                            print(f"O preço diminuiu de {stored_price} para {current_price}. Abrindo posição SELL.")
-                            # Prossegue para abrir a posição
-                            position_details = open_new_position_market(symbol, side, size, leverage)
-                            if position_details:
-                                self.position_trackers[symbol] = {
-                                    'position': position_details,
-                                    'max_pnl_percent': 0,
-                                    'trigger_stop_loss_percent': self.default_stop_loss,
-                                    'used_margin_calls': 0
-                                }
-                                self.save_position_trackers()
-                                self.sound_open_position.play_sound()
-
-                                subject = f"Nova posição aberta: {symbol}"
-                                message = f"Nova posição aberta: {symbol} - {side.upper()} {leverage}x com {size} contratos."
-                                send_email_notification(subject, message)
-                            else:
-                                print("Falha ao abrir nova posição.")
-                        else:
-                            print(f"O preço {current_price} não diminuiu após 1 minuto. Não abrindo posição SELL.")
-                    else:
-                        print("Sinal não identificado após 1 minuto.")
-                    self.monitoring_signal = False
-                    self.update_balance_label()
-
-                # Aguarda 1 minuto antes de verificar o preço novamente
-                QTimer.singleShot(30000, after_wait)
-            else:
-                # print("Sinal não identificado. Continuando monitoramento...")
-                QTimer.singleShot(5000, check_signal)
+    def start_entry(self, symbol, side, size, leverage, price):
+        """Ordem da entrada confirmada pela máquina de estados; verdadeiro se a ordem saiu."""
+        position_details = open_new_position_market(symbol, side, size, leverage)
+        if position_details:
+            self.position_trackers[symbol] = {
+                'position': position_details,
+                'max_pnl_percent': 0,
+                'trigger_stop_loss_percent': self.default_stop_loss,
+                'used_margin_calls': 0
+            }
+            self.save_position_trackers()
+            self.sound_open_position.play_sound()
 
-        check_signal()
+            subject = f"Nova posição aberta: {symbol}"
+            message = f"Nova posição aberta: {symbol} - {side.upper()} {leverage}x com {size} contratos."
+            send_email_notification(subject, message)
+        else:
+            print("Falha ao abrir nova posição.")
+        self.update_balance_label()
+        return bool(position_details)
 
     def check_decision_indicators(self):
         granularity = int(self.granularity)
         decisions = decide_trade_direction(self.binance_symbol, self.rsi_period, self.use_sma, self.use_rsi, self.use_volume, granularity, self.use_high_low)
         self.decision_value = decisions['decision']
+        self.entry.on_signal(self.selected_symbol, self.decision_value)
         self.sma_value = f"SMA: {decisions['sma']}"
         self.rsi_value = f"RSI: {decisions['rsi']}"
         self.volume_value = f"Volume: {decisions['volume']}"
@@ -1015,6 +974,84 @@ class MainWindow(QWidget):
     def show_closed_positions_message(self, message):
         print(message)
 
+    def sync_exchange_stop(self, tracker, fee_percent):
+        """
+        Mantém uma ordem stop na KuCoin no preço do trigger do tracker, para a
+        posição ficar protegida mesmo se o bot parar. Só pede a troca quando o
+        trigger anda mais que STOP_AMEND_THRESHOLD ou a posição muda; as
+        chamadas à API ficam com o ExchangeStopSync, fora da thread da GUI.
+        """
+        if not EXCHANGE_STOPS_ENABLED:
+            return
+        position = tracker['position']
+        symbol = position.get('symbol')
+        avg_entry_price = float(position.get('avgEntryPrice', 0) or 0)
+        real_leverage = float(position.get('realLeverage', 0) or 0)
+        current_qty = position.get('currentQty', 0)
+        mark_price = float(position.get('markPrice', 0) or 0)
+        if avg_entry_price <= 0 or real_leverage <= 0 or current_qty == 0:
+            return
+
+        is_long = current_qty > 0
+        trigger = tracker['trigger_stop_loss_percent']
+        position_key = [is_long, avg_entry_price, real_leverage]
+
+        if not self.auto_close_positions:
+            self.exchange_stops.request(symbol, tracker, {'trigger': trigger, 'price': None, 'key': position_key})
+            return
+
+        # Sem tick aqui: o worker arredonda antes de enviar
+        stop_price = stop_price_for_trigger(avg_entry_price, real_leverage, is_long, trigger, fee_percent)
+        # Stop do lado errado do mark dispararia na hora; o fechamento local cuida desse caso
+        if mark_price and (stop_price >= mark_price if is_long else stop_price <= mark_price):
+            return
+        self.exchange_stops.request(symbol, tracker, {
+            'trigger': trigger,
+            'price': stop_price,
+            'key': position_key,
+            'is_long': is_long,
+            'mark_price': mark_price
+        })
+
+    def replace_exchange_stop(self, symbol, request, active):
+        """
+        Roda na thread do ExchangeStopSync. A nova ordem entra antes de
+        cancelar a antiga: a posição nunca fica sem stop.
+        """
+        if request['price'] is None:
+            if active and not cancel_order(active['order_id']):
+                return False, active
+            print(f"Stop na KuCoin removido para {symbol}")
+            return True, None
+
+        is_long, mark_price = request['is_long'], request['mark_price']
+        stop_price = round_to_tick(request['price'], fetch_tick_size(symbol), is_long)
+        # O arredondamento pode jogar o stop para o lado errado do mark
+        if mark_price and (stop_price >= mark_price if is_long else stop_price <= mark_price):
+            return False, active
+        order_id = place_stop_order(symbol, is_long, stop_price)
+        if order_id is None:
+            return False, active
+        if active:
+            cancel_order(active['order_id'])
+        print(f"Stop na KuCoin em {stop_price} (trigger {request['trigger']:.2f}%) para {symbol}")
+        return True, {
+            'order_id': order_id,
+            'trigger': request['trigger'],
+            'price': stop_price,
+            'key': request['key']
+        }
+
+    def on_exchange_stop_done(self, symbol, tracker, active):
+        """Grava no tracker a ordem stop que ficou na exchange (thread da GUI)."""
+        if self.position_trackers.get(symbol) is not tracker or tracker.get('exchange_stop') == active:
+            return
+        if active is None:
+            tracker.pop('exchange_stop', None)
+        else:
+            tracker['exchange_stop'] = active
+        self.save_position_trackers()
+
     def close_position_market(self, position):
         print(f"Fechando posição: {position['symbol']}")
 
@@ -1023,23 +1060,11 @@ class MainWindow(QWidget):
         real_leverage = position.get('realLeverage', 0)
         maint_margin = position.get('maintMargin', 0)
         pos_margin = position.get('posMargin', 0)
-        unrealised_pnl_value = position.get('unrealisedPnl', 0)
         realised_pnl_value = position.get('realisedPnl', 0)
         current_qty = position.get('currentQty', 0)
         mark_price = position.get('markPrice', 0)
 
-        fee_percent = 0.06 * 2 * real_leverage
-        total_fees_percent = fee_percent
-
-        if pos_margin != 0:
-            pnl_percent = (unrealised_pnl_value / pos_margin) * 100
-            pnl_percent -= total_fees_percent
-        else:
-            pnl_percent = 0.0
-
-        fee_rate = 0.0006 * 2
-        total_fees_paid = fee_rate * real_leverage * maint_margin
-        adjusted_unrealised_pnl_value = unrealised_pnl_value - total_fees_paid
+        adjusted_unrealised_pnl_value, pnl_percent, _ = net_pnl(position)
 
         if current_qty < 0:
             position_direction = "SHORT"
@@ -1078,8 +1103,13 @@ class MainWindow(QWidget):
     def update_price_label(self, price):
         previous_price = self.last_price
         self.last_price = price
+        # Chamada de margem no mesmo tick para a posição do símbolo acompanhado pelo websocket
+        tracker = self.position_trackers.get(self.selected_symbol)
+        if tracker is not None:
+            self.check_margin_call(self.selected_symbol, tracker, price)
         formatted_price = f"{self.selected_symbol} ${price:,.2f}"
         self.price_label.setText(formatted_price)
+        self.entry.on_tick(self.selected_symbol, price)
 
         current_time = time.time()
         time_since_last_update = current_time - self.last_updated_price_time
@@ -1134,14 +1164,13 @@ class MainWindow(QWidget):
             self.save_position_trackers()
             self.sound_open_position.play_sound()
             self.update_used_margin_calls_label(0)
-            self.monitoring_signal = False
 
             subject = f"Nova posição aberta: {symbol}"
             message = f"Nova posição aberta: {symbol} - BUY {leverage}x com {size} contratos."
             send_email_notification(subject, message)
         else:
             print("Falha ao abrir posição BUY.")
-        self.monitoring_signal = False
+        self.entry.cancel("ordem manual")
 
     def sell_market(self):
         symbol = self.selected_symbol
@@ -1159,14 +1188,13 @@ class MainWindow(QWidget):
             self.save_position_trackers()
             self.sound_open_position.play_sound()
             self.update_used_margin_calls_label(0)
-            self.monitoring_signal = False
 
             subject = f"Nova posição aberta: {symbol}"
             message = f"Nova posição aberta: {symbol} - SELL {leverage}x com {size} contratos."
             send_email_notification(subject, message)
         else:
             print("Falha ao abrir posição SELL.")
-        self.monitoring_signal = False
+        self.entry.cancel("ordem manual")
 
     def load_configurations(self):
         try:
@@ -1268,3 +1296,59 @@ class MainWindow(QWidget):
     def update_used_margin_calls_label(self, used_calls):
         self.used_margin_calls_label.setText(f"({used_calls})")
 
+    def check_margin_call(self, symbol, tracker, mark_price):
+        """
+        Deposita margem isolada quando o preço chega a menos de MARGIN_CALL_LIQ_PERCENT
+        da liquidação, até self.margin_calls vezes por posição. O depósito roda em
+        outra thread; o bizNo (id da posição + número da chamada) impede depósito em dobro.
+        """
+        position = tracker['position']
+        used_calls = tracker.get('used_margin_calls', 0)
+        if self.margin_calls <= 0 or used_calls >= self.margin_calls or symbol in self.margin_calls_inflight:
+            return
+        liquidation_price = float(position.get('liquidationPrice', 0) or 0)
+        if not mark_price or liquidation_price <= 0:
+            return
+        # Liquidação ainda igual à da última chamada: esperando a posição ser reconsultada
+        if tracker.get('margin_call_liq') == liquidation_price:
+            return
+        if time.time() - self.margin_call_failures.get(symbol, 0) < 10:
+            return
+        distance = abs(mark_price - liquidation_price) / mark_price * 100
+        if distance >= MARGIN_CALL_LIQ_PERCENT:
+            return
+
+        call_number = used_calls + 1
+        amount = round(float(position.get('posMargin', 0) or 0) * MARGIN_CALL_RATIO, 2)
+        if amount <= 0:
+            return
+        biz_no = f"{position.get('id') or symbol}-margin-{call_number}"
+        print(f"{symbol} a {distance:.2f}% da liquidação ({liquidation_price}). "
+              f"Chamada de margem {call_number}/{self.margin_calls}: +{amount} USDT")
+        self.margin_calls_inflight.add(symbol)
+        tracker['margin_call_liq'] = liquidation_price
+
+        def deposit():
+            ok = deposit_margin(symbol, amount, biz_no)
+            self.margin_call_done.emit(symbol, call_number, amount, ok)
+
+        threading.Thread(target=deposit, daemon=True).start()
+
+    def on_margin_call_done(self, symbol, call_number, amount, ok):
+        self.margin_calls_inflight.discard(symbol)
+        tracker = self.position_trackers.get(symbol)
+        if not ok:
+            self.margin_call_failures[symbol] = time.time()
+            if tracker is not None:
+                tracker.pop('margin_call_liq', None)
+            return
+        self.margin_call_failures.pop(symbol, None)
+        if tracker is not None:
+            tracker['used_margin_calls'] = call_number
+            self.save_position_trackers()
+        self.update_used_margin_calls_label(call_number)
+        send_email_notification(
+            f"Chamada de margem {call_number}/{self.margin_calls}: {symbol}",
+            f"Depositados {amount} USDT de margem isolada em {symbol} perto do preço de liquidação."
+        )
+